@@ -10,6 +10,7 @@ import os
 import logging
 import models
 from database import get_db
+from utils.membership_cache import invalidate_user_memberships
 from ldap3 import Server, Connection, ALL
 
 # Router tanımla
@@ -211,6 +212,22 @@ async def get_current_active_user(current_user: UserInDB = Depends(get_current_u
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+def get_user_from_token(db: Session, token: Optional[str]):
+    """JWT'den aktif kullanıcıyı döndürür, geçersizse None (WebSocket gibi HTTPException kullanılamayan yerler için)"""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    user = get_user(db, username=username)
+    if user is None or not user.is_active:
+        return None
+    return user
+
 # Download endpointleri için opsiyonel OAuth2 (header veya query param token)
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
@@ -415,6 +432,9 @@ def sync_ldap_users_func(db: Session):
             logger.error(f"Final commit hatası: {final_commit_error}")
             db.rollback()
         
+        # Birincil birimler toplu değişmiş olabilir - üyelik önbelleğini temizle
+        invalidate_user_memberships()
+        
         conn.unbind()
         
         return {
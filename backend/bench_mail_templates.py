@@ -0,0 +1,77 @@
+import argparse
+import time
+from types import SimpleNamespace
+
+from utils import mail_templates
+from utils.template_engine import PreparedMailCache
+
+# E-posta şablonu render maliyeti ölçümü (veritabanı / SMTP gerekmez)
+# python bench_mail_templates.py --recipients 1000 --rounds 20
+#
+# "alıcı başına" : her alıcı için şablonun tamamı render edilir (eski davranış)
+# "hazırlanmış"  : talebe ait kısım bir kez, alıcı başına sadece ad doldurulur
+
+def sample_event():
+    creator = SimpleNamespace(full_name="Ayşe Yılmaz", username="ayilmaz")
+    assignee = SimpleNamespace(full_name="Mehmet Demir", username="mdemir")
+    ticket = SimpleNamespace(
+        id=1024, title="Yazıcı ağda görünmüyor", status="in_progress", priority="high",
+        department=SimpleNamespace(name="Bilgi İşlem"), creator=creator, assignee=assignee
+    )
+    comment = SimpleNamespace(content="Sürücü güncellendi, yazıcı yeniden başlatıldı. " * 8)
+    return ticket, creator, comment
+
+def recipients(count):
+    return [SimpleNamespace(full_name=f"Personel {i}", username=f"personel{i}") for i in range(count)]
+
+def bench(label, rounds, recipient_count, fn):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    per_thousand = best * 1000 / recipient_count
+    print(f"{label:<45} {per_thousand * 1000:9.2f} ms / 1000 alıcı")
+    return per_thousand
+
+def main():
+    parser = argparse.ArgumentParser(description="E-posta şablonu render ölçümü")
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    ticket, commenter, comment = sample_event()
+    users = recipients(args.recipients)
+    app_url = "https://destek.example.org"
+
+    cases = [
+        (
+            "Yorum bildirimi (utils/notifications)",
+            lambda: [mail_templates.get_comment_notification_template(ticket, commenter, user, comment, app_url) for user in users],
+            lambda: _render_cached(users, "comment", lambda: mail_templates.prepare_comment_notification(ticket, commenter, comment, app_url)),
+        ),
+        (
+            "Birime talep açıldı (system_settings)",
+            lambda: [mail_templates.prepare_department_ticket_mail(ticket, app_url).render(recipient_name=user.full_name) for user in users],
+            lambda: _render_cached(users, "department", lambda: mail_templates.prepare_department_ticket_mail(ticket, app_url)),
+        ),
+        (
+            "Talep güncellendi (system_settings)",
+            lambda: [mail_templates.prepare_ticket_updated_mail(ticket, commenter, app_url).render(recipient_name=user.full_name) for user in users],
+            lambda: _render_cached(users, "update", lambda: mail_templates.prepare_ticket_updated_mail(ticket, commenter, app_url)),
+        ),
+    ]
+
+    print(f"{args.recipients} alıcı, {args.rounds} tur (en iyi tur)\n")
+    for name, per_recipient, prepared in cases:
+        print(name)
+        slow = bench("  alıcı başına", args.rounds, args.recipients, per_recipient)
+        fast = bench("  hazırlanmış", args.rounds, args.recipients, prepared)
+        print(f"  {slow / fast:.1f}x\n")
+
+def _render_cached(users, key, factory):
+    mails = PreparedMailCache()
+    return [mails.render(key, factory, recipient_name=user.full_name) for user in users]
+
+if __name__ == "__main__":
+    main()
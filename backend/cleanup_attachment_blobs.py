@@ -0,0 +1,20 @@
+from database import SessionLocal
+from utils.config_cache import get_config_snapshot
+from utils.attachment_storage import collect_garbage
+import os
+
+# Referanssız dosya eki blob'larını temizler (cron ile periyodik çalıştırılabilir)
+def main():
+    db = SessionLocal()
+    try:
+        config = get_config_snapshot(db)
+        upload_dir = os.getenv("UPLOAD_DIR") or (config.upload_directory if config else None) or "/app/uploads"
+        print(f"Blob çöp toplama başlatılıyor: {upload_dir}")
+        stats = collect_garbage(db, upload_dir)
+        print(f"{stats['blobs_deleted']} blob ve {stats['orphan_files_deleted']} sahipsiz dosya silindi, "
+              f"{stats['bytes_freed'] / (1024 * 1024):.1f} MB boşaltıldı.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,9 @@ from sqlalchemy.orm import Session
 import logging
 import models
 from database import get_db, engine
+from utils.config_cache import get_config_snapshot
 from auth import router as auth_router
-from routers import tickets, notifications, users, departments, wikis, system_settings, login_logs, reports, system_logs
+from routers import tickets, notifications, users, departments, wikis, system_settings, login_logs, reports, system_logs, export_jobs
 from routers import external_api, api_clients  # Harici API entegrasyonu
 
 # Logging
@@ -96,6 +97,8 @@ class DynamicCORSMiddleware(BaseHTTPMiddleware):
             response.headers["Access-Control-Allow-Credentials"] = "true"
             response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
             response.headers["Access-Control-Allow-Headers"] = "*"
+            # Sayfalama header'ları farklı origin'deki frontend'den okunabilsin
+            response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor, X-Total-Count"
         
         return response
 
@@ -119,6 +122,7 @@ app.include_router(login_logs.router, prefix="/api/login-logs")
 app.include_router(notifications.router, prefix="/api/notifications")
 app.include_router(reports.router, prefix="/api/reports")
 app.include_router(system_logs.router, prefix="/api/system-logs")
+app.include_router(export_jobs.router, prefix="/api/export-jobs")  # Arka plan dışa aktarma işleri
 
 # Harici API Entegrasyonu
 app.include_router(external_api.router, prefix="/api/external")  # Harici uygulamalar için
@@ -130,13 +134,44 @@ app.include_router(api_clients.router, prefix="/api/admin/api-clients")  # API c
 # FastAPI'de çift dekoratör (örn. @app.get("/users") ve @app.get("/users/")) sonsuz döngü yaratır
 # Routers zaten tüm endpoint'leri yönetiyor; buradaki ek tanımları siliyoruz
 
-@app.on_event("startup")
 async def start_tasks():
+    """Arka plan görevleri; tablolar ve tetikleyiciler kurulduktan sonra startup_event sonunda başlatılır"""
     from utils.workflow_worker import run_auto_escalation
     import asyncio
     asyncio.create_task(run_auto_escalation())
     logger.info("Background tasks started (Escalation worker)")
 
+    from utils.realtime import realtime_hub
+    realtime_hub.start()
+
+    # Outbox worker'ı varsa özet e-postalarını ve webhook'ları o gönderir, dışa aktarma işlerini o çalıştırır
+    from utils.outbox import NOTIFICATION_OUTBOX_ENABLED
+    if not NOTIFICATION_OUTBOX_ENABLED:
+        from utils.notification_digest import run_digest_flusher
+        asyncio.create_task(run_digest_flusher())
+        from utils.notification_retention import run_retention_loop
+        asyncio.create_task(run_retention_loop())
+        from utils.webhook_delivery import webhook_dispatcher
+        webhook_dispatcher.start()
+        from utils.export_jobs import export_job_runner
+        export_job_runner.start()
+
+@app.on_event("shutdown")
+async def stop_worker_pools():
+    from utils.render_pool import render_pool
+    render_pool.shutdown()
+    from utils.notifications import push_dispatcher
+    push_dispatcher.shutdown()
+    from utils.realtime import realtime_hub
+    await realtime_hub.stop()
+    from utils.webhook_delivery import webhook_dispatcher
+    await webhook_dispatcher.stop()
+    from utils.export_jobs import export_job_runner
+    export_job_runner.shutdown()
+    # Tampondaki sistem logları en son yazılır (yukarıdakiler kapanırken log üretebilir)
+    from utils.system_logger import system_log_writer
+    system_log_writer.shutdown()
+
 @app.on_event("startup")
 async def startup_event():
     try:
@@ -145,6 +180,28 @@ async def startup_event():
         import models
         models.Base.metadata.create_all(bind=engine)
         logger.info("Tablolar olusturuldu")
+
+        # Okunmamış bildirim sayaçları (PostgreSQL tetikleyicileri, ilk açılışta bir kez)
+        from utils.notification_retention import install_unread_counters
+        try:
+            install_unread_counters(engine)
+        except Exception as e:
+            logger.error(f"Okunmamış sayaç kurulumu başarısız: {e}")
+
+        # Rapor özet tabloları (PostgreSQL tetikleyicileri, ilk açılışta bir kez doldurulur)
+        from utils.report_stats import install_report_rollups
+        try:
+            install_report_rollups(engine)
+        except Exception as e:
+            logger.error(f"Rapor özet tabloları kurulamadı: {e}")
+
+        # Talep tam metin araması (PostgreSQL tetikleyicileri; mevcut talepler arka planda doldurulur)
+        from utils.ticket_search import install_ticket_search, start_backfill
+        try:
+            install_ticket_search(engine)
+            start_backfill(engine)
+        except Exception as e:
+            logger.error(f"Talep arama kurulumu başarısız: {e}")
         
         db = next(get_db())
         
@@ -208,6 +265,9 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Startup error: {str(e)}")
 
+    # Yoklayan görevler ilk sorgularını create_all ve tetikleyici kurulumundan sonra yapar
+    await start_tasks()
+
 @app.get("/config/")
 @app.get("/config")
 @app.get("/api/config")
@@ -215,7 +275,7 @@ async def get_config(db: Session = Depends(get_db)):
     """Frontend configuration"""
     try:
         # Database'den GeneralConfig al
-        general_config = db.query(models.GeneralConfig).first()
+        general_config = get_config_snapshot(db)
         
         if general_config:
             return {
@@ -270,17 +330,10 @@ async def get_config(db: Session = Depends(get_db)):
 
 
 # WebSocket endpointi dosyanın en altına taşındı
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import WebSocket
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    try:
-        while True:
-            data = await websocket.receive_text()
-            await websocket.send_text(f"Echo: {data}")
-    except WebSocketDisconnect:
-        logger.info("WebSocket bağlantısı kapatıldı.")
-                
-
-        
+    """Gerçek zamanlı bildirim ve talep olayları (protokol: utils/realtime.py)"""
+    from utils.realtime import handle_websocket
+    await handle_websocket(websocket)
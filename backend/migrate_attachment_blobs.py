@@ -0,0 +1,104 @@
+import hashlib
+import os
+import shutil
+from database import engine, SessionLocal
+from sqlalchemy import text
+import models
+from utils.attachment_storage import blob_relative_path, acquire_blob
+
+# Mevcut dosya eklerini içerik adresli depoya (uploads/blobs/ab/cd/<sha256>) taşır.
+# Dosyalar aynı upload dizini içinde taşınır; aynı içerikli kopyalar tek blob'a indirgenir.
+# Script yarıda kesilirse tekrar çalıştırılabilir (blob_id'si olan ekler atlanır).
+CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def migrate_schema():
+    models.AttachmentBlob.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        statements = [
+            "ALTER TABLE attachments ADD COLUMN IF NOT EXISTS checksum VARCHAR(64)",
+            "ALTER TABLE attachments ADD COLUMN IF NOT EXISTS blob_id INTEGER REFERENCES attachment_blobs(id)",
+            "CREATE INDEX IF NOT EXISTS ix_attachments_checksum ON attachments (checksum)",
+            "CREATE INDEX IF NOT EXISTS ix_attachments_blob_id ON attachments (blob_id)",
+        ]
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Şema güncellenemedi: {statement} - {e}")
+    print("attachment_blobs tablosu ve attachments kolonları hazır.")
+
+def migrate_files():
+    db = SessionLocal()
+    try:
+        config = db.query(models.GeneralConfig).first()
+        upload_dir = os.getenv("UPLOAD_DIR") or (config.upload_directory if config else None) or "/app/uploads"
+        print(f"Upload dizini: {upload_dir}")
+
+        attachment_ids = [row[0] for row in db.query(models.Attachment.id).filter(models.Attachment.blob_id.is_(None)).all()]
+        moved = deduplicated = missing = 0
+        saved_bytes = 0
+
+        for attachment_id in attachment_ids:
+            attachment = db.query(models.Attachment).filter(models.Attachment.id == attachment_id).first()
+            source = os.path.join(upload_dir, attachment.file_path or "")
+            if not attachment.file_path or not os.path.isfile(source):
+                print(f"Dosya bulunamadı, atlanıyor: #{attachment.id} {source}")
+                missing += 1
+                continue
+
+            checksum = file_sha256(source)
+            size = os.path.getsize(source)
+            destination = os.path.join(upload_dir, blob_relative_path(checksum))
+
+            # Önce hedefe hard link (aynı dosya sistemi) veya kopya oluştur, kayıt commit edildikten sonra kaynağı sil.
+            # Böylece script hangi adımda kesilirse kesilsin ek dosyasız kalmaz.
+            already_stored = os.path.exists(destination)
+            if not already_stored:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                temp_destination = f"{destination}.migrate"
+                try:
+                    os.link(source, temp_destination)
+                except OSError:
+                    shutil.copy2(source, temp_destination)
+                os.replace(temp_destination, destination)
+                moved += 1
+
+            old_path = attachment.file_path
+            blob = acquire_blob(db, checksum, size)
+            attachment.blob_id = blob.id
+            attachment.file_path = blob.storage_path
+            attachment.checksum = checksum
+            attachment.file_size = attachment.file_size or size
+            db.commit()
+
+            # Aynı dosyayı gösteren ve henüz taşınmamış başka ek yoksa eski dosyayı sil
+            still_used = db.query(models.Attachment.id).filter(models.Attachment.file_path == old_path).first()
+            if not still_used and os.path.abspath(source) != os.path.abspath(destination):
+                os.unlink(source)
+                if already_stored:
+                    # Aynı içerik zaten depodaydı - bu kopya diskten kalktı
+                    deduplicated += 1
+                    saved_bytes += size
+
+        print(f"{moved} dosya taşındı, {deduplicated} kopya birleştirildi "
+              f"({saved_bytes / (1024 * 1024):.1f} MB tasarruf), {missing} dosya bulunamadı.")
+    finally:
+        db.close()
+
+def migrate():
+    print("Dosya eki blob migrasyonu başlatılıyor...")
+    migrate_schema()
+    migrate_files()
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,53 @@
+import hashlib
+import os
+from database import engine
+from sqlalchemy import text
+
+# Dosya eklerine SHA-256 özeti kolonu ekler ve mevcut dosyalar için özetleri hesaplar
+CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def migrate():
+    with engine.connect() as conn:
+        print("Dosya eki checksum migrasyonu başlatılıyor...")
+        try:
+            conn.execute(text("ALTER TABLE attachments ADD COLUMN IF NOT EXISTS checksum VARCHAR(64)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_attachments_checksum ON attachments (checksum)"))
+            conn.commit()
+            print("attachments: checksum kolonu eklendi (veya zaten var).")
+        except Exception as e:
+            conn.rollback()
+            print(f"attachments: checksum kolonu eklenemedi: {e}")
+            return
+
+        upload_dir = os.getenv("UPLOAD_DIR")
+        if not upload_dir:
+            row = conn.execute(text("SELECT upload_directory FROM general_config ORDER BY id LIMIT 1")).first()
+            upload_dir = (row[0] if row else None) or "/app/uploads"
+
+        rows = conn.execute(text("SELECT id, file_path FROM attachments WHERE checksum IS NULL")).all()
+        updated = 0
+        for attachment_id, file_path in rows:
+            path = os.path.join(upload_dir, file_path or "")
+            if not file_path or not os.path.isfile(path):
+                print(f"Dosya bulunamadı, atlanıyor: #{attachment_id} {path}")
+                continue
+            conn.execute(
+                text("UPDATE attachments SET checksum = :checksum, file_size = COALESCE(file_size, :size) WHERE id = :id"),
+                {"checksum": file_sha256(path), "size": os.path.getsize(path), "id": attachment_id}
+            )
+            updated += 1
+            if updated % 100 == 0:
+                conn.commit()
+        conn.commit()
+        print(f"{updated} dosya eki için checksum hesaplandı.")
+        print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
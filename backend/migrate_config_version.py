@@ -0,0 +1,16 @@
+from database import engine
+from sqlalchemy import text
+
+# Sistem ayarları önbelleği (utils/config_cache.py) için sürüm sayacı
+def migrate():
+    with engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE general_config ADD COLUMN IF NOT EXISTS config_version INTEGER NOT NULL DEFAULT 1"))
+            conn.commit()
+            print("general_config: config_version eklendi (veya zaten var).")
+        except Exception as e:
+            conn.rollback()
+            print(f"general_config: config_version eklenemedi: {e}")
+
+if __name__ == "__main__":
+    migrate()
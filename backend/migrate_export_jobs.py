@@ -0,0 +1,17 @@
+from database import engine
+import models
+
+# Arka plan dışa aktarma işleri tablosu (export_jobs)
+# Büyük dışa aktarmalar istek içinde değil, iş olarak çalışır; dosyalar yükleme deposunda exports/ altında tutulur
+def migrate():
+    print("Dışa aktarma işleri migrasyonu başlatılıyor...")
+    try:
+        models.ExportJob.__table__.create(bind=engine, checkfirst=True)
+        print("export_jobs tablosu hazır.")
+    except Exception as e:
+        print(f"Tablo oluşturulamadı: {e}")
+        return
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,30 @@
+from database import engine
+from sqlalchemy import text
+import models
+
+# Bildirim özeti (digest) için notification_settings.digest_mode kolonu ve
+# notification_digest_items tablosu
+def migrate():
+    print("Bildirim özeti migrasyonu başlatılıyor...")
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(
+                "ALTER TABLE notification_settings ADD COLUMN IF NOT EXISTS digest_mode VARCHAR(20) DEFAULT 'immediate'"
+            ))
+            conn.execute(text("UPDATE notification_settings SET digest_mode = 'immediate' WHERE digest_mode IS NULL"))
+            conn.commit()
+            print("notification_settings: digest_mode eklendi (veya zaten var).")
+        except Exception as e:
+            conn.rollback()
+            print(f"notification_settings: digest_mode eklenemedi: {e}")
+
+    try:
+        # Tablo ve indeksleri modelden oluşturulur
+        models.NotificationDigestItem.__table__.create(bind=engine, checkfirst=True)
+        print("notification_digest_items tablosu oluşturuldu (veya zaten var).")
+    except Exception as e:
+        print(f"notification_digest_items tablosu oluşturulamadı: {e}")
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
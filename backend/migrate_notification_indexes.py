@@ -0,0 +1,20 @@
+from database import engine
+from sqlalchemy import text
+
+# Bildirim listesi ve SSE akışı için (user_id, created_at) indeksi
+# Büyük tabloda yazmaları kilitlememek için CONCURRENTLY (transaction dışında çalışır)
+def migrate():
+    print("Bildirim indeksi migrasyonu başlatılıyor...")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        try:
+            conn.execute(text(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_notifications_user_id_created_at "
+                "ON notifications (user_id, created_at)"
+            ))
+            print("ix_notifications_user_id_created_at oluşturuldu (veya zaten var).")
+        except Exception as e:
+            print(f"İndeks oluşturulamadı: {e}")
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
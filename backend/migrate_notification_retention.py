@@ -0,0 +1,27 @@
+from database import engine
+import models
+from utils.notification_retention import install_unread_counters
+
+# Bildirim arşiv tablosu ve okunmamış sayaçları
+# Sayaç tablosu mevcut okunmamış bildirimlerden doldurulur, ardından tetikleyiciler kurulur
+def migrate():
+    print("Bildirim saklama migrasyonu başlatılıyor...")
+    try:
+        models.NotificationArchive.__table__.create(bind=engine, checkfirst=True)
+        models.NotificationUnreadCounter.__table__.create(bind=engine, checkfirst=True)
+        print("notifications_archive ve notification_unread_counters tabloları hazır.")
+    except Exception as e:
+        print(f"Tablolar oluşturulamadı: {e}")
+        return
+
+    try:
+        if install_unread_counters(engine):
+            print("Okunmamış sayaç tetikleyicileri kuruldu.")
+        else:
+            print("Sayaç tetikleyicileri zaten kurulu (veya veritabanı PostgreSQL değil).")
+    except Exception as e:
+        print(f"Sayaç tetikleyicileri kurulamadı: {e}")
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
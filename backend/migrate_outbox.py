@@ -0,0 +1,28 @@
+from database import engine
+from sqlalchemy import text
+import models
+
+# Giden bildirim kuyruğu (outbox_jobs) tablosunu ve worker indeksini oluşturur
+def migrate():
+    print("Outbox migrasyonu başlatılıyor...")
+    try:
+        models.OutboxJob.__table__.create(bind=engine, checkfirst=True)
+        print("outbox_jobs tablosu oluşturuldu (veya zaten var).")
+    except Exception as e:
+        print(f"outbox_jobs tablosu oluşturulamadı: {e}")
+        return
+
+    with engine.connect() as conn:
+        try:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_outbox_jobs_status_run_after ON outbox_jobs (status, run_after)"
+            ))
+            conn.commit()
+            print("ix_outbox_jobs_status_run_after oluşturuldu (veya zaten var).")
+        except Exception as e:
+            conn.rollback()
+            print(f"İndeks oluşturulamadı: {e}")
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,30 @@
+import sys
+
+from database import engine
+import models
+from utils.report_stats import install_report_rollups
+
+# Rapor özet tabloları (ticket_daily_stats, ticket_user_daily_stats)
+# Tablolar mevcut taleplerden doldurulur, ardından tickets tetikleyicileri kurulur.
+# Özetler tutarsız görünürse yeniden oluşturmak için: python migrate_report_rollups.py --rebuild
+def migrate(rebuild=False):
+    print("Rapor özet tabloları migrasyonu başlatılıyor...")
+    try:
+        models.TicketDailyStat.__table__.create(bind=engine, checkfirst=True)
+        models.TicketUserDailyStat.__table__.create(bind=engine, checkfirst=True)
+        print("ticket_daily_stats ve ticket_user_daily_stats tabloları hazır.")
+    except Exception as e:
+        print(f"Tablolar oluşturulamadı: {e}")
+        return
+
+    try:
+        if install_report_rollups(engine, rebuild=rebuild):
+            print("Özet tabloları dolduruldu, tetikleyiciler hazır.")
+        else:
+            print("Tetikleyiciler zaten kurulu (veya veritabanı PostgreSQL değil).")
+    except Exception as e:
+        print(f"Özet tabloları doldurulamadı: {e}")
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate(rebuild="--rebuild" in sys.argv)
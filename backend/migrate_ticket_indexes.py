@@ -0,0 +1,28 @@
+from database import engine
+from sqlalchemy import text
+
+# Talep listesi keyset sayfalaması ve sunucu tarafı filtreler için indeksler
+INDEXES = [
+    ("ix_tickets_updated_at_id", "tickets (updated_at, id)"),
+    ("ix_tickets_created_at_id", "tickets (created_at, id)"),
+    ("ix_tickets_department_id", "tickets (department_id)"),
+    ("ix_tickets_creator_id", "tickets (creator_id)"),
+    ("ix_tickets_assignee_id", "tickets (assignee_id)"),
+    ("ix_user_departments_department_id", "user_departments (department_id, user_id)"),
+]
+
+def migrate():
+    with engine.connect() as conn:
+        print("Talep indeksleri migrasyonu başlatılıyor...")
+        for index_name, definition in INDEXES:
+            try:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {definition}"))
+                conn.commit()
+                print(f"{index_name} oluşturuldu (veya zaten var).")
+            except Exception as e:
+                conn.rollback()
+                print(f"{index_name} oluşturulamadı: {e}")
+        print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
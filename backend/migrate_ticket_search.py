@@ -0,0 +1,30 @@
+from database import engine
+from utils.ticket_search import install_ticket_search, backfill_ticket_search
+
+# Talep tam metin araması (PostgreSQL)
+# tickets.search_vector sütunu ve tetikleyiciler kurulur, mevcut talepler parça parça doldurulur,
+# ardından GIN indeksi CONCURRENTLY oluşturulur (yazmalar kilitlenmez)
+def migrate():
+    print("Talep arama migrasyonu başlatılıyor...")
+    if engine.dialect.name != "postgresql":
+        print("Veritabanı PostgreSQL değil; ILIKE araması kullanılacak.")
+        return
+
+    try:
+        if install_ticket_search(engine):
+            print("search_vector sütunu ve tetikleyiciler kuruldu.")
+        else:
+            print("Tetikleyiciler zaten kurulu.")
+    except Exception as e:
+        print(f"Tetikleyiciler kurulamadı: {e}")
+        return
+
+    try:
+        count = backfill_ticket_search(engine)
+        print(f"{count} talep dolduruldu, ix_tickets_search_vector hazır (veya zaten vardı).")
+    except Exception as e:
+        print(f"Doldurma / indeks oluşturma başarısız: {e}")
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,17 @@
+from database import engine
+import models
+
+# Webhook teslimat kuyruğu tablosu (webhook_deliveries)
+# Webhook'lar artık istek içinde değil, bu tablodan dağıtıcı tarafından gönderilir
+def migrate():
+    print("Webhook teslimat kuyruğu migrasyonu başlatılıyor...")
+    try:
+        models.WebhookDelivery.__table__.create(bind=engine, checkfirst=True)
+        print("webhook_deliveries tablosu hazır.")
+    except Exception as e:
+        print(f"Tablo oluşturulamadı: {e}")
+        return
+    print("Migrasyon tamamlandı.")
+
+if __name__ == "__main__":
+    migrate()
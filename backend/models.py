@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum, Table
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Date, Float, Boolean, ForeignKey, Enum, Table, Index, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -11,7 +11,8 @@ user_department_association = Table(
     'user_departments',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id')),
-    Column('department_id', Integer, ForeignKey('departments.id'))
+    Column('department_id', Integer, ForeignKey('departments.id')),
+    Index('ix_user_departments_department_id', 'department_id', 'user_id')
 )
 
 # Wiki sharing association tables
@@ -154,9 +155,15 @@ class Ticket(Base):
     escalation_count = Column(Integer, default=0)         # Kaç kez otomatik atandı
     
     # Foreign Keys
-    creator_id = Column(Integer, ForeignKey("users.id"))
-    assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    department_id = Column(Integer, ForeignKey("departments.id"))
+    creator_id = Column(Integer, ForeignKey("users.id"), index=True)
+    assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    department_id = Column(Integer, ForeignKey("departments.id"), index=True)
+    
+    # Keyset sayfalama indeksleri (migrate_ticket_indexes.py ile mevcut veritabanına eklenir)
+    __table_args__ = (
+        Index("ix_tickets_updated_at_id", "updated_at", "id"),
+        Index("ix_tickets_created_at_id", "created_at", "id"),
+    )
     
     # Relationships
     creator = relationship("User", foreign_keys=[creator_id], back_populates="created_tickets")
@@ -205,6 +212,49 @@ class Comment(Base):
     user = relationship("User")
     ticket = relationship("Ticket")
 
+class TicketDailyStat(Base):
+    """
+    Günlük talep özeti (oluşturma günü, birim, durum, öncelik başına talep sayısı).
+    PostgreSQL'de tickets tetikleyicisi ile güncellenir; boş birim 0, boş durum/öncelik '' olarak tutulur.
+    """
+    __tablename__ = "ticket_daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    department_id = Column(Integer, primary_key=True)
+    status = Column(String(30), primary_key=True)
+    priority = Column(String(30), primary_key=True)
+    is_private = Column(Boolean, primary_key=True)
+    is_assigned = Column(Boolean, primary_key=True)
+    ticket_count = Column(Integer, nullable=False, default=0)
+
+class TicketUserDailyStat(Base):
+    """Günlük personel özeti: talep açan (creator) ve atanan (assignee) kullanıcı başına sayaçlar"""
+    __tablename__ = "ticket_user_daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    department_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    role = Column(String(10), primary_key=True)  # creator, assignee
+    ticket_count = Column(Integer, nullable=False, default=0)
+    urgent_count = Column(Integer, nullable=False, default=0)
+    high_count = Column(Integer, nullable=False, default=0)
+    open_count = Column(Integer, nullable=False, default=0)
+    closed_count = Column(Integer, nullable=False, default=0)
+    # Kapalı taleplerin çözüm süresi toplamı (saniye) ve süresi hesaplanabilen kapalı talep sayısı
+    resolution_seconds = Column(Float, nullable=False, default=0)
+    resolution_count = Column(Integer, nullable=False, default=0)
+
+class AttachmentBlob(Base):
+    """İçerik adresli dosya (SHA-256) - aynı içerikli ekler tek blob'u paylaşır"""
+    __tablename__ = "attachment_blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    size = Column(Integer)
+    storage_path = Column(String(255), nullable=False)  # upload dizinine göre: blobs/ab/cd/<sha256>
+    ref_count = Column(Integer, nullable=False, default=0)  # Bu blob'a bağlı ek sayısı
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Attachment(Base):
     __tablename__ = "attachments"
     
@@ -213,15 +263,18 @@ class Attachment(Base):
     file_path = Column(String)
     content_type = Column(String)
     file_size = Column(Integer)
+    checksum = Column(String(64), nullable=True, index=True)  # SHA-256 (hex), yükleme sırasında hesaplanır
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Foreign Keys
     ticket_id = Column(Integer, ForeignKey("tickets.id"))
     uploaded_by = Column(Integer, ForeignKey("users.id"))
+    blob_id = Column(Integer, ForeignKey("attachment_blobs.id"), nullable=True, index=True)
     
     # Relationships
     ticket = relationship("Ticket")
     uploader = relationship("User")
+    blob = relationship("AttachmentBlob")
 
 class Wiki(Base):
     __tablename__ = "wikis"
@@ -280,6 +333,40 @@ class Notification(Base):
     # Relationships
     user = relationship("User")
 
+    # Kullanıcının bildirimleri tarih sırasıyla (liste, SSE cursor'ı); migrate_notification_indexes.py
+    __table_args__ = (
+        Index("ix_notifications_user_id_created_at", "user_id", "created_at"),
+    )
+
+class NotificationArchive(Base):
+    """
+    Saklama süresi dolan okunmuş bildirimler (soğuk tablo).
+    Kolonlar notifications ile aynı; id orijinal bildirim id'sidir.
+    """
+    __tablename__ = "notifications_archive"
+    
+    id = Column(Integer, primary_key=True)
+    title = Column(String(255))
+    message = Column(Text)
+    type = Column(String(50))
+    is_read = Column(Boolean, default=True)
+    related_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime)
+    email_sent = Column(Boolean, default=False)
+    user_id = Column(Integer, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        Index("ix_notifications_archive_user_id_created_at", "user_id", "created_at"),
+    )
+
+class NotificationUnreadCounter(Base):
+    """Kullanıcı başına okunmamış bildirim sayısı (PostgreSQL'de notifications tetikleyicisi ile güncellenir)"""
+    __tablename__ = "notification_unread_counters"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+
 class NotificationSettings(Base):
     __tablename__ = "notification_settings"
     
@@ -302,12 +389,58 @@ class NotificationSettings(Base):
     wiki_updated = Column(Boolean, default=True)
     wiki_shared = Column(Boolean, default=True)
     
+    # E-posta özeti: immediate (olay başına, kısa birleştirme penceresiyle), hourly, daily
+    digest_mode = Column(String(20), default="immediate", server_default="immediate")
+    
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="notification_settings")
 
+class NotificationDigestItem(Base):
+    """
+    Birleştirilerek gönderilecek e-posta bildirimleri.
+    Aynı (kullanıcı, coalesce_key) için deliver_after'a kadar gelen olaylar tek e-postada gönderilir.
+    """
+    __tablename__ = "notification_digest_items"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    coalesce_key = Column(String(50), nullable=False)   # ticket:<id> veya digest:hourly / digest:daily
+    
+    recipient_email = Column(String(255), nullable=False)
+    notification_type = Column(String(50), nullable=False)
+    related_id = Column(Integer, nullable=True)
+    title = Column(String(255))
+    message = Column(Text)
+    email_body = Column(Text, nullable=True)            # Tek olaylık gruplarda özgün şablon gönderilir
+    email_html = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    deliver_after = Column(DateTime, nullable=False)    # Grubun gönderim zamanı (UTC)
+    sent_at = Column(DateTime, nullable=True)
+    
+    # migrate_notification_digest.py ile mevcut veritabanına eklenir
+    __table_args__ = (
+        Index("ix_notification_digest_items_pending", "user_id", "coalesce_key", "sent_at"),
+        Index("ix_notification_digest_items_deliver_after", "deliver_after"),
+    )
+
+class RealtimeEvent(Base):
+    """
+    /ws bağlantılarına gönderilen olaylar (bildirim, talep güncellemesi, yeni yorum).
+    Artan id ile saklanır; yeniden bağlanan istemci last_event_id'den sonrasını alır.
+    """
+    __tablename__ = "realtime_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(50), nullable=False)
+    user_id = Column(Integer, nullable=True)            # Doluysa sadece bu kullanıcıya
+    ticket_id = Column(Integer, nullable=True)          # Doluysa talebi görebilen kullanıcılara
+    data = Column(Text, nullable=False)                 # JSON
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 class UserLoginLog(Base):
     __tablename__ = "user_login_logs"
     
@@ -373,6 +506,13 @@ class GeneralConfig(Base):
     timeout_high = Column(Integer, default=240)       # 4 hours
     timeout_medium = Column(Integer, default=480)     # 8 hours
     timeout_low = Column(Integer, default=1440)       # 24 hours
+    
+    # Her güncellemede artar - worker'lar önbellekteki ayarların eskiyip eskimediğini buradan anlar
+    config_version = Column(Integer, nullable=False, default=1, server_default="1")
+
+@event.listens_for(GeneralConfig, "before_update")
+def _bump_general_config_version(mapper, connection, target):
+    target.config_version = (target.config_version or 0) + 1
 
 class EmailConfig(Base):
     __tablename__ = "email_config"
@@ -506,6 +646,71 @@ class WebhookLog(Base):
     webhook = relationship("Webhook", back_populates="logs")
 
 
+class WebhookDelivery(Base):
+    """
+    Giden webhook kuyruğu: her satır bir olayın bir webhook'a teslimatı.
+    Gövde kuyruğa alınırken bir kez JSON'a çevrilir; imza ve gönderim aynı byte'lar üzerinden yapılır.
+    """
+    __tablename__ = "webhook_deliveries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    webhook_id = Column(Integer, ForeignKey("webhooks.id", ondelete="CASCADE"), nullable=False, index=True)
+    event_type = Column(String(50), nullable=False)
+    body = Column(Text, nullable=False)                  # Gönderilecek JSON gövdesi
+
+    # Durum: pending -> processing -> done | dead (deneme hakkı bitti / webhook kapalı)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # Bir sonraki deneme zamanı
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_webhook_deliveries_status_run_after", "status", "run_after"),
+    )
+
+
+class ExportJob(Base):
+    """
+    Arka plan dışa aktarma işi (talepler, sistem logları).
+    Dosya yükleme deposunda tahmin edilemez bir adla tutulur, süresi dolunca silinir.
+    """
+    __tablename__ = "export_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(20), nullable=False)            # tickets, system_logs
+    export_format = Column(String(10), nullable=False)   # csv, jsonl, json, xlsx
+    compress = Column(Boolean, nullable=False, default=False)
+    params = Column(Text, nullable=False, default="{}")  # JSON: sorgu filtreleri
+
+    # Durum: queued -> running -> done | failed | cancelled; done -> expired (dosya silindi)
+    status = Column(String(20), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    rows_written = Column(Integer, nullable=False, default=0)
+    total_rows = Column(Integer, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)       # Çalışan işin son ilerleme zamanı
+    error = Column(Text, nullable=True)
+
+    file_path = Column(String(255), nullable=True)       # Yükleme dizinine göre göreli yol
+    file_name = Column(String(255), nullable=True)       # İndirmede gösterilecek ad
+    file_size = Column(BigInteger, nullable=True)
+    media_type = Column(String(100), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_export_jobs_status_id", "status", "id"),
+        Index("ix_export_jobs_user_status", "user_id", "status"),
+    )
+
+
 class SystemLog(Base):
     """Merkezi sistem logları - tüm işlemleri takip eder"""
     __tablename__ = "system_logs"
@@ -542,3 +747,33 @@ class SystemLog(Base):
     # Relationships
     user = relationship("User", backref="system_logs")
 
+
+
+class OutboxJob(Base):
+    """
+    Giden bildirim kuyruğu (e-posta, web push).
+    API isteği işi kaydeder; outbox_worker.py işleri alıp gönderir.
+    """
+    __tablename__ = "outbox_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)            # email, push
+    payload = Column(Text, nullable=False)               # JSON: gönderim parametreleri
+    
+    # Durum: pending -> processing -> done | dead (kalıcı hata / deneme hakkı bitti)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # Bir sonraki deneme zamanı
+    
+    locked_by = Column(String(100), nullable=True)       # İşi alan worker
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    
+    # Worker sorgusu: status + run_after (migrate_outbox.py ile mevcut veritabanına eklenir)
+    __table_args__ = (
+        Index("ix_outbox_jobs_status_run_after", "status", "run_after"),
+    )
@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from database import engine, SessionLocal
+import models
+from utils import notification_digest, notification_retention, outbox
+from utils.webhook_delivery import webhook_dispatcher
+from utils.export_jobs import export_job_runner
+
+# Giden bildirim kuyruğu worker'ı (e-posta, web push, webhook) ve arka plan dışa aktarma işleri
+# API sürecinden bağımsız çalışır: python outbox_worker.py
+# Birden fazla kopya çalıştırılabilir; işler FOR UPDATE SKIP LOCKED ile paylaşılır.
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("outbox_worker")
+
+OUTBOX_WORKER_CONCURRENCY = int(os.getenv("OUTBOX_WORKER_CONCURRENCY", "4"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_DONE_RETENTION_DAYS = int(os.getenv("OUTBOX_DONE_RETENTION_DAYS", "7"))
+PURGE_INTERVAL_SECONDS = 3600
+
+stop_event = threading.Event()
+
+def handle_signal(signum, frame):
+    logger.info("Durdurma sinyali alındı, devam eden işler tamamlanıyor...")
+    stop_event.set()
+
+def claim(worker_id, limit):
+    db = SessionLocal()
+    try:
+        return outbox.claim_jobs(db, worker_id, limit)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Outbox işleri alınamadı: {e}")
+        return []
+    finally:
+        db.close()
+
+def purge():
+    db = SessionLocal()
+    try:
+        count = outbox.purge_finished_jobs(db, OUTBOX_DONE_RETENTION_DAYS)
+        if count:
+            logger.info(f"{count} tamamlanmış outbox işi silindi")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Outbox temizliği başarısız: {e}")
+    finally:
+        db.close()
+
+def flush_digests():
+    db = SessionLocal()
+    try:
+        # Worker her zaman outbox'a yazar: özet, sent_at ile aynı transaction'da kuyruğa girer
+        notification_digest.flush_due_digests(db, use_outbox=True)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Bildirim özeti gönderimi başarısız: {e}")
+    finally:
+        db.close()
+
+def retention_loop():
+    # Arşivleme uzun sürebilir; gönderim döngüsünü bekletmemesi için ayrı thread'de çalışır
+    interval = notification_retention.NOTIFICATION_RETENTION_INTERVAL_HOURS * 3600
+    while not stop_event.wait(interval):
+        notification_retention.run_retention_once()
+
+def webhook_loop():
+    # Webhook teslimatı asyncio tabanlıdır; kendi event loop'uyla ayrı thread'de çalışır
+    async def dispatch():
+        try:
+            await webhook_dispatcher.run(should_stop=stop_event.is_set)
+        finally:
+            await webhook_dispatcher.stop()
+    asyncio.run(dispatch())
+
+def run(concurrency=OUTBOX_WORKER_CONCURRENCY):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    models.OutboxJob.__table__.create(bind=engine, checkfirst=True)
+    models.NotificationDigestItem.__table__.create(bind=engine, checkfirst=True)
+    models.WebhookDelivery.__table__.create(bind=engine, checkfirst=True)
+    models.ExportJob.__table__.create(bind=engine, checkfirst=True)
+    logger.info(f"Outbox worker başlatıldı ({worker_id}, eşzamanlı gönderim: {concurrency})")
+    threading.Thread(target=retention_loop, name="notification-retention", daemon=True).start()
+    webhook_thread = threading.Thread(target=webhook_loop, name="webhook-dispatcher")
+    webhook_thread.start()
+    export_job_runner.start()
+
+    in_flight = set()
+    last_purge = 0.0
+    last_digest_flush = 0.0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="outbox") as executor:
+        while not stop_event.is_set():
+            # Boş slot kadar iş al; gönderimler paralel, yeni işler biri bitince alınır
+            free_slots = concurrency - len(in_flight)
+            claimed = claim(worker_id, free_slots) if free_slots > 0 else []
+            for job_id in claimed:
+                in_flight.add(executor.submit(outbox.process_job, job_id, worker_id))
+
+            if in_flight:
+                done, in_flight = wait(in_flight, timeout=OUTBOX_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception():
+                        logger.error(f"Outbox işi beklenmeyen hata verdi: {future.exception()}")
+            elif not claimed:
+                stop_event.wait(OUTBOX_POLL_SECONDS)
+
+            # Zamanı gelen özet e-postaları outbox'a alınır (bir sonraki turda gönderilir)
+            if time.time() - last_digest_flush > notification_digest.DIGEST_FLUSH_INTERVAL_SECONDS:
+                flush_digests()
+                last_digest_flush = time.time()
+
+            if time.time() - last_purge > PURGE_INTERVAL_SECONDS:
+                purge()
+                last_purge = time.time()
+
+        wait(in_flight)
+    export_job_runner.shutdown()
+    webhook_thread.join()
+    logger.info("Outbox worker durduruldu.")
+
+def print_stats():
+    db = SessionLocal()
+    try:
+        for status, count in outbox.outbox_stats(db).items():
+            print(f"{status}: {count}")
+    finally:
+        db.close()
+
+def retry_dead():
+    db = SessionLocal()
+    try:
+        count = outbox.retry_dead_jobs(db)
+        print(f"{count} dead-letter işi tekrar kuyruğa alındı.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Giden bildirim kuyruğu worker'ı")
+    parser.add_argument("--stats", action="store_true", help="Kuyruk durumunu yazdır ve çık")
+    parser.add_argument("--retry-dead", action="store_true", help="Dead-letter işlerini tekrar kuyruğa al ve çık")
+    args = parser.parse_args()
+
+    if args.stats:
+        print_stats()
+    elif args.retry_dead:
+        retry_dead()
+    else:
+        signal.signal(signal.SIGTERM, handle_signal)
+        signal.signal(signal.SIGINT, handle_signal)
+        run()
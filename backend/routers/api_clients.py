@@ -415,10 +415,7 @@ async def test_webhook(
     current_user: models.User = Depends(require_admin)
 ):
     """Webhook'u test et"""
-    import httpx
-    import json as json_module
-    import hmac
-    import hashlib
+    from utils.webhook_delivery import serialize_payload, webhook_headers, webhook_dispatcher
     
     webhook = db.query(models.Webhook).filter(
         models.Webhook.id == webhook_id,
@@ -443,28 +440,17 @@ async def test_webhook(
         }
     }
     
-    headers = {"Content-Type": "application/json"}
-    if webhook.secret:
-        signature = hmac.new(
-            webhook.secret.encode(),
-            json_module.dumps(test_payload).encode(),
-            hashlib.sha256
-        ).hexdigest()
-        headers["X-Webhook-Signature"] = signature
+    # İmza gönderilen gövdenin kendisinden hesaplanır
+    body = serialize_payload(test_payload).encode()
+    headers = webhook_headers(webhook.secret, body, "test")
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                webhook.url,
-                json=test_payload,
-                headers=headers
-            )
-            
-            return {
-                "success": response.status_code >= 200 and response.status_code < 300,
-                "status_code": response.status_code,
-                "response": response.text[:500]
-            }
+        response = await webhook_dispatcher.post(webhook.url, body, headers)
+        return {
+            "success": response.status_code >= 200 and response.status_code < 300,
+            "status_code": response.status_code,
+            "response": response.text[:500]
+        }
     except Exception as e:
         return {
             "success": False,
@@ -5,6 +5,7 @@ from typing import List
 from database import get_db
 import models, schemas
 from auth import get_current_active_user
+from utils.membership_cache import invalidate_user_memberships
 
 router = APIRouter(tags=["departments"])
 
@@ -31,6 +32,9 @@ def create_department(
     
     db.add(new_department)
     db.commit()
+    # Yönetici yeni birimi üyelikleri arasında görmeli
+    if new_department.manager_id:
+        invalidate_user_memberships(new_department.manager_id)
     db.refresh(new_department)
     return new_department
 
@@ -67,11 +71,17 @@ def update_department(
         raise HTTPException(status_code=404, detail="Departman bulunamadı")
     
     # Güncelleme işlemi
+    previous_manager_id = department.manager_id
     department.name = department_update.name
     department.description = department_update.description
     department.manager_id = department_update.manager_id
     
     db.commit()
+    # Yönetici değiştiyse eski ve yeni yöneticinin üyelik önbelleğini düşür
+    if previous_manager_id != department.manager_id:
+        for manager_id in (previous_manager_id, department.manager_id):
+            if manager_id:
+                invalidate_user_memberships(manager_id)
     db.refresh(department)
     return department
 
@@ -99,4 +109,6 @@ def delete_department(
     
     db.delete(department)
     db.commit()
+    # Birimin tüm üyeleri etkilenir - önbelleği tamamen temizle
+    invalidate_user_memberships()
     return None
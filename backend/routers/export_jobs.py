@@ -0,0 +1,130 @@
+"""
+Arka Plan Dışa Aktarma İşleri Router
+- İş oluşturma (talepler / sistem logları), kullanıcı başına iş sınırı
+- İş durumu ve ilerleme (ayrıca /ws üzerinden "export_job.updated" olayları)
+- Biten dosyanın indirilmesi (yükleme deposundan, yetki kontrolüyle)
+- İptal / silme
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from pathlib import Path
+from urllib.parse import quote
+
+from database import get_db
+import models, schemas
+from auth import get_current_active_user, get_current_user_for_download
+from routers.tickets import ATTACHMENT_ACCEL_REDIRECT_PREFIX, get_upload_dir
+from utils import export_jobs
+from utils.http_cache import file_response
+from utils.report_stats import parse_report_datetime
+
+router = APIRouter(tags=["export-jobs"])
+
+_LIST_LIMIT = 50
+
+
+def _get_own_job(db: Session, job_id: int, user: models.User) -> models.ExportJob:
+    job = db.query(models.ExportJob).filter(
+        models.ExportJob.id == job_id,
+        models.ExportJob.user_id == user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Dışa aktarma işi bulunamadı")
+    return job
+
+
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
+@router.post("", status_code=status.HTTP_202_ACCEPTED)  # Trailing slash olmadan da çalışsın
+def create_export_job(
+    job_in: schemas.ExportJobCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Dışa aktarmayı kuyruğa alır ve iş bilgisini döner.
+    - tickets: params /api/reports/search ile aynı filtreler; format csv, jsonl, xlsx
+    - system_logs (sadece admin): params category, start_date, end_date; format json, jsonl, csv, xlsx
+    """
+    if job_in.kind == "system_logs" and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Bu işlem için yetkiniz yok")
+    allowed = export_jobs.JOB_FORMATS[job_in.kind]
+    if job_in.format not in allowed:
+        raise HTTPException(status_code=400, detail=f"Geçersiz format ({', '.join(allowed)})")
+    if job_in.kind == "system_logs":
+        for key in ("start_date", "end_date"):
+            parse_report_datetime(job_in.params.get(key))
+
+    try:
+        job = export_jobs.create_job(db, current_user, job_in.kind, job_in.format, job_in.compress, job_in.params)
+    except export_jobs.ExportJobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return export_jobs.job_data(job)
+
+
+@router.get("/")
+@router.get("")  # Trailing slash olmadan da çalışsın
+def list_export_jobs(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Kullanıcının son dışa aktarma işleri (yeniden eskiye)"""
+    jobs = db.query(models.ExportJob).filter(
+        models.ExportJob.user_id == current_user.id
+    ).order_by(models.ExportJob.id.desc()).limit(_LIST_LIMIT).all()
+    return [export_jobs.job_data(job) for job in jobs]
+
+
+@router.get("/{job_id}")
+def get_export_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """İş durumu ve ilerlemesi (progress: yüzde, toplam bilinmiyorsa null)"""
+    return export_jobs.job_data(_get_own_job(db, job_id, current_user))
+
+
+@router.get("/{job_id}/download")
+def download_export_job(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user_for_download)
+):
+    """Biten dışa aktarma dosyasını indir - Token header'dan veya query parameter'dan alınır"""
+    job = _get_own_job(db, job_id, current_user)
+    if job.status in export_jobs.ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail="Dışa aktarma henüz tamamlanmadı")
+    if job.status == export_jobs.STATUS_EXPIRED:
+        raise HTTPException(status_code=410, detail="Dosyanın süresi doldu")
+    if job.status != export_jobs.STATUS_DONE or not job.file_path:
+        raise HTTPException(status_code=409, detail="Dışa aktarma başarısız oldu veya iptal edildi")
+
+    etag = f'"export-{job.id}-{job.file_size}"'
+    if ATTACHMENT_ACCEL_REDIRECT_PREFIX:
+        return file_response(
+            request, None, job.media_type, etag, job.finished_at,
+            filename=job.file_name,
+            accel_redirect=ATTACHMENT_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(job.file_path)
+        )
+    file_path = Path(get_upload_dir(db)) / job.file_path
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Dosya sunucuda bulunamadı")
+    return file_response(request, file_path, job.media_type, etag, job.finished_at, filename=job.file_name)
+
+
+@router.delete("/{job_id}")
+def delete_export_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Bekleyen/çalışan işi iptal eder; bitmiş işi dosyasıyla birlikte siler"""
+    job = _get_own_job(db, job_id, current_user)
+    if export_jobs.cancel_job(db, job):
+        return {"message": "Dışa aktarma işi iptal edildi"}
+    export_jobs.remove_job_file(get_upload_dir(db), job)
+    db.delete(job)
+    db.commit()
+    return {"message": "Dışa aktarma işi silindi"}
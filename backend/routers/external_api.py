@@ -29,6 +29,11 @@ import logging
 
 from database import get_db
 import models, schemas
+from utils.ticket_access import TicketAccessChecker
+from utils.config_cache import get_config_snapshot
+from utils.realtime import (
+    EVENT_COMMENT_CREATED, EVENT_TICKET_CREATED, comment_event_data, publish_event, ticket_event_data
+)
 
 logger = logging.getLogger(__name__)
 
@@ -110,6 +115,25 @@ def check_department_access(api_client: models.ApiClient, department_id: int) ->
         return True
 
 
+def get_ticket_counts(db: Session, ticket_ids: List[int]):
+    """Talepler için yorum ve ek sayılarını iki gruplu sorguda döndürür"""
+    if not ticket_ids:
+        return {}, {}
+    comments_counts = dict(
+        db.query(models.Comment.ticket_id, func.count(models.Comment.id))
+        .filter(models.Comment.ticket_id.in_(ticket_ids))
+        .group_by(models.Comment.ticket_id)
+        .all()
+    )
+    attachments_counts = dict(
+        db.query(models.Attachment.ticket_id, func.count(models.Attachment.id))
+        .filter(models.Attachment.ticket_id.in_(ticket_ids))
+        .group_by(models.Attachment.ticket_id)
+        .all()
+    )
+    return comments_counts, attachments_counts
+
+
 # ==================== TICKET ENDPOINTS ====================
 
 @router.post("/tickets", response_model=schemas.ExternalTicketResponse, status_code=status.HTTP_201_CREATED)
@@ -134,11 +158,13 @@ async def create_ticket_external(
             detail="Bu API anahtarı talep oluşturma iznine sahip değil"
         )
     
+    # Sistem ayarları (varsayılan departman, triage, manager assignment vb.)
+    config = get_config_snapshot(db)
+    
     # Departman belirleme
     department_id = ticket_data.department_id or api_client.default_department_id
     if not department_id:
         # Varsayılan sistem departmanını al
-        config = db.query(models.GeneralConfig).first()
         department_id = config.default_department_id if config else None
     
     if not department_id:
@@ -159,9 +185,6 @@ async def create_ticket_external(
     if not department:
         raise HTTPException(status_code=404, detail="Departman bulunamadı")
     
-    # Sistem ayarlarını al (triage, manager assignment vb.)
-    config = db.query(models.GeneralConfig).first()
-    
     # Varsayılan creator olarak API client'ın contact_user'ı veya sistem kullanıcısı
     creator_id = api_client.contact_user_id
     if not creator_id:
@@ -208,6 +231,11 @@ async def create_ticket_external(
             new_ticket.citizenship_no = ticket_data.citizenship_no
         
         db.add(new_ticket)
+        db.flush()
+        # Açık sayfalar yeni talebi /ws üzerinden alır
+        publish_event(db, EVENT_TICKET_CREATED, ticket_event_data(new_ticket), ticket_id=new_ticket.id)
+        # Webhook kuyruğa al (talep ile aynı transaction'da commit olur)
+        queue_webhooks(db, api_client.id, "ticket.created", new_ticket)
         db.commit()
         db.refresh(new_ticket)
         
@@ -220,15 +248,6 @@ async def create_ticket_external(
         
         logger.info(f"External API ticket created: #{created_ticket.id} by {api_client.name}")
         
-        # Webhook gönder
-        background_tasks.add_task(
-            send_webhook,
-            db=None,  # Arka planda yeni session açılacak
-            api_client_id=api_client.id,
-            event_type="ticket.created",
-            ticket=created_ticket
-        )
-        
         # Sistem bildirimleri gönder (mevcut sistemle aynı)
         from utils.notifications import notify_users_about_ticket
         title = f"Yeni Talep (API): {created_ticket.title}"
@@ -298,18 +317,14 @@ async def list_tickets_external(
         joinedload(models.Ticket.assignee)
     ).order_by(models.Ticket.created_at.desc()).offset(offset).limit(per_page).all()
     
-    # Yorum ve ek sayılarını al
-    ticket_responses = []
-    for ticket in tickets:
-        comments_count = db.query(func.count(models.Comment.id)).filter(
-            models.Comment.ticket_id == ticket.id
-        ).scalar()
-        attachments_count = db.query(func.count(models.Attachment.id)).filter(
-            models.Attachment.ticket_id == ticket.id
-        ).scalar()
-        ticket_responses.append(
-            schemas.ExternalTicketResponse.from_ticket(ticket, comments_count, attachments_count)
+    # Yorum ve ek sayılarını sayfadaki tüm talepler için toplu al (talep başına sorgu yerine)
+    comments_counts, attachments_counts = get_ticket_counts(db, [t.id for t in tickets])
+    ticket_responses = [
+        schemas.ExternalTicketResponse.from_ticket(
+            ticket, comments_counts.get(ticket.id, 0), attachments_counts.get(ticket.id, 0)
         )
+        for ticket in tickets
+    ]
     
     pages = (total + per_page - 1) // per_page
     
@@ -351,14 +366,11 @@ async def get_ticket_external(
     if not ticket:
         raise HTTPException(status_code=404, detail="Talep bulunamadı veya erişim yetkiniz yok")
     
-    comments_count = db.query(func.count(models.Comment.id)).filter(
-        models.Comment.ticket_id == ticket.id
-    ).scalar()
-    attachments_count = db.query(func.count(models.Attachment.id)).filter(
-        models.Attachment.ticket_id == ticket.id
-    ).scalar()
+    comments_counts, attachments_counts = get_ticket_counts(db, [ticket.id])
     
-    return schemas.ExternalTicketResponse.from_ticket(ticket, comments_count, attachments_count)
+    return schemas.ExternalTicketResponse.from_ticket(
+        ticket, comments_counts.get(ticket.id, 0), attachments_counts.get(ticket.id, 0)
+    )
 
 
 @router.get("/tickets/by-ref/{external_ref}", response_model=schemas.ExternalTicketResponse)
@@ -390,14 +402,11 @@ async def get_ticket_by_external_ref(
     if not ticket:
         raise HTTPException(status_code=404, detail="Talep bulunamadı")
     
-    comments_count = db.query(func.count(models.Comment.id)).filter(
-        models.Comment.ticket_id == ticket.id
-    ).scalar()
-    attachments_count = db.query(func.count(models.Attachment.id)).filter(
-        models.Attachment.ticket_id == ticket.id
-    ).scalar()
+    comments_counts, attachments_counts = get_ticket_counts(db, [ticket.id])
     
-    return schemas.ExternalTicketResponse.from_ticket(ticket, comments_count, attachments_count)
+    return schemas.ExternalTicketResponse.from_ticket(
+        ticket, comments_counts.get(ticket.id, 0), attachments_counts.get(ticket.id, 0)
+    )
 
 
 @router.get("/tickets/{ticket_id}/comments", response_model=List[schemas.ExternalCommentResponse])
@@ -415,12 +424,7 @@ async def get_ticket_comments_external(
         )
     
     # Erişim kontrolü
-    ticket = db.query(models.Ticket).filter(
-        models.Ticket.id == ticket_id,
-        models.Ticket.api_client_id == api_client.id
-    ).first()
-    
-    if not ticket:
+    if not TicketAccessChecker.for_api_client(db, api_client).can_access(ticket_id):
         raise HTTPException(status_code=404, detail="Talep bulunamadı veya erişim yetkiniz yok")
     
     comments = db.query(models.Comment).options(
@@ -485,24 +489,18 @@ async def add_comment_external(
         created_at=now_istanbul
     )
     
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    
     db.add(new_comment)
+    db.flush()
+    publish_event(db, EVENT_COMMENT_CREATED, comment_event_data(new_comment, user), ticket_id=ticket_id)
+    # Webhook kuyruğa al (yorum ile aynı transaction'da commit olur)
+    queue_webhooks(db, api_client.id, "comment.added", ticket, comment=new_comment)
     db.commit()
     db.refresh(new_comment)
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    
     logger.info(f"External API comment added to ticket #{ticket_id} by {api_client.name}")
     
-    # Webhook gönder
-    background_tasks.add_task(
-        send_webhook,
-        db=None,
-        api_client_id=api_client.id,
-        event_type="comment.added",
-        ticket=ticket,
-        comment=new_comment
-    )
-    
     return schemas.ExternalCommentResponse(
         id=new_comment.id,
         content=new_comment.content,
@@ -514,7 +512,48 @@ async def add_comment_external(
 
 # ==================== WEBHOOK SERVICE ====================
 
-async def send_webhook(
+def build_webhook_payload(
+    event_type: str,
+    ticket: models.Ticket,
+    comment: models.Comment = None,
+    changes: dict = None
+) -> dict:
+    """Talep olayının webhook gövdesi"""
+    payload = {
+        "event": event_type,
+        "timestamp": datetime.utcnow().isoformat(),
+        "ticket_id": ticket.id,
+        "ticket": {
+            "id": ticket.id,
+            "title": ticket.title,
+            "description": ticket.description,
+            "status": ticket.status,
+            "priority": ticket.priority,
+            "source": getattr(ticket, 'source', 'api'),
+            "external_ref": getattr(ticket, 'external_ref', None),
+            "department_id": ticket.department_id,
+            "department_name": ticket.department.name if ticket.department else None,
+            "assignee_id": ticket.assignee_id,
+            "assignee_name": ticket.assignee.full_name if ticket.assignee else None,
+            "created_at": ticket.created_at.isoformat() if ticket.created_at else None,
+            "updated_at": ticket.updated_at.isoformat() if ticket.updated_at else None
+        }
+    }
+    
+    if changes:
+        payload["changes"] = changes
+    
+    if comment:
+        payload["comment"] = {
+            "id": comment.id,
+            "content": comment.content,
+            "user_id": comment.user_id,
+            "created_at": comment.created_at.isoformat() if comment.created_at else None
+        }
+    return payload
+
+
+def queue_webhooks(
     db: Session,
     api_client_id: int,
     event_type: str,
@@ -522,137 +561,19 @@ async def send_webhook(
     comment: models.Comment = None,
     changes: dict = None
 ):
-    """Webhook'ları tetikle ve gönder"""
-    import httpx
-    import asyncio
-    
-    # Yeni DB session oluştur
-    from database import SessionLocal
-    db = SessionLocal()
-    
-    try:
-        # İlgili webhook'ları bul
-        webhooks = db.query(models.Webhook).filter(
-            models.Webhook.api_client_id == api_client_id,
-            models.Webhook.is_active == True
-        ).all()
-        
-        for webhook in webhooks:
-            # Event tipini kontrol et
-            try:
-                events = json.loads(webhook.events) if isinstance(webhook.events, str) else webhook.events
-            except:
-                events = []
-            
-            if event_type not in events:
-                continue
-            
-            # Payload oluştur
-            payload = {
-                "event": event_type,
-                "timestamp": datetime.utcnow().isoformat(),
-                "ticket_id": ticket.id,
-                "ticket": {
-                    "id": ticket.id,
-                    "title": ticket.title,
-                    "description": ticket.description,
-                    "status": ticket.status,
-                    "priority": ticket.priority,
-                    "source": getattr(ticket, 'source', 'api'),
-                    "external_ref": getattr(ticket, 'external_ref', None),
-                    "department_id": ticket.department_id,
-                    "department_name": ticket.department.name if ticket.department else None,
-                    "assignee_id": ticket.assignee_id,
-                    "assignee_name": ticket.assignee.full_name if ticket.assignee else None,
-                    "created_at": ticket.created_at.isoformat() if ticket.created_at else None,
-                    "updated_at": ticket.updated_at.isoformat() if ticket.updated_at else None
-                }
-            }
-            
-            if changes:
-                payload["changes"] = changes
-            
-            if comment:
-                payload["comment"] = {
-                    "id": comment.id,
-                    "content": comment.content,
-                    "user_id": comment.user_id,
-                    "created_at": comment.created_at.isoformat() if comment.created_at else None
-                }
-            
-            # İmza oluştur
-            headers = {"Content-Type": "application/json"}
-            if webhook.secret:
-                import hmac
-                signature = hmac.new(
-                    webhook.secret.encode(),
-                    json.dumps(payload).encode(),
-                    hashlib.sha256
-                ).hexdigest()
-                headers["X-Webhook-Signature"] = signature
-            
-            # Webhook'u gönder
-            success = False
-            response_status = None
-            response_body = None
-            error_message = None
-            
-            for retry in range(webhook.max_retries + 1):
-                try:
-                    async with httpx.AsyncClient(timeout=30.0) as client:
-                        response = await client.post(
-                            webhook.url,
-                            json=payload,
-                            headers=headers
-                        )
-                        response_status = response.status_code
-                        response_body = response.text[:1000]  # İlk 1000 karakter
-                        
-                        if response.status_code >= 200 and response.status_code < 300:
-                            success = True
-                            break
-                        else:
-                            error_message = f"HTTP {response.status_code}: {response_body}"
-                            
-                except Exception as e:
-                    error_message = str(e)
-                
-                if retry < webhook.max_retries:
-                    await asyncio.sleep(webhook.retry_delay_seconds)
-            
-            # Log kaydet
-            webhook_log = models.WebhookLog(
-                webhook_id=webhook.id,
-                event_type=event_type,
-                payload=json.dumps(payload),
-                response_status=response_status,
-                response_body=response_body,
-                success=success,
-                error_message=error_message,
-                retry_count=retry
-            )
-            db.add(webhook_log)
-            
-            # Webhook durumunu güncelle
-            webhook.last_triggered_at = datetime.utcnow()
-            if success:
-                webhook.last_success_at = datetime.utcnow()
-                webhook.failure_count = 0
-            else:
-                webhook.last_failure_at = datetime.utcnow()
-                webhook.failure_count += 1
-            
-            db.commit()
-            
-            if success:
-                logger.info(f"Webhook sent successfully: {webhook.url} for event {event_type}")
-            else:
-                logger.error(f"Webhook failed: {webhook.url} - {error_message}")
-                
-    except Exception as e:
-        logger.error(f"Webhook service error: {str(e)}")
-    finally:
-        db.close()
+    """
+    Webhook teslimatlarını çağıranın transaction'ına ekle; commit çağırana aittir.
+    Olay ve teslimat satırları birlikte commit olur, arada çökme olayı kaybettirmez.
+    Gönderim, yeniden deneme ve devre kesici utils/webhook_delivery.py'deki dağıtıcıdadır;
+    istek yanıt için uç noktayı beklemez.
+    """
+    from utils.webhook_delivery import enqueue_event
+    # Yeni/değişen department ve assignee ilişkileri payload için güncel okunur
+    db.flush()
+    db.expire(ticket, ["department", "assignee"])
+    count = enqueue_event(db, api_client_id, event_type, build_webhook_payload(event_type, ticket, comment, changes))
+    if count:
+        logger.info(f"{count} webhook kuyruğa alındı: {event_type} (talep #{ticket.id})")
 
 
 # ==================== DURUM DEĞİŞİKLİĞİ HOOK ====================
@@ -671,22 +592,7 @@ def trigger_ticket_webhook(
     - Durum değişikliğinde: trigger_ticket_webhook(db, ticket, "ticket.status_changed", {"old_status": "open", "new_status": "closed"})
     - Atama değişikliğinde: trigger_ticket_webhook(db, ticket, "ticket.assigned", {"assignee_id": 5})
     """
-    import asyncio
-    
     if not ticket.api_client_id:
         return  # API'den açılmamış ticket, webhook yok
     
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    loop.create_task(send_webhook(
-        db=None,
-        api_client_id=ticket.api_client_id,
-        event_type=event_type,
-        ticket=ticket,
-        comment=comment,
-        changes=changes
-    ))
+    queue_webhooks(db, ticket.api_client_id, event_type, ticket, comment=comment, changes=changes)
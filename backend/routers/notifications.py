@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import models
@@ -7,7 +8,8 @@ from schemas import NotificationCreate, NotificationResponse, NotificationSettin
 from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 # from utils.notifications import create_notification
-from auth import get_current_active_user
+from auth import get_current_active_user, get_current_user_for_download
+from utils.realtime import EVENT_NOTIFICATION_READ, publish_event
 
 router = APIRouter(
     tags=["notifications"],
@@ -42,11 +44,27 @@ async def get_unread_count(
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Okunmamış bildirim sayısını getir"""
-    count = db.query(models.Notification).filter(
-        models.Notification.user_id == current_user.id,
-        models.Notification.is_read == False
-    ).count()
-    return count
+    from utils.notification_retention import get_unread_count as read_unread_count
+    return read_unread_count(db, current_user.id)
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: Optional[str] = Query(None),
+    current_user: models.User = Depends(get_current_user_for_download)
+):
+    """
+    Bildirim akışı (Server-Sent Events) - WebSocket kullanamayan istemciler için.
+    EventSource başlık gönderemediğinden token ?token= ile de verilebilir.
+    Yeniden bağlanmada Last-Event-ID (veya ?last_event_id=) sonrasındaki bildirimler gönderilir.
+    """
+    from utils.notification_stream import notification_events, parse_last_event_id
+    cursor = parse_last_event_id(request.headers.get("last-event-id") or last_event_id)
+    return StreamingResponse(
+        notification_events(request, current_user.id, cursor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/settings", response_model=NotificationSettingsResponse)
 def get_notification_settings(
@@ -129,6 +147,8 @@ async def mark_notification_read(
         raise HTTPException(status_code=404, detail="Notification not found")
     
     notification.is_read = True
+    # Diğer sekmeler / SSE akışı okunmamış sayısını günceller
+    publish_event(db, EVENT_NOTIFICATION_READ, {"ids": [notification.id]}, user_id=current_user.id)
     db.commit()
     db.refresh(notification)
     
@@ -144,6 +164,7 @@ async def mark_all_notifications_read(
         models.Notification.user_id == current_user.id,
         models.Notification.is_read == False
     ).update({"is_read": True})
+    publish_event(db, EVENT_NOTIFICATION_READ, {"all": True}, user_id=current_user.id)
     
     db.commit()
     return {"status": "success"}
@@ -164,6 +185,8 @@ async def delete_notification(
         raise HTTPException(status_code=404, detail="Notification not found")
     
     db.delete(notification)
+    if not notification.is_read:
+        publish_event(db, EVENT_NOTIFICATION_READ, {"ids": [notification.id]}, user_id=current_user.id)
     db.commit()
     
     return {"status": "success"}
@@ -197,7 +220,8 @@ def update_notification_settings(
                 ticket_assigned=settings.ticket_assigned,
                 ticket_updated=settings.ticket_updated,
                 ticket_commented=settings.ticket_commented,
-                ticket_attachment=settings.ticket_attachment
+                ticket_attachment=settings.ticket_attachment,
+                digest_mode=settings.digest_mode.value if settings.digest_mode else "immediate"
             )
             db.add(notification_settings)
             try:
@@ -215,6 +239,8 @@ def update_notification_settings(
             notification_settings.ticket_updated = settings.ticket_updated
             notification_settings.ticket_commented = settings.ticket_commented
             notification_settings.ticket_attachment = settings.ticket_attachment
+            if settings.digest_mode is not None:
+                notification_settings.digest_mode = settings.digest_mode.value
         
         if notification_settings:
             db.commit()
@@ -277,6 +303,16 @@ async def delete_push_subscription(
     
     return {"status": "success"}
 
+@router.get("/push-metrics")
+def get_push_metrics(
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Web push gönderim metrikleri (push servisi başına gecikme, hata ve süresi dolmuş abonelik sayıları)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Bu işlem için yönetici yetkisi gereklidir")
+    from utils.notifications import push_dispatcher
+    return push_dispatcher.metrics_snapshot()
+
 # Public endpoints (no auth required) - Bu endpoint'ler authentication gerektirmez
 @router.get("/vapid-public-key")
 async def get_vapid_public_key():
@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Response
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, or_, and_, case, extract
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import desc, or_
 from typing import List, Optional
 from datetime import datetime, timedelta
-import csv
-import io
+import os
 
-from database import get_db
+from database import get_db, SessionLocal
 import models, schemas
 from auth import get_current_active_user
+from utils.pagination import encode_cursor, keyset_filter, keyset_order
+from utils.ticket_search import TicketTextSearch
+from utils import report_stats
+from utils.export_stream import EXPORT_YIELD_PER, export_response
 
 router = APIRouter(tags=["reports"])
 
@@ -23,97 +26,21 @@ def get_stats(
     """
     Genel istatistikleri döndürür.
     Admin tüm sistemi görür, diğerleri sadece kendi yetkileri dahilindekileri.
+    Tam günler günlük özet tablosundan, aralık kenarları tickets'tan canlı okunur (utils/report_stats.py).
     """
-    
-    # Base query filters
-    filters = []
-    if start_date:
-        filters.append(models.Ticket.created_at >= start_date)
-    if end_date:
-        filters.append(models.Ticket.created_at <= end_date)
-        
-    # Permission filters
-    if not current_user.is_admin:
-        # Standart kullanıcı filtreleri (basitleştirilmiş raporlama için sadece erişebildikleri)
-        # Bu raporlama için karmaşık yetki kontrolü yerine temel departman/yetki kontrolü yapıyoruz
-        access_filters = []
-        
-        # 1. Kendi oluşturdukları
-        access_filters.append(models.Ticket.creator_id == current_user.id)
-        
-        # 2. Atandıkları
-        access_filters.append(models.Ticket.assignee_id == current_user.id)
-        
-        # 3. Departman (yönetici ise tüm departman, değilse sadece genel)
-        if current_user.department_id:
-            dept_filter = [models.Ticket.department_id == current_user.department_id]
-            if not current_user.role == models.UserRole.DEPARTMENT_ADMIN:
-                # Normal kullanıcı departmanındaki gizli olmayan ve atanmamışları görebilir
-                dept_filter.append(models.Ticket.is_private == False)
-                dept_filter.append(models.Ticket.assignee_id == None)
-            
-            # Departman filtresini AND ile birleştirip access_filters'a ekle
-            access_filters.append(and_(*dept_filter))
-            
-        filters.append(or_(*access_filters))
+    return report_stats.ticket_stats(db, current_user, start_date, end_date)
 
-    # 1. Status Counts
-    status_query = db.query(
-        models.Ticket.status, func.count(models.Ticket.id)
-    ).filter(*filters).group_by(models.Ticket.status)
-    status_stats = dict(status_query.all())
-    
-    # 2. Priority Counts
-    priority_query = db.query(
-        models.Ticket.priority, func.count(models.Ticket.id)
-    ).filter(*filters).group_by(models.Ticket.priority)
-    priority_stats = dict(priority_query.all())
-    
-    # 3. Department Counts (Top 10)
-    dept_query = db.query(
-        models.Department.name, func.count(models.Ticket.id)
-    ).join(models.Ticket).filter(*filters)\
-     .group_by(models.Department.name)\
-     .order_by(desc(func.count(models.Ticket.id)))\
-     .limit(10)
-    dept_stats = dict(dept_query.all())
-
-    return {
-        "status_distribution": status_stats,
-        "priority_distribution": priority_stats,
-        "department_distribution": dept_stats,
-        "total_tickets": sum(status_stats.values())
-    }
+REPORT_SEARCH_PAGE_SIZE = int(os.getenv("REPORT_SEARCH_PAGE_SIZE", "500"))
 
-@router.post("/search")
-def search_tickets(
-    search_params: dict = Body(...),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
-):
-    """
-    Gelişmiş arama endpoint'i.
-    search_params: {
-        "query": str,
-        "status": List[str],
-        "priority": List[str],
-        "department_ids": List[int],
-        "user_ids": List[int],
-        "start_date": str (ISO),
-        "end_date": str (ISO)
-    }
-    """
+def _report_search_query(db: Session, search_params: dict, current_user: models.User):
+    """Arama ve dışa aktarma için ortak filtreler. (query, metin araması veya None) döndürür."""
     query = db.query(models.Ticket)
     
-    # 1. Text Search
-    if search_params.get("query"):
-        q = f"%{search_params['query']}%"
-        query = query.filter(
-            or_(
-                models.Ticket.title.ilike(q),
-                models.Ticket.description.ilike(q)
-            )
-        )
+    # 1. Text Search (başlık, açıklama, yorumlar)
+    text_search = None
+    if search_params.get("query") and str(search_params["query"]).strip():
+        text_search = TicketTextSearch(db, str(search_params["query"]))
+        query = query.filter(text_search.condition)
         
     # 2. Filters
     if search_params.get("status"):
@@ -137,25 +64,66 @@ def search_tickets(
     if search_params.get("end_date"):
         query = query.filter(models.Ticket.created_at <= search_params["end_date"])
 
-    # 3. Permissions (Reuse logic from stats or apply manual filter)
-    # Burada query seviyesinde filtreleme yapmak en performanslısı
-    if not current_user.is_admin:
-        access_conditions = [
-            models.Ticket.creator_id == current_user.id,
-            models.Ticket.assignee_id == current_user.id
-        ]
-        
-        if current_user.department_id:
-            dept_condition = [models.Ticket.department_id == current_user.department_id]
-            if not current_user.role == models.UserRole.DEPARTMENT_ADMIN:
-                dept_condition.append(models.Ticket.is_private == False)
-                dept_condition.append(models.Ticket.assignee_id == None)
-            access_conditions.append(and_(*dept_condition))
-            
-        query = query.filter(or_(*access_conditions))
+    # 3. Permissions - query seviyesinde filtreleme
+    access_filter = report_stats.report_access_filter(current_user)
+    if access_filter is not None:
+        query = query.filter(access_filter)
+    return query, text_search
+
+@router.post("/search")
+def search_tickets(
+    response: Response,
+    search_params: dict = Body(...),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Gelişmiş arama endpoint'i.
+    search_params: {
+        "query": str,  (başlık, açıklama ve yorumlarda; "tırnaklı ifade", -hariç, or desteklenir)
+        "status": List[str],
+        "priority": List[str],
+        "department_ids": List[int],
+        "user_ids": List[int],
+        "start_date": str (ISO),
+        "end_date": str (ISO),
+        "limit": int,
+        "cursor": str
+    }
+    Metin araması varsa sonuçlar ilgiye göre, yoksa oluşturma tarihine göre sıralanır.
+    Sonraki sayfanın imleci X-Next-Cursor header'ında döner.
+    """
+    query, text_search = _report_search_query(db, search_params, current_user)
+
+    # Keyset sayfalama: (ilgi puanı veya oluşturma tarihi, id)
+    ranked = text_search is not None and text_search.rank is not None
+    sort_column = text_search.rank if ranked else models.Ticket.created_at
+    after_cursor = keyset_filter(sort_column, models.Ticket.id, search_params.get("cursor"))
+    if after_cursor is not None:
+        query = query.filter(after_cursor)
+
+    try:
+        page_size = min(int(search_params.get("limit") or REPORT_SEARCH_PAGE_SIZE), REPORT_SEARCH_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Geçersiz limit")
+    if page_size < 1:
+        raise HTTPException(status_code=400, detail="Geçersiz limit")
 
-    # Execute
-    tickets = query.order_by(desc(models.Ticket.created_at)).limit(500).all()
+    # Execute - bir fazla satır çekerek sonraki sayfa olup olmadığını anla
+    columns = [models.Ticket, sort_column] if ranked else [models.Ticket]
+    rows = query.with_entities(*columns).options(
+        joinedload(models.Ticket.creator),
+        joinedload(models.Ticket.assignee),
+        joinedload(models.Ticket.department)
+    ).order_by(*keyset_order(sort_column, models.Ticket.id)).limit(page_size + 1).all()
+    rows = [tuple(row) if ranked else (row, None) for row in rows]
+
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last, last_rank = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last_rank if ranked else last.created_at, last.id)
+
+    highlights = text_search.highlights(db, [t.id for t, _ in rows]) if text_search else {}
     
     # Return minimal necessary data
     return [
@@ -167,74 +135,82 @@ def search_tickets(
             "created_at": t.created_at,
             "creator": t.creator.full_name if t.creator else "Unknown",
             "assignee": t.assignee.full_name if t.assignee else "Unassigned",
-            "department": t.department.name if t.department else "Unknown"
+            "department": t.department.name if t.department else "Unknown",
+            "rank": rank,
+            "title_highlight": highlights.get(t.id, {}).get("title_highlight"),
+            "snippet": highlights.get(t.id, {}).get("snippet")
         }
-        for t in tickets
+        for t, rank in rows
     ]
 
+TICKET_EXPORT_COLUMNS = [
+    ("id", "ID"),
+    ("title", "Başlık"),
+    ("status", "Durum"),
+    ("priority", "Öncelik"),
+    ("department", "Departman"),
+    ("creator", "Oluşturan"),
+    ("assignee", "Atanan"),
+    ("created_at", "Oluşturma Tarihi"),
+]
+
+def ticket_export_count(search_params: dict, user_id: int) -> int:
+    """Dışa aktarılacak talep sayısı (arka plan işinin ilerleme yüzdesi için)"""
+    db = SessionLocal()
+    try:
+        query, _ = _report_search_query(db, search_params, db.get(models.User, user_id))
+        return query.order_by(None).count()
+    finally:
+        db.close()
+
+def ticket_export_rows(search_params: dict, user_id: int):
+    """Arama sonuçlarını parça parça okur (yanıt akarken kendi oturumunu kullanır)"""
+    db = SessionLocal()
+    try:
+        current_user = db.get(models.User, user_id)
+        query, _ = _report_search_query(db, search_params, current_user)
+        query = query.options(
+            joinedload(models.Ticket.department),
+            joinedload(models.Ticket.creator),
+            joinedload(models.Ticket.assignee)
+        ).order_by(desc(models.Ticket.created_at), desc(models.Ticket.id)).yield_per(EXPORT_YIELD_PER)
+        for t in query:
+            yield {
+                "id": t.id,
+                "title": t.title,
+                "status": t.status,
+                "priority": t.priority,
+                "department": t.department.name if t.department else "-",
+                "creator": t.creator.full_name if t.creator else "-",
+                "assignee": t.assignee.full_name if t.assignee else "-",
+                "created_at": t.created_at.strftime("%Y-%m-%d %H:%M:%S") if t.created_at else ""
+            }
+    finally:
+        db.close()
+
 @router.post("/export")
 def export_tickets(
     search_params: dict = Body(...),
-    db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """
-    Arama sonuçlarını CSV olarak dışa aktarır.
+    Arama sonuçlarını dışa aktarır (satır sınırı yok, akış halinde).
+    search_params arama ile aynı filtrelerin yanında:
+    - format: csv (varsayılan), jsonl, xlsx
+    - compress: true ise gzip (xlsx hariç)
+    Proxy zaman aşımına takılan büyük aktarımlar için /api/export-jobs kullanılır.
     """
-    # Search logic reuse (Copy-paste for safety to ensure same filters apply)
-    query = db.query(models.Ticket)
-    
-    # ... (Same filters as above) ...
-    if search_params.get("query"):
-        q = f"%{search_params['query']}%"
-        query = query.filter(or_(models.Ticket.title.ilike(q), models.Ticket.description.ilike(q)))
-    if search_params.get("status"):
-        query = query.filter(models.Ticket.status.in_(search_params["status"]))
-    if search_params.get("priority"):
-        query = query.filter(models.Ticket.priority.in_(search_params["priority"]))
-    if search_params.get("department_ids"):
-        query = query.filter(models.Ticket.department_id.in_(search_params["department_ids"]))
-    if search_params.get("user_ids"):
-        query = query.filter(or_(models.Ticket.creator_id.in_(search_params["user_ids"]), models.Ticket.assignee_id.in_(search_params["user_ids"])))
-    if search_params.get("start_date"):
-        query = query.filter(models.Ticket.created_at >= search_params["start_date"])
-    if search_params.get("end_date"):
-        query = query.filter(models.Ticket.created_at <= search_params["end_date"])
-
-    if not current_user.is_admin:
-        access_conditions = [models.Ticket.creator_id == current_user.id, models.Ticket.assignee_id == current_user.id]
-        if current_user.department_id:
-            dept_condition = [models.Ticket.department_id == current_user.department_id]
-            if not current_user.role == models.UserRole.DEPARTMENT_ADMIN:
-                dept_condition.append(models.Ticket.is_private == False)
-                dept_condition.append(models.Ticket.assignee_id == None)
-            access_conditions.append(and_(*dept_condition))
-        query = query.filter(or_(*access_conditions))
+    export_format = search_params.get("format") or "csv"
+    if export_format not in ("csv", "jsonl", "xlsx"):
+        raise HTTPException(status_code=400, detail="Geçersiz format (csv, jsonl, xlsx)")
 
-    tickets = query.order_by(desc(models.Ticket.created_at)).limit(1000).all()
-
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow(["ID", "Başlık", "Durum", "Öncelik", "Departman", "Oluşturan", "Atanan", "Oluşturma Tarihi"])
-    
-    # Rows
-    for t in tickets:
-        writer.writerow([
-            t.id,
-            t.title,
-            t.status,
-            t.priority,
-            t.department.name if t.department else "-",
-            t.creator.full_name if t.creator else "-",
-            t.assignee.full_name if t.assignee else "-",
-            t.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        ])
-        
-    output.seek(0)
-    
+    return export_response(
+        ticket_export_rows(search_params, current_user.id),
+        TICKET_EXPORT_COLUMNS,
+        export_format,
+        f"talepler_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        compress=bool(search_params.get("compress"))
+    )
 
 @router.post("/personnel-stats")
 def get_personnel_stats(
@@ -244,104 +220,9 @@ def get_personnel_stats(
 ):
     """
     Personel bazlı detaylı raporlama endpoint'i.
-    search_params aynı filtreleri destekler.
+    search_params aynı filtreleri destekler (start_date, end_date, department_ids).
     Dönüş:
     - creators: En çok talep açanlar
     - resolvers: En çok talep çözenler (ort. süre ile)
     """
-    
-    # 1. Base Filters (search_tickets ile aynı mantık)
-    filters = []
-    
-    if search_params.get("start_date"):
-        filters.append(models.Ticket.created_at >= search_params["start_date"])
-    if search_params.get("end_date"):
-        filters.append(models.Ticket.created_at <= search_params["end_date"])
-    if search_params.get("department_ids"):
-        filters.append(models.Ticket.department_id.in_(search_params["department_ids"]))
-        
-    # Permission check
-    if not current_user.is_admin:
-        # Sadece kendi departmanını görebilir veya kısıtlı
-        if current_user.department_id:
-            filters.append(models.Ticket.department_id == current_user.department_id)
-        else:
-            # Departmanı yoksa sadece kendisi
-            filters.append(or_(
-                models.Ticket.creator_id == current_user.id,
-                models.Ticket.assignee_id == current_user.id
-            ))
-
-    # 2. Creators Query (Talep Açanlar)
-    creators_query = db.query(
-        models.User.id,
-        models.User.full_name,
-        models.Department.name.label("department_name"),
-        func.count(models.Ticket.id).label("total_tickets"),
-        func.sum(case((models.Ticket.priority == 'urgent', 1), else_=0)).label("urgent_count"),
-        func.sum(case((models.Ticket.priority == 'high', 1), else_=0)).label("high_count"),
-        func.sum(case((models.Ticket.status == 'open', 1), else_=0)).label("open_count"),
-        func.sum(case((models.Ticket.status == 'closed', 1), else_=0)).label("closed_count"),
-    ).join(models.User, models.Ticket.creator_id == models.User.id)\
-     .outerjoin(models.Department, models.User.department_id == models.Department.id)\
-     .filter(*filters)\
-     .group_by(models.User.id, models.User.full_name, models.Department.name)\
-     .order_by(desc("total_tickets"))
-     
-    creators_data = creators_query.all()
-    
-    # 3. Resolvers Query (Talep Çözenler - Atanan Kişiler)
-    # Kapalı talepler üzerinden ortalama çözüm süresi hesapla
-    
-    resolvers_query = db.query(
-        models.User.id,
-        models.User.full_name,
-        models.Department.name.label("department_name"),
-        func.count(models.Ticket.id).label("total_assigned"),
-        func.sum(case((models.Ticket.status == 'closed', 1), else_=0)).label("total_resolved"),
-        # Ortalama çözüm süresi (saniye cinsinden) - Sadece kapalı talepler için
-        func.avg(
-            case(
-                (models.Ticket.status == 'closed', 
-                 extract('epoch', models.Ticket.updated_at) - extract('epoch', models.Ticket.created_at)),
-                else_=None
-            )
-        ).label("avg_resolution_seconds")
-    ).join(models.User, models.Ticket.assignee_id == models.User.id)\
-     .outerjoin(models.Department, models.User.department_id == models.Department.id)\
-     .filter(*filters)\
-     .group_by(models.User.id, models.User.full_name, models.Department.name)\
-     .order_by(desc("total_resolved"))
-     
-    resolvers_data = resolvers_query.all()
-    
-    return {
-        "creators": [
-            {
-                "id": r.id,
-                "full_name": r.full_name,
-                "department": r.department_name or "Belirtilmemiş",
-                "total_tickets": r.total_tickets,
-                "priority_breakdown": {
-                    "urgent": r.urgent_count,
-                    "high": r.high_count
-                },
-                "status_breakdown": {
-                    "open": r.open_count,
-                    "closed": r.closed_count
-                }
-            }
-            for r in creators_data
-        ],
-        "resolvers": [
-            {
-                "id": r.id,
-                "full_name": r.full_name,
-                "department": r.department_name or "Belirtilmemiş",
-                "total_assigned": r.total_assigned,
-                "total_resolved": r.total_resolved,
-                "avg_resolution_time": round(r.avg_resolution_seconds / 3600, 1) if r.avg_resolution_seconds else 0  # Saat cinsinden
-            }
-            for r in resolvers_data
-        ]
-    }
+    return report_stats.personnel_stats(db, current_user, search_params)
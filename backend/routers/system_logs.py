@@ -1,7 +1,7 @@
 """
 Sistem Logları Router
 - Log listeleme (filtreleme ile)
-- Log export (JSON/CSV)
+- Log export (JSON/JSON Lines/CSV/XLSX, akış halinde)
 - Log temizleme (belirli tarihten önceki logları sil)
 """
 
@@ -11,14 +11,12 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc, and_, or_
 from typing import Optional, List
 from datetime import datetime, timedelta
-from database import get_db
+from database import get_db, SessionLocal
 import models
 from auth import get_current_active_user
 import json
-import csv
-import io
-import gzip
 from pydantic import BaseModel
+from utils.export_stream import EXPORT_FORMAT_PATTERN, EXPORT_YIELD_PER, export_response
 
 router = APIRouter(tags=["system-logs"])
 
@@ -216,52 +214,57 @@ def get_log_categories(
     }
 
 
-@router.get("/export")
-def export_logs(
-    format: str = Query("json", regex="^(json|csv)$"),
-    category: Optional[str] = None,
-    start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None,
-    compress: bool = True,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
-):
-    """Logları export et (JSON veya CSV, opsiyonel gzip sıkıştırma)"""
-    if not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="Bu işlem için yetkiniz yok")
-    
+SYSTEM_LOG_EXPORT_COLUMNS = [
+    ("id", "ID"),
+    ("category", "Kategori"),
+    ("action", "Aksiyon"),
+    ("user_id", "Kullanıcı ID"),
+    ("username", "Kullanıcı"),
+    ("target_type", "Hedef Tür"),
+    ("target_id", "Hedef ID"),
+    ("target_name", "Hedef Ad"),
+    ("details", "Detaylar"),
+    ("status", "Durum"),
+    ("error_message", "Hata Mesajı"),
+    ("ip_address", "IP Adresi"),
+    ("user_agent", "User Agent"),
+    ("created_at", "Tarih"),
+]
+
+
+def _system_log_export_query(db: Session, category: Optional[str], start_date: Optional[datetime],
+                             end_date: Optional[datetime]):
     query = db.query(models.SystemLog)
-    
     if category:
         query = query.filter(models.SystemLog.category == category)
     if start_date:
         query = query.filter(models.SystemLog.created_at >= start_date)
     if end_date:
         query = query.filter(models.SystemLog.created_at <= end_date)
-    
-    logs = query.order_by(models.SystemLog.created_at).all()
-    
-    # Log export işlemini kaydet
-    from utils.system_logger import log_system, LogAction
-    log_system(
-        db=db,
-        action=LogAction.EXPORT,
-        user_id=current_user.id,
-        username=current_user.username,
-        details={
-            "format": format,
-            "category": category,
-            "start_date": start_date.isoformat() if start_date else None,
-            "end_date": end_date.isoformat() if end_date else None,
-            "log_count": len(logs),
-            "compressed": compress
-        }
-    )
-    
-    if format == "json":
-        data = []
-        for log in logs:
-            data.append({
+    return query
+
+
+def system_log_export_count(category: Optional[str], start_date: Optional[datetime],
+                            end_date: Optional[datetime]) -> int:
+    """Dışa aktarılacak log sayısı (arka plan işinin ilerleme yüzdesi için)"""
+    db = SessionLocal()
+    try:
+        return _system_log_export_query(db, category, start_date, end_date).count()
+    finally:
+        db.close()
+
+
+def system_log_export_rows(export_format: str, category: Optional[str], start_date: Optional[datetime],
+                           end_date: Optional[datetime], compress: bool, user_id: int, username: str):
+    """Logları parça parça okur; bitince (veya bağlantı kesilince) export kaydını yazar"""
+    db = SessionLocal()
+    count = 0
+    completed = False
+    try:
+        query = _system_log_export_query(db, category, start_date, end_date)
+        for log in query.order_by(models.SystemLog.created_at, models.SystemLog.id).yield_per(EXPORT_YIELD_PER):
+            count += 1
+            yield {
                 "id": log.id,
                 "category": log.category,
                 "action": log.action,
@@ -276,50 +279,58 @@ def export_logs(
                 "ip_address": log.ip_address,
                 "user_agent": log.user_agent,
                 "created_at": log.created_at.isoformat() if log.created_at else None
-            })
-        
-        content = json.dumps(data, ensure_ascii=False, indent=2)
-        filename = f"system_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        media_type = "application/json"
-        
-    else:  # CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow([
-            "ID", "Kategori", "Aksiyon", "Kullanıcı ID", "Kullanıcı", 
-            "Hedef Tür", "Hedef ID", "Hedef Ad", "Detaylar", "Durum",
-            "Hata Mesajı", "IP Adresi", "User Agent", "Tarih"
-        ])
-        
-        for log in logs:
-            writer.writerow([
-                log.id, log.category, log.action, log.user_id, log.username,
-                log.target_type, log.target_id, log.target_name, log.details,
-                log.status, log.error_message, log.ip_address, log.user_agent,
-                log.created_at.isoformat() if log.created_at else ""
-            ])
-        
-        content = output.getvalue()
-        filename = f"system_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        media_type = "text/csv"
-    
-    if compress:
-        compressed = gzip.compress(content.encode('utf-8'))
-        return Response(
-            content=compressed,
-            media_type="application/gzip",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}.gz"
             }
-        )
-    else:
-        return Response(
-            content=content,
-            media_type=media_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        completed = True
+    finally:
+        db.rollback()  # Okuma transaction'ı (server-side cursor) kapansın
+        # Log export işlemini kaydet
+        from utils.system_logger import log_system, LogAction, LogStatus
+        try:
+            log_system(
+                db=db,
+                action=LogAction.EXPORT,
+                user_id=user_id,
+                username=username,
+                details={
+                    "format": export_format,
+                    "category": category,
+                    "start_date": start_date.isoformat() if start_date else None,
+                    "end_date": end_date.isoformat() if end_date else None,
+                    "log_count": count,
+                    "compressed": compress
+                },
+                status=LogStatus.SUCCESS if completed else LogStatus.WARNING,
+                error_message=None if completed else "Export tamamlanmadan kesildi"
+            )
+        finally:
+            db.close()
+
+
+@router.get("/export")
+def export_logs(
+    format: str = Query("json", regex=EXPORT_FORMAT_PATTERN),
+    category: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    compress: bool = True,
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Logları export et (JSON, JSON Lines, CSV veya XLSX; opsiyonel gzip sıkıştırma).
+    Satır sınırı yok; loglar okundukça gönderilir.
+    Proxy zaman aşımına takılan büyük aktarımlar için /api/export-jobs kullanılır.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Bu işlem için yetkiniz yok")
+    
+    return export_response(
+        system_log_export_rows(format, category, start_date, end_date, compress,
+                               current_user.id, current_user.username),
+        SYSTEM_LOG_EXPORT_COLUMNS,
+        format,
+        f"system_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        compress=compress
+    )
 
 
 @router.delete("/cleanup")
@@ -350,21 +361,9 @@ def cleanup_old_logs(
     # Export before delete (eğer istenirse)
     export_info = None
     if export_before_delete and count_to_delete > 0:
-        logs_to_export = query.all()
-        export_data = []
-        for log in logs_to_export:
-            export_data.append({
-                "id": log.id,
-                "category": log.category,
-                "action": log.action,
-                "username": log.username,
-                "target_type": log.target_type,
-                "target_name": log.target_name,
-                "status": log.status,
-                "created_at": log.created_at.isoformat() if log.created_at else None
-            })
+        # Satırlar belleğe alınmaz; ayrıntılı kopya için silmeden önce /export kullanılır
         export_info = {
-            "exported_count": len(export_data),
+            "exported_count": count_to_delete,
             "cutoff_date": cutoff_date.isoformat()
         }
     
@@ -4,7 +4,6 @@ import os
 from pathlib import Path
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
@@ -13,6 +12,8 @@ import models
 import schemas
 from database import get_db
 from auth import get_current_active_user
+from utils.config_cache import get_config_snapshot, refresh_config_snapshot
+from utils.mail_transport import get_mail_settings, send_mail, reload_mail_transport
 
 logger = logging.getLogger(__name__)
 
@@ -20,31 +21,15 @@ logger = logging.getLogger(__name__)
 import os
 BASE_URL = os.getenv("APP_URL", "https://destek.tesmer.org.tr")
 
-# Helper functions for translations
-def translate_status(status: str) -> str:
-    """Durum durumunu Türkçeye çevir"""
-    status_map = {
-        'open': 'Açık',
-        'closed': 'Kapalı',
-        'in_progress': 'İşlemde',
-        'pending': 'Beklemede',
-        'resolved': 'Çözüldü',
-        'on_hold': 'Beklemeye Alındı'
-    }
-    return status_map.get(status, status)
-
-def translate_priority(priority: str) -> str:
-    """Önceliği Türkçeye çevir"""
-    priority_map = {
-        'low': 'Düşük',
-        'medium': 'Orta',
-        'high': 'Yüksek',
-        'critical': 'Kritik'
-    }
-    return priority_map.get(priority, priority) if priority else 'Belirtilmemiş'
+# E-posta şablonları utils/mail_templates.py'de derlenir.
+# Birden fazla alıcıya gönderen çağıranlar prepare_* ile olay kısmını bir kez hazırlayıp
+# prepared parametresiyle verir; her alıcı için sadece ad doldurulur.
+from utils import mail_templates
+from utils.mail_templates import translate_status, translate_priority
+from utils.template_engine import PreparedMail
 
 
-def send_ticket_created_email(db: Session, ticket: models.Ticket, recipient: models.User):
+def send_ticket_created_email(db: Session, ticket: models.Ticket, recipient: models.User, prepared: Optional[PreparedMail] = None):
     """Talep oluşturulduğunda bilgilendirme e-postası gönder"""
     from datetime import datetime
     try:
@@ -71,7 +56,7 @@ def send_ticket_created_email(db: Session, ticket: models.Ticket, recipient: mod
             )
             return
         
-        email_config = db.query(models.EmailConfig).first()
+        email_config = get_mail_settings(db)
         if not email_config:
             logger.warning("Email configuration not found, skipping created notification")
             return
@@ -84,93 +69,16 @@ def send_ticket_created_email(db: Session, ticket: models.Ticket, recipient: mod
         msg['From'] = email_config.from_email
         msg['To'] = recipient.email
 
-        dept_name = ticket.department.name if ticket.department else 'Genel'
-        creator_name = ticket.creator.full_name if ticket.creator else 'Bilinmiyor'
-        priority_tr = translate_priority(ticket.priority or 'medium')
-        status_tr = translate_status(ticket.status)
-
-        text = f"""Destek Talebiniz Oluşturuldu
-
-Merhaba {recipient.full_name},
-
-"{ticket.title}" başlıklı talep oluşturuldu.
-
-Talep Detayları:
-- Başlık: {ticket.title}
-- Oluşturan: {creator_name}
-- Departman: {dept_name}
-- Öncelik: {priority_tr}
-- Durum: {status_tr}
-
-Talebi görüntülemek için sisteme giriş yapabilirsiniz.
-
-Destek Sistemi"""
-
-        html = f"""<!DOCTYPE html>
-<html lang=\"tr\">
-<head>
-    <meta charset=\"UTF-8\">
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #2563eb 0%, #1d4ed8 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-        .header h2 {{ margin: 0; font-size: 24px; }}
-        .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }}
-        .details {{ background: white; padding: 15px; border-left: 4px solid #2563eb; margin: 15px 0; border-radius: 4px; }}
-        .details p {{ margin: 8px 0; }}
-        .label {{ font-weight: bold; color: #2563eb; }}
-        .button {{ display: inline-block; margin: 20px 0; padding: 12px 30px; background: #2563eb; color: white; text-decoration: none; border-radius: 5px; }}
-        .button:hover {{ background: #1d4ed8; }}
-        .footer {{ margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }}
-    </style>
-</head>
-<body>
-    <div class=\"container\">
-        <div class=\"header\">
-            <h2>🆕 Yeni Destek Talebi</h2>
-        </div>
-        <div class=\"content\">
-            <p>Merhaba <strong>{recipient.full_name}</strong>,</p>
-            <p><strong>"{ticket.title}"</strong> başlıklı bir talep oluşturuldu.</p>
-            <div class=\"details\">
-                <p><span class=\"label\">📋 Başlık:</span> {ticket.title}</p>
-                <p><span class=\"label\">👤 Oluşturan:</span> {creator_name}</p>
-                <p><span class=\"label\">🏢 Departman:</span> {dept_name}</p>
-                <p><span class=\"label\">⚠️ Öncelik:</span> {priority_tr}</p>
-                <p><span class=\"label\">🔔 Durum:</span> {status_tr}</p>
-            </div>
-            <p style=\"text-align: center;\">
-                <a href=\"{BASE_URL}/tickets/{ticket.id}\" class=\"button\">Talebi Görüntüle</a>
-            </p>
-        </div>
-        <div class=\"footer\">
-            <p>Bu otomatik olarak gönderilmiş bir bildirimdir. Lütfen yanıtlamayınız.</p>
-            <p style=\"margin: 5px 0;\">Destek Sistemi</p>
-        </div>
-    </div>
-</body>
-</html>"""
+        prepared = prepared or mail_templates.prepare_ticket_created_mail(ticket, BASE_URL)
+        text, html = prepared.render(recipient_name=recipient.full_name)
 
         part1 = MIMEText(text, 'plain', 'utf-8')
         part2 = MIMEText(html, 'html', 'utf-8')
         msg.attach(part1)
         msg.attach(part2)
 
-        if email_config.smtp_use_tls:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-
-        if email_config.smtp_username and email_config.smtp_password:
-            server.login(email_config.smtp_username, email_config.smtp_password)
-
-        server.sendmail(email_config.from_email, recipient.email, msg.as_string())
-        
-        try:
-            server.quit()
-        except Exception as quit_error:
-            logger.warning(f"Server quit error (mail already sent): {str(quit_error)}")
+        # Havuzdaki SMTP bağlantısıyla gönder
+        send_mail(msg, [recipient.email], db)
 
         from datetime import datetime
         logger.info(
@@ -182,7 +90,7 @@ Destek Sistemi"""
         logger.error(f"Failed to send created email: {str(e)}", exc_info=True)
 
 # Helper function to send ticket assignment email
-def send_ticket_assignment_email(db: Session, ticket: models.Ticket, assignee: models.User):
+def send_ticket_assignment_email(db: Session, ticket: models.Ticket, assignee: models.User, prepared: Optional[PreparedMail] = None):
     """Ticket atandığında e-posta gönder"""
     from datetime import datetime
     try:
@@ -209,7 +117,7 @@ def send_ticket_assignment_email(db: Session, ticket: models.Ticket, assignee: m
             )
             return
         
-        email_config = db.query(models.EmailConfig).first()
+        email_config = get_mail_settings(db)
         if not email_config:
             logger.warning("Email configuration not found, skipping assignment notification")
             return
@@ -223,89 +131,16 @@ def send_ticket_assignment_email(db: Session, ticket: models.Ticket, assignee: m
         msg['From'] = email_config.from_email
         msg['To'] = assignee.email
         
-        # Plain text versiyonu
-        text = f"""Destek Talebine Atandınız
-
-Merhaba {assignee.full_name},
-
-Size "{ticket.title}" başlıklı bir destek talebine atanmışsınız.
-
-Talep Detayları:
-- Başlık: {ticket.title}
-- Oluşturan: {ticket.creator.full_name if ticket.creator else 'Bilinmiyor'}
-- Departman: {ticket.department.name if ticket.department else 'Genel'}
-- Öncelik: {translate_priority(ticket.priority or 'medium')}
-- Durum: {translate_status(ticket.status)}
-
-Lütfen talebi kontrol etmek için sisteme giriş yapınız.
-
-Destek Sistemi"""
-        
-        # HTML versiyonu
-        html = f"""<!DOCTYPE html>
-<html lang="tr">
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-        .header h2 {{ margin: 0; font-size: 24px; }}
-        .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }}
-        .details {{ background: white; padding: 15px; border-left: 4px solid #667eea; margin: 15px 0; border-radius: 4px; }}
-        .details p {{ margin: 8px 0; }}
-        .label {{ font-weight: bold; color: #667eea; }}
-        .button {{ display: inline-block; margin: 20px 0; padding: 12px 30px; background: #667eea; color: white; text-decoration: none; border-radius: 5px; }}
-        .button:hover {{ background: #764ba2; }}
-        .footer {{ margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h2>📌 Destek Talebine Atandınız</h2>
-        </div>
-        <div class="content">
-            <p>Merhaba <strong>{assignee.full_name}</strong>,</p>
-            <p>Size <strong>"{ticket.title}"</strong> başlıklı bir destek talebine atanmışsınız.</p>
-            
-            <div class="details">
-                <p><span class="label">📋 Başlık:</span> {ticket.title}</p>
-                <p><span class="label">👤 Oluşturan:</span> {ticket.creator.full_name if ticket.creator else 'Bilinmiyor'}</p>
-                <p><span class="label">🏢 Departman:</span> {ticket.department.name if ticket.department else 'Genel'}</p>
-                <p><span class="label">⚠️ Öncelik:</span> {translate_priority(ticket.priority or 'medium')}</p>
-                <p><span class="label">🔔 Durum:</span> {translate_status(ticket.status)}</p>
-            </div>
-            
-            <p style="text-align: center;">
-                <a href="{BASE_URL}/tickets/{ticket.id}" class="button">Talebi Görüntüle</a>
-            </p>
-        </div>
-        <div class="footer">
-            <p>Bu otomatik olarak gönderilmiş bir bildirimdir. Lütfen yanıtlamayınız.</p>
-            <p style="margin: 5px 0;">Destek Sistemi</p>
-        </div>
-    </div>
-</body>
-</html>"""
+        prepared = prepared or mail_templates.prepare_ticket_assignment_mail(ticket, BASE_URL)
+        text, html = prepared.render(recipient_name=assignee.full_name)
         
         part1 = MIMEText(text, 'plain', 'utf-8')
         part2 = MIMEText(html, 'html', 'utf-8')
         msg.attach(part1)
         msg.attach(part2)
         
-        if email_config.smtp_use_tls:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-        
-        server.sendmail(email_config.from_email, assignee.email, msg.as_string())
-        
-        try:
-            server.quit()
-        except Exception as quit_error:
-            logger.warning(f"Server quit error (mail already sent): {str(quit_error)}")
+        # Havuzdaki SMTP bağlantısıyla gönder
+        send_mail(msg, [assignee.email], db)
         
         logger.info(
             f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
@@ -315,7 +150,7 @@ Destek Sistemi"""
     except Exception as e:
         logger.error(f"Failed to send assignment email: {str(e)}", exc_info=True)
 
-def send_ticket_created_to_department_email(db: Session, ticket: models.Ticket, recipient: models.User):
+def send_ticket_created_to_department_email(db: Session, ticket: models.Ticket, recipient: models.User, prepared: Optional[PreparedMail] = None):
     """Birime açılan taleplerde tüm birim personeline gönderilecek mail"""
     from datetime import datetime
     try:
@@ -342,7 +177,7 @@ def send_ticket_created_to_department_email(db: Session, ticket: models.Ticket,
             )
             return
         
-        email_config = db.query(models.EmailConfig).first()
+        email_config = get_mail_settings(db)
         if not email_config:
             logger.warning("Email configuration not found, skipping department notification")
             return
@@ -355,93 +190,16 @@ def send_ticket_created_to_department_email(db: Session, ticket: models.Ticket,
         msg['From'] = email_config.from_email
         msg['To'] = recipient.email
 
-        dept_name = ticket.department.name if ticket.department else 'Genel'
-        creator_name = ticket.creator.full_name if ticket.creator else 'Bilinmiyor'
-        priority_tr = translate_priority(ticket.priority or 'medium')
-        status_tr = translate_status(ticket.status)
-
-        text = f"""Biriminize Destek Talebi Açıldı
-
-Merhaba {recipient.full_name},
-
-Biriminiz "{ticket.title}" başlıklı bir destek talebine sahip.
-
-Talep Detayları:
-- Başlık: {ticket.title}
-- Oluşturan: {creator_name}
-- Departman: {dept_name}
-- Öncelik: {priority_tr}
-- Durum: {status_tr}
-
-Talebi görüntülemek ve işlemek için sisteme giriş yapabilirsiniz.
-
-Destek Sistemi"""
-
-        html = f"""<!DOCTYPE html>
-<html lang=\"tr\">
-<head>
-    <meta charset=\"UTF-8\">
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-        .header h2 {{ margin: 0; font-size: 24px; }}
-        .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }}
-        .details {{ background: white; padding: 15px; border-left: 4px solid #10b981; margin: 15px 0; border-radius: 4px; }}
-        .details p {{ margin: 8px 0; }}
-        .label {{ font-weight: bold; color: #10b981; }}
-        .button {{ display: inline-block; margin: 20px 0; padding: 12px 30px; background: #10b981; color: white; text-decoration: none; border-radius: 5px; }}
-        .button:hover {{ background: #059669; }}
-        .footer {{ margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }}
-    </style>
-</head>
-<body>
-    <div class=\"container\">
-        <div class=\"header\">
-            <h2>📢 Biriminize Talep Açıldı</h2>
-        </div>
-        <div class=\"content\">
-            <p>Merhaba <strong>{recipient.full_name}</strong>,</p>
-            <p>Biriminiz <strong>"{ticket.title}"</strong> başlıklı bir destek talebine sahip.</p>
-            <div class=\"details\">
-                <p><span class=\"label\">📋 Başlık:</span> {ticket.title}</p>
-                <p><span class=\"label\">👤 Oluşturan:</span> {creator_name}</p>
-                <p><span class=\"label\">🏢 Departman:</span> {dept_name}</p>
-                <p><span class=\"label\">⚠️ Öncelik:</span> {priority_tr}</p>
-                <p><span class=\"label\">🔔 Durum:</span> {status_tr}</p>
-            </div>
-            <p style=\"text-align: center;\">
-                <a href=\"{BASE_URL}/tickets/{ticket.id}\" class=\"button\">Talebi Görüntüle ve İşle</a>
-            </p>
-        </div>
-        <div class=\"footer\">
-            <p>Bu otomatik olarak gönderilmiş bir bildirimdir. Lütfen yanıtlamayınız.</p>
-            <p style=\"margin: 5px 0;\">Destek Sistemi</p>
-        </div>
-    </div>
-</body>
-</html>"""
+        prepared = prepared or mail_templates.prepare_department_ticket_mail(ticket, BASE_URL)
+        text, html = prepared.render(recipient_name=recipient.full_name)
 
         part1 = MIMEText(text, 'plain', 'utf-8')
         part2 = MIMEText(html, 'html', 'utf-8')
         msg.attach(part1)
         msg.attach(part2)
 
-        if email_config.smtp_use_tls:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-
-        if email_config.smtp_username and email_config.smtp_password:
-            server.login(email_config.smtp_username, email_config.smtp_password)
-
-        server.sendmail(email_config.from_email, recipient.email, msg.as_string())
-        
-        try:
-            server.quit()
-        except Exception as quit_error:
-            logger.warning(f"Server quit error (mail already sent): {str(quit_error)}")
+        # Havuzdaki SMTP bağlantısıyla gönder
+        send_mail(msg, [recipient.email], db)
 
         logger.info(
             f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
@@ -451,10 +209,10 @@ Destek Sistemi"""
     except Exception as e:
         logger.error(f"Failed to send department email: {str(e)}", exc_info=True)
 
-def send_comment_notification_email(db: Session, ticket: models.Ticket, commenter: models.User, recipient: models.User, comment: models.Comment):
+def send_comment_notification_email(db: Session, ticket: models.Ticket, commenter: models.User, recipient: models.User, comment: models.Comment, prepared: Optional[PreparedMail] = None):
     """Send email when someone adds a comment to a ticket"""
     try:
-        email_config = db.query(models.EmailConfig).first()
+        email_config = get_mail_settings(db)
         if not email_config:
             logger.warning("Email configuration not found, skipping comment notification")
             return
@@ -464,64 +222,8 @@ def send_comment_notification_email(db: Session, ticket: models.Ticket, commente
         msg['From'] = email_config.from_email
         msg['To'] = recipient.email or ""
         
-        # Plain text versiyonu
-        text = f"""Destek Talebinize Yorum Eklendi
-
-Merhaba {recipient.full_name},
-
-{commenter.full_name} ({commenter.username}) destek talebinize bir yorum ekledi:
-
-Talep: {ticket.title}
-Yorum: {comment.content}
-
-Detayları görmek için sisteme giriş yapınız.
-
-Destek Sistemi"""
-        
-        # HTML versiyonu
-        html = f"""<!DOCTYPE html>
-<html lang="tr">
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-        .header h2 {{ margin: 0; font-size: 24px; }}
-        .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }}
-        .comment-box {{ background: white; padding: 15px; border-left: 4px solid #10b981; margin: 15px 0; border-radius: 4px; }}
-        .comment-author {{ font-weight: bold; color: #10b981; font-size: 14px; margin-bottom: 8px; }}
-        .comment-text {{ color: #333; font-style: italic; }}
-        .button {{ display: inline-block; margin: 20px 0; padding: 12px 30px; background: #10b981; color: white; text-decoration: none; border-radius: 5px; }}
-        .button:hover {{ background: #059669; }}
-        .footer {{ margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h2>💬 Yorum Eklendi</h2>
-        </div>
-        <div class="content">
-            <p>Merhaba <strong>{recipient.full_name}</strong>,</p>
-            <p><strong>{commenter.full_name}</strong> destek talebinize yorum ekledi.</p>
-            
-            <div class="comment-box">
-                <p><span class="comment-author">📌 Talep: {ticket.title}</span></p>
-                <p class="comment-text">💭 {comment.content}</p>
-            </div>
-            
-            <p style="text-align: center;">
-                <a href="{BASE_URL}/tickets/{ticket.id}" class="button">Görüşmeleri Gör</a>
-            </p>
-        </div>
-        <div class="footer">
-            <p>Bu otomatik olarak gönderilmiş bir bildirimdir. Lütfen yanıtlamayınız.</p>
-            <p style="margin: 5px 0;">Destek Sistemi</p>
-        </div>
-    </div>
-</body>
-</html>"""
+        prepared = prepared or mail_templates.prepare_comment_mail(ticket, commenter, comment, BASE_URL)
+        text, html = prepared.render(recipient_name=recipient.full_name)
         
         # Attach both versions
         part1 = MIMEText(text, 'plain', 'utf-8')
@@ -529,34 +231,18 @@ Destek Sistemi"""
         msg.attach(part1)
         msg.attach(part2)
         
-        # Connect to SMTP server
-        if email_config.smtp_use_tls:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-        
-        # Authenticate if needed
-        if email_config.smtp_username and email_config.smtp_password:
-            server.login(email_config.smtp_username, email_config.smtp_password)
-        
-        # Send email
-        server.sendmail(email_config.from_email, recipient.email, msg.as_string())
-        
-        try:
-            server.quit()
-        except Exception as quit_error:
-            logger.warning(f"Server quit error (mail already sent): {str(quit_error)}")
+        # Havuzdaki SMTP bağlantısıyla gönder
+        send_mail(msg, [recipient.email], db)
         
         logger.info(f"Comment notification email sent to {recipient.email} for ticket {ticket.id}")
     except Exception as e:
         logger.error(f"Failed to send comment notification email: {str(e)}", exc_info=True)
 
 
-def send_ticket_updated_email(db: Session, ticket: models.Ticket, updater: models.User, recipient: models.User):
+def send_ticket_updated_email(db: Session, ticket: models.Ticket, updater: models.User, recipient: models.User, prepared: Optional[PreparedMail] = None):
     """Send email when a ticket is updated"""
     try:
-        email_config = db.query(models.EmailConfig).first()
+        email_config = get_mail_settings(db)
         if not email_config:
             logger.warning("Email configuration not found, skipping ticket update notification")
             return
@@ -569,103 +255,26 @@ def send_ticket_updated_email(db: Session, ticket: models.Ticket, updater: model
         msg['From'] = email_config.from_email
         msg['To'] = recipient.email
 
-        text = f"""
-    Merhaba {recipient.full_name},
-
-    {updater.full_name} talebi {translate_status(ticket.status)} durumuna aldı.
-
-    Talep: {ticket.title}
-    Durum: {translate_status(ticket.status)}
-    Öncelik: {translate_priority(ticket.priority)}
-    Atanan: {(ticket.assignee.full_name if ticket.assignee else 'Atama yok')}
-
-    Detayları görmek için sisteme giriş yapınız.
-
-    Destek Sistemi
-    """
-
-        html = f"""<!DOCTYPE html>
-<html lang="tr">
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #2563eb 0%, #1e40af 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-        .header h2 {{ margin: 0; font-size: 24px; }}
-        .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }}
-        .update-box {{ background: white; padding: 15px; border-left: 4px solid #2563eb; margin: 15px 0; border-radius: 4px; }}
-        .update-item {{ margin: 8px 0; padding: 8px; }}
-        .label {{ font-weight: bold; color: #2563eb; }}
-        .button {{ display: inline-block; margin: 20px 0; padding: 12px 30px; background: #2563eb; color: white; text-decoration: none; border-radius: 5px; }}
-        .button:hover {{ background: #1e40af; }}
-        .footer {{ margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h2>🔄 Destek Talebi Güncellendi</h2>
-        </div>
-        <div class="content">
-            <p>Merhaba <strong>{recipient.full_name}</strong>,</p>
-            <p><strong>{updater.full_name}</strong> talebi <strong>{translate_status(ticket.status)}</strong> durumuna aldı.</p>
-            <div class="update-box">
-                <div class="update-item">
-                    <span class="label">📋 Talep:</span> {ticket.title}
-                </div>
-                <div class="update-item">
-                    <span class="label">🔔 Durum:</span> {translate_status(ticket.status)}
-                </div>
-                <div class="update-item">
-                    <span class="label">⚠️ Öncelik:</span> {translate_priority(ticket.priority)}
-                </div>
-                <div class="update-item">
-                    <span class="label">👤 Atanan:</span> {(ticket.assignee.full_name if ticket.assignee else 'Atama yok')}
-                </div>
-            </div>
-            <p style="text-align: center;">
-                <a href="{BASE_URL}/tickets/{ticket.id}" class="button">Detayları Görüntüle</a>
-            </p>
-        </div>
-        <div class="footer">
-            <p>Bu otomatik olarak gönderilmiş bir bildirimdir. Lütfen yanıtlamayınız.</p>
-            <p style="margin: 5px 0;">Destek Sistemi</p>
-        </div>
-    </div>
-</body>
-</html>"""
+        prepared = prepared or mail_templates.prepare_ticket_updated_mail(ticket, updater, BASE_URL)
+        text, html = prepared.render(recipient_name=recipient.full_name)
 
         part1 = MIMEText(text, 'plain')
         part2 = MIMEText(html, 'html')
         msg.attach(part1)
         msg.attach(part2)
 
-        if email_config.smtp_use_tls:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-
-        if email_config.smtp_username and email_config.smtp_password:
-            server.login(email_config.smtp_username, email_config.smtp_password)
-
-        server.sendmail(email_config.from_email, recipient.email, msg.as_string())
-        
-        try:
-            server.quit()
-        except Exception as quit_error:
-            logger.warning(f"Server quit error (mail already sent): {str(quit_error)}")
+        # Havuzdaki SMTP bağlantısıyla gönder
+        send_mail(msg, [recipient.email], db)
 
         logger.info(f"Ticket updated email sent to {recipient.email} for ticket {ticket.id}")
     except Exception as e:
         logger.error(f"Failed to send ticket updated email: {str(e)}", exc_info=True)
 
 
-def send_attachment_notification_email(db: Session, ticket: models.Ticket, attachment: models.Attachment, uploader: models.User, recipient: models.User):
+def send_attachment_notification_email(db: Session, ticket: models.Ticket, attachment: models.Attachment, uploader: models.User, recipient: models.User, prepared: Optional[PreparedMail] = None):
     """Dosya eklendiğinde e-posta gönder"""
     try:
-        email_config = db.query(models.EmailConfig).first()
+        email_config = get_mail_settings(db)
         if not email_config:
             logger.warning("Email configuration not found, skipping attachment notification")
             return
@@ -677,88 +286,16 @@ def send_attachment_notification_email(db: Session, ticket: models.Ticket, attac
         msg['From'] = email_config.from_email
         msg['To'] = recipient.email
 
-        text = f"""Destek Talebine Dosya Eklendi
-
-Merhaba {recipient.full_name},
-
-{uploader.full_name} ({uploader.username}) destek talebine bir dosya ekledi:
-
-Talep: {ticket.title}
-Dosya: {attachment.filename}
-
-Detayları görmek için sisteme giriş yapınız.
-
-Destek Sistemi"""
-
-        html = f"""<!DOCTYPE html>
-<html lang="tr">
-<head>
-    <meta charset="UTF-8">
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-        .header h2 {{ margin: 0; font-size: 24px; }}
-        .content {{ background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }}
-        .file-box {{ background: white; padding: 15px; border-left: 4px solid #f59e0b; margin: 15px 0; border-radius: 4px; }}
-        .file-info {{ margin: 8px 0; }}
-        .label {{ font-weight: bold; color: #f59e0b; }}
-        .filename {{ background: #fffbeb; padding: 10px; border-radius: 4px; font-family: monospace; word-break: break-all; }}
-        .button {{ display: inline-block; margin: 20px 0; padding: 12px 30px; background: #f59e0b; color: white; text-decoration: none; border-radius: 5px; }}
-        .button:hover {{ background: #d97706; }}
-        .footer {{ margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h2>📎 Dosya Eklendi</h2>
-        </div>
-        <div class="content">
-            <p>Merhaba <strong>{recipient.full_name}</strong>,</p>
-            
-            <div class="file-box">
-                <div class="file-info">
-                    <span class="label">📌 Talep:</span> {ticket.title}
-                </div>
-                <div class="file-info" style="margin-top: 15px;">
-                    <span class="label">📄 Dosya Adı:</span><br/>
-                    <span class="filename">{attachment.filename}</span>
-                </div>
-            </div>
-            
-            <p style="text-align: center;">
-                <a href="{BASE_URL}/tickets/{ticket.id}" class="button">Detayları Görüntüle</a>
-            </p>
-        </div>
-        <div class="footer">
-            <p>Bu otomatik olarak gönderilmiş bir bildirimdir. Lütfen yanıtlamayınız.</p>
-            <p style="margin: 5px 0;">Destek Sistemi</p>
-        </div>
-    </div>
-</body>
-</html>"""
+        prepared = prepared or mail_templates.prepare_attachment_mail(ticket, attachment, uploader, BASE_URL)
+        text, html = prepared.render(recipient_name=recipient.full_name)
         
         part1 = MIMEText(text, 'plain', 'utf-8')
         part2 = MIMEText(html, 'html', 'utf-8')
         msg.attach(part1)
         msg.attach(part2)
 
-        if email_config.smtp_use_tls:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-            server.starttls()
-        else:
-            server = smtplib.SMTP(email_config.smtp_server, email_config.smtp_port, timeout=10)
-
-        if email_config.smtp_username and email_config.smtp_password:
-            server.login(email_config.smtp_username, email_config.smtp_password)
-
-        server.sendmail(email_config.from_email, recipient.email, msg.as_string())
-        
-        try:
-            server.quit()
-        except Exception as quit_error:
-            logger.warning(f"Server quit error (mail already sent): {str(quit_error)}")
+        # Havuzdaki SMTP bağlantısıyla gönder
+        send_mail(msg, [recipient.email], db)
 
         logger.info(f"Attachment notification email sent to {recipient.email} for ticket {ticket.id}")
     except Exception as e:
@@ -795,6 +332,7 @@ def create_email_config(
     db.add(new_config)
     db.commit()
     db.refresh(new_config)
+    reload_mail_transport(db)
     return new_config
 
 @router.get("/email-config", response_model=schemas.EmailConfigResponse)
@@ -855,6 +393,7 @@ async def upload_logo(
         relative_path = f"/branding/{filename}"
         config.custom_logo_url = relative_path
         db.commit()
+        refresh_config_snapshot(db)
         
         return {"url": relative_path}
         
@@ -885,6 +424,7 @@ def update_email_config(
         db.add(new_config)
         db.commit()
         db.refresh(new_config)
+        reload_mail_transport(db)
         return new_config
     
     for key, value in config.dict(exclude_unset=True).items():
@@ -892,6 +432,8 @@ def update_email_config(
     
     db.commit()
     db.refresh(existing_config)
+    # Açık SMTP bağlantıları eski ayarlarla kurulmuş olabilir
+    reload_mail_transport(db)
     return existing_config
 
 @router.delete("/email-config", status_code=status.HTTP_204_NO_CONTENT)
@@ -915,6 +457,7 @@ def delete_email_config(
     
     db.delete(config)
     db.commit()
+    reload_mail_transport(db)
     return None
 
 # General Configuration Endpoints
@@ -943,6 +486,7 @@ def create_general_config(
     db.add(new_config)
     db.commit()
     db.refresh(new_config)
+    refresh_config_snapshot(db)
     return new_config
 
 @router.get("/general-config", response_model=schemas.GeneralConfigResponse)
@@ -990,6 +534,8 @@ def update_general_config(
     
     db.commit()
     db.refresh(existing_config)
+    # Bu worker'daki snapshot'ı hemen güncelle (diğerleri config_version ile fark eder)
+    refresh_config_snapshot(db)
     return existing_config
 
 @router.delete("/general-config", status_code=status.HTTP_204_NO_CONTENT)
@@ -1013,6 +559,7 @@ def delete_general_config(
     
     db.delete(config)
     db.commit()
+    refresh_config_snapshot(db)
     return None
 
 # Notification Configuration Endpoints
@@ -1118,7 +665,7 @@ def delete_notification_config(
 @router.get("/public/config", response_model=dict)
 def get_public_settings(db: Session = Depends(get_db)):
     """Get public settings (no authentication required)"""
-    general_config = db.query(models.GeneralConfig).first()
+    general_config = get_config_snapshot(db)
     if not general_config:
         general_config = models.GeneralConfig(
             app_name="Destek Sistemi",
@@ -1136,6 +683,7 @@ def get_public_settings(db: Session = Depends(get_db)):
         )
         db.add(general_config)
         db.commit()
+        general_config = refresh_config_snapshot(db)
     
     return {
         "enable_teos_id": general_config.enable_teos_id,
@@ -1191,6 +739,7 @@ def get_system_settings(
         db.add(general_config)
         db.commit()
         db.refresh(general_config)
+        refresh_config_snapshot(db)
     
     # Email config: prefer email_config table, fallback to general_config fields
     email_config = db.query(models.EmailConfig).first()
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, BackgroundTasks
-from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, BackgroundTasks, Query, Response, Request
+from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, object_session
 from sqlalchemy import or_, and_
 from typing import List, Optional
 from datetime import datetime
 import os
-import uuid
 from pathlib import Path
-import shutil
+from urllib.parse import quote
 import re
 from bs4 import BeautifulSoup
 import logging
@@ -15,22 +15,47 @@ import logging
 from database import get_db
 import models, schemas
 from auth import get_current_active_user, get_current_user_for_download
+from utils.ticket_access import ticket_visibility_filter, TicketAccessChecker, get_ticket_access, cached_user_department_ids
+from utils.pagination import encode_cursor, keyset_filter, keyset_order
+from utils.config_cache import get_config_snapshot
+from utils.attachment_storage import store_upload, check_declared_size, max_upload_bytes
+from utils.preview_cache import (
+    PREVIEW_VARIANTS, DEFAULT_PREVIEW_VARIANT, RENDERED_EXTENSIONS,
+    get_cached_preview, build_preview, generate_previews
+)
+from utils.http_cache import cache_headers, is_not_modified, file_response
+from utils.render_pool import render_pool
+from utils.realtime import (
+    EVENT_COMMENT_CREATED, EVENT_TICKET_CREATED, EVENT_TICKET_UPDATED, comment_event_data, publish_event, ticket_event_data
+)
 
 logger = logging.getLogger("uvicorn")
 
 router = APIRouter(tags=["tickets"])
 
+# limit gönderilmeyen isteklerde talep listesi sayfa boyutu (0: sınırsız)
+TICKET_PAGE_SIZE_DEFAULT = int(os.getenv("TICKET_PAGE_SIZE_DEFAULT", "50"))
+TICKET_PAGE_SIZE_MAX = int(os.getenv("TICKET_PAGE_SIZE_MAX", "200"))
+
+# X-Accel-Redirect önek yolu (ör. /protected-uploads/). Tanımlıysa dosyayı yetki kontrolünden sonra nginx gönderir.
+ATTACHMENT_ACCEL_REDIRECT_PREFIX = os.getenv("ATTACHMENT_ACCEL_REDIRECT_PREFIX", "")
+
+_created_upload_dirs = set()
+
 def get_upload_dir(db: Session) -> str:
     """Sistem ayarlarından upload dizinini al"""
     # Öncelik: ortam değişkeni (docker-compose ile mount edilen yol) -> DB ayarı -> varsayılan
     env_dir = os.getenv("UPLOAD_DIR")
     db_dir = None
-    config = db.query(models.GeneralConfig).first()
+    config = get_config_snapshot(db)
     if config and config.upload_directory:
         db_dir = config.upload_directory
 
     upload_dir = env_dir or db_dir or "/app/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
+    # Dizin süreç başına bir kez oluşturulur (her indirmede makedirs çağrılmasın)
+    if upload_dir not in _created_upload_dirs:
+        os.makedirs(upload_dir, exist_ok=True)
+        _created_upload_dirs.add(upload_dir)
     return upload_dir
 
 def clean_html_content(html_content: str) -> str:
@@ -56,19 +81,23 @@ def clean_html_content(html_content: str) -> str:
     
     return text_content
 
-# Kullanıcının erişebileceği birim ID'lerini döndürür
+# Kullanıcının erişebileceği birim ID'lerini döndürür (birincil + ek birimler + yönetilen birimler)
+# Sonuç süreç genelindeki üyelik önbelleğinden gelir (utils/membership_cache.py)
 def get_user_department_ids(user: models.User) -> set:
+    db = object_session(user)
+    if db is not None:
+        return set(cached_user_department_ids(db, user.id))
+
+    # Oturuma bağlı olmayan kullanıcı nesnesi - ilişkilerden hesapla
     department_ids = set()
 
     if user.department_id is not None:
         department_ids.add(user.department_id)
 
-    # Many-to-many ilişki ile bağlı birimler
     for department in getattr(user, "departments", []) or []:
         if department and department.id is not None:
             department_ids.add(department.id)
 
-    # Yönetilen birimler (manager_id)
     for department in getattr(user, "managed_departments", []) or []:
         if department and department.id is not None:
             department_ids.add(department.id)
@@ -82,48 +111,10 @@ def user_in_department(user: models.User, department_id: int):
     return department_id in get_user_department_ids(user)
 
 # Kullanıcının bir destek talebine erişim yetkisi olup olmadığını kontrol eden fonksiyon
+# Kurallar utils/ticket_access.py içinde tek bir SQL koşulu olarak tanımlı.
+# Endpoint'ler istek başına paylaşılan TicketAccessChecker'ı (get_ticket_access) kullanmalı.
 def can_access_ticket(db: Session, user: models.User, ticket_id: int):
-    ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
-    if not ticket:
-        return False
-    
-    # Eğer kullanıcı yöneticiyse her talebe erişebilir (private/gizli olanlar dahil)
-    if user.is_admin:
-        return True
-    
-    # Kullanıcı destek talebinin sahibiyse erişebilir (private olsa bile)
-    if ticket.creator_id == user.id:
-        return True
-    
-    # Kullanıcı destek talebine atanmışsa erişebilir (private olsa bile)
-    if ticket.assignee_id == user.id:
-        return True
-    
-    # ÖNEMLİ: PRIVATE/GİZLİ TALEP KONTROLÜ - DİREKT RED!
-    # Eğer talep private/gizli ise, SADECE yaratıcı, atanan kişi ve adminler görebilir
-    # Başka hiç kimse (aynı departmandakiler dahil) asla göremez!
-    if ticket.is_private:
-        return False
-    
-    # DEPARTMAN YÖNETİCİSİ: Kendi departmanındaki TÜM taleplerine (kişisel dahil) erişebilir
-    # Ancak private taleplerden hariç (private taleplere sadece admin, yaratıcı, atanan erişebilir)
-    if ticket.department and ticket.department.manager_id == user.id:
-        return True
-    
-    # Departmana ait talepler: private değilse, birim üyeleri erişebilir
-    if user_in_department(user, ticket.department_id):
-        return True
-    
-    # Talebi açan kişinin birimindeki kullanıcılar da erişebilir
-    # (meslektaşın açtığı talepleri görebilme)
-    creator = db.query(models.User).filter(models.User.id == ticket.creator_id).first()
-    if creator:
-        user_depts = get_user_department_ids(user)
-        creator_depts = get_user_department_ids(creator)
-        if user_depts & creator_depts:  # Ortak birim varsa
-            return True
-    
-    return False
+    return TicketAccessChecker(db, user).can_access(ticket_id)
 
 @router.post("/", response_model=schemas.Ticket)
 def create_ticket(
@@ -148,7 +139,7 @@ def create_ticket(
         cleaned_description = clean_html_content(ticket.description)
         
         # Sistem ayarlarını al
-        config = db.query(models.GeneralConfig).first()
+        config = get_config_snapshot(db)
         require_manager_assignment = config.require_manager_assignment if config else False
         
         # Triage Logic:
@@ -190,6 +181,8 @@ def create_ticket(
         )
         
         db.add(new_ticket)
+        db.flush()
+        publish_event(db, EVENT_TICKET_CREATED, ticket_event_data(new_ticket), ticket_id=new_ticket.id)
         db.commit()
         db.refresh(new_ticket)
         logger.info(f"Ticket başarıyla oluşturuldu: {new_ticket.id}")
@@ -249,145 +242,106 @@ def create_ticket(
 
 @router.get("/", response_model=List[schemas.Ticket])
 def get_tickets(
+    response: Response,
     status: Optional[str] = None,
     department_id: Optional[int] = None,
     user_id: Optional[int] = None,
+    priority: Optional[str] = None,
+    assignee_id: Optional[int] = None,
+    is_personal: Optional[bool] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    sort_by: str = Query("updated_at", regex="^(updated_at|created_at)$"),
+    sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    include_total: bool = False,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
+    """
+    Talep listesi - keyset (cursor) sayfalama ile.
+
+    - limit verilmezse TICKET_PAGE_SIZE_DEFAULT kullanılır
+    - is_personal: true ise kişiye atanmış, false ise atanmamış (birim) talepler
+    - Sonraki sayfanın imleci X-Next-Cursor header'ında döner
+    - include_total=true ise toplam kayıt sayısı X-Total-Count header'ında döner
+    """
     import logging
     from sqlalchemy.orm import joinedload
     logger = logging.getLogger("main")
 
     logger.info(f"Tickets listesi istendi - Kullanıcı: {current_user.username}, admin: {current_user.is_admin}")
 
-    # Admin ise tüm talepleri döndür (private olanlar dahil)
-    if current_user.is_admin:
-        query = db.query(models.Ticket).options(
-            joinedload(models.Ticket.department),
-            joinedload(models.Ticket.assignee)
+    # Erişim kuralları (oluşturan, atanan, birim, meslektaş) tek bir SQL koşulu olarak uygulanır;
+    # tekilleştirme ve filtreleme veritabanında yapılır. Admin için koşul her zaman doğrudur.
+    query = db.query(models.Ticket).filter(ticket_visibility_filter(current_user))
+
+    # Sunucu tarafı filtreler
+    if status:
+        query = query.filter(models.Ticket.status == status)
+    if priority:
+        query = query.filter(models.Ticket.priority.in_([p.strip() for p in priority.split(",") if p.strip()]))
+    if department_id:
+        query = query.filter(models.Ticket.department_id == department_id)
+    if assignee_id:
+        query = query.filter(models.Ticket.assignee_id == assignee_id)
+    if is_personal is not None:
+        query = query.filter(
+            models.Ticket.assignee_id.isnot(None) if is_personal else models.Ticket.assignee_id.is_(None)
         )
-        if status:
-            query = query.filter(models.Ticket.status == status)
-        tickets = query.all()
-        # Admin için is_personal mantığını doğru şekilde ayarla
-        for t in tickets:
-            t.is_personal = t.assignee_id is not None
-        logger.info(f"Admin - tüm talepler listelendi, toplam {len(tickets)} talep döndürüldü")
-        return [schemas.Ticket.from_ticket(ticket) for ticket in tickets]
-
-    # Normal kullanıcılar için filtrelenmiş talepler
-    accessible_tickets = []
-    
-    # 1. Kullanıcının oluşturduğu talepler (private olsa bile)
-    created_query = db.query(models.Ticket).options(
+    if user_id:
+        query = query.filter(or_(
+            models.Ticket.creator_id == user_id,
+            models.Ticket.assignee_id == user_id
+        ))
+    if start_date:
+        query = query.filter(models.Ticket.created_at >= start_date)
+    if end_date:
+        query = query.filter(models.Ticket.created_at <= end_date)
+
+    if include_total:
+        response.headers["X-Total-Count"] = str(query.order_by(None).count())
+
+    # Keyset sayfalama: (sort_column, id)
+    sort_column = getattr(models.Ticket, sort_by)
+    descending = sort_order == "desc"
+    after_cursor = keyset_filter(sort_column, models.Ticket.id, cursor, descending)
+    if after_cursor is not None:
+        query = query.filter(after_cursor)
+    query = query.order_by(*keyset_order(sort_column, models.Ticket.id, descending))
+
+    page_size = limit or TICKET_PAGE_SIZE_DEFAULT
+    if page_size:
+        page_size = min(page_size, TICKET_PAGE_SIZE_MAX)
+        # Bir fazla satır çekerek sonraki sayfa olup olmadığını anla
+        query = query.limit(page_size + 1)
+
+    tickets = query.options(
         joinedload(models.Ticket.department),
         joinedload(models.Ticket.assignee)
-    ).filter(models.Ticket.creator_id == current_user.id)
-    if status:
-        created_query = created_query.filter(models.Ticket.status == status)
-    created_tickets = created_query.all()
-    
-    logger.info(f"DEBUG - Kullanıcı {current_user.id} için bulunan oluşturduğu talepler:")
-    for ticket in created_tickets:
-        logger.info(f"  Ticket ID: {ticket.id}, Title: {ticket.title}, Private: {ticket.is_private}, Assignee: {ticket.assignee_id}")
-    
-    accessible_tickets.extend(created_tickets)
-    logger.info(f"Oluşturduğu talepler: {len(created_tickets)}")
+    ).all()
+
+    if page_size and len(tickets) > page_size:
+        tickets = tickets[:page_size]
+        last = tickets[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(getattr(last, sort_by), last.id)
+
+    for t in tickets:
+        # is_personal mantığını assignee_id'ye göre ayarla
+        t.is_personal = t.assignee_id is not None
+
+    logger.info(f"Kullanıcı {current_user.username} için {len(tickets)} erişilebilir talep döndürüldü")
 
-    # 2. Kullanıcının atandığı talepler (private olsa bile)
-    assigned_query = db.query(models.Ticket).options(
-        joinedload(models.Ticket.department),
-        joinedload(models.Ticket.assignee)
-    ).filter(models.Ticket.assignee_id == current_user.id)
-    if status:
-        assigned_query = assigned_query.filter(models.Ticket.status == status)
-    assigned_tickets = assigned_query.all()
-    accessible_tickets.extend(assigned_tickets)
-    logger.info(f"Atandığı talepler: {len(assigned_tickets)}")
-
-    # 3. Departman talepleri (private olmayan tüm talepler)
-    user_department_ids = get_user_department_ids(current_user)
-    if user_department_ids:
-        logger.info(f"DEBUG - Kullanıcı departmanları: {sorted(user_department_ids)}")
-        dept_query = db.query(models.Ticket).options(
-            joinedload(models.Ticket.department),
-            joinedload(models.Ticket.assignee)
-        ).filter(
-            models.Ticket.department_id.in_(user_department_ids),
-            models.Ticket.is_private == False,  # Gizli değil
-            models.Ticket.creator_id != current_user.id  # Kendi oluşturduğu değil (çakışma önleme)
-        )
-        if status:
-            dept_query = dept_query.filter(models.Ticket.status == status)
-        dept_tickets = dept_query.all()
-        
-        # EK GÜVENLİK: Her ticket için tekrar kontrol
-        filtered_dept_tickets = []
-        for ticket in dept_tickets:
-            # Private ticket'ları kesinlikle reddet
-            if ticket.is_private:
-                logger.info(f"  REDDEDILDI - Private ticket: {ticket.id}")
-                continue
-            # Departman ticket'larını kabul et
-            filtered_dept_tickets.append(ticket)
-            logger.info(f"  KABUL - Departman ticket: {ticket.id}, Title: {ticket.title}")
-        
-        accessible_tickets.extend(filtered_dept_tickets)
-        logger.info(f"Departman talepleri: {len(filtered_dept_tickets)}")
-    else:
-        logger.info("Kullanıcının departmanı yok")
-
-    # 4. Kullanıcının birimindeki meslektaşların açtığı talepler
-    #    (kullanıcının birimi dışındaki birimlere açılmış olsa bile görülebilir)
-    if user_department_ids:
-        colleague_ids_query = db.query(models.User.id).filter(
-            or_(
-                models.User.department_id.in_(user_department_ids),
-                models.User.id.in_(
-                    db.query(models.user_department_association.c.user_id).filter(
-                        models.user_department_association.c.department_id.in_(user_department_ids)
-                    )
-                )
-            ),
-            models.User.id != current_user.id
-        )
-        colleague_ids = [uid for (uid,) in colleague_ids_query.all()]
-        
-        if colleague_ids:
-            colleague_query = db.query(models.Ticket).options(
-                joinedload(models.Ticket.department),
-                joinedload(models.Ticket.assignee)
-            ).filter(
-                models.Ticket.creator_id.in_(colleague_ids),
-                models.Ticket.is_private == False,
-                ~models.Ticket.department_id.in_(user_department_ids)  # Step 3'te zaten dahil edilenler hariç
-            )
-            if status:
-                colleague_query = colleague_query.filter(models.Ticket.status == status)
-            colleague_tickets = colleague_query.all()
-            accessible_tickets.extend(colleague_tickets)
-            logger.info(f"Meslektaş talepleri (diğer birimlere açılan): {len(colleague_tickets)}")
-
-    # Aynı ticket iki kez gelmesin - unique IDs
-    ticket_map = {}
-    for t in accessible_tickets:
-        if t.id not in ticket_map:
-            # is_personal mantığını assignee_id'ye göre ayarla
-            t.is_personal = t.assignee_id is not None
-            ticket_map[t.id] = t
-
-    final_tickets = list(ticket_map.values())
-    logger.info(f"Kullanıcı {current_user.username} için toplam {len(final_tickets)} erişilebilir talep döndürüldü")
-    
     # Clean ticket objects oluştur
-    return [schemas.Ticket.from_ticket(ticket) for ticket in final_tickets]
+    return [schemas.Ticket.from_ticket(ticket) for ticket in tickets]
 
 @router.get("/{ticket_id}", response_model=schemas.Ticket)
 def get_ticket(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
     from sqlalchemy.orm import joinedload
     
@@ -400,7 +354,7 @@ def get_ticket(
     if not ticket:
         raise HTTPException(status_code=404, detail="Destek talebi bulunamadı")
     
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine erişim yetkiniz yok")
     
     # is_personal mantığını assignee_id'ye göre ayarla
@@ -431,7 +385,7 @@ async def update_ticket(
     # Önce triaj kontrolünü yapalım (diğer kontrollerde kullanacağız)
     is_triage_person = False
     from sqlalchemy.orm import joinedload
-    config = db.query(models.GeneralConfig).first()
+    config = get_config_snapshot(db)
     
     if config and config.workflow_enabled:
         # Triaj personeli: ya triage_user_id ile eşleşen ya da triage_department_id'deki kullanıcı
@@ -537,6 +491,31 @@ async def update_ticket(
     import pytz
     istanbul_tz = pytz.timezone('Europe/Istanbul')
     ticket.updated_at = datetime.now(istanbul_tz).replace(tzinfo=None)
+    # Açık sayfalar durum/atama değişikliğini /ws üzerinden alır
+    publish_event(db, EVENT_TICKET_UPDATED, ticket_event_data(ticket), ticket_id=ticket.id)
+
+    # Webhook tetikle (API'den açılmış taleplar için); güncelleme ile aynı transaction'da commit olur
+    if ticket.api_client_id:
+        from routers.external_api import trigger_ticket_webhook
+        
+        # Olay tipini belirle
+        webhook_event = "ticket.updated"
+        changes = {}
+        
+        if ticket_update.status is not None:
+            if ticket_update.status == "closed":
+                webhook_event = "ticket.closed"
+            elif ticket.status == "closed" and ticket_update.status != "closed":
+                webhook_event = "ticket.reopened"
+            else:
+                webhook_event = "ticket.status_changed"
+            changes["status"] = ticket_update.status
+        
+        if ticket_update.assignee_id is not None:
+            webhook_event = "ticket.assigned"
+            changes["assignee_id"] = ticket_update.assignee_id
+        
+        trigger_ticket_webhook(db, ticket, webhook_event, changes)
     
     db.commit()
     db.refresh(ticket)
@@ -585,29 +564,6 @@ async def update_ticket(
         joinedload(models.Ticket.assignee)
     ).filter(models.Ticket.id == ticket_id).first()
 
-    # Webhook tetikle (API'den açılmış taleplar için)
-    if updated_ticket.api_client_id:
-        from routers.external_api import trigger_ticket_webhook
-        
-        # Olay tipini belirle
-        webhook_event = "ticket.updated"
-        changes = {}
-        
-        if ticket_update.status is not None:
-            if ticket_update.status == "closed":
-                webhook_event = "ticket.closed"
-            elif ticket.status == "closed" and ticket_update.status != "closed":
-                webhook_event = "ticket.reopened"
-            else:
-                webhook_event = "ticket.status_changed"
-            changes["status"] = ticket_update.status
-        
-        if ticket_update.assignee_id is not None:
-            webhook_event = "ticket.assigned"
-            changes["assignee_id"] = ticket_update.assignee_id
-        
-        trigger_ticket_webhook(db, updated_ticket, webhook_event, changes)
-
     # NOT: Eski mail gönderme mantığı kaldırıldı (.notifications.py üzerinden yönetiliyor)
     return schemas.Ticket.from_ticket(updated_ticket)
 
@@ -653,9 +609,10 @@ def add_comment(
     comment: schemas.CommentCreate,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine yorum ekleme yetkiniz yok")
     
     new_comment = models.Comment(
@@ -665,6 +622,15 @@ def add_comment(
     )
     
     db.add(new_comment)
+    db.flush()
+    publish_event(db, EVENT_COMMENT_CREATED, comment_event_data(new_comment, current_user), ticket_id=ticket_id)
+
+    # Webhook tetikle (API'den açılmış taleplar için); yorum ile aynı transaction'da commit olur
+    ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
+    if ticket and ticket.api_client_id:
+        from routers.external_api import trigger_ticket_webhook
+        trigger_ticket_webhook(db, ticket, "comment.added", comment=new_comment)
+
     db.commit()
     db.refresh(new_comment)
     
@@ -684,17 +650,6 @@ def add_comment(
         }
     )
 
-    # Webhook tetikle (API'den açılmış taleplar için)
-    from sqlalchemy.orm import joinedload
-    ticket = db.query(models.Ticket).options(
-        joinedload(models.Ticket.department),
-        joinedload(models.Ticket.assignee)
-    ).filter(models.Ticket.id == ticket_id).first()
-    
-    if ticket and ticket.api_client_id:
-        from routers.external_api import trigger_ticket_webhook
-        trigger_ticket_webhook(db, ticket, "comment.added", comment=new_comment)
-
     # Bildirim gönder
     from utils.notifications import notify_users_about_ticket
     background_tasks.add_task(
@@ -718,29 +673,26 @@ async def add_attachment(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine dosya ekleme yetkiniz yok")
 
-    # Upload dizinini alın ve ticket klasörü oluşturun
     upload_dir = Path(get_upload_dir(db))
-    ticket_dir = upload_dir / f"ticket_{ticket_id}"
-    ticket_dir.mkdir(parents=True, exist_ok=True)
 
-    # Dosya yolu oluştur
-    file_path = ticket_dir / file.filename
+    # Dosyayı içerik adresli depoya parça parça kaydet (boyut limiti okuma sırasında uygulanır)
+    # async endpoint - disk yazımı event loop'u bloklamasın
+    stored = await run_in_threadpool(store_upload, db, file, upload_dir, max_upload_bytes(get_config_snapshot(db)))
 
-    # Dosyayı kaydet
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Veritabanına kaydet (relative path: ticket_<id>/filename)
-    relative_path = f"ticket_{ticket_id}/{file.filename}"
+    # Veritabanına kaydet (relative path: blobs/ab/cd/<sha256>)
     new_attachment = models.Attachment(
         filename=file.filename,
-        file_path=relative_path,
+        file_path=stored.relative_path,
         content_type=file.content_type,
+        file_size=stored.size,
+        checksum=stored.checksum,
+        blob_id=stored.blob.id,
         ticket_id=ticket_id,
         uploaded_by=current_user.id
     )
@@ -749,6 +701,10 @@ async def add_attachment(
     db.commit()
     db.refresh(new_attachment)
 
+    # PDF/TIFF önizlemelerini arka planda hazırla (ilk görüntüleme önbellekten gelsin)
+    if Path(file.filename).suffix.lower() in RENDERED_EXTENSIONS:
+        background_tasks.add_task(generate_previews, new_attachment.id)
+
     # Bildirim gönder - SADECE talep ilk oluşturulurken eklenen dosyalar için bildirim gönderme
     from utils.notifications import notify_users_about_ticket
     from datetime import datetime, timedelta
@@ -782,10 +738,11 @@ def upload_ticket_attachment(
     file: UploadFile = File(...),
     background_tasks: BackgroundTasks = BackgroundTasks(),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
     """Ticket'a dosya yükle"""
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine erişim yetkiniz yok")
     
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -796,12 +753,14 @@ def upload_ticket_attachment(
     # if ticket.status == "open" and not current_user.is_admin:
     #     raise HTTPException(status_code=403, detail="Talep henüz açık durumda. Önce 'İşlemde' olarak işaretleyin.")
     
-    # Dosya boyutu kontrolü (10MB limit)
-    if file.size and file.size > 10 * 1024 * 1024:  # 10MB
-        raise HTTPException(status_code=413, detail="Dosya boyutu 10MB'dan büyük olamaz")
+    general_config = get_config_snapshot(db)
+    
+    # Dosya boyutu kontrolü (sistem ayarlarındaki max_file_size_mb)
+    # İstemci boyutu bildirmişse hemen, bildirmemişse okuma sırasında uygulanır
+    max_bytes = max_upload_bytes(general_config)
+    check_declared_size(file, max_bytes)
     
     # Dosya uzantısı kontrolü - sistem ayarlarından oku
-    general_config = db.query(models.GeneralConfig).first()
     if general_config and general_config.allowed_file_types:
         allowed_extensions = [f".{ext.strip()}" for ext in general_config.allowed_file_types.split(",")]
     else:
@@ -816,23 +775,19 @@ def upload_ticket_attachment(
     try:
         # Upload dizinini sistem ayarlarından al
         upload_dir = Path(get_upload_dir(db))
-        upload_dir.mkdir(exist_ok=True)
-        
-        # Benzersiz dosya adı oluştur
-        unique_filename = f"{ticket_id}_{uuid.uuid4().hex[:8]}_{file.filename}"
-        file_path = upload_dir / unique_filename
         
-        # Dosyayı kaydet
-        content = file.file.read()
-        with open(file_path, "wb") as f:
-            f.write(content)
+        # Dosyayı içerik adresli depoya parça parça kaydet (bellekte tamamı tutulmaz)
+        # Aynı içerik daha önce yüklendiyse yeni kopya oluşmaz
+        stored = store_upload(db, file, upload_dir, max_bytes)
         
         # Database'e attachment kaydı ekle
         attachment = models.Attachment(
             ticket_id=ticket_id,
             filename=file.filename,
-                file_path=unique_filename,  # Sadece dosya adı, uploads/ prefix'i olmadan
-            file_size=len(content),
+            file_path=stored.relative_path,  # uploads/ prefix'i olmadan: blobs/ab/cd/<sha256>
+            file_size=stored.size,
+            checksum=stored.checksum,
+            blob_id=stored.blob.id,
             content_type=file.content_type or "application/octet-stream",
             uploaded_by=current_user.id
         )
@@ -841,6 +796,10 @@ def upload_ticket_attachment(
         db.commit()
         db.refresh(attachment)
 
+        # PDF/TIFF önizlemelerini arka planda hazırla (ilk görüntüleme önbellekten gelsin)
+        if file_extension in RENDERED_EXTENSIONS:
+            background_tasks.add_task(generate_previews, attachment.id)
+
         # Bildirim gönder - SADECE talep ilk oluşturulurken eklenen dosyalar için bildirim gönderme
         # Eğer ticket 30 saniyeden daha yeni oluşturulmuşsa, dosya ekleme bildirimi gönderme
         from utils.notifications import notify_users_about_ticket
@@ -883,37 +842,53 @@ def upload_ticket_attachment(
             "preview_url": preview_url
         }
         
+    except HTTPException:
+        # Boyut limiti (413) - geçici dosya store_upload içinde silinir
+        db.rollback()
+        raise
     except Exception as e:
-        # Hata durumunda dosyayı sil
-        if 'file_path' in locals() and file_path.exists():
-            file_path.unlink()
+        # Blob başka eklerle paylaşılıyor olabilir, dosya silinmez;
+        # referansı commit edilmeyen blob'u çöp toplayıcı temizler
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Dosya yüklenirken hata oluştu: {str(e)}")
 
+@router.get("/previews/metrics")
+def get_preview_render_metrics(
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Önizleme render havuzu metrikleri (render süresi, kuyruk bekleme, red/zaman aşımı sayıları)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Bu işlem için yönetici yetkisi gereklidir")
+    return render_pool.metrics_snapshot()
+
+def _load_preview_attachment(db: Session, ticket_id: int, attachment_id: int):
+    attachment = db.query(models.Attachment).filter(
+        models.Attachment.id == attachment_id,
+        models.Attachment.ticket_id == ticket_id
+    ).first()
+    return attachment, (get_upload_dir(db) if attachment else None)
+
 @router.get("/{ticket_id}/attachments/{attachment_id}/preview")
-def preview_attachment(
+async def preview_attachment(
     ticket_id: int,
     attachment_id: int,
+    request: Request,
+    size: str = Query(DEFAULT_PREVIEW_VARIANT, description="Önizleme boyutu: thumb | large"),
     db: Session = Depends(get_db)
 ):
     """Dosya önizlemesi (resim dosyaları için) - Public endpoint"""
     # Erişim kontrolü: Sadece attachment'ın ticket'ına erişimi olan kullanıcılar görebilir
     # Ama IMG tag'ine auth header geçilemediği için kontrol yapmıyoruz
     # Security: Attachment ID'ler guess etmek zor, dosyalar uploads klasöründe şifreli adlarla saklanıyor
+    if size not in PREVIEW_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Geçersiz önizleme boyutu: {size}")
     
-    attachment = db.query(models.Attachment).filter(
-        models.Attachment.id == attachment_id,
-        models.Attachment.ticket_id == ticket_id
-    ).first()
+    # async endpoint: veritabanı erişimi threadpool'da, render işi süreç havuzunda
+    attachment, upload_dir = await run_in_threadpool(_load_preview_attachment, db, ticket_id, attachment_id)
     
     if not attachment:
         raise HTTPException(status_code=404, detail="Dosya bulunamadı")
     
-    upload_dir = Path(get_upload_dir(db))
-    file_path = upload_dir / attachment.file_path
-    
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Dosya sunucuda bulunamadı")
-    
     # Resim dosyaları için mimetype belirle
     file_extension = Path(attachment.filename).suffix.lower()
     mime_types = {
@@ -926,98 +901,92 @@ def preview_attachment(
         '.webp': 'image/webp',
         '.pdf': 'application/pdf'
     }
+    media_type = mime_types.get(file_extension, 'application/octet-stream')
     
-    # PDF dosyası için ilk sayfanın resimini oluştur
-    if file_extension == '.pdf':
-        try:
-            from pdf2image import convert_from_path
-            from PIL import Image
-            import io
-            
-            # PDF'in ilk sayfasını resime çevir
-            images = convert_from_path(str(file_path), first_page=1, last_page=1, dpi=150)
-            if images:
-                # Resimi memory'de sakla
-                img = images[0]
-                # Daha net önizleme için boyutu büyüttük
-                img.thumbnail((1200, 1200))
-                
-                img_io = io.BytesIO()
-                img.save(img_io, 'PNG')
-                img_io.seek(0)
-                
-                return StreamingResponse(img_io, media_type='image/png')
-        except Exception as e:
-            logger = logging.getLogger("uvicorn")
-            logger.warning(f"PDF preview oluşturulamadı: {str(e)}, original dosya dönülecek")
-            # PDF olamıyorsa orijinal dosyayı dön
-            return FileResponse(file_path, media_type=mime_types.get(file_extension, 'application/octet-stream'))
-
-    # TIFF dosyaları tarayıcıda görüntülenmiyor; PNG'ye çevirip dön
-    if file_extension in ['.tiff', '.tif']:
-        try:
-            from PIL import Image
-            import io
-
-            with Image.open(file_path) as img:
-                # Transparanlık kaybını önlemek için RGBA'ya çeviriyoruz
-                img = img.convert('RGBA')
-                # TIFF önizleme çözünürlüğünü büyüttük
-                img.thumbnail((1200, 1200))
-
-                img_io = io.BytesIO()
-                img.save(img_io, 'PNG')
-                img_io.seek(0)
-
-                return StreamingResponse(img_io, media_type='image/png')
-        except Exception as e:
-            logger = logging.getLogger("uvicorn")
-            logger.warning(f"TIFF preview oluşturulamadı: {str(e)}, original dosya dönülecek")
-            return FileResponse(file_path, media_type=mime_types.get(file_extension, 'application/octet-stream'))
+    # Ek içeriği hiç değişmez - istemcideki kopya güncelse dosyaya dokunmadan 304 dön
+    rendered = file_extension in RENDERED_EXTENSIONS
+    content_tag = attachment.checksum or f"attachment-{attachment.id}"
+    etag = f'"{content_tag}-{size}"' if rendered else f'"{content_tag}"'
+    headers = cache_headers(etag, attachment.created_at)
+    if is_not_modified(request, etag, attachment.created_at):
+        return Response(status_code=304, headers=headers)
+    
+    file_path = Path(upload_dir) / attachment.file_path
+    
+    # PDF (ilk sayfa) ve TIFF dosyaları PNG önizlemeye çevrilir; sonuç diskte önbelleklenir
+    if rendered:
+        preview_file = get_cached_preview(upload_dir, attachment.id, size)
+        if preview_file is None:
+            if not file_path.exists():
+                raise HTTPException(status_code=404, detail="Dosya sunucuda bulunamadı")
+            # Kuyruk dolu, zaman aşımı veya hata -> None
+            preview_file = await build_preview(upload_dir, attachment.id, file_path, file_extension, size)
+        if preview_file is not None:
+            return FileResponse(preview_file, media_type='image/png', headers=headers)
+        # Önizleme üretilemiyorsa orijinal dosyayı dön (önbelleğe alınmasın)
+        headers = {"Cache-Control": "no-cache"}
     
-    media_type = mime_types.get(file_extension, 'application/octet-stream')
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Dosya sunucuda bulunamadı")
     
-    return FileResponse(file_path, media_type=media_type)
+    return FileResponse(file_path, media_type=media_type, headers=headers)
 
 @router.get("/{ticket_id}/attachments/{attachment_id}/download")
 def download_attachment(
     ticket_id: int,
     attachment_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user_for_download)
 ):
-    """Dosya indir - Token header'dan veya query parameter'dan alınır"""
-    attachment = db.query(models.Attachment).filter(models.Attachment.id == attachment_id).first()
-    
+    """
+    Dosya indir - Token header'dan veya query parameter'dan alınır
+    Range (devam ettirilebilir indirme, PDF görüntüleyiciler) ve koşullu GET (ETag/304) desteklenir.
+    """
+    # Ek ve erişim kontrolü tek sorguda (talep görünürlük koşulu join ile)
+    access = TicketAccessChecker(db, current_user)
+    attachment = db.query(models.Attachment).join(
+        models.Ticket, models.Ticket.id == models.Attachment.ticket_id
+    ).filter(
+        models.Attachment.id == attachment_id,
+        access.access_filter()
+    ).first()
+
     if not attachment:
-        raise HTTPException(status_code=404, detail="Dosya bulunamadı")
-    
-    # Erişim kontrolü - ticket'a erişebildiğini kontrol et
-    if not can_access_ticket(db, current_user, attachment.ticket_id):
+        # Sadece başarısız istekte 404/403 ayrımı için ek sorgu
+        exists = db.query(models.Attachment.id).filter(models.Attachment.id == attachment_id).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Dosya bulunamadı")
         raise HTTPException(status_code=403, detail="Bu dosyaya erişim yetkiniz yok")
-    
-    upload_dir = Path(get_upload_dir(db))
-    file_path = upload_dir / attachment.file_path
-    
+
+    # İçerik adresli depoda dosya değişmez; checksum güçlü ETag olarak kullanılır
+    etag = f'"{attachment.checksum}"' if attachment.checksum else f'"attachment-{attachment.id}"'
+    media_type = attachment.content_type or 'application/octet-stream'
+
+    if ATTACHMENT_ACCEL_REDIRECT_PREFIX:
+        return file_response(
+            request, None, media_type, etag, attachment.created_at,
+            filename=attachment.filename,
+            accel_redirect=ATTACHMENT_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(attachment.file_path.lstrip("/"))
+        )
+
+    file_path = Path(get_upload_dir(db)) / attachment.file_path
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Dosya sunucuda bulunamadı")
-    
-    return FileResponse(
-        file_path,
-        media_type=attachment.content_type or 'application/octet-stream',
-        filename=attachment.filename
-    )
+
+    return file_response(request, file_path, media_type, etag, attachment.created_at, filename=attachment.filename)
 
 @router.get("/{ticket_id}/comments/")
 def get_ticket_comments(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
     import logging
     logger = logging.getLogger("uvicorn")
     
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine erişim yetkiniz yok")
     
     from sqlalchemy.orm import joinedload
@@ -1054,12 +1023,13 @@ def add_ticket_comment(
     comment_data: schemas.CommentCreate,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
     import logging
     logger = logging.getLogger("uvicorn")
     
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine erişim yetkiniz yok")
     
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -1077,6 +1047,8 @@ def add_ticket_comment(
     )
     
     db.add(new_comment)
+    db.flush()
+    publish_event(db, EVENT_COMMENT_CREATED, comment_event_data(new_comment, current_user), ticket_id=ticket_id)
     db.commit()
     # user ilişkisini yükle
     from sqlalchemy.orm import joinedload
@@ -1085,7 +1057,8 @@ def add_ticket_comment(
     
     # Yorum eklendiğinde bildirim gönder (creator + assignee)
     try:
-        from routers.system_settings import send_comment_notification_email, send_ticket_updated_email
+        from routers.system_settings import send_comment_notification_email, BASE_URL
+        from utils import mail_templates
         recipients = []
         # Creator
         if ticket.creator and ticket.creator.email:
@@ -1100,6 +1073,8 @@ def add_ticket_comment(
             unique_recipients[r.id] = r
         
         logger.info(f"Comment notification recipients: {[r.email for r in unique_recipients.values()]}")
+        # Talep ve yorum kısmı bir kez render edilir, alıcılar sadece adla ayrışır
+        prepared_mail = mail_templates.prepare_comment_mail(ticket, current_user, new_comment_full, BASE_URL)
         
         for recipient in unique_recipients.values():
             notif_settings = db.query(models.NotificationSettings).filter(
@@ -1114,7 +1089,9 @@ def add_ticket_comment(
             logger.info(f"Comment notification check for {recipient.email}: allowed={allowed}, settings={notif_settings}")
             if allowed:
                 try:
-                    background_tasks.add_task(send_comment_notification_email, db, ticket, new_comment_full, current_user, recipient)
+                    background_tasks.add_task(
+                        send_comment_notification_email, db, ticket, current_user, recipient, new_comment_full, prepared_mail
+                    )
                 except Exception as e:
                     logger.error(f"Comment notification email task hatası: {str(e)}")
     except Exception as e:
@@ -1139,10 +1116,11 @@ def add_ticket_comment(
 def get_ticket_attachments(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
     """Ticket'ın eklerini getir"""
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine erişim yetkiniz yok")
     
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -1182,10 +1160,11 @@ def get_ticket_attachments(
 def get_ticket_shared_users(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
     """Ticket'ın paylaşıldığı kullanıcıları getir"""
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine erişim yetkiniz yok")
     
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -1199,10 +1178,11 @@ def get_ticket_shared_users(
 def get_ticket_shared_departments(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    access: TicketAccessChecker = Depends(get_ticket_access)
 ):
     """Ticket'ın paylaşıldığı departmanları getir"""
-    if not can_access_ticket(db, current_user, ticket_id):
+    if not access.can_access(ticket_id):
         raise HTTPException(status_code=403, detail="Bu destek talebine erişim yetkiniz yok")
     
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -6,6 +6,7 @@ from typing import List
 from database import get_db
 import models, schemas
 from auth import get_current_active_user, get_password_hash, sync_ldap_users_func
+from utils.membership_cache import invalidate_user_memberships
 
 router = APIRouter(tags=["users"])
 
@@ -205,6 +206,8 @@ def update_user(
                 user.departments.clear()
     
     db.commit()
+    # Birim üyelikleri değişmiş olabilir - önbellekteki kaydı düşür
+    invalidate_user_memberships(user.id)
     db.refresh(user)
     
     return schemas.UserResponse.from_user(user)
@@ -237,6 +240,7 @@ def delete_user(
     
     db.delete(user)
     db.commit()
+    invalidate_user_memberships(user_id)
     return None
 
 @router.get("/{user_id}/departments")
@@ -347,6 +347,11 @@ class NotificationResponse(NotificationBase):
     class Config:
         orm_mode = True
 
+class DigestModeEnum(str, Enum):
+    IMMEDIATE = "immediate"  # Olay başına (kısa birleştirme penceresiyle)
+    HOURLY = "hourly"
+    DAILY = "daily"
+
 class NotificationSettingsBase(BaseModel):
     email_notifications: bool = True
     browser_notifications: bool = True
@@ -358,6 +363,8 @@ class NotificationSettingsBase(BaseModel):
     wiki_created: bool = True
     wiki_updated: bool = True
     wiki_shared: bool = True
+    # Gönderilmezse mevcut tercih korunur
+    digest_mode: Optional[DigestModeEnum] = None
 
 class NotificationSettingsCreate(NotificationSettingsBase):
     user_id: int
@@ -746,3 +753,14 @@ class WebhookPayload(BaseModel):
     ticket: ExternalTicketResponse
     changes: Optional[Dict[str, Any]] = None  # Değişiklik detayları
     comment: Optional[ExternalCommentResponse] = None  # Yorum eklendiyse
+
+
+# Arka plan dışa aktarma işleri
+class ExportJobCreate(BaseModel):
+    """
+    kind: tickets (params: /api/reports/search filtreleri) veya system_logs (params: category, start_date, end_date)
+    """
+    kind: str = Field(..., regex="^(tickets|system_logs)$")
+    format: str = "csv"
+    compress: bool = False
+    params: Dict[str, Any] = {}
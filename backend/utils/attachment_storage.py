@@ -0,0 +1,248 @@
+"""
+Dosya Eki Depolama
+Yüklenen dosyaları sabit boyutlu parçalar halinde hedef dizindeki geçici bir dosyaya yazar.
+
+- Dosya hiçbir zaman tamamen belleğe alınmaz (parça boyutu kadar bellek kullanılır)
+- Boyut limiti okuma sırasında uygulanır; limit aşılınca yazma durur ve 413 döner
+- SHA-256 özeti okuma sırasında hesaplanır
+- Dosya os.replace ile atomik olarak yerine taşınır (yarım dosya görünmez)
+
+İçerik adresli depo (blob):
+- Dosya içeriği SHA-256 ile adreslenir: <upload_dir>/blobs/ab/cd/<sha256>
+- Aynı içerik kaç talebe eklenirse eklensin diskte tek kopya tutulur
+- attachment_blobs.ref_count blob'a bağlı ek sayısını tutar
+- collect_garbage() referanssız blob'ları ve yarım kalmış dosyaları siler
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger("uvicorn")
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # 1MB
+DEFAULT_MAX_FILE_SIZE_MB = 10
+
+BLOB_DIR = "blobs"
+BLOB_TEMP_DIR = "tmp"
+# Bu süreden eski olup veritabanında karşılığı olmayan blob/geçici dosyalar silinir
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+
+
+class StoredBlob(NamedTuple):
+    blob: "models.AttachmentBlob"
+    relative_path: str  # upload dizinine göre (Attachment.file_path)
+    size: int
+    checksum: str
+
+
+def max_upload_bytes(config) -> int:
+    """Sistem ayarlarındaki max_file_size_mb değerini byte'a çevir"""
+    max_mb = getattr(config, "max_file_size_mb", None) or DEFAULT_MAX_FILE_SIZE_MB
+    return int(max_mb) * 1024 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Dosya boyutu {max_bytes // (1024 * 1024)}MB'dan büyük olamaz"
+    )
+
+
+def check_declared_size(upload: UploadFile, max_bytes: Optional[int]):
+    """İstemci dosya boyutunu bildirmişse okumaya başlamadan reddet"""
+    if max_bytes and upload.size and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+
+def stream_to_tempfile(upload: UploadFile, directory: Path, max_bytes: Optional[int] = None) -> Tuple[Path, int, str]:
+    """
+    Yüklenen dosyayı directory içindeki geçici bir dosyaya parça parça yaz.
+    (geçici dosya yolu, boyut, sha256) döndürür; hata/limit aşımında geçici dosyayı siler.
+    """
+    check_declared_size(upload, max_bytes)
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=str(directory), prefix=".upload-", suffix=".part")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = upload.file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise _too_large(max_bytes)
+                hasher.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        # mkstemp 0600 ile oluşturur; normal open() ile yazılmış dosyalarla aynı izinler
+        os.chmod(temp_path, 0o644)
+    except BaseException:
+        _unlink_quietly(temp_path)
+        raise
+
+    return Path(temp_path), size, hasher.hexdigest()
+
+
+def blob_relative_path(checksum: str) -> str:
+    """SHA-256 özetinden blob yolu (upload dizinine göre): blobs/ab/cd/<sha256>"""
+    return f"{BLOB_DIR}/{checksum[:2]}/{checksum[2:4]}/{checksum}"
+
+
+def acquire_blob(db: Session, checksum: str, size: int) -> "models.AttachmentBlob":
+    """
+    Blob kaydının referans sayısını bir artır (yoksa oluştur).
+    UPDATE satırı kilitler; çöp toplayıcı aynı blob'u bu transaction bitene kadar silemez.
+    """
+    blob_query = db.query(models.AttachmentBlob).filter(models.AttachmentBlob.sha256 == checksum)
+    updated = blob_query.update(
+        {models.AttachmentBlob.ref_count: models.AttachmentBlob.ref_count + 1},
+        synchronize_session=False
+    )
+    if not updated:
+        try:
+            with db.begin_nested():
+                db.add(models.AttachmentBlob(
+                    sha256=checksum,
+                    size=size,
+                    storage_path=blob_relative_path(checksum),
+                    ref_count=1
+                ))
+        except IntegrityError:
+            # Aynı içerik eşzamanlı olarak başka bir istekle eklendi
+            blob_query.update(
+                {models.AttachmentBlob.ref_count: models.AttachmentBlob.ref_count + 1},
+                synchronize_session=False
+            )
+    return blob_query.populate_existing().one()
+
+
+def store_upload(db: Session, upload: UploadFile, upload_dir: Path, max_bytes: Optional[int] = None) -> StoredBlob:
+    """
+    Yüklenen dosyayı içerik adresli depoya yaz ve blob kaydını al.
+    Aynı içerik zaten varsa yeni kopya oluşmaz, sadece referans sayısı artar.
+    Çağıran, Attachment kaydıyla birlikte commit etmelidir.
+    """
+    upload_dir = Path(upload_dir)
+    temp_path, size, checksum = stream_to_tempfile(upload, upload_dir / BLOB_DIR / BLOB_TEMP_DIR, max_bytes)
+    try:
+        blob = acquire_blob(db, checksum, size)
+        destination = upload_dir / blob.storage_path
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        # İçerik aynı olduğu için mevcut blob'un üzerine yazmak güvenli (atomik rename)
+        os.replace(temp_path, destination)
+    except BaseException:
+        _unlink_quietly(temp_path)
+        raise
+    return StoredBlob(blob=blob, relative_path=blob.storage_path, size=size, checksum=checksum)
+
+
+def collect_garbage(db: Session, upload_dir: Path, grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> dict:
+    """
+    Referanssız blob'ları sil.
+    1. ref_count değerlerini attachments tablosundan yeniden hesapla
+    2. ref_count = 0 olan blob'ların dosyasını ve kaydını sil (satır kilitliyken)
+    3. Veritabanında karşılığı olmayan eski blob/geçici dosyaları sil
+    """
+    upload_dir = Path(upload_dir)
+    stats = {"blobs_deleted": 0, "orphan_files_deleted": 0, "bytes_freed": 0}
+
+    # 1. Referans sayılarını düzelt (yarıda kalmış işlemler, elle silinen ekler)
+    reference_count = db.query(func.count(models.Attachment.id)).filter(
+        models.Attachment.blob_id == models.AttachmentBlob.id
+    ).correlate(models.AttachmentBlob).scalar_subquery()
+    db.query(models.AttachmentBlob).update(
+        {models.AttachmentBlob.ref_count: reference_count},
+        synchronize_session=False
+    )
+    db.commit()
+
+    # 2. Referanssız blob'lar
+    unreferenced_ids = [
+        row[0] for row in db.query(models.AttachmentBlob.id).filter(models.AttachmentBlob.ref_count <= 0).all()
+    ]
+    for blob_id in unreferenced_ids:
+        blob = db.query(models.AttachmentBlob).filter(
+            models.AttachmentBlob.id == blob_id,
+            models.AttachmentBlob.ref_count <= 0
+        ).with_for_update(skip_locked=True).first()
+        if not blob:
+            db.rollback()
+            continue
+        # 1. adımdan sonra commit edilmiş bir ek bu blob'u kullanmaya başlamış olabilir
+        referenced = db.query(func.count(models.Attachment.id)).filter(models.Attachment.blob_id == blob.id).scalar()
+        if referenced:
+            blob.ref_count = referenced
+            db.commit()
+            continue
+        # Dosya, kayıt kilitliyken silinir; eşzamanlı yükleme kilidi bekler ve dosyayı yeniden yazar
+        path = upload_dir / blob.storage_path
+        if path.exists():
+            stats["bytes_freed"] += path.stat().st_size
+            _unlink_quietly(path)
+        db.delete(blob)
+        db.commit()
+        stats["blobs_deleted"] += 1
+
+    # 3. Kaydı olmayan dosyalar (commit öncesi çöken yüklemeler) ve yarım kalmış geçici dosyalar
+    blob_root = upload_dir / BLOB_DIR
+    if blob_root.exists():
+        cutoff = time.time() - grace_seconds
+        candidates = []
+        for path in blob_root.rglob("*"):
+            if not path.is_file():
+                continue
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if path.parent.name == BLOB_TEMP_DIR:
+                stats["bytes_freed"] += path.stat().st_size
+                _unlink_quietly(path)
+                stats["orphan_files_deleted"] += 1
+            else:
+                candidates.append(path)
+
+        for start in range(0, len(candidates), 500):
+            batch = candidates[start:start + 500]
+            known = {
+                row[0] for row in db.query(models.AttachmentBlob.sha256).filter(
+                    models.AttachmentBlob.sha256.in_([p.name for p in batch])
+                ).all()
+            }
+            for path in batch:
+                if path.name not in known:
+                    stats["bytes_freed"] += path.stat().st_size
+                    _unlink_quietly(path)
+                    stats["orphan_files_deleted"] += 1
+
+    logger.info(
+        f"Blob çöp toplama: {stats['blobs_deleted']} blob, {stats['orphan_files_deleted']} sahipsiz dosya silindi, "
+        f"{stats['bytes_freed']} byte boşaltıldı"
+    )
+    return stats
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
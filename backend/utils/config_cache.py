@@ -0,0 +1,143 @@
+"""
+Sistem Ayarları (GeneralConfig) Önbelleği
+GeneralConfig satırı salt okunur bir snapshot olarak bellekte tutulur.
+
+- Snapshot bir kez yüklenir; sıcak yollar (upload dizini, triaj ayarları vb.) sorgu çalıştırmaz.
+- Her GeneralConfig güncellemesinde config_version kolonu artırılır (models.py - before_update).
+- Diğer worker'lar en fazla CONFIG_CACHE_CHECK_SECONDS saniyede bir sadece
+  (id, config_version) değerini okuyarak snapshot'ın eskiyip eskimediğini anlar
+  (silinip yeniden oluşturulan satır sürüm 1'den başlar; id farkı bunu yakalar).
+- Ayarları yazan endpoint'ler commit sonrası refresh_config_snapshot() çağırır.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+logger = logging.getLogger("uvicorn")
+
+CONFIG_CACHE_CHECK_SECONDS = float(os.getenv("CONFIG_CACHE_CHECK_SECONDS", "10"))
+
+
+class ConfigSnapshot:
+    """GeneralConfig'in değiştirilemez kopyası - alanlara ORM nesnesindeki gibi erişilir"""
+
+    __slots__ = ("_values", "version")
+
+    def __init__(self, values: Dict[str, Any], version: int):
+        object.__setattr__(self, "_values", dict(values))
+        object.__setattr__(self, "version", version)
+
+    @property
+    def revision(self) -> Tuple[int, int]:
+        """Eskime kontrolü için (id, config_version)"""
+        return (self._values.get("id"), self.version)
+
+    @classmethod
+    def from_model(cls, config: models.GeneralConfig) -> "ConfigSnapshot":
+        values = {column.key: getattr(config, column.key) for column in models.GeneralConfig.__table__.columns}
+        return cls(values, config.config_version or 0)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("ConfigSnapshot salt okunurdur")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self._values)
+
+
+class ConfigCache:
+    """Süreç genelinde tek GeneralConfig snapshot'ı"""
+
+    def __init__(self, check_interval: float = CONFIG_CACHE_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session):
+        config = db.query(models.GeneralConfig).order_by(models.GeneralConfig.id).first()
+        self._snapshot = ConfigSnapshot.from_model(config) if config else None
+        self._loaded = True
+        self._checked_at = time.monotonic()
+
+    def _current_revision(self, db: Session) -> Optional[Tuple[int, int]]:
+        row = db.query(models.GeneralConfig.id, models.GeneralConfig.config_version).order_by(
+            models.GeneralConfig.id
+        ).first()
+        return (row[0], row[1] or 0) if row else None
+
+    def _with_session(self, db: Optional[Session], func):
+        if db is not None:
+            return func(db)
+        session = SessionLocal()
+        try:
+            return func(session)
+        finally:
+            session.close()
+
+    def get(self, db: Optional[Session] = None) -> Optional[ConfigSnapshot]:
+        """Güncel snapshot (ayar satırı yoksa None)"""
+        if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+            return self._snapshot
+
+        with self._lock:
+            # Başka bir thread bu arada kontrol etmiş olabilir
+            if self._loaded and time.monotonic() - self._checked_at < self.check_interval:
+                return self._snapshot
+            try:
+                def check(session: Session):
+                    if not self._loaded:
+                        self._load(session)
+                        return
+                    revision = self._current_revision(session)
+                    current = self._snapshot.revision if self._snapshot else None
+                    if revision != current:
+                        logger.info(f"Sistem ayarları değişmiş ({current} -> {revision}), yeniden yükleniyor")
+                        self._load(session)
+                    else:
+                        self._checked_at = time.monotonic()
+
+                self._with_session(db, check)
+            except Exception as e:
+                # Veritabanı geçici olarak erişilemezse eldeki snapshot ile devam et
+                logger.error(f"Sistem ayarları yüklenemedi: {e}")
+                if not self._loaded:
+                    raise
+            return self._snapshot
+
+    def refresh(self, db: Optional[Session] = None) -> Optional[ConfigSnapshot]:
+        """Snapshot'ı hemen yeniden yükle (ayarları yazan endpoint'ler commit sonrası çağırır)"""
+        with self._lock:
+            self._with_session(db, self._load)
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+            self._snapshot = None
+
+
+config_cache = ConfigCache()
+
+
+def get_config_snapshot(db: Optional[Session] = None) -> Optional[ConfigSnapshot]:
+    """Sistem ayarlarının güncel snapshot'ı - db.query(models.GeneralConfig).first() yerine kullanılır"""
+    return config_cache.get(db)
+
+
+def refresh_config_snapshot(db: Optional[Session] = None) -> Optional[ConfigSnapshot]:
+    return config_cache.refresh(db)
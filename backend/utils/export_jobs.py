@@ -0,0 +1,468 @@
+"""
+Arka Plan Dışa Aktarma İşleri
+
+Büyük dışa aktarmalar HTTP isteği içinde (proxy zaman aşımına takılarak) değil, iş olarak çalışır:
+- POST /api/export-jobs işi kuyruğa alır ve iş kimliğini döner; istemci ilerlemeyi GET ile yoklar
+  veya /ws kanalındaki "export_job.updated" olaylarından izler
+- İşler sınırlı bir thread havuzunda (EXPORT_JOB_WORKERS) çalışır; kuyruk export_jobs tablosudur,
+  birden fazla süreç işleri FOR UPDATE SKIP LOCKED ile paylaşır
+- Kullanıcı başına en fazla EXPORT_JOB_MAX_ACTIVE_PER_USER bekleyen/çalışan iş kabul edilir,
+  aynı anda en fazla EXPORT_JOB_MAX_RUNNING_PER_USER tanesi çalışır
+- Satırlar mevcut akışlı dışa aktarma üreteçleriyle (utils/export_stream.py) okunup yükleme deposunda
+  exports/ altına geçici dosya + atomik rename ile yazılır. /uploads herkese açık bağlandığı için
+  dosya adları tahmin edilemez; indirme yetki kontrollü endpoint üzerinden yapılır
+- Biten dosyalar EXPORT_JOB_TTL_HOURS sonra silinir (iş "expired" olur), eski iş kayıtları temizlenir
+- Süreç kapanırken çalışan işler kuyruğa geri bırakılır; çöken süreçten kalan işler
+  EXPORT_JOB_STALE_SECONDS sonra tekrar denenir
+
+Outbox worker'ı varsa (NOTIFICATION_OUTBOX_ENABLED) işleri o çalıştırır, yoksa API süreci.
+"""
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional, Set, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+from utils.export_stream import EXPORT_FORMATS, Columns, export_chunks
+from utils.realtime import EVENT_EXPORT_JOB_UPDATED, publish_event
+from utils.report_stats import parse_report_datetime
+
+logger = logging.getLogger("uvicorn")
+
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+EXPORT_JOB_MAX_ACTIVE_PER_USER = int(os.getenv("EXPORT_JOB_MAX_ACTIVE_PER_USER", "3"))
+EXPORT_JOB_MAX_RUNNING_PER_USER = int(os.getenv("EXPORT_JOB_MAX_RUNNING_PER_USER", "1"))
+EXPORT_JOB_TTL_HOURS = int(os.getenv("EXPORT_JOB_TTL_HOURS", "24"))
+EXPORT_JOB_HISTORY_DAYS = int(os.getenv("EXPORT_JOB_HISTORY_DAYS", "7"))
+EXPORT_JOB_POLL_SECONDS = float(os.getenv("EXPORT_JOB_POLL_SECONDS", "2"))
+EXPORT_JOB_STALE_SECONDS = int(os.getenv("EXPORT_JOB_STALE_SECONDS", "600"))
+EXPORT_JOB_MAX_ATTEMPTS = 3
+# İlerleme (rows_written + heartbeat + /ws olayı) en fazla bu aralıkla yazılır
+_PROGRESS_INTERVAL_SECONDS = 2.0
+_RECOVER_INTERVAL_SECONDS = 60
+_PURGE_INTERVAL_SECONDS = 3600
+_CLAIM_LOCK_KEY = 7_401_024
+EXPORT_SUBDIR = "exports"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+STATUS_EXPIRED = "expired"
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+# İş türü -> izin verilen biçimler
+JOB_FORMATS = {
+    "tickets": ("csv", "jsonl", "xlsx"),
+    "system_logs": tuple(EXPORT_FORMATS),
+}
+
+
+class ExportJobLimitError(Exception):
+    """Kullanıcının bekleyen/çalışan iş sınırı dolu"""
+
+
+class _JobStopped(Exception):
+    """İş iptal edildi veya süreç kapanıyor; dosya yazımı yarıda bırakılır"""
+
+
+def job_data(job: models.ExportJob) -> dict:
+    """API yanıtı ve /ws olayı için iş özeti"""
+    progress = None
+    if job.status == STATUS_DONE:
+        progress = 100
+    elif job.total_rows:
+        progress = min(99, int(job.rows_written * 100 / job.total_rows))
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "format": job.export_format,
+        "compress": job.compress,
+        "status": job.status,
+        "rows_written": job.rows_written,
+        "total_rows": job.total_rows,
+        "progress": progress,
+        "error": job.error,
+        "file_name": job.file_name,
+        "file_size": job.file_size,
+        "download_url": f"/api/export-jobs/{job.id}/download" if job.status == STATUS_DONE else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "expires_at": job.expires_at,
+    }
+
+
+def _publish(db: Session, job: models.ExportJob):
+    publish_event(db, EVENT_EXPORT_JOB_UPDATED, job_data(job), user_id=job.user_id)
+
+
+def create_job(db: Session, user: models.User, kind: str, export_format: str, compress: bool,
+               params: dict) -> models.ExportJob:
+    """İşi kuyruğa alır (commit eder). Kullanıcının aktif iş sınırı doluysa ExportJobLimitError."""
+    active = db.query(func.count(models.ExportJob.id)).filter(
+        models.ExportJob.user_id == user.id,
+        models.ExportJob.status.in_(ACTIVE_STATUSES)
+    ).scalar()
+    if active >= EXPORT_JOB_MAX_ACTIVE_PER_USER:
+        raise ExportJobLimitError(f"Aynı anda en fazla {EXPORT_JOB_MAX_ACTIVE_PER_USER} dışa aktarma işi bekleyebilir")
+
+    job = models.ExportJob(
+        user_id=user.id,
+        kind=kind,
+        export_format=export_format,
+        compress=compress and export_format != "xlsx",
+        params=json.dumps(params, ensure_ascii=False, default=str),
+        status=STATUS_QUEUED,
+    )
+    db.add(job)
+    db.flush()
+    _publish(db, job)
+    db.commit()
+    export_job_runner.wake()
+    return job
+
+
+def cancel_job(db: Session, job: models.ExportJob) -> bool:
+    """Bekleyen/çalışan işi iptal eder (çalışan iş bir sonraki ilerleme yazımında durur)"""
+    if job.status not in ACTIVE_STATUSES:
+        return False
+    now = datetime.utcnow()
+    job.status = STATUS_CANCELLED
+    job.finished_at = now
+    job.expires_at = now
+    _publish(db, job)
+    db.commit()
+    return True
+
+
+def remove_job_file(upload_dir: str, job: models.ExportJob):
+    if job.file_path:
+        try:
+            os.unlink(os.path.join(upload_dir, job.file_path))
+        except FileNotFoundError:
+            pass
+        job.file_path = None
+
+
+# ==================== Kaynaklar ====================
+
+def _job_source(job: models.ExportJob, user: models.User) -> Tuple[Columns, Callable[[], int], Iterator[dict], str]:
+    """(sütunlar, toplam satır sayacı, satır üreteci, dosya adı öneki)"""
+    params = json.loads(job.params or "{}")
+    if job.kind == "tickets":
+        from routers.reports import TICKET_EXPORT_COLUMNS, ticket_export_count, ticket_export_rows
+        return (
+            TICKET_EXPORT_COLUMNS,
+            lambda: ticket_export_count(params, user.id),
+            ticket_export_rows(params, user.id),
+            "talepler",
+        )
+    if job.kind == "system_logs":
+        from routers.system_logs import SYSTEM_LOG_EXPORT_COLUMNS, system_log_export_count, system_log_export_rows
+        category = params.get("category")
+        start_date = parse_report_datetime(params.get("start_date"))
+        end_date = parse_report_datetime(params.get("end_date"))
+        return (
+            SYSTEM_LOG_EXPORT_COLUMNS,
+            lambda: system_log_export_count(category, start_date, end_date),
+            system_log_export_rows(job.export_format, category, start_date, end_date, job.compress,
+                                   user.id, user.username),
+            "system_logs",
+        )
+    raise ValueError(f"Bilinmeyen dışa aktarma türü: {job.kind}")
+
+
+# ==================== Kuyruk ====================
+
+def claim_jobs(db: Session, limit: int) -> list:
+    """
+    Sıradaki işleri bu süreç adına "running" yapar.
+    Kullanıcı başına çalışan iş sınırı süreçler arasında da korunur (PostgreSQL'de alım advisory lock ile sıralanır).
+    """
+    if limit <= 0:
+        return []
+    job = models.ExportJob
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CLAIM_LOCK_KEY})
+    running = dict(db.query(job.user_id, func.count(job.id)).filter(
+        job.status == STATUS_RUNNING
+    ).group_by(job.user_id).all())
+    candidates = db.query(job).filter(job.status == STATUS_QUEUED).order_by(job.id).limit(
+        limit * 4
+    ).with_for_update(skip_locked=True).all()
+
+    now = datetime.utcnow()
+    claimed = []
+    for candidate in candidates:
+        if len(claimed) >= limit:
+            break
+        if running.get(candidate.user_id, 0) >= EXPORT_JOB_MAX_RUNNING_PER_USER:
+            continue
+        running[candidate.user_id] = running.get(candidate.user_id, 0) + 1
+        candidate.status = STATUS_RUNNING
+        candidate.attempts += 1
+        candidate.started_at = now
+        candidate.heartbeat_at = now
+        candidate.rows_written = 0
+        candidate.error = None
+        _publish(db, candidate)
+        claimed.append(candidate.id)
+    db.commit()
+    return claimed
+
+
+def recover_stale_jobs(db: Session) -> int:
+    """İlerlemesi EXPORT_JOB_STALE_SECONDS'dır yazılmayan (süreci çökmüş) işleri tekrar kuyruğa alır"""
+    stale_before = datetime.utcnow() - timedelta(seconds=EXPORT_JOB_STALE_SECONDS)
+    jobs = db.query(models.ExportJob).filter(
+        models.ExportJob.status == STATUS_RUNNING,
+        models.ExportJob.heartbeat_at < stale_before
+    ).with_for_update(skip_locked=True).all()
+    for job in jobs:
+        if job.attempts >= EXPORT_JOB_MAX_ATTEMPTS:
+            job.status = STATUS_FAILED
+            job.error = "İş yanıt vermeyi bıraktı"
+            job.finished_at = datetime.utcnow()
+            job.expires_at = job.finished_at
+        else:
+            job.status = STATUS_QUEUED
+        _publish(db, job)
+    db.commit()
+    return len(jobs)
+
+
+def purge_expired_jobs(db: Session) -> int:
+    """Süresi dolan dosyaları siler; geçmiş süresi de dolan iş kayıtlarını kaldırır. Silinen dosya sayısını döner."""
+    from routers.tickets import get_upload_dir
+    upload_dir = get_upload_dir(db)
+    now = datetime.utcnow()
+    jobs = db.query(models.ExportJob).filter(
+        models.ExportJob.status == STATUS_DONE,
+        models.ExportJob.expires_at < now
+    ).all()
+    for job in jobs:
+        remove_job_file(upload_dir, job)
+        job.status = STATUS_EXPIRED
+    db.query(models.ExportJob).filter(
+        models.ExportJob.status.in_((STATUS_FAILED, STATUS_CANCELLED, STATUS_EXPIRED)),
+        models.ExportJob.expires_at < now - timedelta(days=EXPORT_JOB_HISTORY_DAYS)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(jobs)
+
+
+# ==================== Çalıştırma ====================
+
+class _ProgressTracker:
+    """Satırları sayar; aralıklarla ilerlemeyi yazar, iptal ve kapanışı kontrol eder"""
+
+    def __init__(self, db: Session, job: models.ExportJob, stopping: threading.Event):
+        self.db = db
+        self.job = job
+        self.stopping = stopping
+        self.rows = 0
+        self.last_write = time.monotonic()
+
+    def count(self, rows: Iterator[dict]) -> Iterator[dict]:
+        for row in rows:
+            if self.stopping.is_set():
+                raise _JobStopped()
+            self.rows += 1
+            if time.monotonic() - self.last_write >= _PROGRESS_INTERVAL_SECONDS:
+                self.write()
+            yield row
+
+    def write(self):
+        # İş bu arada iptal edildiyse (status artık running değil) güncelleme satır bulamaz
+        updated = self.db.query(models.ExportJob).filter(
+            models.ExportJob.id == self.job.id,
+            models.ExportJob.status == STATUS_RUNNING
+        ).update({
+            models.ExportJob.rows_written: self.rows,
+            models.ExportJob.heartbeat_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        if not updated:
+            self.db.rollback()
+            raise _JobStopped()
+        self.db.refresh(self.job)
+        _publish(self.db, self.job)
+        self.db.commit()
+        self.last_write = time.monotonic()
+
+
+def run_job(job_id: int, stopping: threading.Event):
+    """Tek işi çalıştırır (havuz thread'inde, kendi session'ı ile)"""
+    from routers.tickets import get_upload_dir
+
+    db = SessionLocal()
+    temp_path = None
+    rows = None
+    try:
+        job = db.get(models.ExportJob, job_id)
+        if not job or job.status != STATUS_RUNNING:
+            return
+        user = db.get(models.User, job.user_id)
+        if not user or not user.is_active:
+            raise ValueError("Kullanıcı bulunamadı veya pasif")
+        if job.kind == "system_logs" and not user.is_admin:
+            raise PermissionError("Sistem loglarını dışa aktarma yetkisi yok")
+
+        columns, count_rows, rows, prefix = _job_source(job, user)
+        job.total_rows = count_rows()
+        _publish(db, job)
+        db.commit()
+
+        tracker = _ProgressTracker(db, job, stopping)
+        chunks, media_type, extension = export_chunks(tracker.count(rows), columns, job.export_format, job.compress)
+
+        upload_dir = get_upload_dir(db)
+        export_dir = os.path.join(upload_dir, EXPORT_SUBDIR)
+        os.makedirs(export_dir, exist_ok=True)
+        relative_path = f"{EXPORT_SUBDIR}/{secrets.token_urlsafe(24)}.{extension}"
+        temp_path = os.path.join(upload_dir, relative_path + ".part")
+        with open(temp_path, "wb") as out:
+            for chunk in chunks:
+                out.write(chunk)
+        tracker.write()  # Son iptal kontrolü; iptal edildiyse dosya yayınlanmaz
+        os.replace(temp_path, os.path.join(upload_dir, relative_path))
+        temp_path = None
+
+        now = datetime.utcnow()
+        job.status = STATUS_DONE
+        job.rows_written = tracker.rows
+        job.file_path = relative_path
+        job.file_name = f"{prefix}_{job.created_at.strftime('%Y%m%d_%H%M%S')}.{extension}"
+        job.file_size = os.path.getsize(os.path.join(upload_dir, relative_path))
+        job.media_type = media_type
+        job.finished_at = now
+        job.expires_at = now + timedelta(hours=EXPORT_JOB_TTL_HOURS)
+        _publish(db, job)
+        db.commit()
+        logger.info(f"Dışa aktarma işi #{job_id} tamamlandı ({tracker.rows} satır)")
+    except _JobStopped:
+        db.rollback()
+        if stopping.is_set():
+            # Süreç kapanıyor: iş kuyruğa geri döner, başka süreç/yeniden başlatma baştan alır
+            db.query(models.ExportJob).filter(
+                models.ExportJob.id == job_id,
+                models.ExportJob.status == STATUS_RUNNING
+            ).update({models.ExportJob.status: STATUS_QUEUED, models.ExportJob.rows_written: 0},
+                     synchronize_session=False)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Dışa aktarma işi #{job_id} başarısız: {e}")
+        job = db.get(models.ExportJob, job_id)
+        if job and job.status == STATUS_RUNNING:
+            now = datetime.utcnow()
+            job.status = STATUS_FAILED
+            job.error = str(e)[:1000]
+            job.finished_at = now
+            job.expires_at = now
+            _publish(db, job)
+            db.commit()
+    finally:
+        if rows is not None:
+            rows.close()  # Kaynak üreteci oturumunu kapatsın (yarıda kaldıysa da)
+        if temp_path:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+        db.close()
+
+
+class ExportJobRunner:
+    """Kuyruktan işleri alıp sınırlı thread havuzunda çalıştırır; süresi dolanları temizler"""
+
+    def __init__(self, workers: int = EXPORT_JOB_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._in_flight: Set[Future] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export-job")
+        self._thread = threading.Thread(target=self._loop, name="export-job-runner", daemon=True)
+        self._thread.start()
+        logger.info(f"Dışa aktarma iş havuzu başlatıldı ({self.workers} worker)")
+
+    def wake(self):
+        """Yeni iş geldi; bu süreçte havuz çalışıyorsa yoklama beklemeden alınır"""
+        self._wakeup.set()
+
+    def shutdown(self, wait: bool = True):
+        """Çalışan işler kuyruğa geri bırakılır (satır döngüsü durma isteğini hemen görür)"""
+        if not self.running:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._thread = None
+        self._executor = None
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._in_flight.discard(future)
+        self._wakeup.set()
+
+    def _run_db(self, fn, *args):
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Dışa aktarma kuyruğu işlemi başarısız ({fn.__name__}): {e}")
+        finally:
+            db.close()
+
+    def _loop(self):
+        last_recover = last_purge = 0.0
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            if time.time() - last_recover > _RECOVER_INTERVAL_SECONDS:
+                self._run_db(recover_stale_jobs)
+                last_recover = time.time()
+            if time.time() - last_purge > _PURGE_INTERVAL_SECONDS:
+                self._run_db(purge_expired_jobs)
+                last_purge = time.time()
+
+            with self._lock:
+                free_slots = self.workers - len(self._in_flight)
+            claimed = []
+            if free_slots > 0:
+                claimed = self._run_db(claim_jobs, free_slots) or []
+            for job_id in claimed:
+                future = self._executor.submit(run_job, job_id, self._stopping)
+                with self._lock:
+                    self._in_flight.add(future)
+                future.add_done_callback(self._done)
+
+            if not claimed:
+                self._wakeup.wait(EXPORT_JOB_POLL_SECONDS)
+
+
+export_job_runner = ExportJobRunner()
@@ -0,0 +1,263 @@
+"""
+Akışlı (streaming) dışa aktarma
+
+Satırlar veritabanından yield_per ile parça parça okunur (PostgreSQL'de server-side cursor),
+seçilen biçimde yazılıp ~64 KB'lık parçalar halinde StreamingResponse ile gönderilir.
+İstenirse gzip sıkıştırma da akış sırasında yapılır. Bellek kullanımı satır sayısından bağımsızdır,
+satır sınırı yoktur.
+
+Biçimler:
+- csv   : başlık satırı + satırlar
+- jsonl : her satır bir JSON nesnesi
+- json  : tek JSON dizisi (indent=2, eski export biçimi)
+- xlsx  : zip akışı olarak yazılan tek/çok sayfalı Excel dosyası (ek kütüphane gerekmez).
+          Excel'in sayfa başına satır sınırı aşılırsa yeni sayfaya geçilir. Zaten sıkıştırılmış olduğu için gzip uygulanmaz.
+
+Satır üreteçleri veritabanı oturumunu kendileri açıp kapatmalıdır; istek oturumu yanıt akarken kapanmış olabilir.
+Büyük dışa aktarmalar arka plan işi olarak da çalıştırılabilir (utils/export_jobs.py).
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "1000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# (anahtar, başlık) - satır sözlüklerindeki anahtarlar ve dosyadaki sütun başlıkları
+Columns = List[Tuple[str, str]]
+
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "json": ("application/json", "json"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+EXPORT_FORMAT_PATTERN = "^(" + "|".join(EXPORT_FORMATS) + ")$"
+
+
+def csv_chunks(rows: Iterable[dict], columns: Columns) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([label for _, label in columns])
+    keys = [key for key, _ in columns]
+    for row in rows:
+        writer.writerow([row.get(key) for key in keys])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _buffered(lines: Iterable[str]) -> Iterator[bytes]:
+    parts: List[str] = []
+    size = 0
+    for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+def jsonl_chunks(rows: Iterable[dict], columns: Columns) -> Iterator[bytes]:
+    return _buffered(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+
+
+def json_chunks(rows: Iterable[dict], columns: Columns) -> Iterator[bytes]:
+    """json.dumps(list, indent=2) ile aynı çıktı, dizinin tamamı bellekte tutulmadan"""
+    def lines():
+        yield "["
+        separator = "\n"
+        for row in rows:
+            item = json.dumps(row, ensure_ascii=False, indent=2, default=str).replace("\n", "\n  ")
+            yield f"{separator}  {item}"
+            separator = ",\n"
+        yield "\n]" if separator != "\n" else "]"
+    return _buffered(lines())
+
+
+# ==================== XLSX ====================
+
+XLSX_MAX_ROWS = 1_048_576
+_XLSX_MAX_CELL_CHARS = 32767
+# XML 1.0'da izin verilmeyen kontrol karakterleri
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+{sheets}</Types>"""
+
+_XLSX_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_XLSX_WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>{sheets}</sheets>
+</workbook>"""
+
+_XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+{sheets}</Relationships>"""
+
+_XLSX_SHEET_START = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                     '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+_XLSX_SHEET_END = "</sheetData></worksheet>"
+
+
+class _ChunkSink:
+    """zipfile'ın yazdığı byte'ları toplar; konum desteklemez, zipfile akış moduna geçer"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_cell(reference: str, value) -> str:
+    if value is None or value == "":
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{reference}"><v>{value}</v></c>'
+    text = _XML_INVALID.sub("", str(value))[:_XLSX_MAX_CELL_CHARS]
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(number: int, letters: List[str], values: list) -> str:
+    cells = "".join(_xlsx_cell(f"{letter}{number}", value) for letter, value in zip(letters, values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def xlsx_chunks(rows: Iterable[dict], columns: Columns, sheet_title: str = "Veri") -> Iterator[bytes]:
+    keys = [key for key, _ in columns]
+    letters = [_column_letter(index) for index in range(len(columns))]
+    header = [label for _, label in columns]
+    sink = _ChunkSink()
+    sheet_count = 0
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        rows = iter(rows)
+        pending = next(rows, None)
+        while sheet_count == 0 or pending is not None:
+            sheet_count += 1
+            with archive.open(f"xl/worksheets/sheet{sheet_count}.xml", "w", force_zip64=True) as sheet:
+                parts = [_XLSX_SHEET_START, _xlsx_row(1, letters, header)]
+                size = 0
+                number = 1
+                while pending is not None and number < XLSX_MAX_ROWS:
+                    number += 1
+                    part = _xlsx_row(number, letters, [pending.get(key) for key in keys])
+                    parts.append(part)
+                    size += len(part)
+                    if size >= EXPORT_CHUNK_BYTES:
+                        sheet.write("".join(parts).encode("utf-8"))
+                        parts, size = [], 0
+                        if sink.size >= EXPORT_CHUNK_BYTES:
+                            yield sink.drain()
+                    pending = next(rows, None)
+                parts.append(_XLSX_SHEET_END)
+                sheet.write("".join(parts).encode("utf-8"))
+
+        sheet_names = [sheet_title if index == 1 else f"{sheet_title} {index}" for index in range(1, sheet_count + 1)]
+        archive.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES.format(sheets="".join(
+            f'<Override PartName="/xl/worksheets/sheet{index}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>\n'
+            for index in range(1, sheet_count + 1)
+        )))
+        archive.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _XLSX_WORKBOOK.format(sheets="".join(
+            f'<sheet name="{escape(name)}" sheetId="{index}" r:id="rId{index}"/>'
+            for index, name in enumerate(sheet_names, start=1)
+        )))
+        archive.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS.format(sheets="".join(
+            f'<Relationship Id="rId{index}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{index}.xml"/>\n'
+            for index in range(1, sheet_count + 1)
+        )))
+    yield sink.drain()
+
+
+# ==================== Sıkıştırma ve yanıt ====================
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip başlığı
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+_WRITERS: Dict[str, Callable[[Iterable[dict], Columns], Iterator[bytes]]] = {
+    "csv": csv_chunks,
+    "jsonl": jsonl_chunks,
+    "json": json_chunks,
+    "xlsx": xlsx_chunks,
+}
+
+
+def export_chunks(rows: Iterable[dict], columns: Columns, export_format: str,
+                  compress: bool = False) -> Tuple[Iterator[bytes], str, str]:
+    """(byte parçaları, media type, dosya uzantısı) - yanıt akışı ve arka plan işleri ortak kullanır"""
+    media_type, extension = EXPORT_FORMATS[export_format]
+    chunks = _WRITERS[export_format](rows, columns)
+    if compress and export_format != "xlsx":
+        chunks = gzip_chunks(chunks)
+        media_type = "application/gzip"
+        extension = f"{extension}.gz"
+    return chunks, media_type, extension
+
+
+def export_response(rows: Iterable[dict], columns: Columns, export_format: str,
+                    filename: str, compress: bool = False) -> StreamingResponse:
+    """
+    rows: satır sözlükleri üreteci (değerler yazılacak hale getirilmiş)
+    filename: uzantısız dosya adı
+    """
+    chunks, media_type, extension = export_chunks(rows, columns, export_format, compress)
+    filename = f"{filename}.{extension}"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -0,0 +1,145 @@
+"""
+HTTP koşullu istek (conditional GET) ve byte aralığı (Range) yardımcıları
+ETag / Last-Modified başlıklarını üretir, If-None-Match / If-Modified-Since kontrolü yapar
+ve dosyaları 206 Partial Content ile parça parça gönderir.
+"""
+
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def http_date(value: datetime) -> str:
+    """datetime -> HTTP tarih formatı (naive değerler UTC kabul edilir)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None, cache_control: str = "private, max-age=3600") -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """İstemcideki kopya güncelse True (304 dönülebilir)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match varsa If-Modified-Since dikkate alınmaz (RFC 9110)
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP tarihleri saniye hassasiyetinde
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    Tek aralıklı Range başlığını (bytes=a-b, bytes=a-, bytes=-n) (başlangıç, bitiş) olarak döndürür.
+    Başlık yoksa veya çoklu aralık istenmişse None (tüm dosya gönderilir).
+    Karşılanamayan aralıkta ValueError fırlatır (416).
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text == "":
+            # Son n byte
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError("Geçersiz aralık")
+            start = max(file_size - length, 0)
+            end = file_size - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else file_size - 1
+            end = min(end, file_size - 1)
+    except ValueError:
+        raise ValueError("Geçersiz aralık")
+    if start < 0 or start > end or start >= file_size:
+        raise ValueError("Karşılanamayan aralık")
+    return start, end
+
+
+def iter_file_range(path, start: int, end: int, chunk_size: int = FILE_CHUNK_SIZE) -> Iterator[bytes]:
+    """Dosyanın [start, end] aralığını parça parça okur"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def content_disposition(filename: str, disposition: str = "attachment") -> str:
+    """Türkçe karakterli dosya adları için RFC 5987 uyumlu Content-Disposition"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def file_response(request: Request, path, media_type: str, etag: str, last_modified: Optional[datetime] = None,
+                  filename: Optional[str] = None, accel_redirect: Optional[str] = None) -> Response:
+    """
+    Koşullu GET (304), byte aralığı (206/416) ve isteğe bağlı X-Accel-Redirect destekli dosya yanıtı.
+    accel_redirect verilirse dosyayı nginx gönderir (Range/koşullu istekleri de nginx karşılar).
+    """
+    headers = cache_headers(etag, last_modified)
+    headers["Accept-Ranges"] = "bytes"
+    if filename:
+        headers["Content-Disposition"] = content_disposition(filename)
+
+    if is_not_modified(request, etag, last_modified):
+        headers.pop("Content-Disposition", None)
+        return Response(status_code=304, headers=headers)
+
+    if accel_redirect:
+        headers["X-Accel-Redirect"] = accel_redirect
+        return Response(media_type=media_type, headers=headers)
+
+    file_size = os.path.getsize(path)
+    range_header = request.headers.get("range")
+    # If-Range: istemcideki sürüm değiştiyse tüm dosyayı gönder
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range.strip() != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, file_size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{file_size}", "Accept-Ranges": "bytes"})
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_file_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
@@ -1,8 +1,38 @@
 """
 Centralized email templates for the Destek (Support) System.
 Includes both HTML and plain text versions.
+
+Şablonlar modül yüklenirken bir kez derlenir (utils/template_engine.py).
+prepare_* fonksiyonları olaya ait alanları bir kez yerleştirir; dönen PreparedMail
+alıcı başına sadece $recipient_name gibi kişisel alanlarla render edilir.
 """
 
+from utils.template_engine import MailTemplate, PreparedMail
+
+STATUS_LABELS = {
+    'open': 'Açık',
+    'closed': 'Kapalı',
+    'in_progress': 'İşlemde',
+    'pending': 'Beklemede',
+    'resolved': 'Çözüldü',
+    'on_hold': 'Beklemeye Alındı'
+}
+
+PRIORITY_LABELS = {
+    'low': 'Düşük',
+    'medium': 'Orta',
+    'high': 'Yüksek',
+    'critical': 'Kritik'
+}
+
+def translate_status(status: str) -> str:
+    """Durum durumunu Türkçeye çevir"""
+    return STATUS_LABELS.get(status, status)
+
+def translate_priority(priority: str) -> str:
+    """Önceliği Türkçeye çevir"""
+    return PRIORITY_LABELS.get(priority, priority) if priority else 'Belirtilmemiş'
+
 def get_base_styles():
     return """
         body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }
@@ -55,168 +85,629 @@ def get_html_wrapper(title, content, header_class="blue"):
 </body>
 </html>"""
 
+def _button(url_field, color, label):
+    return (f'<a href="${{{url_field}}}" style="display:inline-block;margin:20px 0;padding:12px 30px;'
+            f'background-color:{color};color:#ffffff;text-decoration:none;border-radius:5px;font-weight:bold;" '
+            f'target="_blank">{label}</a>')
+
+def _department_name(ticket):
+    return ticket.department.name if ticket.department else 'Genel'
+
+def _ticket_url(ticket, app_url):
+    return f"{app_url}/tickets/{ticket.id}"
+
 # --- TICKET CREATED TEMPLATES ---
 
-def get_ticket_created_user_template(ticket, app_url):
-    """Kullanıcıya: Talebiniz alındı"""
-    title = "🆕 Talebiniz Alındı"
-    text = f"""Merhaba {ticket.creator.full_name},
+TICKET_CREATED_USER = MailTemplate(
+    text="""Merhaba $creator_name,
     
-"{ticket.title}" başlıklı talebiniz başarıyla oluşturuldu ve sisteme kaydedildi. 
+"$ticket_title" başlıklı talebiniz başarıyla oluşturuldu ve sisteme kaydedildi. 
 Talebiniz en kısa sürede incelenip tarafınıza dönüş yapılacaktır.
 
 Talep Detayları:
-- Başlık: {ticket.title}
-- Departman: {ticket.department.name if ticket.department else 'Genel'}
-- Öncelik: {ticket.priority}
+- Başlık: $ticket_title
+- Departman: $department_name
+- Öncelik: $priority
 
-Talebi takip etmek için: {app_url}/tickets/{ticket.id}
-"""
-    html_content = f"""
-        <p>Merhaba <strong>{ticket.creator.full_name}</strong>,</p>
-        <p><strong>"{ticket.title}"</strong> başlıklı talebiniz başarıyla oluşturuldu ve sisteme kaydedildi.</p>
+Talebi takip etmek için: $ticket_url
+""",
+    html=get_html_wrapper("🆕 Talebiniz Alındı", f"""
+        <p>Merhaba <strong>$creator_name</strong>,</p>
+        <p><strong>"$ticket_title"</strong> başlıklı talebiniz başarıyla oluşturuldu ve sisteme kaydedildi.</p>
         <div class="details">
-            <p><span class="label">📋 Başlık:</span> {ticket.title}</p>
-            <p><span class="label">🏢 Departman:</span> {ticket.department.name if ticket.department else 'Genel'}</p>
-            <p><span class="label">⚠️ Öncelik:</span> {ticket.priority}</p>
+            <p><span class="label">📋 Başlık:</span> $ticket_title</p>
+            <p><span class="label">🏢 Departman:</span> $department_name</p>
+            <p><span class="label">⚠️ Öncelik:</span> $priority</p>
         </div>
         <p style="text-align: center;">
-            <a href="{app_url}/tickets/{ticket.id}" style="display:inline-block;margin:20px 0;padding:12px 30px;background-color:#2563eb;color:#ffffff;text-decoration:none;border-radius:5px;font-weight:bold;" target="_blank">Talebi Görüntüle</a>
+            {_button("ticket_url", "#2563eb", "Talebi Görüntüle")}
         </p>
-    """
-    return text, get_html_wrapper(title, html_content, "blue")
+    """, "blue")
+)
 
-def get_ticket_created_staff_template(ticket, app_url):
-    """Personele: Yeni talep atandı"""
-    title = "📌 Yeni Talep Atandı"
-    text = f"""Merhaba {ticket.assignee.full_name},
+TICKET_CREATED_STAFF = MailTemplate(
+    text="""Merhaba $assignee_name,
     
-Size "{ticket.title}" başlıklı yeni bir destek talebi atanmıştır.
+Size "$ticket_title" başlıklı yeni bir destek talebi atanmıştır.
 
 Talep Detayları:
-- Başlık: {ticket.title}
-- Oluşturan: {ticket.creator.full_name}
-- Departman: {ticket.department.name if ticket.department else 'Genel'}
-- Öncelik: {ticket.priority}
+- Başlık: $ticket_title
+- Oluşturan: $creator_name
+- Departman: $department_name
+- Öncelik: $priority
 
-Talebi incelemek için: {app_url}/tickets/{ticket.id}
-"""
-    html_content = f"""
-        <p>Merhaba <strong>{ticket.assignee.full_name}</strong>,</p>
-        <p>Size <strong>"{ticket.title}"</strong> başlıklı yeni bir destek talebi atanmıştır.</p>
+Talebi incelemek için: $ticket_url
+""",
+    html=get_html_wrapper("📌 Yeni Talep Atandı", f"""
+        <p>Merhaba <strong>$assignee_name</strong>,</p>
+        <p>Size <strong>"$ticket_title"</strong> başlıklı yeni bir destek talebi atanmıştır.</p>
         <div class="details purple">
-            <p><span class="label purple">📋 Başlık:</span> {ticket.title}</p>
-            <p><span class="label purple">👤 Oluşturan:</span> {ticket.creator.full_name}</p>
-            <p><span class="label purple">🏢 Departman:</span> {ticket.department.name if ticket.department else 'Genel'}</p>
-            <p><span class="label purple">⚠️ Öncelik:</span> {ticket.priority}</p>
+            <p><span class="label purple">📋 Başlık:</span> $ticket_title</p>
+            <p><span class="label purple">👤 Oluşturan:</span> $creator_name</p>
+            <p><span class="label purple">🏢 Departman:</span> $department_name</p>
+            <p><span class="label purple">⚠️ Öncelik:</span> $priority</p>
         </div>
         <p style="text-align: center;">
-            <a href="{app_url}/tickets/{ticket.id}" style="display:inline-block;margin:20px 0;padding:12px 30px;background-color:#667eea;color:#ffffff;text-decoration:none;border-radius:5px;font-weight:bold;" target="_blank">Talebi İncele</a>
+            {_button("ticket_url", "#667eea", "Talebi İncele")}
         </p>
-    """
-    return text, get_html_wrapper(title, html_content, "purple")
+    """, "purple")
+)
 
-def get_ticket_created_triage_template(ticket, app_url):
-    """Triaj personeline: Yönlendirilecek talep var"""
-    title = "📢 Yeni Talep (Yönlendirme Bekliyor)"
-    text = f"""Merhaba,
+TICKET_CREATED_TRIAGE = MailTemplate(
+    text="""Merhaba,
     
-Sisteme "{ticket.title}" başlıklı yeni bir talep düştü. Talep yönlendirme (Triaj) beklemektedir.
+Sisteme "$ticket_title" başlıklı yeni bir talep düştü. Talep yönlendirme (Triaj) beklemektedir.
 
 Talep Detayları:
-- Başlık: {ticket.title}
-- Oluşturan: {ticket.creator.full_name}
-- Birim: {ticket.department.name if ticket.department else 'Genel'}
+- Başlık: $ticket_title
+- Oluşturan: $creator_name
+- Birim: $department_name
 
-Talebi yönlendirmek için: {app_url}/tickets/{ticket.id}
-"""
-    html_content = f"""
+Talebi yönlendirmek için: $ticket_url
+""",
+    html=get_html_wrapper("📢 Yeni Talep (Yönlendirme Bekliyor)", f"""
         <p>Merhaba,</p>
-        <p>Sisteme <strong>"{ticket.title}"</strong> başlıklı yeni bir talep düştü. Talep yönlendirme (Triaj) beklemektedir.</p>
+        <p>Sisteme <strong>"$ticket_title"</strong> başlıklı yeni bir talep düştü. Talep yönlendirme (Triaj) beklemektedir.</p>
         <div class="details green">
-            <p><span class="label green">📋 Başlık:</span> {ticket.title}</p>
-            <p><span class="label green">👤 Oluşturan:</span> {ticket.creator.full_name}</p>
-            <p><span class="label green">🏢 Birim:</span> {ticket.department.name if ticket.department else 'Genel'}</p>
+            <p><span class="label green">📋 Başlık:</span> $ticket_title</p>
+            <p><span class="label green">👤 Oluşturan:</span> $creator_name</p>
+            <p><span class="label green">🏢 Birim:</span> $department_name</p>
         </div>
         <p style="text-align: center;">
-            <a href="{app_url}/tickets/{ticket.id}" style="display:inline-block;margin:20px 0;padding:12px 30px;background-color:#10b981;color:#ffffff;text-decoration:none;border-radius:5px;font-weight:bold;" target="_blank">Talebi Yönlendir</a>
+            {_button("ticket_url", "#10b981", "Talebi Yönlendir")}
         </p>
-    """
-    return text, get_html_wrapper(title, html_content, "green")
+    """, "green")
+)
+
+def prepare_ticket_created_user(ticket, app_url) -> PreparedMail:
+    """Kullanıcıya: Talebiniz alındı (alıcıya özel alan yok)"""
+    return TICKET_CREATED_USER.prepare(
+        creator_name=ticket.creator.full_name, ticket_title=ticket.title, department_name=_department_name(ticket),
+        priority=ticket.priority, ticket_url=_ticket_url(ticket, app_url)
+    )
+
+def prepare_ticket_created_staff(ticket, app_url) -> PreparedMail:
+    """Personele: Yeni talep atandı (alıcıya özel alan yok)"""
+    return TICKET_CREATED_STAFF.prepare(
+        assignee_name=ticket.assignee.full_name, creator_name=ticket.creator.full_name, ticket_title=ticket.title,
+        department_name=_department_name(ticket), priority=ticket.priority, ticket_url=_ticket_url(ticket, app_url)
+    )
+
+def prepare_ticket_created_triage(ticket, app_url) -> PreparedMail:
+    """Triaj personeline: Yönlendirilecek talep var (alıcıya özel alan yok)"""
+    return TICKET_CREATED_TRIAGE.prepare(
+        creator_name=ticket.creator.full_name, ticket_title=ticket.title, department_name=_department_name(ticket),
+        ticket_url=_ticket_url(ticket, app_url)
+    )
+
+def get_ticket_created_user_template(ticket, app_url):
+    """Kullanıcıya: Talebiniz alındı"""
+    return prepare_ticket_created_user(ticket, app_url).render()
+
+def get_ticket_created_staff_template(ticket, app_url):
+    """Personele: Yeni talep atandı"""
+    return prepare_ticket_created_staff(ticket, app_url).render()
+
+def get_ticket_created_triage_template(ticket, app_url):
+    """Triaj personeline: Yönlendirilecek talep var"""
+    return prepare_ticket_created_triage(ticket, app_url).render()
 
 # --- COMMENT TEMPLATES ---
 
-def get_comment_notification_template(ticket, commenter, recipient, comment, app_url):
-    title = "💬 Yeni Yorum Eklendi"
-    text = f"""Merhaba {recipient.full_name},
+COMMENT_NOTIFICATION = MailTemplate(
+    text="""Merhaba $recipient_name,
     
-"{ticket.title}" başlıklı talebinize {commenter.full_name} tarafından yeni bir yorum eklendi.
+"$ticket_title" başlıklı talebinize $commenter_name tarafından yeni bir yorum eklendi.
 
-Talep: {ticket.title}
-Yorum: {comment.content}
+Talep: $ticket_title
+Yorum: $comment
 
-Görüşmeleri görmek için: {app_url}/tickets/{ticket.id}
-"""
-    html_content = f"""
-        <p>Merhaba <strong>{recipient.full_name}</strong>,</p>
-        <p><strong>"{ticket.title}"</strong> başlıklı talebinize bir yorum eklendi.</p>
+Görüşmeleri görmek için: $ticket_url
+""",
+    html=get_html_wrapper("💬 Yeni Yorum Eklendi", f"""
+        <p>Merhaba <strong>$recipient_name</strong>,</p>
+        <p><strong>"$ticket_title"</strong> başlıklı talebinize bir yorum eklendi.</p>
         <div class="comment-box">
-            <p style="margin-bottom: 5px; font-weight: bold; color: #666;">{commenter.full_name} dedi ki:</p>
-            {comment.content}
+            <p style="margin-bottom: 5px; font-weight: bold; color: #666;">$commenter_name dedi ki:</p>
+            $comment
         </div>
         <p style="text-align: center;">
-            <a href="{app_url}/tickets/{ticket.id}" style="display:inline-block;margin:20px 0;padding:12px 30px;background-color:#10b981;color:#ffffff;text-decoration:none;border-radius:5px;font-weight:bold;" target="_blank">Mesajlara Git</a>
+            {_button("ticket_url", "#10b981", "Mesajlara Git")}
         </p>
-    """
-    return text, get_html_wrapper(title, html_content, "green")
+    """, "green")
+)
+
+def prepare_comment_notification(ticket, commenter, comment, app_url) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return COMMENT_NOTIFICATION.prepare(
+        ticket_title=ticket.title, commenter_name=commenter.full_name, comment=comment.content,
+        ticket_url=_ticket_url(ticket, app_url)
+    )
+
+def get_comment_notification_template(ticket, commenter, recipient, comment, app_url):
+    return prepare_comment_notification(ticket, commenter, comment, app_url).render(recipient_name=recipient.full_name)
 
 # --- UPDATE TEMPLATES ---
 
-def get_ticket_updated_template(ticket, updater, recipient, app_url, changes_desc):
-    title = "🔄 Talep Güncellendi"
-    text = f"""Merhaba {recipient.full_name},
+TICKET_UPDATED = MailTemplate(
+    text="""Merhaba $recipient_name,
     
-"{ticket.title}" başlıklı talebiniz {updater.full_name} tarafından güncellendi.
+"$ticket_title" başlıklı talebiniz $updater_name tarafından güncellendi.
 
-Güncelleme: {changes_desc}
-Durum: {ticket.status}
-Öncelik: {ticket.priority}
+Güncelleme: $changes
+Durum: $status
+Öncelik: $priority
 
-Talebi görüntüle: {app_url}/tickets/{ticket.id}
-"""
-    html_content = f"""
-        <p>Merhaba <strong>{recipient.full_name}</strong>,</p>
-        <p><strong>"{ticket.title}"</strong> başlıklı talebinizde bir güncelleme yapıldı.</p>
+Talebi görüntüle: $ticket_url
+""",
+    html=get_html_wrapper("🔄 Talep Güncellendi", f"""
+        <p>Merhaba <strong>$recipient_name</strong>,</p>
+        <p><strong>"$ticket_title"</strong> başlıklı talebinizde bir güncelleme yapıldı.</p>
         <div class="details">
-            <p><span class="label">👤 Güncelleyen:</span> {updater.full_name}</p>
-            <p><span class="label">📝 İşlem:</span> {changes_desc}</p>
-            <p><span class="label">🔔 Durum:</span> {ticket.status}</p>
+            <p><span class="label">👤 Güncelleyen:</span> $updater_name</p>
+            <p><span class="label">📝 İşlem:</span> $changes</p>
+            <p><span class="label">🔔 Durum:</span> $status</p>
         </div>
         <p style="text-align: center;">
-            <a href="{app_url}/tickets/{ticket.id}" style="display:inline-block;margin:20px 0;padding:12px 30px;background-color:#2563eb;color:#ffffff;text-decoration:none;border-radius:5px;font-weight:bold;" target="_blank">Talebi Görüntüle</a>
+            {_button("ticket_url", "#2563eb", "Talebi Görüntüle")}
         </p>
-    """
-    return text, get_html_wrapper(title, html_content, "blue")
+    """, "blue")
+)
+
+def prepare_ticket_updated(ticket, updater, app_url, changes_desc) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return TICKET_UPDATED.prepare(
+        ticket_title=ticket.title, updater_name=updater.full_name, changes=changes_desc, status=ticket.status,
+        priority=ticket.priority, ticket_url=_ticket_url(ticket, app_url)
+    )
+
+def get_ticket_updated_template(ticket, updater, recipient, app_url, changes_desc):
+    return prepare_ticket_updated(ticket, updater, app_url, changes_desc).render(recipient_name=recipient.full_name)
 
 # --- ATTACHMENT TEMPLATES ---
 
-def get_attachment_notification_template(ticket, uploader, recipient, attachment, app_url):
-    title = "📎 Dosya Eklendi"
-    text = f"""Merhaba {recipient.full_name},
+ATTACHMENT_NOTIFICATION = MailTemplate(
+    text="""Merhaba $recipient_name,
     
-"{ticket.title}" başlıklı talebinize {uploader.full_name} tarafından yeni bir dosya eklendi.
+"$ticket_title" başlıklı talebinize $uploader_name tarafından yeni bir dosya eklendi.
 
-Talebe git: {app_url}/tickets/{ticket.id}
-"""
-    html_content = f"""
-        <p>Merhaba <strong>{recipient.full_name}</strong>,</p>
-        <p><strong>"{ticket.title}"</strong> başlıklı talebinize yeni bir dosya eklendi.</p>
+Talebe git: $ticket_url
+""",
+    html=get_html_wrapper("📎 Dosya Eklendi", f"""
+        <p>Merhaba <strong>$recipient_name</strong>,</p>
+        <p><strong>"$ticket_title"</strong> başlıklı talebinize yeni bir dosya eklendi.</p>
         <div class="details orange">
-            <p><span class="label orange">👤 Yükleyen:</span> {uploader.full_name}</p>
-            <p><span class="label orange">📄 Dosya Adı:</span> {attachment.filename}</p>
+            <p><span class="label orange">👤 Yükleyen:</span> $uploader_name</p>
+            <p><span class="label orange">📄 Dosya Adı:</span> $filename</p>
         </div>
         <p style="text-align: center;">
-            <a href="{app_url}/tickets/{ticket.id}" style="display:inline-block;margin:20px 0;padding:12px 30px;background-color:#f59e0b;color:#ffffff;text-decoration:none;border-radius:5px;font-weight:bold;" target="_blank">Talebi Görüntüle</a>
+            {_button("ticket_url", "#f59e0b", "Talebi Görüntüle")}
         </p>
+    """, "orange")
+)
+
+def prepare_attachment_notification(ticket, uploader, attachment, app_url) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return ATTACHMENT_NOTIFICATION.prepare(
+        ticket_title=ticket.title, uploader_name=uploader.full_name, filename=attachment.filename,
+        ticket_url=_ticket_url(ticket, app_url)
+    )
+
+def get_attachment_notification_template(ticket, uploader, recipient, attachment, app_url):
+    return prepare_attachment_notification(ticket, uploader, attachment, app_url).render(recipient_name=recipient.full_name)
+
+# --- SYSTEM EMAILS (routers/system_settings.py send_*_email) ---
+
+def _standalone_page(heading, styles, content):
+    """Kendi stil bloğunu taşıyan tam sayfa e-posta iskeleti"""
+    return f"""<!DOCTYPE html>
+<html lang="tr">
+<head>
+    <meta charset="UTF-8">
+    <style>{styles}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h2>{heading}</h2>
+        </div>
+        <div class="content">{content}
+        </div>
+        <div class="footer">
+            <p>Bu otomatik olarak gönderilmiş bir bildirimdir. Lütfen yanıtlamayınız.</p>
+            <p style="margin: 5px 0;">Destek Sistemi</p>
+        </div>
+    </div>
+</body>
+</html>"""
+
+TICKET_CREATED_MAIL = MailTemplate(
+    text="""Destek Talebiniz Oluşturuldu
+
+Merhaba $recipient_name,
+
+"$ticket_title" başlıklı talep oluşturuldu.
+
+Talep Detayları:
+- Başlık: $ticket_title
+- Oluşturan: $creator_name
+- Departman: $department_name
+- Öncelik: $priority
+- Durum: $status
+
+Talebi görüntülemek için sisteme giriş yapabilirsiniz.
+
+Destek Sistemi""",
+    html=_standalone_page(
+        "🆕 Yeni Destek Talebi",
+        """
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #2563eb 0%, #1d4ed8 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+        .header h2 { margin: 0; font-size: 24px; }
+        .content { background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }
+        .details { background: white; padding: 15px; border-left: 4px solid #2563eb; margin: 15px 0; border-radius: 4px; }
+        .details p { margin: 8px 0; }
+        .label { font-weight: bold; color: #2563eb; }
+        .button { display: inline-block; margin: 20px 0; padding: 12px 30px; background: #2563eb; color: white; text-decoration: none; border-radius: 5px; }
+        .button:hover { background: #1d4ed8; }
+        .footer { margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }""",
+        """
+            <p>Merhaba <strong>$recipient_name</strong>,</p>
+            <p><strong>"$ticket_title"</strong> başlıklı bir talep oluşturuldu.</p>
+            <div class="details">
+                <p><span class="label">📋 Başlık:</span> $ticket_title</p>
+                <p><span class="label">👤 Oluşturan:</span> $creator_name</p>
+                <p><span class="label">🏢 Departman:</span> $department_name</p>
+                <p><span class="label">⚠️ Öncelik:</span> $priority</p>
+                <p><span class="label">🔔 Durum:</span> $status</p>
+            </div>
+            <p style="text-align: center;">
+                <a href="$ticket_url" class="button">Talebi Görüntüle</a>
+            </p>"""
+    )
+)
+
+TICKET_ASSIGNMENT_MAIL = MailTemplate(
+    text="""Destek Talebine Atandınız
+
+Merhaba $recipient_name,
+
+Size "$ticket_title" başlıklı bir destek talebine atanmışsınız.
+
+Talep Detayları:
+- Başlık: $ticket_title
+- Oluşturan: $creator_name
+- Departman: $department_name
+- Öncelik: $priority
+- Durum: $status
+
+Lütfen talebi kontrol etmek için sisteme giriş yapınız.
+
+Destek Sistemi""",
+    html=_standalone_page(
+        "📌 Destek Talebine Atandınız",
+        """
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+        .header h2 { margin: 0; font-size: 24px; }
+        .content { background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }
+        .details { background: white; padding: 15px; border-left: 4px solid #667eea; margin: 15px 0; border-radius: 4px; }
+        .details p { margin: 8px 0; }
+        .label { font-weight: bold; color: #667eea; }
+        .button { display: inline-block; margin: 20px 0; padding: 12px 30px; background: #667eea; color: white; text-decoration: none; border-radius: 5px; }
+        .button:hover { background: #764ba2; }
+        .footer { margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }""",
+        """
+            <p>Merhaba <strong>$recipient_name</strong>,</p>
+            <p>Size <strong>"$ticket_title"</strong> başlıklı bir destek talebine atanmışsınız.</p>
+            
+            <div class="details">
+                <p><span class="label">📋 Başlık:</span> $ticket_title</p>
+                <p><span class="label">👤 Oluşturan:</span> $creator_name</p>
+                <p><span class="label">🏢 Departman:</span> $department_name</p>
+                <p><span class="label">⚠️ Öncelik:</span> $priority</p>
+                <p><span class="label">🔔 Durum:</span> $status</p>
+            </div>
+            
+            <p style="text-align: center;">
+                <a href="$ticket_url" class="button">Talebi Görüntüle</a>
+            </p>"""
+    )
+)
+
+DEPARTMENT_TICKET_MAIL = MailTemplate(
+    text="""Biriminize Destek Talebi Açıldı
+
+Merhaba $recipient_name,
+
+Biriminiz "$ticket_title" başlıklı bir destek talebine sahip.
+
+Talep Detayları:
+- Başlık: $ticket_title
+- Oluşturan: $creator_name
+- Departman: $department_name
+- Öncelik: $priority
+- Durum: $status
+
+Talebi görüntülemek ve işlemek için sisteme giriş yapabilirsiniz.
+
+Destek Sistemi""",
+    html=_standalone_page(
+        "📢 Biriminize Talep Açıldı",
+        """
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+        .header h2 { margin: 0; font-size: 24px; }
+        .content { background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }
+        .details { background: white; padding: 15px; border-left: 4px solid #10b981; margin: 15px 0; border-radius: 4px; }
+        .details p { margin: 8px 0; }
+        .label { font-weight: bold; color: #10b981; }
+        .button { display: inline-block; margin: 20px 0; padding: 12px 30px; background: #10b981; color: white; text-decoration: none; border-radius: 5px; }
+        .button:hover { background: #059669; }
+        .footer { margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }""",
+        """
+            <p>Merhaba <strong>$recipient_name</strong>,</p>
+            <p>Biriminiz <strong>"$ticket_title"</strong> başlıklı bir destek talebine sahip.</p>
+            <div class="details">
+                <p><span class="label">📋 Başlık:</span> $ticket_title</p>
+                <p><span class="label">👤 Oluşturan:</span> $creator_name</p>
+                <p><span class="label">🏢 Departman:</span> $department_name</p>
+                <p><span class="label">⚠️ Öncelik:</span> $priority</p>
+                <p><span class="label">🔔 Durum:</span> $status</p>
+            </div>
+            <p style="text-align: center;">
+                <a href="$ticket_url" class="button">Talebi Görüntüle ve İşle</a>
+            </p>"""
+    )
+)
+
+COMMENT_MAIL = MailTemplate(
+    text="""Destek Talebinize Yorum Eklendi
+
+Merhaba $recipient_name,
+
+$commenter_name ($commenter_username) destek talebinize bir yorum ekledi:
+
+Talep: $ticket_title
+Yorum: $comment
+
+Detayları görmek için sisteme giriş yapınız.
+
+Destek Sistemi""",
+    html=_standalone_page(
+        "💬 Yorum Eklendi",
+        """
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+        .header h2 { margin: 0; font-size: 24px; }
+        .content { background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }
+        .comment-box { background: white; padding: 15px; border-left: 4px solid #10b981; margin: 15px 0; border-radius: 4px; }
+        .comment-author { font-weight: bold; color: #10b981; font-size: 14px; margin-bottom: 8px; }
+        .comment-text { color: #333; font-style: italic; }
+        .button { display: inline-block; margin: 20px 0; padding: 12px 30px; background: #10b981; color: white; text-decoration: none; border-radius: 5px; }
+        .button:hover { background: #059669; }
+        .footer { margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }""",
+        """
+            <p>Merhaba <strong>$recipient_name</strong>,</p>
+            <p><strong>$commenter_name</strong> destek talebinize yorum ekledi.</p>
+            
+            <div class="comment-box">
+                <p><span class="comment-author">📌 Talep: $ticket_title</span></p>
+                <p class="comment-text">💭 $comment</p>
+            </div>
+            
+            <p style="text-align: center;">
+                <a href="$ticket_url" class="button">Görüşmeleri Gör</a>
+            </p>"""
+    )
+)
+
+TICKET_UPDATED_MAIL = MailTemplate(
+    text="""
+    Merhaba $recipient_name,
+
+    $updater_name talebi $status durumuna aldı.
+
+    Talep: $ticket_title
+    Durum: $status
+    Öncelik: $priority
+    Atanan: $assignee_name
+
+    Detayları görmek için sisteme giriş yapınız.
+
+    Destek Sistemi
+    """,
+    html=_standalone_page(
+        "🔄 Destek Talebi Güncellendi",
+        """
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #2563eb 0%, #1e40af 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+        .header h2 { margin: 0; font-size: 24px; }
+        .content { background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }
+        .update-box { background: white; padding: 15px; border-left: 4px solid #2563eb; margin: 15px 0; border-radius: 4px; }
+        .update-item { margin: 8px 0; padding: 8px; }
+        .label { font-weight: bold; color: #2563eb; }
+        .button { display: inline-block; margin: 20px 0; padding: 12px 30px; background: #2563eb; color: white; text-decoration: none; border-radius: 5px; }
+        .button:hover { background: #1e40af; }
+        .footer { margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }""",
+        """
+            <p>Merhaba <strong>$recipient_name</strong>,</p>
+            <p><strong>$updater_name</strong> talebi <strong>$status</strong> durumuna aldı.</p>
+            <div class="update-box">
+                <div class="update-item">
+                    <span class="label">📋 Talep:</span> $ticket_title
+                </div>
+                <div class="update-item">
+                    <span class="label">🔔 Durum:</span> $status
+                </div>
+                <div class="update-item">
+                    <span class="label">⚠️ Öncelik:</span> $priority
+                </div>
+                <div class="update-item">
+                    <span class="label">👤 Atanan:</span> $assignee_name
+                </div>
+            </div>
+            <p style="text-align: center;">
+                <a href="$ticket_url" class="button">Detayları Görüntüle</a>
+            </p>"""
+    )
+)
+
+ATTACHMENT_MAIL = MailTemplate(
+    text="""Destek Talebine Dosya Eklendi
+
+Merhaba $recipient_name,
+
+$uploader_name ($uploader_username) destek talebine bir dosya ekledi:
+
+Talep: $ticket_title
+Dosya: $filename
+
+Detayları görmek için sisteme giriş yapınız.
+
+Destek Sistemi""",
+    html=_standalone_page(
+        "📎 Dosya Eklendi",
+        """
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+        .header h2 { margin: 0; font-size: 24px; }
+        .content { background: #f8f9fa; padding: 20px; border: 1px solid #e0e0e0; border-radius: 0 0 8px 8px; }
+        .file-box { background: white; padding: 15px; border-left: 4px solid #f59e0b; margin: 15px 0; border-radius: 4px; }
+        .file-info { margin: 8px 0; }
+        .label { font-weight: bold; color: #f59e0b; }
+        .filename { background: #fffbeb; padding: 10px; border-radius: 4px; font-family: monospace; word-break: break-all; }
+        .button { display: inline-block; margin: 20px 0; padding: 12px 30px; background: #f59e0b; color: white; text-decoration: none; border-radius: 5px; }
+        .button:hover { background: #d97706; }
+        .footer { margin-top: 20px; padding-top: 15px; border-top: 1px solid #ddd; font-size: 12px; color: #666; text-align: center; }""",
+        """
+            <p>Merhaba <strong>$recipient_name</strong>,</p>
+            
+            <div class="file-box">
+                <div class="file-info">
+                    <span class="label">📌 Talep:</span> $ticket_title
+                </div>
+                <div class="file-info" style="margin-top: 15px;">
+                    <span class="label">📄 Dosya Adı:</span><br/>
+                    <span class="filename">$filename</span>
+                </div>
+            </div>
+            
+            <p style="text-align: center;">
+                <a href="$ticket_url" class="button">Detayları Görüntüle</a>
+            </p>"""
+    )
+)
+
+def _ticket_details(ticket, base_url):
+    return {
+        "ticket_title": ticket.title,
+        "ticket_url": _ticket_url(ticket, base_url),
+        "creator_name": ticket.creator.full_name if ticket.creator else 'Bilinmiyor',
+        "department_name": _department_name(ticket),
+        "priority": translate_priority(ticket.priority or 'medium'),
+        "status": translate_status(ticket.status),
+    }
+
+def prepare_ticket_created_mail(ticket, base_url) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return TICKET_CREATED_MAIL.prepare(**_ticket_details(ticket, base_url))
+
+def prepare_ticket_assignment_mail(ticket, base_url) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return TICKET_ASSIGNMENT_MAIL.prepare(**_ticket_details(ticket, base_url))
+
+def prepare_department_ticket_mail(ticket, base_url) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return DEPARTMENT_TICKET_MAIL.prepare(**_ticket_details(ticket, base_url))
+
+def prepare_comment_mail(ticket, commenter, comment, base_url) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return COMMENT_MAIL.prepare(
+        ticket_title=ticket.title, ticket_url=_ticket_url(ticket, base_url), commenter_name=commenter.full_name,
+        commenter_username=commenter.username, comment=comment.content
+    )
+
+def prepare_ticket_updated_mail(ticket, updater, base_url) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return TICKET_UPDATED_MAIL.prepare(
+        ticket_title=ticket.title, ticket_url=_ticket_url(ticket, base_url), updater_name=updater.full_name,
+        status=translate_status(ticket.status), priority=translate_priority(ticket.priority),
+        assignee_name=ticket.assignee.full_name if ticket.assignee else 'Atama yok'
+    )
+
+def prepare_attachment_mail(ticket, attachment, uploader, base_url) -> PreparedMail:
+    """Alıcı başına: recipient_name"""
+    return ATTACHMENT_MAIL.prepare(
+        ticket_title=ticket.title, ticket_url=_ticket_url(ticket, base_url), uploader_name=uploader.full_name,
+        uploader_username=uploader.username, filename=attachment.filename
+    )
+
+# --- DIGEST TEMPLATES ---
+
+def get_digest_template(recipient, groups, app_url, period_label=None):
     """
-    return text, get_html_wrapper(title, html_content, "orange")
+    Birden fazla bildirimi tek e-postada toplar.
+    groups: [{"ticket_id", "ticket_title", "events": [(başlık, mesaj, zaman), ...]}, ...]
+    period_label: "Saatlik" / "Günlük" özetler için, None ise tek talebin birleştirilmiş bildirimi
+    """
+    event_count = sum(len(group["events"]) for group in groups)
+    if period_label:
+        title = f"📬 {period_label} Bildirim Özeti"
+        intro = f"Son dönemde {len(groups)} talepte {event_count} yeni bildiriminiz var."
+    else:
+        title = "📬 Talep Hareketleri"
+        intro = f"<strong>\"{groups[0]['ticket_title']}\"</strong> başlıklı talepte {event_count} yeni hareket var."
+
+    text_parts = [f"Merhaba {recipient.full_name},", "", intro.replace("<strong>", "").replace("</strong>", ""), ""]
+    html_parts = [f"<p>Merhaba <strong>{recipient.full_name}</strong>,</p>", f"<p>{intro}</p>"]
+    for group in groups:
+        ticket_url = f"{app_url}/tickets/{group['ticket_id']}"
+        text_parts.append(f"Talep: {group['ticket_title']}")
+        event_lines = []
+        for event_title, event_message, event_time in group["events"]:
+            time_text = event_time.strftime('%H:%M') if event_time else ""
+            text_parts.append(f"  - [{time_text}] {event_title}: {event_message}")
+            event_lines.append(f"<p>🕒 {time_text} &nbsp; <strong>{event_title}</strong> - {event_message}</p>")
+        text_parts.append(f"  Talebi görüntüle: {ticket_url}")
+        text_parts.append("")
+        html_parts.append(f"""
+        <div class="details">
+            <p><span class="label">📌 Talep:</span> <a href="{ticket_url}" target="_blank">{group['ticket_title']}</a></p>
+            {''.join(event_lines)}
+        </div>""")
+
+    if not period_label:
+        html_parts.append(f"""
+        <p style="text-align: center;">
+            <a href="{app_url}/tickets/{groups[0]['ticket_id']}" style="display:inline-block;margin:20px 0;padding:12px 30px;background-color:#2563eb;color:#ffffff;text-decoration:none;border-radius:5px;font-weight:bold;" target="_blank">Talebi Görüntüle</a>
+        </p>""")
+
+    return "\n".join(text_parts), get_html_wrapper(title, "\n".join(html_parts), "blue")
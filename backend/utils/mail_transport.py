@@ -0,0 +1,305 @@
+"""
+SMTP Gönderim Katmanı
+Kimliği doğrulanmış SMTP bağlantılarını havuzda tutar ve tekrar kullanır.
+
+- Her e-posta için yeni TLS el sıkışması ve login yapılmaz; bağlantı havuzdan alınır
+- Uzun süre boşta kalan bağlantı kullanılmadan önce NOOP ile kontrol edilir
+- Kopmuş bağlantı atılır, gönderim yeni bağlantıyla bir kez tekrarlanır
+- SMTP ayarları (EmailConfig) bellekte tutulur; en fazla SMTP_CONFIG_CHECK_SECONDS
+  saniyede bir sadece updated_at okunarak değişiklik kontrol edilir
+- Birden fazla alıcı/mesaj tek oturumda gönderilir (send_many)
+- E-posta ayarlarını yazan endpoint'ler commit sonrası reload_mail_transport() çağırır
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.message import Message
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+logger = logging.getLogger("uvicorn")
+
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "10"))
+# Bu süreden uzun boşta kalan bağlantı NOOP ile kontrol edilir
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "30"))
+# Sunucular uzun oturumları kapatır; bu süreden eski bağlantılar yenilenir
+SMTP_CONNECTION_MAX_AGE_SECONDS = float(os.getenv("SMTP_CONNECTION_MAX_AGE_SECONDS", "300"))
+SMTP_CONFIG_CHECK_SECONDS = float(os.getenv("SMTP_CONFIG_CHECK_SECONDS", "10"))
+
+# Bağlantının koptuğunu gösteren hatalar (yeni bağlantıyla tekrar denenir)
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError, OSError)
+# Sadece ilgili mesajı etkileyen sunucu redleri
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class SmtpSettings(NamedTuple):
+    """EmailConfig'in değiştirilemez kopyası"""
+    smtp_server: Optional[str]
+    smtp_port: int
+    smtp_username: Optional[str]
+    smtp_password: Optional[str]
+    smtp_use_tls: bool
+    from_email: Optional[str]
+    from_name: Optional[str]
+
+    @classmethod
+    def from_model(cls, config: models.EmailConfig) -> "SmtpSettings":
+        return cls(
+            smtp_server=config.smtp_server,
+            smtp_port=config.smtp_port or 587,
+            smtp_username=config.smtp_username,
+            smtp_password=config.smtp_password,
+            smtp_use_tls=config.smtp_use_tls if config.smtp_use_tls is not None else True,
+            from_email=config.from_email,
+            from_name=config.from_name,
+        )
+
+    @property
+    def is_complete(self) -> bool:
+        return bool(self.smtp_server and self.from_email)
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "created_at", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class SmtpConnectionPool:
+    """Tek bir SMTP ayarı için sınırlı sayıda açık bağlantı"""
+
+    def __init__(self, settings: SmtpSettings, max_size: int = SMTP_POOL_SIZE):
+        self.settings = settings
+        self.max_size = max_size
+        self._idle: Deque[_PooledConnection] = deque()
+        self._lock = threading.Lock()
+        # Aynı anda en fazla max_size bağlantı açık olabilir (fazlası bekler)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    def _connect(self) -> _PooledConnection:
+        settings = self.settings
+        # 465: doğrudan SSL, diğer portlar: STARTTLS (smtp_use_tls açıksa)
+        if settings.smtp_port == 465:
+            smtp = smtplib.SMTP_SSL(settings.smtp_server, settings.smtp_port, timeout=SMTP_TIMEOUT_SECONDS)
+        else:
+            smtp = smtplib.SMTP(settings.smtp_server, settings.smtp_port, timeout=SMTP_TIMEOUT_SECONDS)
+            if settings.smtp_use_tls:
+                smtp.starttls()
+        try:
+            if settings.smtp_username and settings.smtp_password:
+                smtp.login(settings.smtp_username, settings.smtp_password)
+        except BaseException:
+            _close_quietly(smtp)
+            raise
+        logger.info(f"SMTP bağlantısı açıldı: {settings.smtp_server}:{settings.smtp_port}")
+        return _PooledConnection(smtp)
+
+    def _is_usable(self, conn: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if now - conn.created_at > SMTP_CONNECTION_MAX_AGE_SECONDS:
+            return False
+        if now - conn.last_used > SMTP_IDLE_CHECK_SECONDS:
+            try:
+                code, _ = conn.smtp.noop()
+                return code == 250
+            except _CONNECTION_ERRORS + (smtplib.SMTPException,):
+                return False
+        return True
+
+    def _checkout(self) -> _PooledConnection:
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            if self._is_usable(conn):
+                return conn
+            _close_quietly(conn.smtp)
+
+    @contextmanager
+    def connection(self):
+        """Havuzdan bağlantı al; blok hatasız biterse bağlantı havuza döner"""
+        if not self._slots.acquire(timeout=SMTP_TIMEOUT_SECONDS * 3):
+            raise smtplib.SMTPException("SMTP bağlantı havuzu dolu")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn.smtp
+        except BaseException:
+            # Hatalı oturumun durumu belirsiz; bağlantı kapatılır
+            if conn is not None:
+                _close_quietly(conn.smtp)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                conn.last_used = time.monotonic()
+                with self._lock:
+                    if self._closed:
+                        _close_quietly(conn.smtp)
+                    else:
+                        self._idle.append(conn)
+            self._slots.release()
+
+    def close(self):
+        """Boştaki bağlantıları kapat; kullanımdakiler iade edildiğinde kapanır"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            _close_quietly(conn.smtp, quit=True)
+
+
+class MailTransport:
+    """Süreç genelinde SMTP ayarları ve bağlantı havuzu"""
+
+    def __init__(self, check_interval: float = SMTP_CONFIG_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._settings: Optional[SmtpSettings] = None
+        self._stamp: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._pool: Optional[SmtpConnectionPool] = None
+
+    def get_settings(self, db: Optional[Session] = None) -> Optional[SmtpSettings]:
+        """Geçerli SMTP ayarları (EmailConfig yoksa None)"""
+        now = time.monotonic()
+        if self._stamp is not None and now - self._checked_at < self.check_interval:
+            return self._settings
+        with _session(db) as session:
+            stamp = session.query(models.EmailConfig.id, models.EmailConfig.updated_at).order_by(
+                models.EmailConfig.id
+            ).first()
+            stamp = tuple(stamp) if stamp else ()
+            if stamp != self._stamp:
+                self._load(session)
+            else:
+                self._checked_at = now
+        return self._settings
+
+    def _load(self, db: Session):
+        config = db.query(models.EmailConfig).order_by(models.EmailConfig.id).first()
+        settings = SmtpSettings.from_model(config) if config else None
+        stamp = (config.id, config.updated_at) if config else ()
+        with self._lock:
+            old_pool = None
+            if settings != self._settings:
+                old_pool, self._pool = self._pool, None
+            self._settings = settings
+            self._stamp = stamp
+            self._checked_at = time.monotonic()
+        if old_pool is not None:
+            old_pool.close()
+            logger.info("SMTP ayarları değişti, bağlantı havuzu yenilendi")
+
+    def reload(self, db: Optional[Session] = None):
+        """Ayarları veritabanından hemen yeniden oku (değiştiyse havuzu kapat)"""
+        with _session(db) as session:
+            self._load(session)
+
+    def _get_pool(self, settings: SmtpSettings) -> SmtpConnectionPool:
+        with self._lock:
+            if self._pool is None or self._pool.settings != settings:
+                if self._pool is not None:
+                    self._pool.close()
+                self._pool = SmtpConnectionPool(settings)
+            return self._pool
+
+    def send(self, msg: Message, to_addrs: Sequence[str], db: Optional[Session] = None) -> Dict[str, tuple]:
+        """
+        Tek mesajı verilen alıcılara gönder (tüm alıcılar tek SMTP işleminde).
+        Reddedilen alıcıları {adres: (kod, mesaj)} olarak döndürür; hiçbir alıcı kabul edilmezse hata fırlatır.
+        """
+        result = self.send_many([(msg, to_addrs)], db)[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def send_many(self, messages: Iterable[Tuple[Message, Sequence[str]]],
+                  db: Optional[Session] = None) -> List[Union[Dict[str, tuple], smtplib.SMTPException]]:
+        """
+        Mesajları tek SMTP oturumunda sırayla gönder.
+        Her mesaj için reddedilen alıcılar veya (sunucu mesajı reddettiyse) hata nesnesi döner;
+        bir mesajın reddedilmesi diğerlerini etkilemez.
+        Bağlantı koparsa kalan mesajlar yeni bağlantıyla bir kez daha denenir.
+        """
+        settings = self.get_settings(db)
+        if not settings or not settings.is_complete:
+            raise smtplib.SMTPException("E-posta yapılandırması eksik (Sunucu veya Gönderen adresi yok)")
+
+        pending = [(msg, list(to_addrs)) for msg, to_addrs in messages]
+        results: List[Union[Dict[str, tuple], smtplib.SMTPException]] = []
+        retried = False
+        while len(results) < len(pending):
+            pool = self._get_pool(settings)
+            try:
+                with pool.connection() as smtp:
+                    for msg, to_addrs in pending[len(results):]:
+                        try:
+                            results.append(smtp.send_message(msg, from_addr=settings.from_email, to_addrs=to_addrs))
+                        except _MESSAGE_ERRORS as e:
+                            # smtplib işlemi RSET ile sıfırlar; oturum sonraki mesaj için kullanılabilir
+                            results.append(e)
+            except _CONNECTION_ERRORS:
+                if retried:
+                    raise
+                retried = True
+                logger.warning("SMTP bağlantısı koptu, yeni bağlantıyla tekrar deneniyor")
+        return results
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+
+
+@contextmanager
+def _session(db: Optional[Session]):
+    if db is not None:
+        yield db
+        return
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _close_quietly(smtp: smtplib.SMTP, quit: bool = False):
+    try:
+        if quit:
+            smtp.quit()
+        else:
+            smtp.close()
+    except Exception:
+        pass
+
+
+mail_transport = MailTransport()
+
+
+def get_mail_settings(db: Optional[Session] = None) -> Optional[SmtpSettings]:
+    return mail_transport.get_settings(db)
+
+
+def send_mail(msg: Message, to_addrs: Sequence[str], db: Optional[Session] = None) -> Dict[str, tuple]:
+    return mail_transport.send(msg, to_addrs, db)
+
+
+def reload_mail_transport(db: Optional[Session] = None):
+    mail_transport.reload(db)
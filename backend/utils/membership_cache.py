@@ -0,0 +1,67 @@
+"""
+Kullanıcı Birim Üyeliği Önbelleği
+Kullanıcı ID -> birim ID kümesi eşlemesini süreç içinde (TTL + LRU) saklar.
+
+Her talep endpoint'inin yetki kontrolü user.departments ve user.managed_departments
+ilişkilerini tekrar tekrar yüklemek yerine bu önbelleği kullanır.
+Üyelik değiştiğinde (kullanıcı/birim güncelleme, LDAP senkronizasyonu) açıkça temizlenir.
+Birden fazla worker varsa diğer worker'lardaki kayıtlar en geç TTL süresi sonunda yenilenir.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, Optional
+
+MEMBERSHIP_CACHE_TTL_SECONDS = int(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "60"))
+MEMBERSHIP_CACHE_MAX_ENTRIES = int(os.getenv("MEMBERSHIP_CACHE_MAX_ENTRIES", "5000"))
+
+
+class MembershipCache:
+    """Thread-safe TTL + LRU önbellek"""
+
+    def __init__(self, ttl_seconds: int = MEMBERSHIP_CACHE_TTL_SECONDS, max_entries: int = MEMBERSHIP_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[FrozenSet[int]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, department_ids = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            # LRU: son kullanılanı sona taşı
+            self._entries.move_to_end(user_id)
+            return department_ids
+
+    def set(self, user_id: int, department_ids: Iterable[int]) -> FrozenSet[int]:
+        value = frozenset(department_ids)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Tek kullanıcının (veya user_id verilmezse herkesin) kaydını sil"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+# Süreç genelinde tek önbellek
+membership_cache = MembershipCache()
+
+
+def invalidate_user_memberships(user_id: Optional[int] = None):
+    """Üyelik değişikliklerinden sonra çağrılır (user_id yoksa tüm önbellek temizlenir)"""
+    membership_cache.invalidate(user_id)
@@ -0,0 +1,296 @@
+"""
+Bildirim E-postası Birleştirme (Digest)
+Kısa sürede aynı talepte art arda gelen olaylar (güncelleme, ek, yorum) için
+her olayda ayrı e-posta yerine tek özet e-posta gönderilir.
+
+- digest_mode = immediate: talepteki ilk olay hemen gönderilir; sonraki
+  NOTIFICATION_COALESCE_SECONDS içinde gelen olaylar toplanıp pencere sonunda tek e-postada gider
+- digest_mode = hourly / daily: talep bildirimleri saat başında / her gün
+  NOTIFICATION_DAILY_DIGEST_HOUR'da (İstanbul saati) tek özet e-postasında gönderilir
+- Sadece talep bildirimleri birleştirilir; diğer türler (wiki vb.) her zaman hemen gönderilir
+- Bekleyen e-postalar flush_due_digests() ile gönderilir: outbox worker'ı açıksa worker,
+  değilse API sürecindeki run_digest_flusher() döngüsü çağırır. Worker özetleri her zaman outbox'a
+  ekler; API sürecinde kayıtlar sadece gönderim başarılıysa gönderilmiş işaretlenir
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pytz
+from sqlalchemy import case, func, insert, tuple_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import models
+import schemas
+from database import SessionLocal
+
+logger = logging.getLogger("uvicorn")
+
+# 0: birleştirme kapalı (her olay ayrı e-posta)
+NOTIFICATION_COALESCE_SECONDS = int(os.getenv("NOTIFICATION_COALESCE_SECONDS", "120"))
+NOTIFICATION_DAILY_DIGEST_HOUR = int(os.getenv("NOTIFICATION_DAILY_DIGEST_HOUR", "8"))
+DIGEST_FLUSH_INTERVAL_SECONDS = int(os.getenv("DIGEST_FLUSH_INTERVAL_SECONDS", "30"))
+# Gönderilmiş kayıtlar pencere kontrolü için kısa süre tutulur
+DIGEST_SENT_RETENTION_HOURS = 24
+
+MODE_IMMEDIATE = schemas.DigestModeEnum.IMMEDIATE.value
+MODE_HOURLY = schemas.DigestModeEnum.HOURLY.value
+MODE_DAILY = schemas.DigestModeEnum.DAILY.value
+
+_COALESCED_TYPES = {
+    schemas.NotificationTypeEnum.TICKET_CREATED.value,
+    schemas.NotificationTypeEnum.TICKET_UPDATED.value,
+    schemas.NotificationTypeEnum.TICKET_ASSIGNED.value,
+    schemas.NotificationTypeEnum.TICKET_COMMENTED.value,
+}
+
+_PERIOD_LABELS = {MODE_HOURLY: "Saatlik", MODE_DAILY: "Günlük"}
+
+_istanbul_tz = pytz.timezone('Europe/Istanbul')
+
+# (kullanıcı id, e-posta, başlık, mesaj, özel e-posta metni, özel e-posta HTML'i)
+EmailTuple = Tuple[int, str, str, str, Optional[str], Optional[str]]
+
+
+def digest_mode(settings: models.NotificationSettings) -> str:
+    return getattr(settings, "digest_mode", None) or MODE_IMMEDIATE
+
+
+def is_coalesced(settings: models.NotificationSettings, notification_type) -> bool:
+    """Bu bildirimin e-postası birleştirilerek mi gönderilecek?"""
+    if getattr(notification_type, "value", notification_type) not in _COALESCED_TYPES:
+        return False
+    return digest_mode(settings) != MODE_IMMEDIATE or NOTIFICATION_COALESCE_SECONDS > 0
+
+
+def next_delivery_time(mode: str, now: Optional[datetime] = None) -> datetime:
+    """Saatlik/günlük özet için sıradaki gönderim zamanı (naive UTC)"""
+    now = now or datetime.utcnow()
+    if mode == MODE_HOURLY:
+        return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    local_now = pytz.utc.localize(now).astimezone(_istanbul_tz)
+    target = _istanbul_tz.localize(
+        local_now.replace(tzinfo=None, hour=NOTIFICATION_DAILY_DIGEST_HOUR, minute=0, second=0, microsecond=0)
+    )
+    if target <= local_now:
+        target = _istanbul_tz.normalize(target + timedelta(days=1))
+    return target.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def _coalesce_key(mode: str, related_id: Optional[int]) -> str:
+    if mode == MODE_IMMEDIATE:
+        return f"ticket:{related_id}"
+    return f"digest:{mode}"
+
+
+def schedule_emails(
+    db: Session,
+    settings_by_user: Dict[int, models.NotificationSettings],
+    emails: Sequence[EmailTuple],
+    notification_type,
+    related_id: Optional[int]
+) -> List[EmailTuple]:
+    """
+    Birleştirilecek e-postaları notification_digest_items'a ekler (commit çağırana aittir).
+    Hemen gönderilmesi gereken e-postaları döndürür.
+    Bekleyen grupları tek sorguda okur; alıcı sayısından bağımsızdır.
+    """
+    type_value = getattr(notification_type, "value", notification_type)
+    now = datetime.utcnow()
+    window = timedelta(seconds=NOTIFICATION_COALESCE_SECONDS)
+
+    immediate: List[EmailTuple] = []
+    planned = []
+    for email in emails:
+        settings = settings_by_user.get(email[0])
+        if settings is None or not is_coalesced(settings, notification_type):
+            immediate.append(email)
+            continue
+        mode = digest_mode(settings)
+        planned.append((email, mode, _coalesce_key(mode, related_id)))
+
+    if not planned:
+        return immediate
+
+    # Pencere içindeki talep grupları: bekleyen grubun gönderim zamanı ve son gönderim zamanı
+    ticket_keys = {(email[0], key) for email, mode, key in planned if mode == MODE_IMMEDIATE}
+    groups = {}
+    if ticket_keys:
+        item = models.NotificationDigestItem
+        rows = db.query(
+            item.user_id,
+            item.coalesce_key,
+            func.min(case((item.sent_at.is_(None), item.deliver_after))),
+            func.max(item.sent_at)
+        ).filter(
+            item.user_id.in_({user_id for user_id, _ in ticket_keys}),
+            item.coalesce_key.in_({key for _, key in ticket_keys}),
+            (item.sent_at.is_(None)) | (item.sent_at > now - window)
+        ).group_by(item.user_id, item.coalesce_key).all()
+        groups = {(user_id, key): (pending_at, last_sent) for user_id, key, pending_at, last_sent in rows}
+
+    items = []
+    for email, mode, key in planned:
+        user_id, recipient_email, title, message, custom_body, custom_html = email
+        sent_at = None
+        if mode == MODE_IMMEDIATE:
+            pending_at, last_sent = groups.get((user_id, key), (None, None))
+            if pending_at is not None:
+                deliver_after = pending_at
+            elif last_sent is not None:
+                # Pencere içinde e-posta gitti; bu olay pencere sonunda gidecek grubu başlatır
+                deliver_after = last_sent + window
+            else:
+                # İlk olay beklemeden gider; pencereyi başlatmak için gönderilmiş olarak kaydedilir
+                deliver_after = sent_at = now
+                immediate.append(email)
+            groups[(user_id, key)] = (None if sent_at else deliver_after, sent_at or last_sent)
+        else:
+            deliver_after = next_delivery_time(mode, now)
+
+        items.append({
+            "user_id": user_id,
+            "coalesce_key": key,
+            "recipient_email": recipient_email,
+            "notification_type": type_value,
+            "related_id": related_id,
+            "title": title,
+            "message": message,
+            "email_body": custom_body,
+            "email_html": custom_html,
+            "created_at": now,
+            "deliver_after": deliver_after,
+            "sent_at": sent_at,
+        })
+    db.execute(insert(models.NotificationDigestItem), items)
+    return immediate
+
+
+def flush_due_digests(db: Session, use_outbox: Optional[bool] = None) -> int:
+    """
+    Gönderim zamanı gelen grupları tek e-posta olarak gönderir. Gönderilen e-posta sayısını döndürür.
+    Kayıtlar FOR UPDATE SKIP LOCKED ile alınır; birden fazla süreç aynı grubu iki kez göndermez.
+    use_outbox: e-postalar outbox'a sent_at ile aynı transaction'da eklenir (None: NOTIFICATION_OUTBOX_ENABLED).
+    Outbox kullanılmıyorsa grup sadece gönderim başarılıysa gönderilmiş işaretlenir; başarısız grup
+    sonraki turda tekrar denenir.
+    """
+    from utils import mail_templates
+    from utils.notifications import APPLICATION_URL, send_email_notification
+    from utils.outbox import NOTIFICATION_OUTBOX_ENABLED, enqueue_email
+
+    item = models.NotificationDigestItem
+    now = datetime.utcnow()
+
+    due_groups = db.query(item.user_id, item.coalesce_key).filter(
+        item.sent_at.is_(None)
+    ).group_by(item.user_id, item.coalesce_key).having(func.min(item.deliver_after) <= now).all()
+
+    # Eski gönderilmiş kayıtları temizle
+    db.query(item).filter(
+        item.sent_at < now - timedelta(hours=DIGEST_SENT_RETENTION_HOURS)
+    ).delete(synchronize_session=False)
+
+    if not due_groups:
+        db.commit()
+        return 0
+
+    items = db.query(item).filter(
+        item.sent_at.is_(None),
+        tuple_(item.user_id, item.coalesce_key).in_([tuple(group) for group in due_groups])
+    ).order_by(item.created_at, item.id).with_for_update(skip_locked=True).all()
+
+    grouped: Dict[Tuple[int, str], List[models.NotificationDigestItem]] = OrderedDict()
+    for digest_item in items:
+        grouped.setdefault((digest_item.user_id, digest_item.coalesce_key), []).append(digest_item)
+
+    users = {
+        user.id: user for user in db.query(models.User).filter(
+            models.User.id.in_({user_id for user_id, _ in grouped})
+        ).all()
+    }
+    ticket_titles = dict(db.query(models.Ticket.id, models.Ticket.title).filter(
+        models.Ticket.id.in_({digest_item.related_id for digest_item in items if digest_item.related_id})
+    ).all())
+
+    emails = []
+    for (user_id, key), group_items in grouped.items():
+        last = group_items[-1]
+        if len(group_items) == 1 and last.email_body and last.email_html:
+            # Tek olay: özgün bildirim şablonu
+            emails.append((group_items, (last.recipient_email, last.title, last.message, last.notification_type,
+                                         last.related_id, last.email_body, last.email_html)))
+            continue
+
+        by_ticket: Dict[int, dict] = OrderedDict()
+        for digest_item in group_items:
+            group = by_ticket.setdefault(digest_item.related_id, {
+                "ticket_id": digest_item.related_id,
+                "ticket_title": ticket_titles.get(digest_item.related_id, f"#{digest_item.related_id}"),
+                "events": []
+            })
+            event_time = pytz.utc.localize(digest_item.created_at).astimezone(_istanbul_tz) if digest_item.created_at else None
+            group["events"].append((digest_item.title, digest_item.message, event_time))
+
+        mode = key.split(":", 1)[1] if key.startswith("digest:") else None
+        period_label = _PERIOD_LABELS.get(mode)
+        if period_label:
+            subject = f"{period_label} bildirim özeti ({len(group_items)} bildirim)"
+            related_id = None
+        else:
+            subject = f"{by_ticket[last.related_id]['ticket_title']} - {len(group_items)} yeni hareket"
+            related_id = last.related_id
+        summary = "; ".join(digest_item.title for digest_item in group_items)
+        text_content, html_content = mail_templates.get_digest_template(
+            users[user_id], list(by_ticket.values()), APPLICATION_URL, period_label
+        )
+        emails.append((group_items, (last.recipient_email, subject, summary, last.notification_type,
+                                     related_id, text_content, html_content)))
+
+    if use_outbox is None:
+        use_outbox = NOTIFICATION_OUTBOX_ENABLED
+    sent = sent_items = 0
+    for group_items, (recipient_email, subject, message, type_value, related_id, body, html) in emails:
+        if use_outbox:
+            enqueue_email(db, recipient_email, subject, message, type_value, related_id, body, html)
+        else:
+            try:
+                send_email_notification(
+                    db, recipient_email, subject, message,
+                    schemas.NotificationTypeEnum(type_value), related_id, body, html, raise_errors=True
+                )
+            except Exception:
+                # Hata loglandı; kayıtlar bekliyor olarak kalır, sonraki turda tekrar denenir
+                continue
+        for digest_item in group_items:
+            digest_item.sent_at = now
+        sent += 1
+        sent_items += len(group_items)
+    db.commit()
+
+    if sent:
+        logger.info(f"{sent_items} bildirim {sent} özet e-postasında birleştirildi")
+    return sent
+
+
+def _flush_once():
+    db = SessionLocal()
+    try:
+        flush_due_digests(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Bildirim özeti gönderimi başarısız: {e}")
+    finally:
+        db.close()
+
+
+async def run_digest_flusher():
+    """Outbox worker'ı yokken bekleyen özet e-postalarını periyodik olarak gönderir"""
+    logger.info("Bildirim özeti gönderici başlatıldı")
+    while True:
+        await asyncio.sleep(DIGEST_FLUSH_INTERVAL_SECONDS)
+        await run_in_threadpool(_flush_once)
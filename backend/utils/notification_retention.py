@@ -0,0 +1,257 @@
+"""
+Bildirim Saklama (Retention) ve Okunmamış Sayaçları
+
+Arşivleme:
+- NOTIFICATION_RETENTION_DAYS'ten eski okunmuş bildirimler notifications_archive tablosuna taşınır
+- NOTIFICATION_UNREAD_RETENTION_DAYS'ten eski okunmamış bildirimler de taşınır (0: taşınmaz)
+- Arşivdeki kayıtlar NOTIFICATION_ARCHIVE_RETENTION_DAYS sonra silinir (0: silinmez)
+- Taşıma NOTIFICATION_RETENTION_BATCH_SIZE'lık parçalarla, her parça ayrı transaction'da yapılır;
+  uzun kilit ve büyük WAL patlaması olmaz
+- Birden fazla süreç aynı anda çalıştırsa da advisory lock ile tek süreç iş yapar
+- Outbox worker'ı varsa o, yoksa API sürecindeki run_retention_loop() çalıştırır
+
+Okunmamış sayaçları (PostgreSQL):
+- notification_unread_counters tablosu notifications üzerindeki statement-level tetikleyicilerle
+  (transition table) güncellenir; toplu INSERT/UPDATE tek upsert ile yansır
+- unread-count endpoint'i COUNT(*) yerine tek satır okur
+- Tetikleyici yoksa (SQLite, kurulum öncesi) COUNT(*) kullanılır
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, literal, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import models
+from database import SessionLocal
+
+logger = logging.getLogger("uvicorn")
+
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+NOTIFICATION_UNREAD_RETENTION_DAYS = int(os.getenv("NOTIFICATION_UNREAD_RETENTION_DAYS", "365"))
+NOTIFICATION_ARCHIVE_RETENTION_DAYS = int(os.getenv("NOTIFICATION_ARCHIVE_RETENTION_DAYS", "730"))
+NOTIFICATION_RETENTION_BATCH_SIZE = int(os.getenv("NOTIFICATION_RETENTION_BATCH_SIZE", "5000"))
+NOTIFICATION_RETENTION_INTERVAL_HOURS = float(os.getenv("NOTIFICATION_RETENTION_INTERVAL_HOURS", "6"))
+# Parçalar arasında kısa bekleme: canlı trafiğe I/O bırakır
+_BATCH_PAUSE_SECONDS = 0.2
+# pg_try_advisory_lock anahtarı (sabit, uygulama genelinde tekil)
+_RETENTION_LOCK_KEY = 7_401_018
+
+_COUNTER_TRIGGER = "notifications_unread_counter"
+
+# Pozitif farklar upsert edilir; negatif farklar sadece mevcut satırı günceller
+# (kullanıcı silinirken CASCADE ile giden bildirimler için satır yeniden oluşturulmaz)
+_COUNTER_APPLY_SQL = """
+    WITH changes AS (
+        SELECT user_id, SUM(delta) AS delta FROM ({changes}) deltas
+        WHERE user_id IS NOT NULL GROUP BY user_id HAVING SUM(delta) <> 0
+    ), added AS (
+        INSERT INTO notification_unread_counters (user_id, unread_count)
+        SELECT user_id, delta FROM changes WHERE delta > 0
+        ON CONFLICT (user_id) DO UPDATE
+        SET unread_count = notification_unread_counters.unread_count + EXCLUDED.unread_count
+    )
+    UPDATE notification_unread_counters counters
+    SET unread_count = GREATEST(counters.unread_count + changes.delta, 0)
+    FROM changes WHERE counters.user_id = changes.user_id AND changes.delta < 0;
+"""
+
+_COUNTER_CHANGES = {
+    "ins": "SELECT user_id, 1 AS delta FROM new_rows WHERE is_read IS NOT TRUE",
+    "upd": """SELECT user_id, 1 AS delta FROM new_rows WHERE is_read IS NOT TRUE
+              UNION ALL
+              SELECT user_id, -1 FROM old_rows WHERE is_read IS NOT TRUE""",
+    "del": "SELECT user_id, -1 AS delta FROM old_rows WHERE is_read IS NOT TRUE",
+}
+
+_COUNTER_EVENTS = {
+    "ins": ("INSERT", "NEW TABLE AS new_rows"),
+    "upd": ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    "del": ("DELETE", "OLD TABLE AS old_rows"),
+}
+
+
+def _counter_statements() -> List[str]:
+    statements = []
+    for suffix, (event, referencing) in _COUNTER_EVENTS.items():
+        function = f"notification_unread_counter_{suffix}"
+        statements.append(f"""
+            CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+            BEGIN
+                {_COUNTER_APPLY_SQL.format(changes=_COUNTER_CHANGES[suffix])}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        statements.append(f"""
+            CREATE TRIGGER {_COUNTER_TRIGGER}_{suffix} AFTER {event} ON notifications
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+    return statements
+
+
+_counter_state: Dict[str, bool] = {}
+
+
+def _counter_trigger_exists(conn) -> bool:
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_trigger WHERE tgname = :name"), {"name": f"{_COUNTER_TRIGGER}_ins"}
+    ).first())
+
+
+def install_unread_counters(engine: Engine) -> bool:
+    """
+    Sayaç tablosunu mevcut verilerle doldurur ve tetikleyicileri kurar (sadece PostgreSQL).
+    Tetikleyici zaten varsa hiçbir şey yapmaz. Kurulum yapıldıysa True döner.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        if _counter_trigger_exists(conn):
+            return False
+    models.NotificationUnreadCounter.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        # Doldurma ile tetikleyici arasında yazılan bildirim sayılmadan kalmasın
+        conn.execute(text("LOCK TABLE notifications IN SHARE ROW EXCLUSIVE MODE"))
+        if _counter_trigger_exists(conn):
+            return False
+        conn.execute(text("DELETE FROM notification_unread_counters"))
+        conn.execute(text("""
+            INSERT INTO notification_unread_counters (user_id, unread_count)
+            SELECT n.user_id, COUNT(*) FROM notifications n
+            JOIN users u ON u.id = n.user_id
+            WHERE n.is_read IS NOT TRUE
+            GROUP BY n.user_id
+        """))
+        for statement in _counter_statements():
+            conn.execute(text(statement))
+    _counter_state.clear()
+    logger.info("Okunmamış bildirim sayaçları kuruldu")
+    return True
+
+
+def unread_counters_enabled(db: Session) -> bool:
+    """Sayaç tetikleyicisi kurulu mu (süreç başına bir kez kontrol edilir)"""
+    enabled = _counter_state.get("enabled")
+    if enabled is None:
+        enabled = db.get_bind().dialect.name == "postgresql" and _counter_trigger_exists(db)
+        _counter_state["enabled"] = enabled
+    return enabled
+
+
+def get_unread_count(db: Session, user_id: int) -> int:
+    """Okunmamış bildirim sayısı: sayaç satırı (O(1)) veya COUNT(*)"""
+    if unread_counters_enabled(db):
+        count = db.query(models.NotificationUnreadCounter.unread_count).filter(
+            models.NotificationUnreadCounter.user_id == user_id
+        ).scalar()
+        return max(count or 0, 0)
+    return db.query(models.Notification.id).filter(
+        models.Notification.user_id == user_id,
+        models.Notification.is_read == False
+    ).count()
+
+
+def archive_notifications(db: Session, read_before: datetime, unread_before: Optional[datetime] = None,
+                          batch_size: int = NOTIFICATION_RETENTION_BATCH_SIZE) -> int:
+    """Eski bildirimleri parça parça arşive taşır; taşınan satır sayısını döndürür"""
+    notification = models.Notification
+    archive_table = models.NotificationArchive.__table__
+    columns = [column.name for column in archive_table.columns if column.name != "archived_at"]
+    condition = (notification.is_read == True) & (notification.created_at < read_before)
+    if unread_before is not None:
+        condition = condition | (notification.created_at < unread_before)
+
+    total = 0
+    while True:
+        ids = [row[0] for row in db.query(notification.id).filter(condition).order_by(
+            notification.id
+        ).limit(batch_size).all()]
+        if not ids:
+            break
+        now = datetime.utcnow()
+        source = select(
+            *[notification.__table__.c[name] for name in columns], literal(now).label("archived_at")
+        ).where(notification.id.in_(ids))
+        db.execute(insert(archive_table).from_select(columns + ["archived_at"], source))
+        db.execute(delete(notification.__table__).where(notification.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+        time.sleep(_BATCH_PAUSE_SECONDS)
+    return total
+
+
+def purge_archive(db: Session, before: datetime, batch_size: int = NOTIFICATION_RETENTION_BATCH_SIZE) -> int:
+    archive = models.NotificationArchive
+    total = 0
+    while True:
+        ids = [row[0] for row in db.query(archive.id).filter(
+            archive.archived_at < before
+        ).order_by(archive.id).limit(batch_size).all()]
+        if not ids:
+            break
+        db.execute(delete(archive.__table__).where(archive.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+def run_retention(db: Session) -> Dict[str, int]:
+    """Saklama politikasını bir kez uygula. Başka süreç çalıştırıyorsa atlar."""
+    if db.get_bind().dialect.name != "postgresql":
+        return _apply_retention(db)
+    # Session her parçada commit edip bağlantısını havuza bırakır; oturum seviyesindeki kilit
+    # aynı bağlantıda alınıp bırakılsın diye çalışma boyunca ayrı bir bağlantı tutulur
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _RETENTION_LOCK_KEY}).scalar():
+            return {}
+        try:
+            return _apply_retention(db)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _RETENTION_LOCK_KEY})
+
+
+def _apply_retention(db: Session) -> Dict[str, int]:
+    now = datetime.utcnow()
+    unread_before = None
+    if NOTIFICATION_UNREAD_RETENTION_DAYS > 0:
+        unread_before = now - timedelta(days=NOTIFICATION_UNREAD_RETENTION_DAYS)
+    result = {
+        "archived": archive_notifications(db, now - timedelta(days=NOTIFICATION_RETENTION_DAYS), unread_before),
+        "purged": 0,
+    }
+    if NOTIFICATION_ARCHIVE_RETENTION_DAYS > 0:
+        result["purged"] = purge_archive(db, now - timedelta(days=NOTIFICATION_ARCHIVE_RETENTION_DAYS))
+    if result["archived"] or result["purged"]:
+        logger.info(f"Bildirim saklama: {result['archived']} arşive taşındı, {result['purged']} arşivden silindi")
+    return result
+
+
+def run_retention_once():
+    db = SessionLocal()
+    try:
+        run_retention(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Bildirim saklama işlemi başarısız: {e}")
+    finally:
+        db.close()
+
+
+async def run_retention_loop():
+    """Outbox worker'ı yokken saklama politikasını periyodik olarak uygular"""
+    while True:
+        await asyncio.sleep(NOTIFICATION_RETENTION_INTERVAL_HOURS * 3600)
+        await run_in_threadpool(run_retention_once)
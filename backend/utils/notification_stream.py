@@ -0,0 +1,243 @@
+"""
+Bildirim Akışı (Server-Sent Events)
+WebSocket'i engelleyen proxy arkasındaki istemciler için /ws'nin bildirim kısmının SSE karşılığı.
+
+- Olaylar:
+    event: notification   (id: cursor, data: NotificationResponse alanları)
+    event: unread_count   (data: {"count": N})
+- İstemci yeniden bağlanınca tarayıcı Last-Event-ID başlığını gönderir; o cursor'dan sonraki
+  bildirimler (user_id, created_at) indeksi ile okunur, geçmişin tamamı taranmaz
+- Canlı bildirimler realtime_hub'dan (LISTEN/NOTIFY) gelir; her bağlantının kuyruğu
+  NOTIFICATION_STREAM_QUEUE_SIZE ile sınırlıdır. Kuyruk dolarsa olaylar atılır ve
+  eksik kısım cursor'dan veritabanından tekrar okunur (bellek büyümez, bildirim kaybolmaz)
+- created_at commit'ten önce atanır; geç commit olan bildirim daha yenisinin arkasında kalabilir.
+  Cursor'un gerisindeki canlı olaylar atılmaz, gönderilen id'lerle tekilleşir; bağlantı içindeki
+  tekrar okumalar cursor'un NOTIFICATION_STREAM_REORDER_SECONDS gerisinden başlar
+- Boşta NOTIFICATION_STREAM_HEARTBEAT_SECONDS'da bir yorum satırı gönderilir (proxy zaman aşımı)
+"""
+
+import asyncio
+import json
+import os
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Deque, List, Optional, Set, Tuple
+
+from fastapi import Request
+from sqlalchemy import and_, or_
+from starlette.concurrency import run_in_threadpool
+
+import models
+from database import SessionLocal
+from utils.notification_retention import get_unread_count
+from utils.pagination import decode_cursor, encode_cursor
+from utils.realtime import EVENT_NOTIFICATION, EVENT_NOTIFICATION_READ, realtime_hub
+
+NOTIFICATION_STREAM_QUEUE_SIZE = int(os.getenv("NOTIFICATION_STREAM_QUEUE_SIZE", "100"))
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATION_STREAM_HEARTBEAT_SECONDS", "15"))
+# Yeniden bağlanmada tek seferde okunacak en fazla bildirim (fazlası sonraki turda)
+NOTIFICATION_STREAM_CATCHUP_LIMIT = 200
+# Tarayıcının yeniden bağlanmadan önce bekleyeceği süre (ms)
+NOTIFICATION_STREAM_RETRY_MS = 5000
+# Eşzamanlı transaction'lar created_at sırasıyla commit olmayabilir; tekrar okuma bu kadar geriden başlar
+NOTIFICATION_STREAM_REORDER_SECONDS = int(os.getenv("NOTIFICATION_STREAM_REORDER_SECONDS", "60"))
+_SENT_IDS_SIZE = NOTIFICATION_STREAM_CATCHUP_LIMIT * 5
+
+Cursor = Tuple[datetime, int]
+
+
+class NotificationSubscriber:
+    """realtime_hub aboneliği: sadece kullanıcının bildirim olaylarını sınırlı kuyrukta tutar"""
+    ticket_events = False
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=NOTIFICATION_STREAM_QUEUE_SIZE)
+        self.overflowed = False
+        self._sent: Deque[int] = deque(maxlen=_SENT_IDS_SIZE)
+        self._sent_set: Set[int] = set()
+
+    @property
+    def sent_ids(self) -> Set[int]:
+        return self._sent_set
+
+    def mark_sent(self, notification_id: int):
+        if len(self._sent) == self._sent.maxlen:
+            self._sent_set.discard(self._sent[0])
+        self._sent.append(notification_id)
+        self._sent_set.add(notification_id)
+
+    def offer(self, events):
+        for event in events:
+            if event["type"] not in (EVENT_NOTIFICATION, EVENT_NOTIFICATION_READ):
+                continue
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Yavaş istemci: kuyruk büyütülmez, eksikler veritabanından okunur
+                self.overflowed = True
+                return
+
+
+def _format(event: str, data, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _notification_data(notification: models.Notification) -> dict:
+    return {
+        "id": notification.id,
+        "user_id": notification.user_id,
+        "type": notification.type,
+        "title": notification.title,
+        "message": notification.message,
+        "related_id": notification.related_id,
+        "is_read": notification.is_read,
+        "created_at": notification.created_at,
+    }
+
+
+def _after(cursor: Optional[Cursor]):
+    if cursor is None:
+        return None
+    created_at, notification_id = cursor
+    return or_(
+        models.Notification.created_at > created_at,
+        and_(models.Notification.created_at == created_at, models.Notification.id > notification_id)
+    )
+
+
+def _load_state(user_id: int, cursor: Optional[Cursor], floor: Optional[Cursor] = None,
+                sent_ids: Optional[Set[int]] = None) -> Tuple[List[dict], Optional[Cursor], int]:
+    """
+    (cursor'dan sonraki bildirimler, yeni cursor, okunmamış sayısı).
+    Cursor yoksa geçmiş gönderilmez; kullanıcının son bildirimi başlangıç noktası olur.
+    sent_ids verilirse (bağlantı içi tekrar okuma) cursor'un reorder penceresi gerisinden, en fazla
+    bağlantının başladığı cursor'a (floor) kadar okunur; geç commit olan bildirimler de gelir,
+    bu bağlantıda gönderilmiş olanlar atlanır.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(models.Notification).filter(models.Notification.user_id == user_id)
+        notifications = []
+        if cursor is None:
+            latest = query.order_by(models.Notification.created_at.desc(), models.Notification.id.desc()).first()
+            # Hiç bildirimi yoksa sonraki tüm bildirimler yeni sayılır
+            cursor = (latest.created_at, latest.id) if latest is not None else (datetime.min, 0)
+        else:
+            start = cursor
+            if sent_ids:
+                start = max(floor, (cursor[0] - timedelta(seconds=NOTIFICATION_STREAM_REORDER_SECONDS), 0))
+                query = query.filter(models.Notification.id.notin_(sent_ids))
+            notifications = query.filter(_after(start)).order_by(
+                models.Notification.created_at, models.Notification.id
+            ).limit(NOTIFICATION_STREAM_CATCHUP_LIMIT).all()
+            if notifications:
+                cursor = max(cursor, (notifications[-1].created_at, notifications[-1].id))
+
+        return [_notification_data(notification) for notification in notifications], cursor, _count_unread(db, user_id)
+    finally:
+        db.close()
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[Cursor]:
+    if not value:
+        return None
+    try:
+        created_at, notification_id = decode_cursor(value)
+    except Exception:
+        return None
+    if not isinstance(created_at, datetime):
+        return None
+    return created_at, notification_id
+
+
+async def notification_events(request: Request, user_id: int, cursor: Optional[Cursor]) -> AsyncIterator[str]:
+    """SSE gövdesi: catch-up, canlı bildirimler, okunmamış sayısı ve heartbeat"""
+    subscriber = NotificationSubscriber(user_id)
+    # Catch-up okumasından önce abone ol: arada gelen bildirimler kuyrukta bekler, gönderilen id'lerle tekilleşir
+    realtime_hub.register(subscriber)
+    try:
+        yield f"retry: {NOTIFICATION_STREAM_RETRY_MS}\n\n"
+        last_unread = None
+        needs_reload = True
+        # Bağlantı başındaki cursor: öncesi önceki bağlantıda gönderilmiştir, tekrar okunmaz
+        floor = cursor
+        while True:
+            if needs_reload:
+                # Bağlantı başı veya kuyruk taşması: eksikler indeks üzerinden okunur
+                subscriber.overflowed = False
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                event_cursor = cursor
+                notifications, cursor, unread_count = await run_in_threadpool(
+                    _load_state, user_id, cursor, floor, set(subscriber.sent_ids)
+                )
+                if floor is None:
+                    floor = cursor
+                for data in notifications:
+                    # Event id (Last-Event-ID) geç gelen bildirimle geri gitmez
+                    key = (data["created_at"], data["id"])
+                    event_cursor = key if event_cursor is None else max(event_cursor, key)
+                    subscriber.mark_sent(data["id"])
+                    yield _format("notification", data, encode_cursor(*event_cursor))
+                if unread_count != last_unread:
+                    last_unread = unread_count
+                    yield _format("unread_count", {"count": unread_count})
+                # Sınıra takıldıysa kalanlar bir sonraki turda
+                needs_reload = len(notifications) >= NOTIFICATION_STREAM_CATCHUP_LIMIT
+                if needs_reload:
+                    continue
+
+            try:
+                first = await asyncio.wait_for(subscriber.queue.get(), timeout=NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": heartbeat\n\n"
+                continue
+
+            if subscriber.overflowed:
+                needs_reload = True
+                continue
+
+            events = [first]
+            while not subscriber.queue.empty():
+                events.append(subscriber.queue.get_nowait())
+
+            for event in events:
+                if event["type"] != EVENT_NOTIFICATION:
+                    continue
+                data = event["data"]
+                if data["id"] in subscriber.sent_ids:
+                    continue
+                created_at = datetime.fromisoformat(data["created_at"])
+                # Geç commit olan bildirim cursor'un gerisinde olabilir: gönderilir, cursor geri gitmez
+                if cursor is None or (created_at, data["id"]) > cursor:
+                    cursor = (created_at, data["id"])
+                subscriber.mark_sent(data["id"])
+                yield _format("notification", data, encode_cursor(*cursor))
+
+            # Yeni bildirim veya okundu işareti: sayı bir kez okunur, değiştiyse gönderilir
+            unread_count = await run_in_threadpool(_unread_count, user_id)
+            if unread_count != last_unread:
+                last_unread = unread_count
+                yield _format("unread_count", {"count": unread_count})
+    finally:
+        realtime_hub.unregister(subscriber)
+
+
+def _count_unread(db, user_id: int) -> int:
+    return get_unread_count(db, user_id)
+
+
+def _unread_count(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return _count_unread(db, user_id)
+    finally:
+        db.close()
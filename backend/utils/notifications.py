@@ -9,9 +9,9 @@ from email.mime.multipart import MIMEMultipart
 import os
 import requests
 import json
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 from database import get_db, SessionLocal
-from pywebpush import webpush, WebPushException
+from pywebpush import WebPushException
 import base64
 import pytz
 
@@ -32,13 +32,236 @@ VAPID_CLAIMS = {
 }
 
 from utils import mail_templates
+from utils.template_engine import PreparedMailCache
+from utils.config_cache import get_config_snapshot
+from utils.mail_transport import get_mail_settings, send_mail
+from utils.outbox import NOTIFICATION_OUTBOX_ENABLED, enqueue_email, enqueue_push
+from utils.notification_digest import is_coalesced, schedule_emails
+from utils.realtime import EVENT_NOTIFICATION, event_values, publish_event, publish_events
+from utils.push_dispatcher import EXPIRED_STATUS_CODES, PushDispatcher, prune_subscriptions
+
+# Paylaşılan HTTP oturumu ve VAPID imzası ile web push gönderimi
+push_dispatcher = PushDispatcher(VAPID_PRIVATE_KEY, VAPID_CLAIMS["sub"])
 
 import logging
-from sqlalchemy import text
+from sqlalchemy import text, insert
+from sqlalchemy.exc import IntegrityError
 
 # Logger ayarları
 logger = logging.getLogger("uvicorn.error")
 
+# Bildirim türü -> NotificationSettings'teki tür bazlı tercih alanı
+_TYPE_SETTING_FIELDS = {
+    schemas.NotificationTypeEnum.TICKET_CREATED: "ticket_created",
+    schemas.NotificationTypeEnum.TICKET_UPDATED: "ticket_updated",
+    schemas.NotificationTypeEnum.TICKET_ASSIGNED: "ticket_assigned",
+    schemas.NotificationTypeEnum.TICKET_COMMENTED: "ticket_commented",
+}
+
+# Tekrar gönderim engeli: aynı kullanıcı/tip/kayıt için bu süre içinde mail gittiyse tekrar gönderme
+DUPLICATE_WINDOW_MINUTES = 5
+
+def _istanbul_now() -> datetime:
+    return datetime.now(pytz.timezone('Europe/Istanbul')).replace(tzinfo=None)
+
+def _delivery_preferences(settings: models.NotificationSettings, notification_type) -> Tuple[bool, bool, Optional[str]]:
+    """Kullanıcı tercihlerine göre (e-posta gönder, push gönder, e-posta red sebebi)"""
+    should_send_email = settings.email_notifications
+    should_send_push = settings.browser_notifications
+    email_rejected_reason = None
+
+    field = _TYPE_SETTING_FIELDS.get(notification_type)
+    if field and not getattr(settings, field):
+        should_send_email = False
+        should_send_push = False
+        email_rejected_reason = f"{field}_disabled"
+
+    if not settings.email_notifications:
+        email_rejected_reason = "email_notifications_disabled"
+
+    return should_send_email, should_send_push, email_rejected_reason
+
+def notification_event_data(row: Dict[str, Any], notification_id: int) -> Dict[str, Any]:
+    """/ws 'notification' olayı - NotificationResponse ile aynı alanlar"""
+    return {
+        "id": notification_id,
+        "user_id": row["user_id"],
+        "type": row["type"],
+        "title": row["title"],
+        "message": row["message"],
+        "related_id": row["related_id"],
+        "is_read": row["is_read"],
+        "created_at": row["created_at"],
+    }
+
+def _notification_settings_defaults() -> Dict[str, Any]:
+    """NotificationSettings kolon varsayılanları"""
+    return {
+        column.key: column.default.arg
+        for column in models.NotificationSettings.__table__.columns
+        if column.default is not None and not callable(column.default.arg)
+    }
+
+def load_notification_recipients(db: Session, user_ids: Iterable[int]) -> Dict[int, Tuple[models.User, models.NotificationSettings]]:
+    """
+    Alıcıları bildirim ayarlarıyla birlikte tek sorguda yükler.
+    Ayarı olmayan kullanıcılar için varsayılan ayarlar tek INSERT ile eklenir (çağıranın commit'i ile yazılır).
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    rows = db.query(models.User, models.NotificationSettings).outerjoin(
+        models.NotificationSettings, models.NotificationSettings.user_id == models.User.id
+    ).filter(models.User.id.in_(user_ids)).all()
+
+    defaults = _notification_settings_defaults()
+    recipients = {}
+    missing = []
+    for user, settings in rows:
+        if settings is None:
+            # Kaydedilmemiş nesne sadece tercihleri okumak için kullanılır
+            settings = models.NotificationSettings(user_id=user.id, **defaults)
+            missing.append({"user_id": user.id, **defaults})
+        recipients[user.id] = (user, settings)
+
+    if missing:
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.NotificationSettings), missing)
+        except IntegrityError:
+            # Eşzamanlı bir istek aynı kullanıcılar için ayar oluşturdu (değerler aynı varsayılanlar)
+            pass
+    return recipients
+
+def create_notifications_bulk(
+    db: Session,
+    recipients: Dict[int, Tuple[models.User, models.NotificationSettings]],
+    contents: Dict[int, Tuple[str, str, Optional[str], Optional[str]]],
+    notification_type: schemas.NotificationTypeEnum,
+    related_id: int,
+    background_tasks: Optional[BackgroundTasks] = None
+) -> int:
+    """
+    create_notification'ın çok alıcılı sürümü - alıcı sayısından bağımsız sabit sayıda sorgu:
+    tekrar kontrolü tek sorgu, Notification/SystemLog/Outbox satırları toplu INSERT, tek commit.
+
+    contents: {user_id: (başlık, mesaj, özel e-posta metni, özel e-posta HTML'i)}
+    Oluşturulan bildirim sayısını döndürür.
+    """
+    from utils.system_logger import add_system_logs, mail_log_values, LogAction
+
+    user_ids = [user_id for user_id in contents if user_id in recipients]
+    if not user_ids:
+        return 0
+
+    try:
+        now_istanbul = _istanbul_now()
+        type_value = getattr(notification_type, "value", notification_type)
+
+        # Son 5 dakikada mail gönderilmiş alıcılar (tek sorgu)
+        recently_mailed = {
+            row[0] for row in db.query(models.Notification.user_id).filter(
+                models.Notification.user_id.in_(user_ids),
+                models.Notification.type == type_value,
+                models.Notification.related_id == related_id,
+                models.Notification.email_sent == True,
+                models.Notification.created_at > now_istanbul - timedelta(minutes=DUPLICATE_WINDOW_MINUTES)
+            ).distinct().all()
+        }
+
+        notification_rows = []
+        log_rows = []
+        emails = []
+        pushes = []
+        for user_id in user_ids:
+            user, settings = recipients[user_id]
+            title, message, custom_email_body, custom_email_html = contents[user_id]
+
+            should_send_email, should_send_push, email_rejected_reason = _delivery_preferences(settings, notification_type)
+            if user_id in recently_mailed:
+                # Birleştirilen e-postalar düşürülmez, özet e-postasına eklenir
+                if not is_coalesced(settings, notification_type):
+                    should_send_email = False
+                should_send_push = False
+            if not user.email:
+                should_send_email = False
+                email_rejected_reason = "no_email_address"
+
+            if email_rejected_reason:
+                log_rows.append(mail_log_values(
+                    action=LogAction.REJECTED,
+                    recipient_email=user.email if user.email else f"user_{user_id}",
+                    subject=title,
+                    user_id=user_id,
+                    username=user.username,
+                    success=False,
+                    error_message=f"Kullanıcı mail bildirimi kabul etmiyor: {email_rejected_reason}",
+                    details={
+                        "notification_type": str(notification_type),
+                        "reason": email_rejected_reason,
+                        "related_id": related_id
+                    }
+                ))
+
+            notification_rows.append({
+                "user_id": user_id,
+                "type": type_value,
+                "title": title,
+                "message": message,
+                "related_id": related_id,
+                "is_read": False,
+                "email_sent": bool(should_send_email),
+                "created_at": now_istanbul,
+            })
+            if should_send_email:
+                emails.append((user_id, user.email, title, message, custom_email_body, custom_email_html))
+            if should_send_push and user.browser_notification_token:
+                pushes.append((user.browser_notification_token, title, message))
+
+        # Tüm satırlar tek executemany ile; id'ler /ws olayları için parametre sırasıyla döner
+        notification_ids = db.execute(
+            insert(models.Notification).returning(models.Notification.id, sort_by_parameter_order=True),
+            notification_rows
+        ).scalars().all()
+        publish_events(db, [
+            event_values(EVENT_NOTIFICATION, notification_event_data(row, notification_id), user_id=row["user_id"])
+            for row, notification_id in zip(notification_rows, notification_ids)
+        ])
+        add_system_logs(db, log_rows)
+        # Aynı talepteki art arda olaylar / saatlik-günlük özet seçenler için e-posta ertelenir
+        emails = schedule_emails(
+            db, {user_id: recipients[user_id][1] for user_id in user_ids}, emails, notification_type, related_id
+        )
+        if NOTIFICATION_OUTBOX_ENABLED:
+            for _, email, title, message, custom_email_body, custom_email_html in emails:
+                enqueue_email(db, email, title, message, notification_type, related_id, custom_email_body, custom_email_html)
+            for token, title, message in pushes:
+                enqueue_push(db, token, title, message, notification_type, related_id)
+        db.commit()
+    except Exception as e:
+        logger.error(f"Toplu bildirim oluşturulurken hata: {str(e)}")
+        db.rollback()
+        return 0
+
+    if not NOTIFICATION_OUTBOX_ENABLED:
+        for _, email, title, message, custom_email_body, custom_email_html in emails:
+            if background_tasks:
+                # Background task kendi session'ını açar
+                background_tasks.add_task(
+                    send_email_notification, None, email, title, message,
+                    notification_type, related_id, custom_email_body, custom_email_html
+                )
+            else:
+                send_email_notification(db, email, title, message, notification_type, related_id, custom_email_body, custom_email_html)
+        if background_tasks and pushes:
+            # Tüm alıcılara tek görevde, sınırlı sayıda paralel istekle
+            background_tasks.add_task(push_dispatcher.send_pushes, [
+                (token, build_push_data(title, message, notification_type, related_id))
+                for token, title, message in pushes
+            ])
+
+    return len(notification_rows)
+
 async def create_notification(
     db: Session,
     user_id: int,
@@ -67,31 +290,7 @@ async def create_notification(
         
 
         # Bildirim türüne göre tercihleri kontrol et
-        should_send_email = settings.email_notifications
-        should_send_push = settings.browser_notifications
-
-        type_enabled = True
-        email_rejected_reason = None
-        
-        if notification_type == schemas.NotificationTypeEnum.TICKET_CREATED and not settings.ticket_created:
-            type_enabled = False
-            email_rejected_reason = "ticket_created_disabled"
-        elif notification_type == schemas.NotificationTypeEnum.TICKET_UPDATED and not settings.ticket_updated:
-            type_enabled = False
-            email_rejected_reason = "ticket_updated_disabled"
-        elif notification_type == schemas.NotificationTypeEnum.TICKET_ASSIGNED and not settings.ticket_assigned:
-            type_enabled = False
-            email_rejected_reason = "ticket_assigned_disabled"
-        elif notification_type == schemas.NotificationTypeEnum.TICKET_COMMENTED and not settings.ticket_commented:
-            type_enabled = False
-            email_rejected_reason = "ticket_commented_disabled"
-
-        if not type_enabled:
-            should_send_email = False
-            should_send_push = False
-        
-        if not settings.email_notifications:
-            email_rejected_reason = "email_notifications_disabled"
+        should_send_email, should_send_push, email_rejected_reason = _delivery_preferences(settings, notification_type)
 
         # Daha önce aynı kullanıcı, tip ve ilgili id için mail gönderilmiş mi kontrol et
         # Ayrıca son 5 dakika içinde aynı bildirim gönderilmişse tekrar gönderme (loop önleme)
@@ -104,7 +303,9 @@ async def create_notification(
             models.Notification.created_at > five_minutes_ago
         ).first()
         if existing_mail:
-            should_send_email = False
+            # Birleştirilen e-postalar düşürülmez, özet e-postasına eklenir
+            if not is_coalesced(settings, notification_type):
+                should_send_email = False
             should_send_push = False  # Push bildirimi de engelle
 
         # DB'ye bildirimi kaydet - İstanbul timezone kullan
@@ -122,6 +323,15 @@ async def create_notification(
         )
 
         db.add(notification)
+        db.flush()
+        publish_event(
+            db, EVENT_NOTIFICATION,
+            notification_event_data({
+                "user_id": user_id, "type": getattr(notification_type, "value", notification_type), "title": title, "message": message,
+                "related_id": related_id, "is_read": False, "created_at": now_istanbul
+            }, notification.id),
+            user_id=user_id
+        )
         db.commit()
         db.refresh(notification)
 
@@ -151,9 +361,24 @@ async def create_notification(
                 }
             )
 
-        # E-posta bildirimi gönder (Background Task'e ekle)
+        # Art arda gelen talep olayları / saatlik-günlük özet: e-posta özet kuyruğuna alınır
+        if should_send_email and not schedule_emails(
+            db, {user_id: settings},
+            [(user_id, user.email, title, message, custom_email_body, custom_email_html)],
+            notification_type, related_id
+        ):
+            should_send_email = False
+            notification.email_sent = True
+            db.commit()
+
+        # E-posta bildirimi gönder (outbox kuyruğuna veya Background Task'e ekle)
         if should_send_email:
-            if background_tasks:
+            if NOTIFICATION_OUTBOX_ENABLED:
+                # Gönderimi outbox_worker.py yapar; iş bildirimle aynı commit'te kaydedilir
+                enqueue_email(db, user.email, title, message, notification_type, related_id, custom_email_body, custom_email_html)
+                notification.email_sent = True
+                db.commit()
+            elif background_tasks:
                 # ÖNEMLİ: Background task içinde request-scoped DB kullanılmaz. 
                 # send_email_notification kendi session'ını oluşturacak.
                 background_tasks.add_task(
@@ -178,7 +403,10 @@ async def create_notification(
 
         # Tarayıcı bildirimi gönder
         if should_send_push and user.browser_notification_token:
-            if background_tasks:
+            if NOTIFICATION_OUTBOX_ENABLED:
+                enqueue_push(db, user.browser_notification_token, title, message, notification_type, related_id)
+                db.commit()
+            elif background_tasks:
                 background_tasks.add_task(
                     send_browser_notification,
                     user.browser_notification_token,
@@ -203,9 +431,13 @@ def send_email_notification(
     notification_type: schemas.NotificationTypeEnum,
     related_id: int,
     custom_body: Optional[str] = None,
-    custom_html: Optional[str] = None
+    custom_html: Optional[str] = None,
+    raise_errors: bool = False
 ):
-    """E-posta bildirimi gönderir (Background Task olarak çalışabilir)"""
+    """
+    E-posta bildirimi gönderir (Background Task olarak çalışabilir)
+    raise_errors: hata loglandıktan sonra tekrar fırlatılır (outbox worker'ı tekrar denesin diye)
+    """
     standalone_session = False
     if not db:
         db = SessionLocal()
@@ -214,14 +446,18 @@ def send_email_notification(
     try:
         logger.info(f"E-posta gönderimi başlatılıyor: {recipient_email} - Konu: {title}")
         
-        # DB'den e-posta yapılandırmasını al
-        email_config = db.query(models.EmailConfig).first()
+        # E-posta yapılandırması (bellekteki kopya - her gönderimde sorgulanmaz)
+        email_config = get_mail_settings(db)
         if not email_config:
             logger.warning("E-posta yapılandırması bulunamadı, gönderim iptal edildi.")
+            if raise_errors:
+                raise smtplib.SMTPException("E-posta yapılandırması bulunamadı")
             return
 
         if not email_config.smtp_server or not email_config.from_email:
             logger.warning("E-posta yapılandırması eksik (Sunucu veya Gönderen adresi yok).")
+            if raise_errors:
+                raise smtplib.SMTPException("E-posta yapılandırması eksik")
             return
 
         msg = MIMEMultipart('alternative')
@@ -240,29 +476,9 @@ def send_email_notification(
         msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
         msg.attach(MIMEText(html_content, 'html', 'utf-8'))
         
-        # SMTP Sunucusuna Bağlan
+        # Havuzdaki SMTP bağlantısıyla gönder (TLS ve login bağlantı başına bir kez)
         try:
-            port = email_config.smtp_port or 587
-            use_ssl = (port == 465)
-            
-            logger.info(f"SMTP Bağlanıyor: {email_config.smtp_server}:{port} (SSL: {use_ssl})")
-            
-            if use_ssl:
-                server = smtplib.SMTP_SSL(email_config.smtp_server, port, timeout=10)
-            else:
-                server = smtplib.SMTP(email_config.smtp_server, port, timeout=10)
-
-            # Ehlo / StartTLS
-            if not use_ssl and getattr(email_config, 'smtp_use_tls', True):
-                server.starttls()
-            
-            # Login
-            if email_config.smtp_username and email_config.smtp_password:
-                server.login(email_config.smtp_username, email_config.smtp_password)
-            
-            # Send
-            server.send_message(msg)
-            server.quit()
+            send_mail(msg, [recipient_email], db)
             logger.info(f"E-posta başarıyla gönderildi: {recipient_email}")
             
             # Başarılı mail logu
@@ -295,6 +511,8 @@ def send_email_notification(
                     "related_id": related_id
                 }
             )
+            if raise_errors:
+                raise
         except Exception as conn_err:
             logger.error(f"E-posta bağlantı hatası ({recipient_email}): {str(conn_err)}")
             # Başarısız mail logu
@@ -311,43 +529,60 @@ def send_email_notification(
                     "related_id": related_id
                 }
             )
+            if raise_errors:
+                raise
             
     except Exception as e:
         logger.error(f"E-posta gönderiminde genel hata: {str(e)}")
+        if raise_errors:
+            raise
     finally:
         if standalone_session:
             db.close()
 
+def build_push_data(title: str, message: str, notification_type: str, related_id: int) -> str:
+    """Service worker'a gönderilen bildirim içeriği (JSON)"""
+    notification_type = getattr(notification_type, "value", notification_type)
+    return json.dumps({
+        "notification": {
+            "title": title,
+            "body": message,
+            "icon": "/logo192.png",
+            "badge": "/logo192.png",
+            "data": {
+                "url": f"{APPLICATION_URL}/tickets/{related_id}" if notification_type.startswith("TICKET_") else APPLICATION_URL
+            }
+        }
+    })
+
 def send_browser_notification(
     subscription_info: str,
     title: str,
     message: str,
     notification_type: str,
-    related_id: int
+    related_id: int,
+    raise_errors: bool = False
 ):
-    """Web Push bildirimi gönderir"""
+    """
+    Web Push bildirimi gönderir (raise_errors: hata False yerine exception olarak döner)
+    Süresi dolmuş (404/410) abonelik kullanıcıdan silinir.
+    """
     try:
-        subscription_json = json.loads(subscription_info)
-        notification_data = {
-            "notification": {
-                "title": title,
-                "body": message,
-                "icon": "/logo192.png",
-                "badge": "/logo192.png",
-                "data": {
-                    "url": f"{APPLICATION_URL}/tickets/{related_id}" if notification_type.startswith("TICKET_") else APPLICATION_URL
-                }
-            }
-        }
-        webpush(
-            subscription_info=subscription_json,
-            data=json.dumps(notification_data),
-            vapid_private_key=VAPID_PRIVATE_KEY,
-            vapid_claims=VAPID_CLAIMS
-        )
+        push_dispatcher.send(subscription_info, build_push_data(title, message, notification_type, related_id))
         return True
+    except WebPushException as e:
+        if e.response is not None and e.response.status_code in EXPIRED_STATUS_CODES:
+            logger.info(f"Push aboneliğinin süresi dolmuş ({e.response.status_code}), siliniyor")
+            prune_subscriptions([subscription_info])
+        else:
+            logger.error(f"Web Push gönderme hatası: {str(e)}")
+        if raise_errors:
+            raise
+        return False
     except Exception as e:
         logger.error(f"Web Push gönderme hatası: {str(e)}")
+        if raise_errors:
+            raise
         return False
 
 async def notify_users_about_ticket(
@@ -375,7 +610,7 @@ async def notify_users_about_ticket(
         if not ticket: return
         
         app_url = os.getenv("APP_URL") or os.getenv("APPLICATION_URL", "http://localhost:3000")
-        config = db.query(models.GeneralConfig).first()
+        config = get_config_snapshot(db)
         is_triage_enabled = config.workflow_enabled if config else False
         triage_user_id = config.triage_user_id if config else None
         triage_enabled_at = getattr(config, 'triage_enabled_at', None)
@@ -390,20 +625,41 @@ async def notify_users_about_ticket(
             recipients.add((ticket.assignee_id, role))
         elif ticket.department_id:
              # Talep bir birime atanmış ama kişiye atanmamış - departman personeline gönder
-             dept_users = db.query(models.User).filter(
+             dept_user_ids = db.query(models.User.id).filter(
                  models.User.department_id == ticket.department_id,
                  models.User.is_active == True
              ).all()
-             for d_user in dept_users: 
+             for (d_user_id,) in dept_user_ids: 
                  # Triaj departmanı ise 'triage' rolü ver, yoksa 'staff'
                  role = 'staff'
                  if is_triage_enabled and config and config.triage_department_id and ticket.department_id == config.triage_department_id:
                      role = 'triage'
-                 recipients.add((d_user.id, role))
+                 recipients.add((d_user_id, role))
+
+        recipients = {(user_id, role) for user_id, role in recipients if user_id != exclude_user_id}
+        if not recipients:
+            return
 
-        for user_id, role in recipients:
-            if user_id == exclude_user_id:
+        # Alıcılar (ayarlarıyla), işlemi yapan kişi ve ilgili yorum/dosya alıcı sayısından bağımsız olarak bir kez yüklenir
+        recipient_map = load_notification_recipients(db, [user_id for user_id, _ in recipients])
+        actor = None
+        if exclude_user_id and context in ('comment', 'update', 'attachment'):
+            actor = db.query(models.User).filter(models.User.id == exclude_user_id).first()
+        comment = None
+        if context == 'comment' and comment_id:
+            comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+        attachment = None
+        if context == 'attachment' and attachment_id:
+            attachment = db.query(models.Attachment).filter(models.Attachment.id == attachment_id).first()
+
+        contents = {}
+        # Şablonun talebe ait kısmı olay başına bir kez render edilir; alıcı başına sadece ad doldurulur
+        mails = PreparedMailCache()
+        # Aynı kişi birden fazla rolde olabilir (ör. hem oluşturan hem atanan); tek bildirim alır
+        for user_id, role in sorted(recipients, key=lambda r: (r[0], r[1] != 'user')):
+            if user_id in contents:
                 continue
+            recipient_user = recipient_map.get(user_id, (None, None))[0]
 
             c_text, c_html = None, None
             c_title, c_msg = title, message
@@ -419,49 +675,50 @@ async def notify_users_about_ticket(
                         if triage_disabled_at and ticket.created_at >= triage_disabled_at:
                             continue
                     # Triaj enabled ama timestamp yoksa veya kontroller geçtiyse mail gönder
-                    c_text, c_html = mail_templates.get_ticket_created_triage_template(ticket, app_url)
+                    c_text, c_html = mails.render('triage', lambda: mail_templates.prepare_ticket_created_triage(ticket, app_url))
                     c_title, c_msg = "Yönlendirme Bekleyen Talep", "Sisteme yeni bir talep düştü."
                 elif role == 'user':
-                    c_text, c_html = mail_templates.get_ticket_created_user_template(ticket, app_url)
+                    c_text, c_html = mails.render('user', lambda: mail_templates.prepare_ticket_created_user(ticket, app_url))
                     c_title, c_msg = "Talebiniz Alındı", "Talebiniz başarıyla oluşturuldu."
                 elif role == 'staff':
                     # Staff için assignee olmalı - yoksa triage template kullan
                     if ticket.assignee:
-                        c_text, c_html = mail_templates.get_ticket_created_staff_template(ticket, app_url)
+                        c_text, c_html = mails.render('staff', lambda: mail_templates.prepare_ticket_created_staff(ticket, app_url))
                         c_title, c_msg = "Size Atanan Yeni Talep", "Size yeni bir talep atandı."
                     else:
                         # Departman ataması - triage gibi davran
-                        c_text, c_html = mail_templates.get_ticket_created_triage_template(ticket, app_url)
+                        c_text, c_html = mails.render('triage', lambda: mail_templates.prepare_ticket_created_triage(ticket, app_url))
                         c_title, c_msg = "Biriminize Yeni Talep", "Biriminize yeni bir talep düştü."
             
             elif context == 'comment' and comment_id:
-                comment = db.query(models.Comment).filter(models.Comment.id == comment_id).first()
-                recipient_user = db.query(models.User).filter(models.User.id == user_id).first()
-                commenter = db.query(models.User).filter(models.User.id == exclude_user_id).first()
-                if comment and recipient_user and commenter:
-                    c_text, c_html = mail_templates.get_comment_notification_template(ticket, commenter, recipient_user, comment, app_url)
-                    c_title, c_msg = "Yeni Yorum Eklendi", f"{commenter.full_name} yorum yazdı."
+                if comment and recipient_user and actor:
+                    c_text, c_html = mails.render(
+                        'comment', lambda: mail_templates.prepare_comment_notification(ticket, actor, comment, app_url),
+                        recipient_name=recipient_user.full_name
+                    )
+                    c_title, c_msg = "Yeni Yorum Eklendi", f"{actor.full_name} yorum yazdı."
 
             elif context == 'update':
-                updater = db.query(models.User).filter(models.User.id == exclude_user_id).first()
-                recipient_user = db.query(models.User).filter(models.User.id == user_id).first()
-                if updater and recipient_user:
-                    c_text, c_html = mail_templates.get_ticket_updated_template(ticket, updater, recipient_user, app_url, message)
-                    c_title, c_msg = "Talep Güncellendi", f"{updater.full_name} güncelledi."
+                if actor and recipient_user:
+                    c_text, c_html = mails.render(
+                        'update', lambda: mail_templates.prepare_ticket_updated(ticket, actor, app_url, message),
+                        recipient_name=recipient_user.full_name
+                    )
+                    c_title, c_msg = "Talep Güncellendi", f"{actor.full_name} güncelledi."
 
             elif context == 'attachment' and attachment_id:
-                attachment = db.query(models.Attachment).filter(models.Attachment.id == attachment_id).first()
-                uploader = db.query(models.User).filter(models.User.id == exclude_user_id).first()
-                recipient_user = db.query(models.User).filter(models.User.id == user_id).first()
-                if attachment and uploader and recipient_user:
-                    c_text, c_html = mail_templates.get_attachment_notification_template(ticket, uploader, recipient_user, attachment, app_url)
-                    c_title, c_msg = "Dosya Eklendi", f"{uploader.full_name} dosya ekledi."
-
-            await create_notification(
-                db=db, user_id=user_id, notification_type=notification_type,
-                title=c_title, message=c_msg, related_id=ticket_id,
-                background_tasks=background_tasks, custom_email_body=c_text, custom_email_html=c_html
-            )
+                if attachment and actor and recipient_user:
+                    c_text, c_html = mails.render(
+                        'attachment', lambda: mail_templates.prepare_attachment_notification(ticket, actor, attachment, app_url),
+                        recipient_name=recipient_user.full_name
+                    )
+                    c_title, c_msg = "Dosya Eklendi", f"{actor.full_name} dosya ekledi."
+
+            contents[user_id] = (c_title, c_msg, c_text, c_html)
+
+        create_notifications_bulk(
+            db, recipient_map, contents, notification_type, ticket_id, background_tasks
+        )
 
     finally:
         if standalone_session:
@@ -495,7 +752,8 @@ async def notify_users_about_wiki(
             for u in d.users: user_ids.add(u.id)
             for u in d.primary_users: user_ids.add(u.id)
         if exclude_user_id in user_ids: user_ids.remove(exclude_user_id)
-        for u_id in user_ids:
-            await create_notification(db=db, user_id=u_id, notification_type=notification_type, title=title, message=message, related_id=wiki_id, background_tasks=background_tasks)
+        recipient_map = load_notification_recipients(db, user_ids)
+        contents = {u_id: (title, message, None, None) for u_id in user_ids}
+        create_notifications_bulk(db, recipient_map, contents, notification_type, wiki_id, background_tasks)
     finally:
         if standalone_session: db.close()
\ No newline at end of file
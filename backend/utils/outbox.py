@@ -0,0 +1,258 @@
+"""
+Giden Bildirim Kuyruğu (Outbox)
+E-posta ve web push gönderimleri API sürecinde değil, outbox_worker.py sürecinde yapılır.
+
+- API isteği gönderimi outbox_jobs tablosuna kaydeder (bildirimle aynı transaction'da)
+- Worker işleri SELECT ... FOR UPDATE SKIP LOCKED ile toplu alır; birden fazla worker çakışmaz
+- Hata durumunda iş üstel bekleme (backoff) ile tekrar denenir
+- Kalıcı hatalar veya deneme hakkı biten işler 'dead' durumuna alınır (dead-letter)
+- Süreç yeniden başlarsa yarıda kalan işler OUTBOX_LOCK_TIMEOUT_SECONDS sonra tekrar alınır
+
+NOTIFICATION_OUTBOX_ENABLED kapalıysa bildirimler eskisi gibi BackgroundTasks ile gönderilir.
+"""
+
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+logger = logging.getLogger("uvicorn")
+
+NOTIFICATION_OUTBOX_ENABLED = os.getenv("NOTIFICATION_OUTBOX_ENABLED", "false").lower() in ("1", "true", "yes")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_BASE_SECONDS = int(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "30"))
+OUTBOX_BACKOFF_MAX_SECONDS = int(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+# processing durumunda bu süreden uzun kalan iş (worker çöktü) tekrar alınır
+OUTBOX_LOCK_TIMEOUT_SECONDS = int(os.getenv("OUTBOX_LOCK_TIMEOUT_SECONDS", "600"))
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"
+
+KIND_EMAIL = "email"
+KIND_PUSH = "push"
+
+
+class PermanentDeliveryError(Exception):
+    """Tekrar denemenin anlamı olmayan hata (geçersiz alıcı, süresi dolmuş abonelik vb.)"""
+
+
+_handlers: Dict[str, Callable[[Session, dict], None]] = {}
+
+
+def register_handler(kind: str):
+    """İş türü için gönderim fonksiyonu kaydet; fonksiyon hata durumunda exception fırlatmalı"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(db: Session, kind: str, payload: dict, max_attempts: Optional[int] = None) -> models.OutboxJob:
+    """İşi kuyruğa ekle. Commit çağırana aittir (bildirim kaydıyla aynı transaction)."""
+    job = models.OutboxJob(
+        kind=kind,
+        payload=json.dumps(payload, ensure_ascii=False, default=str),
+        status=STATUS_PENDING,
+        attempts=0,
+        max_attempts=max_attempts or OUTBOX_MAX_ATTEMPTS,
+        run_after=datetime.utcnow()
+    )
+    db.add(job)
+    return job
+
+
+def enqueue_email(db: Session, recipient_email: str, title: str, message: str, notification_type,
+                  related_id: int, custom_body: Optional[str] = None, custom_html: Optional[str] = None) -> models.OutboxJob:
+    return enqueue(db, KIND_EMAIL, {
+        "recipient_email": recipient_email,
+        "title": title,
+        "message": message,
+        "notification_type": getattr(notification_type, "value", notification_type),
+        "related_id": related_id,
+        "custom_body": custom_body,
+        "custom_html": custom_html,
+    })
+
+
+def enqueue_push(db: Session, subscription_info: str, title: str, message: str, notification_type,
+                 related_id: int) -> models.OutboxJob:
+    return enqueue(db, KIND_PUSH, {
+        "subscription_info": subscription_info,
+        "title": title,
+        "message": message,
+        "notification_type": getattr(notification_type, "value", notification_type),
+        "related_id": related_id,
+    })
+
+
+def claim_jobs(db: Session, worker_id: str, limit: int) -> List[int]:
+    """
+    Zamanı gelmiş işlerden en fazla limit kadarını bu worker adına kilitle.
+    SKIP LOCKED: başka worker'ın o an aldığı satırlar beklenmeden atlanır.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=OUTBOX_LOCK_TIMEOUT_SECONDS)
+    rows = db.query(models.OutboxJob.id).filter(
+        or_(
+            and_(models.OutboxJob.status == STATUS_PENDING, models.OutboxJob.run_after <= now),
+            and_(models.OutboxJob.status == STATUS_PROCESSING, models.OutboxJob.locked_at < stale_before)
+        )
+    ).order_by(
+        models.OutboxJob.run_after, models.OutboxJob.id
+    ).limit(limit).with_for_update(skip_locked=True).all()
+
+    job_ids = [row[0] for row in rows]
+    if job_ids:
+        db.query(models.OutboxJob).filter(models.OutboxJob.id.in_(job_ids)).update({
+            models.OutboxJob.status: STATUS_PROCESSING,
+            models.OutboxJob.locked_by: worker_id,
+            models.OutboxJob.locked_at: now,
+            models.OutboxJob.attempts: models.OutboxJob.attempts + 1,
+        }, synchronize_session=False)
+    db.commit()
+    return job_ids
+
+
+def backoff_seconds(attempts: int) -> float:
+    """1. hata: ~30sn, 2.: ~60sn, 3.: ~120sn ... (OUTBOX_BACKOFF_MAX_SECONDS ile sınırlı, ±%20 sapma)"""
+    delay = min(OUTBOX_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), OUTBOX_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def process_job(job_id: int, worker_id: str) -> str:
+    """Tek işi çalıştır (worker thread'inde, kendi session'ı ile). Yeni durumu döndürür."""
+    db = SessionLocal()
+    try:
+        job = db.query(models.OutboxJob).filter(
+            models.OutboxJob.id == job_id,
+            models.OutboxJob.status == STATUS_PROCESSING,
+            models.OutboxJob.locked_by == worker_id
+        ).first()
+        if not job:
+            return ""
+
+        try:
+            handler = _handlers.get(job.kind)
+            if handler is None:
+                raise PermanentDeliveryError(f"Bilinmeyen iş türü: {job.kind}")
+            handler(db, json.loads(job.payload))
+        except Exception as e:
+            db.rollback()
+            return _mark_failed(db, job, e)
+
+        job.status = STATUS_DONE
+        job.finished_at = datetime.utcnow()
+        job.locked_by = None
+        job.locked_at = None
+        job.last_error = None
+        db.commit()
+        return STATUS_DONE
+    finally:
+        db.close()
+
+
+def _mark_failed(db: Session, job: models.OutboxJob, error: Exception) -> str:
+    now = datetime.utcnow()
+    permanent = isinstance(error, (PermanentDeliveryError, ValueError))
+    job.last_error = f"{type(error).__name__}: {error}"[:2000]
+    job.locked_by = None
+    job.locked_at = None
+    if permanent or job.attempts >= job.max_attempts:
+        job.status = STATUS_DEAD
+        job.finished_at = now
+        logger.error(f"Outbox işi #{job.id} ({job.kind}) başarısız, dead-letter'a alındı: {job.last_error}")
+    else:
+        job.status = STATUS_PENDING
+        job.run_after = now + timedelta(seconds=backoff_seconds(job.attempts))
+        logger.warning(
+            f"Outbox işi #{job.id} ({job.kind}) başarısız (deneme {job.attempts}/{job.max_attempts}), "
+            f"{job.run_after:%H:%M:%S} tekrar denenecek: {job.last_error}"
+        )
+    db.commit()
+    return job.status
+
+
+def retry_dead_jobs(db: Session, job_ids: Optional[List[int]] = None) -> int:
+    """Dead-letter işlerini sıfırdan tekrar kuyruğa al (örn. SMTP ayarı düzeltildikten sonra)"""
+    query = db.query(models.OutboxJob).filter(models.OutboxJob.status == STATUS_DEAD)
+    if job_ids:
+        query = query.filter(models.OutboxJob.id.in_(job_ids))
+    count = query.update({
+        models.OutboxJob.status: STATUS_PENDING,
+        models.OutboxJob.attempts: 0,
+        models.OutboxJob.run_after: datetime.utcnow(),
+        models.OutboxJob.finished_at: None,
+    }, synchronize_session=False)
+    db.commit()
+    return count
+
+
+def purge_finished_jobs(db: Session, older_than_days: int) -> int:
+    """Tamamlanmış eski işleri sil (dead işler incelenmek üzere tutulur)"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    count = db.query(models.OutboxJob).filter(
+        models.OutboxJob.status == STATUS_DONE,
+        models.OutboxJob.finished_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
+
+
+def outbox_stats(db: Session) -> Dict[str, int]:
+    rows = db.query(models.OutboxJob.status, func.count(models.OutboxJob.id)).group_by(models.OutboxJob.status).all()
+    stats = {STATUS_PENDING: 0, STATUS_PROCESSING: 0, STATUS_DONE: 0, STATUS_DEAD: 0}
+    stats.update({status: count for status, count in rows})
+    return stats
+
+
+@register_handler(KIND_EMAIL)
+def _deliver_email(db: Session, payload: dict):
+    import smtplib
+    import schemas
+    from utils.notifications import send_email_notification
+
+    try:
+        send_email_notification(
+            db,
+            payload["recipient_email"],
+            payload["title"],
+            payload["message"],
+            schemas.NotificationTypeEnum(payload["notification_type"]),
+            payload["related_id"],
+            payload.get("custom_body"),
+            payload.get("custom_html"),
+            raise_errors=True
+        )
+    except smtplib.SMTPRecipientsRefused as e:
+        raise PermanentDeliveryError(f"Alıcı reddedildi: {e.recipients}") from e
+
+
+@register_handler(KIND_PUSH)
+def _deliver_push(db: Session, payload: dict):
+    from pywebpush import WebPushException
+    from utils.notifications import send_browser_notification
+
+    try:
+        send_browser_notification(
+            payload["subscription_info"],
+            payload["title"],
+            payload["message"],
+            payload["notification_type"],
+            payload["related_id"],
+            raise_errors=True
+        )
+    except WebPushException as e:
+        # 404/410: abonelik artık geçerli değil
+        if e.response is not None and e.response.status_code in (404, 410):
+            raise PermanentDeliveryError(f"Push aboneliği geçersiz ({e.response.status_code})") from e
+        raise
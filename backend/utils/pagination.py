@@ -0,0 +1,59 @@
+"""
+Keyset (cursor) sayfalama yardımcıları
+Cursor, son satırın sıralama değeri ve ID'sinden oluşan base64 kodlu bir JSON'dur.
+OFFSET kullanılmadığı için sayfa maliyeti tablo boyutundan bağımsızdır.
+Sıralama değeri NULL olabilir: NULL en büyük değer sayılır (PostgreSQL varsayılanı, ASC NULLS LAST /
+DESC NULLS FIRST); sıralama keyset_order ile, koşul keyset_filter ile aynı kurala göre kurulur.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    """(sıralama değeri, id) ikilisini cursor string'ine çevir"""
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps({"v": value, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Cursor string'ini (sıralama değeri, id) ikilisine çevir"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        value = data["v"]
+        if isinstance(value, dict) and "dt" in value:
+            value = datetime.fromisoformat(value["dt"])
+        return value, int(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Geçersiz sayfalama imleci (cursor)")
+
+
+def keyset_order(sort_column, id_column, descending: bool = True) -> List:
+    """keyset_filter ile uyumlu ORDER BY (NULL en büyük; (sort_column, id) indeksiyle taranabilir)"""
+    if descending:
+        return [sort_column.desc().nulls_first(), id_column.desc()]
+    return [sort_column.asc().nulls_last(), id_column.asc()]
+
+
+def keyset_filter(sort_column, id_column, cursor: Optional[str], descending: bool = True):
+    """Cursor'dan sonraki satırlar için WHERE koşulu (cursor yoksa None)"""
+    if not cursor:
+        return None
+    value, row_id = decode_cursor(cursor)
+    if value is None:
+        # Son satırın değeri NULL: azalan sırada NULL'lar önce gelir, sonra NULL olmayanlar;
+        # artan sırada NULL'lar en sondadır
+        if descending:
+            return or_(and_(sort_column.is_(None), id_column < row_id), sort_column.isnot(None))
+        return and_(sort_column.is_(None), id_column > row_id)
+    if descending:
+        return or_(sort_column < value, and_(sort_column == value, id_column < row_id))
+    return or_(sort_column > value, and_(sort_column == value, id_column > row_id), sort_column.is_(None))
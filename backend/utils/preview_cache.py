@@ -0,0 +1,126 @@
+"""
+Dosya Eki Önizleme Önbelleği
+PDF (ilk sayfa) ve TIFF dosyalarının PNG önizlemelerini diskte saklar.
+
+- Anahtar: (attachment_id, boyut varyantı) -> <upload_dir>/previews/<id>-<varyant>.png
+- Ek içeriği değişmediği için önizleme bir kez üretilir; sonraki istekler dosyadan döner
+- Toplam boyut PREVIEW_CACHE_MAX_MB'ı aşarsa en uzun süredir kullanılmayanlar silinir (LRU, mtime ile)
+- Yükleme sonrası önizlemeler arka planda önceden üretilir (generate_previews)
+- Render işi utils/render_pool.py'deki süreç havuzunda çalışır
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from database import SessionLocal
+import models
+from utils.render_pool import render_pool
+
+logger = logging.getLogger("uvicorn")
+
+PREVIEW_DIR = "previews"
+PREVIEW_CACHE_MAX_MB = int(os.getenv("PREVIEW_CACHE_MAX_MB", "512"))
+
+# Varyant adı -> (en büyük kenar px, PDF rasterleştirme DPI)
+PREVIEW_VARIANTS = {
+    "thumb": (300, 50),
+    "large": (1200, 150),
+}
+DEFAULT_PREVIEW_VARIANT = "large"
+
+# Tarayıcıda doğrudan gösterilemeyen, PNG'ye çevrilen türler
+RENDERED_EXTENSIONS = {".pdf", ".tiff", ".tif"}
+
+
+def preview_cache_dir(upload_dir) -> Path:
+    return Path(os.getenv("PREVIEW_CACHE_DIR") or Path(upload_dir) / PREVIEW_DIR)
+
+
+def preview_path(upload_dir, attachment_id: int, variant: str) -> Path:
+    return preview_cache_dir(upload_dir) / f"{attachment_id}-{variant}.png"
+
+
+def get_cached_preview(upload_dir, attachment_id: int, variant: str) -> Optional[Path]:
+    """Önbellekte varsa önizleme yolunu döndür (LRU için erişim zamanını günceller)"""
+    path = preview_path(upload_dir, attachment_id, variant)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def _render_args(upload_dir, attachment_id: int, source_path: Path, extension: str, variant: str):
+    max_px, dpi = PREVIEW_VARIANTS[variant]
+    destination = preview_path(upload_dir, attachment_id, variant)
+    return (attachment_id, variant), str(source_path), str(destination), extension, max_px, dpi
+
+
+async def build_preview(upload_dir, attachment_id: int, source_path: Path, extension: str, variant: str) -> Optional[Path]:
+    """
+    Önizlemeyi render havuzunda üretip önbelleğe yaz.
+    Kuyruk dolu, zaman aşımı veya hata durumunda None (çağıran orijinal dosyayı döner).
+    Blob dosyalarının uzantısı olmadığı için uzantı orijinal dosya adından verilir.
+    """
+    key, *args = _render_args(upload_dir, attachment_id, source_path, extension, variant)
+    if not await render_pool.render(key, *args):
+        return None
+    evict_previews(upload_dir)
+    return Path(args[1])
+
+
+def evict_previews(upload_dir, max_bytes: Optional[int] = None):
+    """Önbellek boyutu limiti aşarsa en eski erişilen önizlemeleri sil"""
+    max_bytes = max_bytes if max_bytes is not None else PREVIEW_CACHE_MAX_MB * 1024 * 1024
+    directory = preview_cache_dir(upload_dir)
+    entries = []
+    total = 0
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.endswith(".png"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+    except FileNotFoundError:
+        return
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+def generate_previews(attachment_id: int):
+    """Yükleme sonrası arka planda tüm varyantları üret (ilk görüntüleme hızlı olsun)"""
+    db = SessionLocal()
+    try:
+        attachment = db.query(models.Attachment).filter(models.Attachment.id == attachment_id).first()
+        if not attachment or not attachment.file_path:
+            return
+        extension = Path(attachment.filename or "").suffix.lower()
+        if extension not in RENDERED_EXTENSIONS:
+            return
+
+        from routers.tickets import get_upload_dir
+        upload_dir = get_upload_dir(db)
+        source_path = Path(upload_dir) / attachment.file_path
+        for variant in PREVIEW_VARIANTS:
+            if not get_cached_preview(upload_dir, attachment.id, variant):
+                key, *args = _render_args(upload_dir, attachment.id, source_path, extension, variant)
+                render_pool.render_sync(key, *args)
+        evict_previews(upload_dir)
+    except Exception as e:
+        logger.warning(f"Önizleme önceden üretilemedi (ek #{attachment_id}): {e}")
+    finally:
+        db.close()
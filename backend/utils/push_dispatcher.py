@@ -0,0 +1,235 @@
+"""
+Web Push Gönderim Katmanı
+Tarayıcı bildirimlerini paylaşılan HTTP oturumu ve önbelleğe alınmış VAPID imzasıyla gönderir.
+
+- HTTP bağlantıları push servisi (FCM, Mozilla autopush vb.) başına havuzda tutulur
+- VAPID anahtarı bir kez okunur; imzalı başlıklar push servisi (aud) başına
+  geçerlilik süresinin sonuna kadar tekrar kullanılır
+- Abonelik JSON'u her gönderimde yeniden parse edilmez
+- Çok alıcılı gönderimler (send_pushes) en fazla PUSH_CONCURRENCY paralel istekle yapılır
+- 404/410 dönen (süresi dolmuş) abonelikler users.browser_notification_token'dan silinir
+- Push servisi başına gecikme ve hata metrikleri metrics_snapshot() ile okunur
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import requests
+from py_vapid import Vapid
+from pywebpush import WebPusher, WebPushException
+from requests.adapters import HTTPAdapter
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+logger = logging.getLogger("uvicorn")
+
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", "8"))
+PUSH_TIMEOUT_SECONDS = float(os.getenv("PUSH_TIMEOUT_SECONDS", "10"))
+# Push servisinin çevrimdışı cihaz için bildirimi saklama süresi
+PUSH_TTL_SECONDS = int(os.getenv("PUSH_TTL_SECONDS", "86400"))
+# VAPID JWT en fazla 24 saat geçerli olabilir; süresi bitmeden 1 saat önce yenilenir
+VAPID_TOKEN_LIFETIME_SECONDS = 12 * 60 * 60
+VAPID_TOKEN_RENEW_MARGIN_SECONDS = 60 * 60
+
+# Abonelik artık geçerli değil
+EXPIRED_STATUS_CODES = (404, 410)
+
+
+@lru_cache(maxsize=4096)
+def parse_subscription(subscription_info: str) -> dict:
+    """Kayıtlı abonelik JSON'u (WebPusher kendi kopyasını aldığı için sonuç paylaşılabilir)"""
+    subscription = json.loads(subscription_info) if isinstance(subscription_info, str) else subscription_info
+    if not isinstance(subscription, dict) or "endpoint" not in subscription:
+        raise ValueError("Geçersiz push aboneliği")
+    return subscription
+
+
+def push_service(endpoint: str) -> str:
+    """Metrik anahtarı: push servisinin host adı (fcm.googleapis.com vb.)"""
+    return urlparse(endpoint).netloc or "unknown"
+
+
+class PushMetrics:
+    """Push servisi başına gönderim sayaçları (thread-safe)"""
+
+    _FIELDS = ("sent", "failed", "expired", "latency_seconds_total", "latency_seconds_max")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._services: Dict[str, Dict[str, float]] = {}
+
+    def record(self, service: str, latency: float, outcome: str):
+        with self._lock:
+            data = self._services.setdefault(service, dict.fromkeys(self._FIELDS, 0))
+            data[outcome] += 1
+            data["latency_seconds_total"] += latency
+            data["latency_seconds_max"] = max(data["latency_seconds_max"], latency)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for service, data in self._services.items():
+                requests_count = (data["sent"] + data["failed"] + data["expired"]) or 1
+                result[service] = {
+                    "sent": data["sent"],
+                    "failed": data["failed"],
+                    "expired": data["expired"],
+                    "latency_seconds_avg": round(data["latency_seconds_total"] / requests_count, 4),
+                    "latency_seconds_max": round(data["latency_seconds_max"], 4),
+                }
+            return result
+
+
+class PushDispatcher:
+    def __init__(self, vapid_private_key: str, vapid_subject: str,
+                 concurrency: int = PUSH_CONCURRENCY, timeout: float = PUSH_TIMEOUT_SECONDS):
+        self.vapid_private_key = vapid_private_key
+        self.vapid_subject = vapid_subject
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.metrics = PushMetrics()
+        self._lock = threading.Lock()
+        self._vapid: Optional[Vapid] = None
+        self._vapid_headers: Dict[str, Tuple[dict, float]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(concurrency, 1))
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="webpush")
+            return self._executor
+
+    def vapid_headers(self, endpoint: str) -> dict:
+        """Push servisi için imzalı VAPID başlıkları (süresi dolana kadar önbellekten)"""
+        parsed = urlparse(endpoint)
+        audience = f"{parsed.scheme}://{parsed.netloc}"
+        now = time.time()
+        with self._lock:
+            cached = self._vapid_headers.get(audience)
+            if cached and cached[1] - VAPID_TOKEN_RENEW_MARGIN_SECONDS > now:
+                return cached[0]
+            if self._vapid is None:
+                self._vapid = Vapid.from_string(private_key=self.vapid_private_key)
+            expires_at = int(now) + VAPID_TOKEN_LIFETIME_SECONDS
+            headers = self._vapid.sign({"sub": self.vapid_subject, "aud": audience, "exp": expires_at})
+            self._vapid_headers[audience] = (headers, expires_at)
+            return headers
+
+    def send(self, subscription_info: str, data: str, ttl: int = PUSH_TTL_SECONDS) -> requests.Response:
+        """
+        Tek aboneliğe gönder. Push servisi hata dönerse WebPushException fırlatır
+        (response.status_code 404/410 ise abonelik geçersizdir).
+        """
+        subscription = parse_subscription(subscription_info)
+        endpoint = subscription["endpoint"]
+        service = push_service(endpoint)
+        headers = dict(self.vapid_headers(endpoint))
+
+        started_at = time.monotonic()
+        try:
+            response = WebPusher(subscription, requests_session=self._session).send(
+                data, headers, ttl=ttl, timeout=self.timeout
+            )
+        except Exception:
+            self.metrics.record(service, time.monotonic() - started_at, "failed")
+            raise
+        latency = time.monotonic() - started_at
+
+        if response.status_code > 202:
+            outcome = "expired" if response.status_code in EXPIRED_STATUS_CODES else "failed"
+            self.metrics.record(service, latency, outcome)
+            raise WebPushException(
+                f"Push failed: {response.status_code} {response.reason}", response=response
+            )
+        self.metrics.record(service, latency, "sent")
+        return response
+
+    def _send_quietly(self, subscription_info: str, data: str) -> Tuple[bool, bool]:
+        """(gönderildi mi, abonelik süresi dolmuş mu) - send_pushes için"""
+        try:
+            self.send(subscription_info, data)
+            return True, False
+        except WebPushException as e:
+            expired = e.response is not None and e.response.status_code in EXPIRED_STATUS_CODES
+            if not expired:
+                logger.error(f"Web Push gönderme hatası: {e}")
+            return False, expired
+        except Exception as e:
+            logger.error(f"Web Push gönderme hatası: {e}")
+            return False, False
+
+    async def send_pushes(self, pushes: Sequence[Tuple[str, str]]) -> int:
+        """
+        (abonelik, veri) çiftlerini en fazla concurrency paralel istekle gönder.
+        Süresi dolmuş abonelikler tek sorguyla silinir. Başarılı gönderim sayısını döndürür.
+        """
+        if not pushes:
+            return 0
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(executor, self._send_quietly, subscription_info, data)
+            for subscription_info, data in pushes
+        ])
+        expired = {subscription_info for (subscription_info, _), (_, is_expired) in zip(pushes, results) if is_expired}
+        if expired:
+            await loop.run_in_executor(executor, prune_subscriptions, expired)
+        return sum(1 for sent, _ in results if sent)
+
+    def metrics_snapshot(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "timeout_seconds": self.timeout,
+            "vapid_audiences_cached": len(self._vapid_headers),
+            "services": self.metrics.snapshot(),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        self._session.close()
+
+
+def prune_subscriptions(subscriptions: Iterable[str], db: Optional[Session] = None) -> int:
+    """
+    Süresi dolmuş abonelikleri kullanıcılardan sil.
+    Sadece token hâlâ aynıysa silinir; kullanıcı bu arada yeniden abone olduysa yeni kayıt korunur.
+    """
+    subscriptions = list(subscriptions)
+    if not subscriptions:
+        return 0
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        count = db.query(models.User).filter(
+            models.User.browser_notification_token.in_(subscriptions)
+        ).update({models.User.browser_notification_token: None}, synchronize_session=False)
+        db.commit()
+        if count:
+            logger.info(f"{count} süresi dolmuş push aboneliği silindi")
+        return count
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Push abonelikleri silinemedi: {e}")
+        return 0
+    finally:
+        if own_session:
+            db.close()
@@ -0,0 +1,485 @@
+"""
+Gerçek Zamanlı Olay Kanalı (/ws)
+Bildirimleri, talep durum/atama değişikliklerini, yeni yorumları ve dışa aktarma işlerinin ilerlemesini bağlı tarayıcılara iletir.
+
+- Olaylar realtime_events tablosuna işlemle aynı transaction'da yazılır (publish_event)
+- PostgreSQL'de commit sırasında NOTIFY realtime_events gönderilir; her uvicorn worker'ı
+  LISTEN ile uyanıp yeni olayları tek sorguda okur (NOTIFY yoksa REALTIME_POLL_SECONDS ile yoklar)
+- Kullanıcıya özel olaylar (bildirim, dışa aktarma işi) sadece o kullanıcıya, talep olayları sadece talebi
+  görebilen kullanıcılara (TicketAccessChecker) gider
+- Her bağlantıya olaylar toplu (batch) gönderilir; boşta REALTIME_HEARTBEAT_SECONDS'da bir heartbeat
+- İstemci ?last_event_id=N ile yeniden bağlanırsa kaçırdığı olaylar tekrar gönderilir;
+  fazla geride kaldıysa {"type": "resync"} alır ve listeyi baştan yükler
+
+İstemci protokolü:
+    ws://.../ws?token=<JWT>&last_event_id=<son alınan id>
+    <- {"type": "events", "events": [{"id": 12, "type": "notification", "data": {...}}, ...]}
+    <- {"type": "heartbeat", "last_event_id": 12}
+    <- {"type": "resync"}
+    -> "ping"  (<- {"type": "pong"})
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable, List, Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+from sqlalchemy import func, insert, or_, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import models
+from database import SessionLocal, engine
+
+logger = logging.getLogger("uvicorn")
+
+REALTIME_CHANNEL = "realtime_events"
+REALTIME_HEARTBEAT_SECONDS = float(os.getenv("REALTIME_HEARTBEAT_SECONDS", "25"))
+# LISTEN yoksa (SQLite, bağlantı koptu) yeni olaylar bu aralıkla yoklanır
+REALTIME_POLL_SECONDS = float(os.getenv("REALTIME_POLL_SECONDS", "2"))
+# Bir gönderimde en fazla bu kadar olay; kısa bekleme ile art arda gelen olaylar birleştirilir
+REALTIME_BATCH_SIZE = int(os.getenv("REALTIME_BATCH_SIZE", "100"))
+REALTIME_BATCH_DELAY_SECONDS = float(os.getenv("REALTIME_BATCH_DELAY_SECONDS", "0.05"))
+# Yavaş istemci: kuyruk dolarsa bağlantı kapatılır, istemci last_event_id ile devam eder
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "1000"))
+REALTIME_REPLAY_LIMIT = int(os.getenv("REALTIME_REPLAY_LIMIT", "500"))
+REALTIME_EVENT_RETENTION_HOURS = int(os.getenv("REALTIME_EVENT_RETENTION_HOURS", "24"))
+# Eşzamanlı transaction'lar id sırasıyla commit olmayabilir; son id'nin bu kadar gerisinden okunur
+_REORDER_WINDOW = 200
+_FETCH_LIMIT = 1000
+_PURGE_INTERVAL_SECONDS = 3600
+
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_RESYNC = 4409
+
+EVENT_NOTIFICATION = "notification"
+EVENT_NOTIFICATION_READ = "notification.read"
+EVENT_TICKET_CREATED = "ticket.created"
+EVENT_TICKET_UPDATED = "ticket.updated"
+EVENT_COMMENT_CREATED = "comment.created"
+EVENT_EXPORT_JOB_UPDATED = "export_job.updated"
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _notify(db: Session):
+    # NOTIFY transaction commit edilince iletilir; aynı transaction'daki tekrarlar birleştirilir
+    if _is_postgres(db):
+        db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": REALTIME_CHANNEL})
+
+
+def event_values(event_type: str, data: dict, user_id: Optional[int] = None, ticket_id: Optional[int] = None) -> dict:
+    return {
+        "event_type": event_type,
+        "user_id": user_id,
+        "ticket_id": ticket_id,
+        "data": json.dumps(data, ensure_ascii=False, default=str),
+        "created_at": datetime.utcnow(),
+    }
+
+
+def publish_event(db: Session, event_type: str, data: dict, user_id: Optional[int] = None,
+                  ticket_id: Optional[int] = None):
+    """Olayı kaydet (commit çağırana aittir; olay ancak commit sonrası gönderilir)"""
+    publish_events(db, [event_values(event_type, data, user_id, ticket_id)])
+
+
+def publish_events(db: Session, events: List[dict]):
+    """event_values() satırlarını tek executemany ile kaydet"""
+    if not events:
+        return
+    db.execute(insert(models.RealtimeEvent), events)
+    _notify(db)
+
+
+def ticket_event_data(ticket: models.Ticket) -> dict:
+    return {
+        "id": ticket.id,
+        "title": ticket.title,
+        "status": ticket.status,
+        "priority": ticket.priority,
+        "department_id": ticket.department_id,
+        "assignee_id": ticket.assignee_id,
+        "updated_at": ticket.updated_at,
+    }
+
+
+def comment_event_data(comment: models.Comment, author: Optional[models.User] = None) -> dict:
+    return {
+        "id": comment.id,
+        "ticket_id": comment.ticket_id,
+        "user_id": comment.user_id,
+        "user_full_name": author.full_name if author else None,
+        "content": comment.content,
+        "created_at": comment.created_at,
+    }
+
+
+def _serialize(event: models.RealtimeEvent) -> dict:
+    return {"id": event.id, "type": event.event_type, "data": json.loads(event.data)}
+
+
+class RealtimeConnection:
+    # Talep olaylarını da alır (SSE bildirim akışı sadece kullanıcıya özel olayları alır)
+    ticket_events = True
+
+    def __init__(self, websocket: WebSocket, user_id: int, last_event_id: int = 0):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.last_event_id = last_event_id
+        # Bu id ve öncesi istemcide var; üstündekiler id yerine gönderilenler kümesiyle tekilleştirilir
+        # (geç commit olan düşük id'li olaylar da iletilir)
+        self._floor = last_event_id
+        self._sent_ids: Deque[int] = deque(maxlen=_REORDER_WINDOW * 5)
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=REALTIME_QUEUE_SIZE)
+        self.overflowed = False
+        self._send_lock = asyncio.Lock()
+
+    def reset(self, last_event_id: int):
+        self.last_event_id = self._floor = last_event_id
+
+    def offer(self, events: Iterable[dict]):
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.overflowed = True
+                return
+
+    async def send(self, message: dict):
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+
+    async def sender(self):
+        """Kuyruktaki olayları toplu gönderir, boşta heartbeat atar"""
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=REALTIME_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await self.send({"type": "heartbeat", "last_event_id": self.last_event_id})
+                continue
+
+            # Aynı işlemden gelen olaylar (talep + bildirim + yorum) tek mesajda gitsin
+            if self.queue.empty():
+                await asyncio.sleep(REALTIME_BATCH_DELAY_SECONDS)
+            batch = [first]
+            while len(batch) < REALTIME_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            if self.overflowed:
+                await self.websocket.close(code=CLOSE_RESYNC)
+                return
+
+            # Yeniden bağlanma sırasında hem replay hem canlı akıştan gelen tekrarları at
+            batch = [event for event in batch if event["id"] > self._floor and event["id"] not in self._sent_ids]
+            if batch:
+                self._sent_ids.extend(event["id"] for event in batch)
+                self.last_event_id = max(self.last_event_id, max(event["id"] for event in batch))
+                await self.send({"type": "events", "events": batch})
+
+
+class RealtimeHub:
+    """Süreç içindeki /ws bağlantıları ve olay dağıtımı"""
+
+    def __init__(self):
+        self._connections: Dict[int, Set[RealtimeConnection]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listen_conn = None
+        self._last_id = 0
+        self._seen: Deque[int] = deque(maxlen=_REORDER_WINDOW * 5)
+        self._seen_set: Set[int] = set()
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_id
+
+    # --- Bağlantılar ---
+
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self._connections.values())
+
+    def register(self, connection):
+        """connection: user_id, ticket_events ve offer(olaylar) sağlayan abone (/ws veya SSE)"""
+        self._connections.setdefault(connection.user_id, set()).add(connection)
+
+    def unregister(self, connection):
+        connections = self._connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._connections[connection.user_id]
+
+    # --- Yaşam döngüsü ---
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop_listening()
+
+    def _start_listening(self) -> bool:
+        """PostgreSQL LISTEN bağlantısını aç; SQLite veya hata durumunda False"""
+        if engine.dialect.name != "postgresql":
+            return False
+        try:
+            raw = engine.raw_connection()
+            # Havuzdan ayrılan bağlantı sadece LISTEN için kullanılır
+            raw.detach()
+            conn = raw.driver_connection
+            conn.set_session(autocommit=True)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {REALTIME_CHANNEL}")
+            asyncio.get_running_loop().add_reader(conn.fileno(), self._on_notify)
+            self._listen_conn = conn
+            logger.info("Realtime: PostgreSQL LISTEN başlatıldı")
+            return True
+        except Exception as e:
+            logger.error(f"Realtime: LISTEN başlatılamadı, yoklamaya geçiliyor: {e}")
+            self._stop_listening()
+            return False
+
+    def _stop_listening(self):
+        conn, self._listen_conn = self._listen_conn, None
+        if conn is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _on_notify(self):
+        conn = self._listen_conn
+        if conn is None:
+            return
+        try:
+            conn.poll()
+            conn.notifies.clear()
+        except Exception as e:
+            logger.warning(f"Realtime: LISTEN bağlantısı koptu: {e}")
+            self._stop_listening()
+        self._wake.set()
+
+    async def _run(self):
+        self._last_id = await run_in_threadpool(_max_event_id)
+        last_purge = 0.0
+        while True:
+            try:
+                if self._listen_conn is None:
+                    self._start_listening()
+                # LISTEN varken yoklama sadece güvenlik için (kaçan NOTIFY)
+                timeout = REALTIME_POLL_SECONDS if self._listen_conn is None else REALTIME_HEARTBEAT_SECONDS
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+                if self._connections:
+                    events = await run_in_threadpool(_fetch_events, self._last_id - _REORDER_WINDOW)
+                    events = [event for event in events if event.id not in self._seen_set]
+                    if events:
+                        self._mark_seen(events)
+                        await self._dispatch(events)
+                else:
+                    self._last_id = await run_in_threadpool(_max_event_id)
+
+                if time.time() - last_purge > _PURGE_INTERVAL_SECONDS:
+                    await run_in_threadpool(purge_events)
+                    last_purge = time.time()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Realtime dağıtım hatası: {e}")
+                await asyncio.sleep(REALTIME_POLL_SECONDS)
+
+    def _mark_seen(self, events: List[models.RealtimeEvent]):
+        for event in events:
+            if len(self._seen) == self._seen.maxlen:
+                self._seen_set.discard(self._seen[0])
+            self._seen.append(event.id)
+            self._seen_set.add(event.id)
+            self._last_id = max(self._last_id, event.id)
+
+    async def _dispatch(self, events: List[models.RealtimeEvent]):
+        user_ids = set(self._connections)
+        ticket_ids = {event.ticket_id for event in events if event.ticket_id is not None and event.user_id is None}
+        # Sadece talep olaylarını dinleyen bağlantısı olan kullanıcılar için görünürlük kontrolü
+        ticket_user_ids = {
+            user_id for user_id in user_ids
+            if any(connection.ticket_events for connection in self._connections.get(user_id, ()))
+        }
+        visible = {}
+        if ticket_ids and ticket_user_ids:
+            visible = await run_in_threadpool(_visible_tickets, ticket_user_ids, ticket_ids)
+
+        serialized = [(event, _serialize(event)) for event in events]
+        for user_id in user_ids:
+            user_events = [
+                data for event, data in serialized
+                if event.user_id == user_id
+                or (event.user_id is None and event.ticket_id in visible.get(user_id, ()))
+            ]
+            if user_events:
+                for connection in list(self._connections.get(user_id, ())):
+                    connection.offer(user_events)
+
+    async def replay(self, connection: RealtimeConnection, user: models.User):
+        """last_event_id sonrasındaki olayları bağlantının kuyruğuna ekle"""
+        events, complete = await run_in_threadpool(_replay_events, user, connection.last_event_id)
+        if not complete:
+            await connection.send({"type": "resync"})
+            connection.reset(self._last_id)
+            return
+        connection.offer(events)
+
+
+def _max_event_id() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.max(models.RealtimeEvent.id)).scalar() or 0
+    finally:
+        db.close()
+
+
+def _fetch_events(after_id: int) -> List[models.RealtimeEvent]:
+    db = SessionLocal()
+    try:
+        events = db.query(models.RealtimeEvent).filter(
+            models.RealtimeEvent.id > after_id
+        ).order_by(models.RealtimeEvent.id).limit(_FETCH_LIMIT).all()
+        db.expunge_all()
+        return events
+    finally:
+        db.close()
+
+
+def _visible_tickets(user_ids: Set[int], ticket_ids: Set[int]) -> Dict[int, Set[int]]:
+    """Bağlı kullanıcıların olaylardaki taleplerden görebildikleri (bağlantı sayısından bağımsız sorgu sayısı)"""
+    from utils.ticket_access import visible_tickets_by_user
+
+    db = SessionLocal()
+    try:
+        users = db.query(models.User).filter(models.User.id.in_(user_ids), models.User.is_active == True).all()
+        return visible_tickets_by_user(db, users, ticket_ids)
+    finally:
+        db.close()
+
+
+def _replay_events(user: models.User, after_id: int):
+    """(kullanıcının görebileceği olaylar, eksiksiz mi) - eksikse istemci yeniden yüklemeli"""
+    from utils.ticket_access import TicketAccessChecker
+
+    db = SessionLocal()
+    try:
+        oldest = db.query(func.min(models.RealtimeEvent.id)).scalar()
+        if oldest is not None and oldest > after_id + 1:
+            # Aradaki olaylar silinmiş
+            return [], False
+        events = db.query(models.RealtimeEvent).filter(
+            models.RealtimeEvent.id > after_id,
+            or_(models.RealtimeEvent.user_id == user.id, models.RealtimeEvent.user_id.is_(None))
+        ).order_by(models.RealtimeEvent.id).limit(REALTIME_REPLAY_LIMIT + 1).all()
+        if len(events) > REALTIME_REPLAY_LIMIT:
+            return [], False
+        allowed = set(TicketAccessChecker(db, user).filter_accessible(
+            {event.ticket_id for event in events if event.user_id is None and event.ticket_id is not None}
+        ))
+        return [
+            _serialize(event) for event in events
+            if event.user_id == user.id or event.ticket_id in allowed
+        ], True
+    finally:
+        db.close()
+
+
+def purge_events(older_than_hours: int = REALTIME_EVENT_RETENTION_HOURS) -> int:
+    db = SessionLocal()
+    try:
+        count = db.query(models.RealtimeEvent).filter(
+            models.RealtimeEvent.created_at < datetime.utcnow() - timedelta(hours=older_than_hours)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return count
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Realtime olay temizliği başarısız: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def _authenticate(token: Optional[str]) -> Optional[models.User]:
+    from auth import get_user_from_token
+
+    db = SessionLocal()
+    try:
+        user = get_user_from_token(db, token)
+        if user is not None:
+            db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+
+realtime_hub = RealtimeHub()
+
+
+async def handle_websocket(websocket: WebSocket):
+    """/ws endpoint'i: kimlik doğrulama, replay, canlı akış ve heartbeat"""
+    token = websocket.query_params.get("token")
+    user = await run_in_threadpool(_authenticate, token)
+    if user is None:
+        await websocket.close(code=CLOSE_UNAUTHORIZED)
+        return
+    try:
+        last_event_id = int(websocket.query_params.get("last_event_id") or 0)
+    except ValueError:
+        last_event_id = 0
+
+    await websocket.accept()
+    connection = RealtimeConnection(websocket, user.id, last_event_id)
+    # Replay'den önce kaydol: arada gelen canlı olaylar kuyruğa düşer, tekrarlar sender'da atılır
+    realtime_hub.register(connection)
+    try:
+        if last_event_id:
+            await realtime_hub.replay(connection, user)
+        else:
+            connection.reset(realtime_hub.last_event_id)
+            await connection.send({"type": "heartbeat", "last_event_id": connection.last_event_id})
+        sender = asyncio.create_task(connection.sender())
+        receiver = asyncio.create_task(_receive(connection))
+        done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.warning(f"WebSocket bağlantı hatası: {task.exception()}")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        realtime_hub.unregister(connection)
+        logger.info("WebSocket bağlantısı kapatıldı.")
+
+
+async def _receive(connection: RealtimeConnection):
+    while True:
+        message = await connection.websocket.receive_text()
+        if message == "ping":
+            await connection.send({"type": "pong"})
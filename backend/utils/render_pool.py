@@ -0,0 +1,228 @@
+"""
+Önizleme Render Havuzu
+PDF rasterleştirme ve TIFF -> PNG dönüşümünü web worker'ı yerine ayrı süreçlerde çalıştırır.
+
+- Sınırlı ProcessPoolExecutor (PREVIEW_RENDER_WORKERS süreç)
+- Kuyruk limiti: bekleyen + çalışan iş sayısı PREVIEW_RENDER_QUEUE_MAX'a ulaşınca yeni iş alınmaz,
+  endpoint orijinal dosyayı döner
+- İş başına zaman aşımı (PREVIEW_RENDER_TIMEOUT_SECONDS); aşılırsa orijinal dosya döner
+- Aynı (ek, varyant) için eşzamanlı istekler tek işi paylaşır
+- Render süresi ve kuyruk bekleme metrikleri metrics_snapshot() ile okunur
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger("uvicorn")
+
+PREVIEW_RENDER_WORKERS = int(os.getenv("PREVIEW_RENDER_WORKERS", "2"))
+PREVIEW_RENDER_QUEUE_MAX = int(os.getenv("PREVIEW_RENDER_QUEUE_MAX", "8"))
+PREVIEW_RENDER_TIMEOUT_SECONDS = float(os.getenv("PREVIEW_RENDER_TIMEOUT_SECONDS", "20"))
+
+
+def render_preview_file(source_path: str, destination: str, extension: str, max_px: int, dpi: int,
+                        timeout: Optional[float] = None) -> bool:
+    """
+    Kaynağın PNG önizlemesini destination'a yaz (geçici dosya + atomik rename).
+    Alt süreçte çalışır; timeout poppler (pdftoppm) sürecine de uygulanır.
+    """
+    from PIL import Image
+
+    if extension == ".pdf":
+        from pdf2image import convert_from_path
+        images = convert_from_path(source_path, first_page=1, last_page=1, dpi=dpi, timeout=timeout)
+        if not images:
+            return False
+        img = images[0]
+    else:
+        img = Image.open(source_path)
+        # Transparanlık kaybını önlemek için RGBA'ya çeviriyoruz
+        img = img.convert("RGBA")
+
+    try:
+        img.thumbnail((max_px, max_px))
+        directory = os.path.dirname(destination)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".preview-", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                img.save(out, "PNG")
+            os.replace(temp_path, destination)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    finally:
+        img.close()
+    return True
+
+
+def _render_job(submitted_at: float, source_path: str, destination: str, extension: str,
+                max_px: int, dpi: int, timeout: float) -> Tuple[bool, float, float]:
+    """Alt süreçte çalışır: (başarılı mı, kuyrukta bekleme süresi, render süresi)"""
+    started_at = time.time()
+    ok = render_preview_file(source_path, destination, extension, max_px, dpi, timeout=timeout)
+    return ok, started_at - submitted_at, time.time() - started_at
+
+
+class RenderMetrics:
+    """Render havuzu sayaçları (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.render_seconds_total = 0.0
+        self.render_seconds_max = 0.0
+        self.queue_wait_seconds_total = 0.0
+        self.queue_wait_seconds_max = 0.0
+
+    def increment(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record(self, queue_wait: float, render_time: float):
+        with self._lock:
+            self.completed += 1
+            self.render_seconds_total += render_time
+            self.render_seconds_max = max(self.render_seconds_max, render_time)
+            self.queue_wait_seconds_total += queue_wait
+            self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, queue_wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "render_seconds_avg": round(self.render_seconds_total / completed, 4),
+                "render_seconds_max": round(self.render_seconds_max, 4),
+                "queue_wait_seconds_avg": round(self.queue_wait_seconds_total / completed, 4),
+                "queue_wait_seconds_max": round(self.queue_wait_seconds_max, 4),
+            }
+
+
+class RenderPool:
+    def __init__(self, max_workers: int = PREVIEW_RENDER_WORKERS, max_queue: int = PREVIEW_RENDER_QUEUE_MAX,
+                 timeout: float = PREVIEW_RENDER_TIMEOUT_SECONDS):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.metrics = RenderMetrics()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: alt süreçler web worker'ın thread/bağlantı durumunu devralmaz
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, key: Hashable, source_path: str, destination: str, extension: str,
+               max_px: int, dpi: int) -> Optional[Future]:
+        """İşi kuyruğa al; kuyruk doluysa None (çağıran orijinal dosyaya düşer)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if self._pending >= self.max_queue:
+                self.metrics.increment("rejected")
+                return None
+            args = (time.time(), source_path, destination, extension, max_px, dpi, self.timeout)
+            try:
+                future = self._get_executor().submit(_render_job, *args)
+            except BrokenProcessPool:
+                # Bir alt süreç çöktüyse havuzu yeniden kur
+                logger.error("Önizleme render havuzu bozuldu, yeniden başlatılıyor")
+                self._executor = None
+                future = self._get_executor().submit(_render_job, *args)
+            self._pending += 1
+            self._inflight[key] = future
+            self.metrics.increment("submitted")
+        future.add_done_callback(lambda f: self._finished(key, f))
+        return future
+
+    def _finished(self, key: Hashable, future: Future):
+        with self._lock:
+            self._pending -= 1
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        try:
+            ok, queue_wait, render_time = future.result()
+            self.metrics.record(queue_wait, render_time)
+            if not ok:
+                self.metrics.increment("failed")
+        except Exception as e:
+            self.metrics.increment("failed")
+            logger.warning(f"Önizleme render hatası: {e}")
+
+    async def render(self, key: Hashable, source_path: str, destination: str, extension: str,
+                     max_px: int, dpi: int) -> bool:
+        """Event loop'u bloklamadan render et; kuyruk dolu/zaman aşımı/hata durumunda False"""
+        future = self.submit(key, source_path, destination, extension, max_px, dpi)
+        if future is None:
+            return False
+        try:
+            # shield: zaman aşımında iş iptal edilmez, aynı işi bekleyen diğer istekler etkilenmez
+            ok, _, _ = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+            return ok
+        except asyncio.TimeoutError:
+            self.metrics.increment("timeouts")
+            return False
+        except Exception:
+            return False
+
+    def render_sync(self, key: Hashable, source_path: str, destination: str, extension: str,
+                    max_px: int, dpi: int) -> bool:
+        """Arka plan görevleri için bloklayan sürüm (threadpool'dan çağrılır)"""
+        future = self.submit(key, source_path, destination, extension, max_px, dpi)
+        if future is None:
+            return False
+        try:
+            ok, _, _ = future.result(timeout=self.timeout)
+            return ok
+        except concurrent.futures.TimeoutError:
+            self.metrics.increment("timeouts")
+            return False
+        except Exception:
+            return False
+
+    def metrics_snapshot(self) -> dict:
+        data = self.metrics.snapshot()
+        with self._lock:
+            data["in_queue"] = self._pending
+        data["max_workers"] = self.max_workers
+        data["max_queue"] = self.max_queue
+        data["timeout_seconds"] = self.timeout
+        return data
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+render_pool = RenderPool()
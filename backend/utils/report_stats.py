@@ -0,0 +1,492 @@
+"""
+Rapor İstatistikleri (günlük özet tabloları + canlı kuyruk)
+
+/reports/stats ve /reports/personnel-stats her açılışta tüm tickets tablosunu gruplamaz:
+- ticket_daily_stats: oluşturma günü / birim / durum / öncelik / gizli / atanmış başına talep sayısı
+- ticket_user_daily_stats: oluşturma günü / birim / kullanıcı / rol (creator, assignee) başına sayaçlar
+  ve kapalı taleplerin çözüm süresi toplamı
+- PostgreSQL'de tickets üzerindeki statement-level tetikleyiciler (transition table) her
+  INSERT/UPDATE/DELETE'in farkını tek upsert ile özetlere yansıtır; özetler her an günceldir
+
+Sorgu, tarih aralığının tam günlerini özetten okur; aralığın kenarlarındaki kısmi günler
+(ör. 14:30'dan itibaren) ve kullanıcının kendi talepleri gibi birim özetine sığmayan kısımlar
+tickets tablosundan canlı sayılır (indeksli, küçük "canlı kuyruk").
+
+Tetikleyici yoksa (SQLite, kurulum öncesi) her şey doğrudan tickets üzerinden hesaplanır.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, extract, func, or_, text, true
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger("uvicorn")
+
+_ROLLUP_TRIGGER = "tickets_report_rollup"
+
+_DAILY_CHANGES = """
+    SELECT created_at::date AS day, coalesce(department_id, 0) AS department_id,
+           coalesce(status, '') AS status, coalesce(priority, '') AS priority,
+           coalesce(is_private, false) AS is_private, assignee_id IS NOT NULL AS is_assigned,
+           {sign} AS delta
+    FROM {rows} WHERE created_at IS NOT NULL
+"""
+
+_DAILY_APPLY = """
+    INSERT INTO ticket_daily_stats (day, department_id, status, priority, is_private, is_assigned, ticket_count)
+    SELECT day, department_id, status, priority, is_private, is_assigned, SUM(delta)
+    FROM ({changes}) changes
+    GROUP BY day, department_id, status, priority, is_private, is_assigned
+    HAVING SUM(delta) <> 0
+    ON CONFLICT (day, department_id, status, priority, is_private, is_assigned) DO UPDATE
+    SET ticket_count = ticket_daily_stats.ticket_count + EXCLUDED.ticket_count;
+"""
+
+_USER_CHANGES = """
+    SELECT created_at::date AS day, coalesce(department_id, 0) AS department_id,
+           {user_column} AS user_id, '{role}' AS role,
+           {sign} AS delta,
+           CASE WHEN priority = 'urgent' THEN {sign} ELSE 0 END AS urgent_delta,
+           CASE WHEN priority = 'high' THEN {sign} ELSE 0 END AS high_delta,
+           CASE WHEN status = 'open' THEN {sign} ELSE 0 END AS open_delta,
+           CASE WHEN status = 'closed' THEN {sign} ELSE 0 END AS closed_delta,
+           CASE WHEN status = 'closed' AND updated_at IS NOT NULL
+                THEN {sign} * (extract(epoch FROM updated_at) - extract(epoch FROM created_at)) ELSE 0 END AS seconds_delta,
+           CASE WHEN status = 'closed' AND updated_at IS NOT NULL THEN {sign} ELSE 0 END AS timed_delta
+    FROM {rows} WHERE created_at IS NOT NULL AND {user_column} IS NOT NULL
+"""
+
+_USER_APPLY = """
+    INSERT INTO ticket_user_daily_stats (day, department_id, user_id, role, ticket_count, urgent_count,
+                                         high_count, open_count, closed_count, resolution_seconds, resolution_count)
+    SELECT day, department_id, user_id, role, SUM(delta), SUM(urgent_delta), SUM(high_delta), SUM(open_delta), SUM(closed_delta),
+           SUM(seconds_delta), SUM(timed_delta)
+    FROM ({changes}) changes
+    GROUP BY day, department_id, user_id, role
+    HAVING SUM(delta) <> 0 OR SUM(urgent_delta) <> 0 OR SUM(high_delta) <> 0 OR SUM(open_delta) <> 0
+        OR SUM(closed_delta) <> 0 OR SUM(seconds_delta) <> 0 OR SUM(timed_delta) <> 0
+    ON CONFLICT (day, department_id, user_id, role) DO UPDATE
+    SET ticket_count = ticket_user_daily_stats.ticket_count + EXCLUDED.ticket_count,
+        urgent_count = ticket_user_daily_stats.urgent_count + EXCLUDED.urgent_count,
+        high_count = ticket_user_daily_stats.high_count + EXCLUDED.high_count,
+        open_count = ticket_user_daily_stats.open_count + EXCLUDED.open_count,
+        closed_count = ticket_user_daily_stats.closed_count + EXCLUDED.closed_count,
+        resolution_seconds = ticket_user_daily_stats.resolution_seconds + EXCLUDED.resolution_seconds,
+        resolution_count = ticket_user_daily_stats.resolution_count + EXCLUDED.resolution_count;
+"""
+
+_ROLLUP_EVENTS = {
+    "ins": ("INSERT", "NEW TABLE AS new_rows", [("new_rows", "1")]),
+    # Transition table kullanan UPDATE tetikleyicisi sütun listesi alamaz; değişmeyen satırların
+    # +1/-1 farkı GROUP BY'da birbirini götürür
+    "upd": ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+            [("new_rows", "1"), ("old_rows", "-1")]),
+    "del": ("DELETE", "OLD TABLE AS old_rows", [("old_rows", "-1")]),
+}
+
+
+def _apply_statements(sources: List[Tuple[str, str]]) -> str:
+    """(satır kaynağı, işaret) listesinden iki özet tablosunu güncelleyen SQL"""
+    daily = " UNION ALL ".join(_DAILY_CHANGES.format(rows=rows, sign=sign) for rows, sign in sources)
+    users = " UNION ALL ".join(
+        _USER_CHANGES.format(rows=rows, sign=sign, user_column=column, role=role)
+        for rows, sign in sources
+        for column, role in (("creator_id", "creator"), ("assignee_id", "assignee"))
+    )
+    return _DAILY_APPLY.format(changes=daily) + _USER_APPLY.format(changes=users)
+
+
+def _rollup_statements() -> List[str]:
+    statements = []
+    for suffix, (event, referencing, sources) in _ROLLUP_EVENTS.items():
+        function = f"ticket_report_rollup_{suffix}"
+        statements.append(f"""
+            CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+            BEGIN
+                {_apply_statements(sources)}
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        statements.append(f"""
+            CREATE TRIGGER {_ROLLUP_TRIGGER}_{suffix} AFTER {event} ON tickets
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+    return statements
+
+
+_rollup_state: Dict[str, bool] = {}
+
+
+def _rollup_trigger_exists(conn) -> bool:
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_trigger WHERE tgname = :name"), {"name": f"{_ROLLUP_TRIGGER}_ins"}
+    ).first())
+
+
+def install_report_rollups(engine: Engine, rebuild: bool = False) -> bool:
+    """
+    Özet tablolarını mevcut taleplerden doldurur ve tetikleyicileri kurar (sadece PostgreSQL).
+    Tetikleyici zaten varsa rebuild=True verilmedikçe hiçbir şey yapmaz. Kurulum yapıldıysa True döner.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    if not rebuild:
+        with engine.connect() as conn:
+            if _rollup_trigger_exists(conn):
+                return False
+    models.TicketDailyStat.__table__.create(bind=engine, checkfirst=True)
+    models.TicketUserDailyStat.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        # Doldurma ile tetikleyici arasında yazılan talep özete girmeden kalmasın
+        conn.execute(text("LOCK TABLE tickets IN SHARE ROW EXCLUSIVE MODE"))
+        installed = _rollup_trigger_exists(conn)
+        if installed and not rebuild:
+            return False
+        conn.execute(text("DELETE FROM ticket_daily_stats"))
+        conn.execute(text("DELETE FROM ticket_user_daily_stats"))
+        for statement in _apply_statements([("tickets", "1")]).split(";"):
+            if statement.strip():
+                conn.execute(text(statement))
+        if not installed:
+            for statement in _rollup_statements():
+                conn.execute(text(statement))
+    _rollup_state.clear()
+    logger.info("Rapor özet tabloları " + ("yeniden oluşturuldu" if installed else "kuruldu"))
+    return True
+
+
+def rollups_enabled(db: Session) -> bool:
+    """Özet tetikleyicisi kurulu mu (süreç başına bir kez kontrol edilir)"""
+    enabled = _rollup_state.get("enabled")
+    if enabled is None:
+        enabled = db.get_bind().dialect.name == "postgresql" and _rollup_trigger_exists(db)
+        _rollup_state["enabled"] = enabled
+    return enabled
+
+
+# ==================== Erişim ve tarih aralığı ====================
+
+def report_access_filter(current_user: models.User):
+    """Raporlama erişim koşulu (admin için None)"""
+    if current_user.is_admin:
+        return None
+    access_conditions = [
+        models.Ticket.creator_id == current_user.id,
+        models.Ticket.assignee_id == current_user.id
+    ]
+    department_condition = _department_condition(current_user)
+    if department_condition is not None:
+        access_conditions.append(department_condition)
+    return or_(*access_conditions)
+
+
+def _department_condition(current_user: models.User):
+    """Birim kuralı: yönetici tüm birimi, diğerleri gizli olmayan ve atanmamış talepleri görür"""
+    if not current_user.department_id:
+        return None
+    conditions = [models.Ticket.department_id == current_user.department_id]
+    if not current_user.role == models.UserRole.DEPARTMENT_ADMIN:
+        conditions.append(models.Ticket.is_private.isnot(True))
+        conditions.append(models.Ticket.assignee_id == None)
+    return and_(*conditions)
+
+
+def _outside_department_condition(current_user: models.User):
+    """_department_condition'ın tersi (NULL değerler dahil)"""
+    conditions = [
+        models.Ticket.department_id == None,
+        models.Ticket.department_id != current_user.department_id
+    ]
+    if not current_user.role == models.UserRole.DEPARTMENT_ADMIN:
+        conditions.append(models.Ticket.is_private.is_(True))
+        conditions.append(models.Ticket.assignee_id != None)
+    return or_(*conditions)
+
+
+def parse_report_datetime(value) -> Optional[datetime]:
+    """ISO tarih/saat (str veya datetime) -> UTC, saat dilimsiz datetime"""
+    if value is None or value == "":
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Geçersiz tarih: {value}")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class _Window:
+    """
+    [start, end] aralığının özet ve canlı kısımları.
+    Tam günler [full_start, full_end) özetten, kenarlar tickets'tan okunur.
+    """
+
+    def __init__(self, start: Optional[datetime], end: Optional[datetime]):
+        self.date_filters = []
+        if start is not None:
+            self.date_filters.append(models.Ticket.created_at >= start)
+        if end is not None:
+            self.date_filters.append(models.Ticket.created_at <= end)
+
+        self.full_start = None
+        if start is not None:
+            midnight = datetime.combine(start.date(), time.min)
+            self.full_start = midnight if midnight == start else midnight + timedelta(days=1)
+        self.full_end = datetime.combine(end.date(), time.min) if end is not None else None
+        self.has_full_days = self.full_start is None or self.full_end is None or self.full_start < self.full_end
+
+    def rollup_filters(self, model) -> list:
+        filters = []
+        if self.full_start is not None:
+            filters.append(model.day >= self.full_start.date())
+        if self.full_end is not None:
+            filters.append(model.day < self.full_end.date())
+        return filters
+
+    def full_day_filters(self) -> list:
+        filters = []
+        if self.full_start is not None:
+            filters.append(models.Ticket.created_at >= self.full_start)
+        if self.full_end is not None:
+            filters.append(models.Ticket.created_at < self.full_end)
+        return filters
+
+    def edge_condition(self):
+        """Aralıkta olup tam günlere girmeyen talepler (kenar yoksa None)"""
+        outside = []
+        if self.full_start is not None:
+            outside.append(models.Ticket.created_at < self.full_start)
+        if self.full_end is not None:
+            outside.append(models.Ticket.created_at >= self.full_end)
+        if not outside:
+            return None
+        return and_(*self.date_filters, or_(*outside))
+
+
+def _live_condition(window: _Window, current_user: models.User, use_rollups: bool):
+    """
+    tickets'tan canlı sayılacak satırlar.
+    Özet kullanılmıyorsa aralığın tamamı; kullanılıyorsa kenar günler ve (admin değilse)
+    tam günlerdeki, birim özetine girmeyen kendi talepleri. Canlı kısım yoksa None.
+    """
+    access = report_access_filter(current_user)
+    if not use_rollups:
+        return and_(true(), *window.date_filters, *([access] if access is not None else []))
+
+    parts = []
+    edge = window.edge_condition()
+    if edge is not None:
+        parts.append(and_(edge, access) if access is not None else edge)
+    if not current_user.is_admin:
+        own = or_(models.Ticket.creator_id == current_user.id, models.Ticket.assignee_id == current_user.id)
+        if current_user.department_id:
+            own = and_(own, _outside_department_condition(current_user))
+        parts.append(and_(*window.full_day_filters(), own))
+    return or_(*parts) if parts else None
+
+
+def _merge_counts(*sources) -> Dict:
+    merged = defaultdict(int)
+    for rows in sources:
+        for key, count in rows:
+            merged[key] += count or 0
+    return {key: count for key, count in merged.items() if count > 0}
+
+
+# ==================== /reports/stats ====================
+
+def ticket_stats(db: Session, current_user: models.User,
+                 start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
+    window = _Window(parse_report_datetime(start_date), parse_report_datetime(end_date))
+    use_rollups = window.has_full_days and rollups_enabled(db)
+    # Departmanı olmayan kullanıcının tüm talepleri zaten kendi talepleridir (canlı, indeksli)
+    if use_rollups and not current_user.is_admin and not current_user.department_id:
+        use_rollups = False
+
+    rollup_status, rollup_priority, rollup_department = [], [], []
+    if use_rollups:
+        stat = models.TicketDailyStat
+        filters = window.rollup_filters(stat)
+        if not current_user.is_admin:
+            filters.append(stat.department_id == current_user.department_id)
+            if not current_user.role == models.UserRole.DEPARTMENT_ADMIN:
+                filters.append(stat.is_private == False)
+                filters.append(stat.is_assigned == False)
+        total = func.sum(stat.ticket_count)
+        rollup_status = [(status or None, count) for status, count in
+                         db.query(stat.status, total).filter(*filters).group_by(stat.status).all()]
+        rollup_priority = [(priority or None, count) for priority, count in
+                           db.query(stat.priority, total).filter(*filters).group_by(stat.priority).all()]
+        rollup_department = db.query(stat.department_id, total).filter(
+            *filters, stat.department_id != 0
+        ).group_by(stat.department_id).all()
+
+    live_status, live_priority, live_department = [], [], []
+    live = _live_condition(window, current_user, use_rollups)
+    if live is not None:
+        count = func.count(models.Ticket.id)
+        live_status = db.query(models.Ticket.status, count).filter(live).group_by(models.Ticket.status).all()
+        live_priority = db.query(models.Ticket.priority, count).filter(live).group_by(models.Ticket.priority).all()
+        live_department = db.query(models.Ticket.department_id, count).filter(
+            live, models.Ticket.department_id != None
+        ).group_by(models.Ticket.department_id).all()
+
+    status_stats = _merge_counts(rollup_status, live_status)
+    priority_stats = _merge_counts(rollup_priority, live_priority)
+
+    # Department Counts (Top 10) - ada göre
+    department_counts = _merge_counts(rollup_department, live_department)
+    dept_stats = defaultdict(int)
+    if department_counts:
+        for department_id, name in db.query(models.Department.id, models.Department.name).filter(
+            models.Department.id.in_(list(department_counts))
+        ).all():
+            dept_stats[name] += department_counts[department_id]
+    top_departments = sorted(dept_stats.items(), key=lambda item: item[1], reverse=True)[:10]
+
+    return {
+        "status_distribution": status_stats,
+        "priority_distribution": priority_stats,
+        "department_distribution": dict(top_departments),
+        "total_tickets": sum(status_stats.values())
+    }
+
+
+# ==================== /reports/personnel-stats ====================
+
+_MEASURES = ("ticket_count", "urgent_count", "high_count", "open_count", "closed_count",
+             "resolution_seconds", "resolution_count")
+
+
+def _live_user_measures(db: Session, condition, user_column, role: str):
+    ticket = models.Ticket
+    closed_timed = and_(ticket.status == 'closed', ticket.updated_at != None)
+    return [
+        ((user_id, role), values)
+        for user_id, *values in db.query(
+            user_column,
+            func.count(ticket.id),
+            func.sum(case((ticket.priority == 'urgent', 1), else_=0)),
+            func.sum(case((ticket.priority == 'high', 1), else_=0)),
+            func.sum(case((ticket.status == 'open', 1), else_=0)),
+            func.sum(case((ticket.status == 'closed', 1), else_=0)),
+            func.sum(case(
+                (closed_timed, extract('epoch', ticket.updated_at) - extract('epoch', ticket.created_at)),
+                else_=0
+            )),
+            func.sum(case((closed_timed, 1), else_=0)),
+        ).filter(condition, user_column != None).group_by(user_column).all()
+    ]
+
+
+def personnel_stats(db: Session, current_user: models.User, search_params: dict) -> dict:
+    """
+    Personel bazlı rapor.
+    - creators: En çok talep açanlar
+    - resolvers: En çok talep çözenler (ort. süre ile)
+    """
+    window = _Window(parse_report_datetime(search_params.get("start_date")),
+                     parse_report_datetime(search_params.get("end_date")))
+    department_ids = search_params.get("department_ids") or []
+
+    # Birim kısıtı talebin birimi üzerinden; birimi olmayan kullanıcı sadece kendi taleplerini görür
+    own_only = not current_user.is_admin and not current_user.department_id
+    use_rollups = window.has_full_days and not own_only and rollups_enabled(db)
+
+    ticket_filters = []
+    if department_ids:
+        ticket_filters.append(models.Ticket.department_id.in_(department_ids))
+    if not current_user.is_admin:
+        if current_user.department_id:
+            ticket_filters.append(models.Ticket.department_id == current_user.department_id)
+        else:
+            ticket_filters.append(or_(
+                models.Ticket.creator_id == current_user.id,
+                models.Ticket.assignee_id == current_user.id
+            ))
+
+    rollup_rows = []
+    if use_rollups:
+        stat = models.TicketUserDailyStat
+        filters = window.rollup_filters(stat)
+        if department_ids:
+            filters.append(stat.department_id.in_(department_ids))
+        if not current_user.is_admin:
+            filters.append(stat.department_id == current_user.department_id)
+        rollup_rows = [
+            ((user_id, role), values)
+            for user_id, role, *values in db.query(
+                stat.user_id, stat.role, *[func.sum(getattr(stat, name)) for name in _MEASURES]
+            ).filter(*filters).group_by(stat.user_id, stat.role).all()
+        ]
+
+    live_rows = []
+    live = window.edge_condition() if use_rollups else and_(true(), *window.date_filters)
+    if live is not None:
+        condition = and_(live, *ticket_filters)
+        live_rows = (_live_user_measures(db, condition, models.Ticket.creator_id, "creator") +
+                     _live_user_measures(db, condition, models.Ticket.assignee_id, "assignee"))
+
+    measures: Dict[Tuple[int, str], List[float]] = {}
+    for key, values in rollup_rows + live_rows:
+        current = measures.setdefault(key, [0] * len(_MEASURES))
+        for index, value in enumerate(values):
+            current[index] += value or 0
+    measures = {key: dict(zip(_MEASURES, values)) for key, values in measures.items() if values[0] > 0}
+
+    users = {}
+    user_ids = {user_id for user_id, _ in measures}
+    if user_ids:
+        users = {
+            user_id: (full_name, department_name)
+            for user_id, full_name, department_name in db.query(
+                models.User.id, models.User.full_name, models.Department.name
+            ).outerjoin(models.Department, models.User.department_id == models.Department.id)
+             .filter(models.User.id.in_(list(user_ids))).all()
+        }
+
+    creators, resolvers = [], []
+    for (user_id, role), m in measures.items():
+        if user_id not in users:
+            continue
+        full_name, department_name = users[user_id]
+        if role == "creator":
+            creators.append({
+                "id": user_id,
+                "full_name": full_name,
+                "department": department_name or "Belirtilmemiş",
+                "total_tickets": int(m["ticket_count"]),
+                "priority_breakdown": {
+                    "urgent": int(m["urgent_count"]),
+                    "high": int(m["high_count"])
+                },
+                "status_breakdown": {
+                    "open": int(m["open_count"]),
+                    "closed": int(m["closed_count"])
+                }
+            })
+        else:
+            average = m["resolution_seconds"] / m["resolution_count"] if m["resolution_count"] else 0
+            resolvers.append({
+                "id": user_id,
+                "full_name": full_name,
+                "department": department_name or "Belirtilmemiş",
+                "total_assigned": int(m["ticket_count"]),
+                "total_resolved": int(m["closed_count"]),
+                "avg_resolution_time": round(average / 3600, 1) if average else 0  # Saat cinsinden
+            })
+
+    creators.sort(key=lambda r: r["total_tickets"], reverse=True)
+    resolvers.sort(key=lambda r: r["total_resolved"], reverse=True)
+    return {"creators": creators, "resolvers": resolvers}
@@ -1,18 +1,46 @@
 """
 Merkezi Sistem Loglama Modülü
 Tüm sistem işlemlerini loglar: auth, ticket, mail, user, department, wiki, system
+
+create_system_log ve log_* yardımcıları kaydı bellekteki tampona ekleyip hemen döner;
+arka plan thread'i tamponu SYSTEM_LOG_BATCH_SIZE satırda veya SYSTEM_LOG_FLUSH_SECONDS'da bir
+kendi bağlantısıyla tek INSERT (executemany) olarak yazar. Çağıranın session'ı kullanılmaz, commit edilmez.
+- Tampon SYSTEM_LOG_BUFFER_SIZE ile sınırlıdır. Dolarsa SYSTEM_LOG_OVERFLOW_POLICY:
+  "drop" (varsayılan) yeni kaydı atar ve sayar, atılan sayı sonraki yazımda uyarı logu olarak kaydedilir;
+  "sync" kaydı çağıran thread'de ayrı bir bağlantıyla hemen yazar
+- Süreç kapanırken (FastAPI shutdown, atexit) tampondaki kayıtlar yazılır
+- SYSTEM_LOG_ASYNC=false ise her kayıt ayrı bağlantıyla hemen yazılır
 """
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+from collections import deque
 from datetime import datetime
+import atexit
 import json
 import logging
-from typing import Optional, Any, Dict
-from database import SessionLocal
+import os
+import threading
+from typing import Optional, Any, Deque, Dict, List
+import pytz
+from database import engine
 import models
 
 logger = logging.getLogger("uvicorn.error")
 
+SYSTEM_LOG_ASYNC = os.getenv("SYSTEM_LOG_ASYNC", "true").lower() == "true"
+SYSTEM_LOG_BATCH_SIZE = int(os.getenv("SYSTEM_LOG_BATCH_SIZE", "200"))
+SYSTEM_LOG_FLUSH_SECONDS = float(os.getenv("SYSTEM_LOG_FLUSH_SECONDS", "1"))
+SYSTEM_LOG_BUFFER_SIZE = int(os.getenv("SYSTEM_LOG_BUFFER_SIZE", "10000"))
+SYSTEM_LOG_OVERFLOW_POLICY = os.getenv("SYSTEM_LOG_OVERFLOW_POLICY", "drop")
+# Yazım hatasında (veritabanı erişilemez) yeniden deneme beklemesi
+_RETRY_SECONDS = 5.0
+
+if SYSTEM_LOG_OVERFLOW_POLICY not in ("drop", "sync"):
+    raise ValueError(f"Geçersiz SYSTEM_LOG_OVERFLOW_POLICY: {SYSTEM_LOG_OVERFLOW_POLICY!r}")
+
+_ISTANBUL_TZ = pytz.timezone('Europe/Istanbul')
+
 # Log Kategorileri
 class LogCategory:
     AUTH = "auth"           # Giriş/çıkış işlemleri
@@ -61,6 +89,180 @@ class LogStatus:
     WARNING = "warning"
 
 
+def system_log_values(
+    category: str,
+    action: str,
+    user_id: Optional[int] = None,
+    username: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[int] = None,
+    target_name: Optional[str] = None,
+    details: Optional[Dict[str, Any]] = None,
+    status: str = LogStatus.SUCCESS,
+    error_message: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None
+) -> Dict[str, Any]:
+    """SystemLog satırı için kolon değerleri (toplu INSERT için de kullanılır)"""
+    # İstanbul timezone
+    now_istanbul = datetime.now(_ISTANBUL_TZ).replace(tzinfo=None)
+
+    return {
+        "category": category,
+        "action": action,
+        "user_id": user_id,
+        "username": username,
+        "target_type": target_type,
+        "target_id": target_id,
+        "target_name": target_name,
+        "details": json.dumps(details, ensure_ascii=False) if details else None,
+        "status": status,
+        "error_message": error_message,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "created_at": now_istanbul,
+    }
+
+
+def _console_log(values: Dict[str, Any]):
+    log_msg = f"[{values['category'].upper()}] {values['action']} - User: {values['username'] or 'System'}"
+    if values["target_type"] and values["target_name"]:
+        log_msg += f" - Target: {values['target_type']}:{values['target_name']}"
+    if values["status"] == LogStatus.FAILED:
+        logger.error(log_msg + f" - Error: {values['error_message']}")
+    elif values["status"] == LogStatus.WARNING:
+        logger.warning(log_msg)
+    else:
+        logger.info(log_msg)
+
+
+def add_system_logs(db: Session, entries: List[Dict[str, Any]]):
+    """
+    Birden fazla log satırını tek INSERT (executemany) ile ekler.
+    Commit çağırana aittir; loglar çağıranın kayıtlarıyla birlikte yazılır.
+    """
+    if not entries:
+        return
+    db.execute(insert(models.SystemLog), entries)
+    for values in entries:
+        _console_log(values)
+
+
+def _write_logs(entries: List[Dict[str, Any]]):
+    """Kayıtları ayrı bir bağlantı ve transaction ile yazar"""
+    with engine.begin() as conn:
+        conn.execute(insert(models.SystemLog), entries)
+
+
+class SystemLogWriter:
+    """Sınırlı bellek tamponu + toplu yazan arka plan thread'i (thread-safe)"""
+
+    def __init__(self, batch_size: int = SYSTEM_LOG_BATCH_SIZE, flush_seconds: float = SYSTEM_LOG_FLUSH_SECONDS,
+                 buffer_size: int = SYSTEM_LOG_BUFFER_SIZE, overflow_policy: str = SYSTEM_LOG_OVERFLOW_POLICY):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.buffer_size = buffer_size
+        self.overflow_policy = overflow_policy
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._dropped = 0
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # flush() ile thread aynı anda yazmasın
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._stopping = False
+
+    def _ensure_thread(self):
+        # fork sonrası alt süreçte thread yoktur; ilk kayıtta yeniden başlatılır
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._buffer.clear()
+        self._pid = os.getpid()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="system-log-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, values: Dict[str, Any]):
+        with self._condition:
+            if not self._stopping:
+                self._ensure_thread()
+                if len(self._buffer) < self.buffer_size:
+                    self._buffer.append(values)
+                    if len(self._buffer) >= self.batch_size:
+                        self._condition.notify()
+                    return
+                if self.overflow_policy == "drop":
+                    self._dropped += 1
+                    return
+        # Tampon dolu ("sync") veya süreç kapanıyor: kayıt hemen yazılır
+        _write_logs([values])
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if self._dropped:
+            batch.append(system_log_values(
+                LogCategory.SYSTEM, "log_dropped", status=LogStatus.WARNING,
+                error_message=f"Log tamponu doldu, {self._dropped} kayıt yazılamadı",
+                details={"dropped_count": self._dropped, "buffer_size": self.buffer_size}
+            ))
+            self._dropped = 0
+        return batch
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            _write_logs(batch)
+            return True
+        except Exception as e:
+            logger.error(f"Sistem logları yazılamadı ({len(batch)} kayıt): {e}")
+            with self._condition:
+                # Yer varsa kayıtlar tamponun başına geri konur, yoksa atılan sayısına eklenir
+                room = max(0, self.buffer_size - len(self._buffer))
+                self._buffer.extendleft(reversed(batch[:room]))
+                self._dropped += len(batch) - min(room, len(batch))
+            return False
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if len(self._buffer) < self.batch_size and not self._stopping:
+                    self._condition.wait(self.flush_seconds)
+                if self._stopping:
+                    return
+                batch = self._take_batch()
+            if batch:
+                with self._write_lock:
+                    ok = self._write_batch(batch)
+                if not ok:
+                    with self._condition:
+                        self._condition.wait(_RETRY_SECONDS)
+
+    def flush(self):
+        """Tampondaki tüm kayıtları çağıran thread'de yazar"""
+        with self._write_lock:
+            while True:
+                with self._condition:
+                    batch = self._take_batch()
+                if not batch or not self._write_batch(batch):
+                    return
+
+    def shutdown(self):
+        """Thread'i durdurur ve kalan kayıtları yazar (uygulama kapanışında, atexit ile de çağrılır)"""
+        with self._condition:
+            if self._thread is None or self._pid != os.getpid():
+                return
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout=self.flush_seconds + 5)
+        self.flush()
+        self._thread = None
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+
+system_log_writer = SystemLogWriter()
+atexit.register(system_log_writer.shutdown)
+
+
 def create_system_log(
     db: Optional[Session],
     category: str,
@@ -77,10 +279,10 @@ def create_system_log(
     user_agent: Optional[str] = None
 ):
     """
-    Sistem logu oluşturur.
+    Sistem logu oluşturur (tampona ekler, veritabanına arka planda toplu yazılır).
     
     Args:
-        db: Veritabanı session'ı (None ise yeni session oluşturulur)
+        db: Kullanılmaz (geriye uyumluluk); çağıranın transaction'ı commit edilmez
         category: Log kategorisi (LogCategory)
         action: Yapılan işlem (LogAction)
         user_id: İşlemi yapan kullanıcı ID'si
@@ -94,54 +296,20 @@ def create_system_log(
         ip_address: IP adresi
         user_agent: User agent
     """
-    standalone_session = False
-    if not db:
-        db = SessionLocal()
-        standalone_session = True
-    
     try:
-        # İstanbul timezone
-        import pytz
-        istanbul_tz = pytz.timezone('Europe/Istanbul')
-        now_istanbul = datetime.now(istanbul_tz).replace(tzinfo=None)
-        
-        log_entry = models.SystemLog(
-            category=category,
-            action=action,
-            user_id=user_id,
-            username=username,
-            target_type=target_type,
-            target_id=target_id,
-            target_name=target_name,
-            details=json.dumps(details, ensure_ascii=False) if details else None,
-            status=status,
-            error_message=error_message,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            created_at=now_istanbul
+        values = system_log_values(
+            category, action, user_id=user_id, username=username, target_type=target_type,
+            target_id=target_id, target_name=target_name, details=details, status=status,
+            error_message=error_message, ip_address=ip_address, user_agent=user_agent
         )
-        
-        db.add(log_entry)
-        db.commit()
-        
-        # Console log
-        log_msg = f"[{category.upper()}] {action} - User: {username or 'System'}"
-        if target_type and target_name:
-            log_msg += f" - Target: {target_type}:{target_name}"
-        if status == LogStatus.FAILED:
-            logger.error(log_msg + f" - Error: {error_message}")
-        elif status == LogStatus.WARNING:
-            logger.warning(log_msg)
+        if SYSTEM_LOG_ASYNC:
+            system_log_writer.enqueue(values)
         else:
-            logger.info(log_msg)
+            _write_logs([values])
+        _console_log(values)
             
     except Exception as e:
         logger.error(f"Sistem logu oluşturulurken hata: {str(e)}")
-        if standalone_session:
-            db.rollback()
-    finally:
-        if standalone_session:
-            db.close()
 
 
 # Yardımcı fonksiyonlar - kolay kullanım için
@@ -200,6 +368,23 @@ def log_mail(db: Session, action: str, recipient_email: str, subject: str = None
     )
 
 
+def mail_log_values(action: str, recipient_email: str, subject: str = None,
+                    user_id: int = None, username: str = None, success: bool = True,
+                    error_message: str = None, details: dict = None) -> Dict[str, Any]:
+    """log_mail ile aynı kayıt - add_system_logs ile toplu yazmak için"""
+    return system_log_values(
+        category=LogCategory.MAIL,
+        action=action,
+        user_id=user_id,
+        username=username,
+        target_type="email",
+        target_name=recipient_email,
+        details={**(details or {}), "subject": subject} if subject else details,
+        status=LogStatus.SUCCESS if success else LogStatus.FAILED,
+        error_message=error_message
+    )
+
+
 def log_user(db: Session, action: str, target_user_id: int, target_username: str,
              user_id: int = None, username: str = None, details: dict = None,
              ip_address: str = None):
@@ -0,0 +1,119 @@
+"""
+Derlenmiş e-posta şablonları
+
+Şablonlar string.Template sözdizimini kullanır ($alan, ${alan}, $$ -> $).
+Kaynak metin bir kez (modül yüklenirken) sabit parçalar ve alan adları olarak ayrıştırılır;
+render sadece parçaları birleştirir, her alıcı için metin yeniden taranmaz.
+
+İki aşamalı doldurma:
+- bind(): olaya ait alanlar (talep başlığı, durum, yorum...) bir kez yerleştirilir,
+  sonuç sadece alıcıya özel alanları ($recipient_name gibi) bekleyen yeni bir şablondur
+- render(): kalan alanlar doldurulur; hiç alan kalmadıysa önceden birleştirilmiş metin döner
+
+Yerleştirilen değerler tekrar ayrıştırılmaz; kullanıcı metnindeki "$" karakterleri alan sayılmaz.
+"""
+
+from string import Template
+from typing import Dict, List, Tuple
+
+
+class CompiledTemplate:
+    """Sabit parçalar ve aralarındaki alan adları: literals[0] + f0 + literals[1] + ... + literals[-1]"""
+    __slots__ = ("literals", "fields", "_static")
+
+    def __init__(self, source: str):
+        literals: List[str] = []
+        fields: List[str] = []
+        current: List[str] = []
+        position = 0
+        for match in Template.pattern.finditer(source):
+            current.append(source[position:match.start()])
+            position = match.end()
+            if match.group("escaped") is not None:
+                current.append("$")
+                continue
+            name = match.group("named") or match.group("braced")
+            if name is None:
+                raise ValueError(f"Geçersiz şablon alanı: {source[match.start():match.start() + 20]!r}")
+            literals.append("".join(current))
+            fields.append(name)
+            current = []
+        current.append(source[position:])
+        literals.append("".join(current))
+        self._set(literals, fields)
+
+    def _set(self, literals: List[str], fields: List[str]):
+        self.literals = tuple(literals)
+        self.fields = tuple(fields)
+        self._static = literals[0] if not fields else None
+
+    @classmethod
+    def _from_parts(cls, literals: List[str], fields: List[str]) -> "CompiledTemplate":
+        template = cls.__new__(cls)
+        template._set(literals, fields)
+        return template
+
+    def bind(self, **values) -> "CompiledTemplate":
+        """Verilen alanları yerleştirir, kalan alanlarla yeni şablon döndürür"""
+        literals = [self.literals[0]]
+        fields = []
+        for name, literal in zip(self.fields, self.literals[1:]):
+            if name in values:
+                literals[-1] = f"{literals[-1]}{values[name]}{literal}"
+            else:
+                fields.append(name)
+                literals.append(literal)
+        return self._from_parts(literals, fields)
+
+    def render(self, **values) -> str:
+        if self._static is not None:
+            return self._static
+        parts = [self.literals[0]]
+        for name, literal in zip(self.fields, self.literals[1:]):
+            parts.append(str(values[name]))
+            parts.append(literal)
+        return "".join(parts)
+
+
+class PreparedMail:
+    """Olay alanları yerleştirilmiş düz metin + HTML çifti; alıcı başına sadece kalan alanlar doldurulur"""
+    __slots__ = ("text", "html")
+
+    def __init__(self, text: CompiledTemplate, html: CompiledTemplate):
+        self.text = text
+        self.html = html
+
+    def render(self, **recipient_values) -> Tuple[str, str]:
+        return self.text.render(**recipient_values), self.html.render(**recipient_values)
+
+
+class MailTemplate:
+    """Bir e-posta türünün derlenmiş düz metin ve HTML şablonu"""
+    __slots__ = ("text", "html")
+
+    def __init__(self, text: str, html: str):
+        self.text = CompiledTemplate(text)
+        self.html = CompiledTemplate(html)
+
+    def prepare(self, **event_values) -> PreparedMail:
+        return PreparedMail(self.text.bind(**event_values), self.html.bind(**event_values))
+
+
+class PreparedMailCache:
+    """
+    Bir olayın fan-out'u boyunca hazırlanmış şablonları tutar.
+    Aynı anahtar (ör. 'comment', 'triage') için şablon sadece ilk alıcıda hazırlanır.
+    """
+    __slots__ = ("_mails",)
+
+    def __init__(self):
+        self._mails: Dict[str, PreparedMail] = {}
+
+    def get(self, key: str, factory) -> PreparedMail:
+        mail = self._mails.get(key)
+        if mail is None:
+            mail = self._mails[key] = factory()
+        return mail
+
+    def render(self, key: str, factory, **recipient_values) -> Tuple[str, str]:
+        return self.get(key, factory).render(**recipient_values)
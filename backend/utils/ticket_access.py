@@ -0,0 +1,245 @@
+"""
+Talep Görünürlük Motoru
+can_access_ticket ile aynı erişim kurallarını tek bir SQL koşuluna çevirir.
+Böylece tekilleştirme ve filtreleme Python yerine PostgreSQL'de yapılır.
+
+Kurallar (can_access_ticket ile birebir):
+1. Admin her talebi görür (gizliler dahil)
+2. Talebi oluşturan ve atanan kişi her zaman görür (gizli olsa bile)
+3. Gizli talepleri başka kimse göremez
+4. Kullanıcının birimine (birincil, ek birimler, yönettiği birimler) açılan talepler
+5. Kullanıcıyla ortak birimi olan meslektaşların açtığı talepler
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from fastapi import Depends
+from sqlalchemy import select, union, union_all, and_, or_, true
+from sqlalchemy.orm import Session
+
+import models
+from database import get_db
+from auth import get_current_active_user
+from utils.membership_cache import membership_cache
+
+
+def user_department_ids_select(user_id: int):
+    """Kullanıcının birim ID'lerini döndüren SELECT (birincil + many-to-many + yönetilen)"""
+    assoc = models.user_department_association
+    return union(
+        select(models.User.department_id.label("department_id")).where(
+            models.User.id == user_id,
+            models.User.department_id.isnot(None)
+        ),
+        select(assoc.c.department_id.label("department_id")).where(
+            assoc.c.user_id == user_id,
+            assoc.c.department_id.isnot(None)
+        ),
+        select(models.Department.id.label("department_id")).where(
+            models.Department.manager_id == user_id
+        )
+    )
+
+
+def cached_user_department_ids(db: Session, user_id: int) -> FrozenSet[int]:
+    """Kullanıcının birim ID'leri - önce süreç önbelleğine bakar, yoksa tek sorgu ile yükler"""
+    department_ids = membership_cache.get(user_id)
+    if department_ids is None:
+        rows = db.execute(user_department_ids_select(user_id)).all()
+        department_ids = membership_cache.set(user_id, (row[0] for row in rows if row[0] is not None))
+    return department_ids
+
+
+def cached_department_ids_for_users(db: Session, user_ids: Iterable[int]) -> Dict[int, FrozenSet[int]]:
+    """Birden fazla kullanıcının birim ID'leri - önbellekte olmayanlar tek sorgu ile yüklenir"""
+    result: Dict[int, FrozenSet[int]] = {}
+    missing: Dict[int, Set[int]] = {}
+    for user_id in set(user_ids):
+        department_ids = membership_cache.get(user_id)
+        if department_ids is None:
+            missing[user_id] = set()
+        else:
+            result[user_id] = department_ids
+    if missing:
+        memberships = department_memberships_subquery()
+        rows = db.execute(
+            select(memberships.c.user_id, memberships.c.department_id).where(memberships.c.user_id.in_(missing))
+        ).all()
+        for user_id, department_id in rows:
+            if department_id is not None:
+                missing[user_id].add(department_id)
+        for user_id, department_ids in missing.items():
+            result[user_id] = membership_cache.set(user_id, department_ids)
+    return result
+
+
+def department_memberships_subquery():
+    """Tüm kullanıcı-birim üyeliklerini (user_id, department_id) olarak döndüren alt sorgu"""
+    assoc = models.user_department_association
+    return union_all(
+        select(
+            models.User.id.label("user_id"),
+            models.User.department_id.label("department_id")
+        ).where(models.User.department_id.isnot(None)),
+        select(
+            assoc.c.user_id.label("user_id"),
+            assoc.c.department_id.label("department_id")
+        ),
+        select(
+            models.Department.manager_id.label("user_id"),
+            models.Department.id.label("department_id")
+        ).where(models.Department.manager_id.isnot(None))
+    ).subquery("department_memberships")
+
+
+def ticket_visibility_filter(user: models.User, department_ids: Optional[Iterable[int]] = None):
+    """
+    Kullanıcının görebileceği talepler için SQL koşulu döndürür.
+
+    department_ids verilirse kullanıcının birimleri alt sorgu yerine sabit liste olarak kullanılır
+    (TicketAccessChecker birim kümesini bir kez çekip tekrar kullanır).
+
+    Kullanım:
+        query = db.query(models.Ticket).filter(ticket_visibility_filter(current_user))
+    """
+    if user.is_admin:
+        return true()
+
+    if department_ids is None:
+        user_depts = user_department_ids_select(user.id).cte("user_depts")
+        user_dept_ids = select(user_depts.c.department_id)
+    else:
+        user_dept_ids = list(department_ids)
+
+    # Kullanıcıyla en az bir ortak birimi olan kullanıcılar (meslektaşlar)
+    memberships = department_memberships_subquery()
+    colleague_ids = select(memberships.c.user_id).where(
+        memberships.c.department_id.in_(user_dept_ids)
+    )
+
+    return or_(
+        models.Ticket.creator_id == user.id,
+        models.Ticket.assignee_id == user.id,
+        # Gizli talepler sadece yukarıdaki iki kurala takılır
+        and_(
+            models.Ticket.is_private.isnot(True),
+            or_(
+                # Birimin talepleri (yönetilen birimler user_depts içinde)
+                models.Ticket.department_id.in_(user_dept_ids),
+                # Meslektaşların açtığı talepler (başka birimlere açılmış olsa bile)
+                models.Ticket.creator_id.in_(colleague_ids)
+            )
+        )
+    )
+
+
+def visible_tickets_by_user(db: Session, users: Iterable[models.User], ticket_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    """
+    Birden fazla kullanıcı için {kullanıcı id: görebildiği talep ID'leri} (ticket_visibility_filter kuralları).
+    Talepler tek sorguda okunur, birim kümeleri üyelik önbelleğinden gelir ve kurallar Python'da
+    uygulanır; sorgu sayısı kullanıcı sayısından bağımsızdır.
+    """
+    tickets = db.query(
+        models.Ticket.id, models.Ticket.creator_id, models.Ticket.assignee_id,
+        models.Ticket.department_id, models.Ticket.is_private
+    ).filter(models.Ticket.id.in_(set(ticket_ids))).all()
+    users = list(users)
+
+    # Meslektaş kuralı için talebi açanların birimleri de gerekir
+    department_ids = cached_department_ids_for_users(
+        db,
+        [user.id for user in users if not user.is_admin]
+        + [ticket.creator_id for ticket in tickets if ticket.creator_id is not None]
+    )
+
+    visible: Dict[int, Set[int]] = {}
+    for user in users:
+        if user.is_admin:
+            visible[user.id] = {ticket.id for ticket in tickets}
+            continue
+        user_depts = department_ids.get(user.id, frozenset())
+        visible[user.id] = {
+            ticket.id for ticket in tickets
+            if ticket.creator_id == user.id
+            or ticket.assignee_id == user.id
+            # Gizli talepler sadece yukarıdaki iki kurala takılır
+            or (ticket.is_private is not True and (
+                ticket.department_id in user_depts
+                or not user_depts.isdisjoint(department_ids.get(ticket.creator_id, ()))
+            ))
+        }
+    return visible
+
+
+class TicketAccessChecker:
+    """
+    Toplu talep erişim kontrolü.
+
+    Bir kullanıcı ve N talep ID'si için en fazla iki sorgu çalıştırır:
+    1. Kullanıcının birim kümesi (istek boyunca bir kez)
+    2. Erişilebilir talep ID'leri (görünürlük koşulu ile)
+    Sonuçlar nesne üzerinde saklanır; aynı istek içinde bir talep iki kez sorgulanmaz.
+    """
+
+    def __init__(self, db: Session, user: Optional[models.User] = None, api_client: Optional[models.ApiClient] = None):
+        self.db = db
+        self.user = user
+        self.api_client = api_client
+        self._department_ids: Optional[FrozenSet[int]] = None
+        self._results: Dict[int, bool] = {}
+
+    @classmethod
+    def for_api_client(cls, db: Session, api_client: models.ApiClient) -> "TicketAccessChecker":
+        """Harici API istemcisi için: sadece kendi açtığı taleplere erişebilir"""
+        return cls(db, api_client=api_client)
+
+    def department_ids(self) -> FrozenSet[int]:
+        """Kullanıcının birim ID'leri (üyelik önbelleğinden, istek boyunca sabit)"""
+        if self._department_ids is None:
+            self._department_ids = cached_user_department_ids(self.db, self.user.id)
+        return self._department_ids
+
+    def access_filter(self):
+        """Erişim koşulu (başka sorgulara join ile eklenebilir)"""
+        if self.api_client is not None:
+            return models.Ticket.api_client_id == self.api_client.id
+        if self.user.is_admin:
+            return true()
+        return ticket_visibility_filter(self.user, self.department_ids())
+
+    def check_many(self, ticket_ids: Iterable[int]) -> Dict[int, bool]:
+        """Verilen talepler için {ticket_id: erişim_var_mı} döndürür (olmayan talepler False)"""
+        ticket_ids = {int(t) for t in ticket_ids if t is not None}
+        pending = ticket_ids - self._results.keys()
+        if pending:
+            allowed = {
+                row[0] for row in self.db.query(models.Ticket.id).filter(
+                    models.Ticket.id.in_(pending),
+                    self.access_filter()
+                ).all()
+            }
+            for ticket_id in pending:
+                self._results[ticket_id] = ticket_id in allowed
+        return {ticket_id: self._results[ticket_id] for ticket_id in ticket_ids}
+
+    def can_access(self, ticket_id: int) -> bool:
+        """Tek talep için erişim kontrolü (sonuç önbellekten döner)"""
+        return self.check_many([ticket_id]).get(ticket_id, False)
+
+    def filter_accessible(self, ticket_ids: Iterable[int]) -> List[int]:
+        """Erişilebilir talep ID'lerini giriş sırasını koruyarak döndürür"""
+        ticket_ids = list(ticket_ids)
+        results = self.check_many(ticket_ids)
+        return [t for t in ticket_ids if results.get(t)]
+
+
+def get_ticket_access(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+) -> TicketAccessChecker:
+    """
+    FastAPI dependency - istek başına tek bir TicketAccessChecker.
+    FastAPI dependency sonuçlarını istek içinde önbelleğe aldığı için
+    aynı istekteki tüm kontroller aynı nesneyi (ve memo'yu) paylaşır.
+    """
+    return TicketAccessChecker(db, current_user)
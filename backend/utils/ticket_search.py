@@ -0,0 +1,260 @@
+"""
+Talep Tam Metin Araması
+
+PostgreSQL:
+- tickets.search_vector (tsvector) başlık (A), açıklama (B) ve yorumlardan (C) oluşur;
+  HTML etiketleri ayıklanır, TICKET_SEARCH_CONFIG (varsayılan: turkish) ile köklere ayrılır
+- Tetikleyiciler talep yazılırken ve yorum eklenip/düzenlenip/silinirken vektörü günceller
+- GIN indeksi (ix_tickets_search_vector) ile eşleşme sıralı tarama yapmadan bulunur
+- Sorgu websearch_to_tsquery ile ayrıştırılır ("tırnaklı ifade", -hariç, or);
+  sonuçlar ts_rank_cd ile sıralanır, vurgular (ts_headline) sadece dönen sayfa için hesaplanır
+- Sütun ve tetikleyiciler açılışta kurulur; mevcut talepler parça parça doldurulur,
+  indeks en son oluşturulur. İndeks hazır olana kadar ILIKE araması kullanılır.
+
+Diğer veritabanları (SQLite): başlık, açıklama ve yorumlarda ILIKE; sıralama oluşturma tarihine göre.
+"""
+
+import html
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import Float, and_, cast, exists, func, literal_column, or_, select, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger("uvicorn")
+
+TICKET_SEARCH_CONFIG = os.getenv("TICKET_SEARCH_CONFIG", "turkish")
+TICKET_SEARCH_BACKFILL_BATCH_SIZE = int(os.getenv("TICKET_SEARCH_BACKFILL_BATCH_SIZE", "2000"))
+# Vektöre girecek yorum metni üst sınırı (tsvector 1 MB sınırına takılmamak için)
+_COMMENT_TEXT_LIMIT = 200000
+_BATCH_PAUSE_SECONDS = 0.1
+_SEARCH_LOCK_KEY = 7_401_021
+_SEARCH_TRIGGER = "tickets_search_vector"
+_SEARCH_INDEX = "ix_tickets_search_vector"
+# Hazır değilken tekrar kontrol aralığı (başka süreç doldurmayı bitirmiş olabilir)
+_READY_RECHECK_SECONDS = 60
+
+# ts_headline işaretleri; metin HTML-escape edildikten sonra <mark> ile değiştirilir
+_MARK_START = "\x02"
+_MARK_STOP = "\x03"
+
+if not re.fullmatch(r"[a-z_]+", TICKET_SEARCH_CONFIG):
+    raise ValueError(f"Geçersiz TICKET_SEARCH_CONFIG: {TICKET_SEARCH_CONFIG!r}")
+
+_VECTOR_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION ticket_search_vector(p_ticket_id integer, p_title text, p_description text)
+    RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('{TICKET_SEARCH_CONFIG}', coalesce(p_title, '')), 'A')
+            || setweight(to_tsvector('{TICKET_SEARCH_CONFIG}',
+                   regexp_replace(coalesce(p_description, ''), '<[^>]*>', ' ', 'g')), 'B')
+            || setweight(to_tsvector('{TICKET_SEARCH_CONFIG}', left(coalesce((
+                   SELECT string_agg(regexp_replace(coalesce(c.content, ''), '<[^>]*>', ' ', 'g'), ' ' ORDER BY c.id)
+                   FROM comments c WHERE c.ticket_id = p_ticket_id
+               ), ''), {_COMMENT_TEXT_LIMIT})), 'C')
+    $$ LANGUAGE sql STABLE
+"""
+
+_TRIGGER_STATEMENTS = [
+    _VECTOR_FUNCTION,
+    """
+    CREATE OR REPLACE FUNCTION tickets_search_vector_refresh() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := ticket_search_vector(NEW.id, NEW.title, NEW.description);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE TRIGGER {_SEARCH_TRIGGER} BEFORE INSERT OR UPDATE OF title, description ON tickets
+    FOR EACH ROW EXECUTE FUNCTION tickets_search_vector_refresh()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION comments_search_vector_refresh() RETURNS trigger AS $$
+    DECLARE
+        affected integer[];
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            affected := ARRAY[NEW.ticket_id];
+        ELSIF TG_OP = 'DELETE' THEN
+            affected := ARRAY[OLD.ticket_id];
+        ELSE
+            affected := ARRAY[OLD.ticket_id, NEW.ticket_id];
+        END IF;
+        UPDATE tickets SET search_vector = ticket_search_vector(id, title, description)
+        WHERE id = ANY(affected);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE TRIGGER {_SEARCH_TRIGGER}_comments AFTER INSERT OR DELETE OR UPDATE OF content, ticket_id ON comments
+    FOR EACH ROW EXECUTE FUNCTION comments_search_vector_refresh()
+    """,
+]
+
+_search_state: Dict[str, float] = {}
+
+
+def _trigger_exists(conn) -> bool:
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_trigger WHERE tgname = :name"), {"name": _SEARCH_TRIGGER}
+    ).first())
+
+
+def _index_ready(conn) -> bool:
+    return bool(conn.execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND i.indisvalid
+    """), {"name": _SEARCH_INDEX}).first())
+
+
+def install_ticket_search(engine: Engine) -> bool:
+    """
+    search_vector sütununu ve tetikleyicileri kurar (sadece PostgreSQL).
+    Tetikleyici zaten varsa hiçbir şey yapmaz. Kurulum yapıldıysa True döner.
+    Mevcut talepler backfill_ticket_search() ile doldurulur.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as conn:
+        if _trigger_exists(conn):
+            return False
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE tickets IN SHARE ROW EXCLUSIVE MODE"))
+        if _trigger_exists(conn):
+            return False
+        conn.execute(text("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+        for statement in _TRIGGER_STATEMENTS:
+            conn.execute(text(statement))
+    logger.info("Talep arama tetikleyicileri kuruldu")
+    return True
+
+
+def backfill_ticket_search(engine: Engine, batch_size: int = TICKET_SEARCH_BACKFILL_BATCH_SIZE) -> int:
+    """
+    Vektörü boş talepleri parça parça doldurur, ardından GIN indeksini oluşturur.
+    Başka süreç çalıştırıyorsa veya indeks zaten hazırsa atlar. Doldurulan satır sayısını döndürür.
+    """
+    if engine.dialect.name != "postgresql":
+        return 0
+    total = 0
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if _index_ready(conn) or not _trigger_exists(conn):
+            return 0
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _SEARCH_LOCK_KEY}).scalar():
+            return 0
+        try:
+            while True:
+                count = conn.execute(text("""
+                    UPDATE tickets SET search_vector = ticket_search_vector(id, title, description)
+                    WHERE id IN (
+                        SELECT id FROM tickets WHERE search_vector IS NULL ORDER BY id LIMIT :limit
+                    )
+                """), {"limit": batch_size}).rowcount
+                total += count
+                if count < batch_size:
+                    break
+                time.sleep(_BATCH_PAUSE_SECONDS)
+            # Yarım kalmış (geçersiz) indeks varsa yeniden oluşturulur
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {_SEARCH_INDEX}"))
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY {_SEARCH_INDEX} ON tickets USING GIN (search_vector)"))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _SEARCH_LOCK_KEY})
+    _search_state.clear()
+    logger.info(f"Talep arama indeksi hazır ({total} talep dolduruldu)")
+    return total
+
+
+def start_backfill(engine: Engine):
+    """Doldurma ve indeks oluşturma açılışı bekletmesin diye arka plan thread'inde çalışır"""
+    def backfill():
+        try:
+            backfill_ticket_search(engine)
+        except Exception as e:
+            logger.error(f"Talep arama indeksi doldurulamadı: {e}")
+    if engine.dialect.name == "postgresql":
+        threading.Thread(target=backfill, name="ticket-search-backfill", daemon=True).start()
+
+
+def search_index_ready(db: Session) -> bool:
+    """Tam metin araması kullanılabilir mi (hazırsa süreç boyunca bir daha sorulmaz)"""
+    if _search_state.get("ready"):
+        return True
+    checked_at = _search_state.get("checked_at")
+    if checked_at is not None and time.monotonic() - checked_at < _READY_RECHECK_SECONDS:
+        return False
+    ready = db.get_bind().dialect.name == "postgresql" and _index_ready(db)
+    _search_state.update(ready=ready, checked_at=time.monotonic())
+    return ready
+
+
+class TicketTextSearch:
+    """
+    Bir arama ifadesinin sorguya uygulanması.
+
+        search = TicketTextSearch(db, "yazıcı -toner")
+        query = query.filter(search.condition)
+        if search.rank is not None:
+            query = query.order_by(search.rank.desc(), models.Ticket.id.desc())
+        highlights = search.highlights(db, [t.id for t in page])
+    """
+
+    def __init__(self, db: Session, phrase: str):
+        self.phrase = phrase.strip()
+        self.ranked = search_index_ready(db)
+        if self.ranked:
+            vector = literal_column("tickets.search_vector")
+            self.tsquery = func.websearch_to_tsquery(cast(TICKET_SEARCH_CONFIG, REGCONFIG), self.phrase)
+            self.condition = vector.op("@@")(self.tsquery)
+            # ts_rank_cd real döner; cursor'daki değer double olarak bağlandığından eşitlik
+            # karşılaştırması tutsun diye sıralama ve seçim de double üzerinden yapılır
+            self.rank = cast(func.ts_rank_cd(vector, self.tsquery), Float)
+        else:
+            self.tsquery = None
+            pattern = f"%{self.phrase}%"
+            self.condition = or_(
+                models.Ticket.title.ilike(pattern),
+                models.Ticket.description.ilike(pattern),
+                exists().where(and_(
+                    models.Comment.ticket_id == models.Ticket.id,
+                    models.Comment.content.ilike(pattern)
+                ))
+            )
+            self.rank = None
+
+    def highlights(self, db: Session, ticket_ids: List[int]) -> Dict[int, dict]:
+        """Sayfadaki talepler için vurgulanmış başlık ve metin parçası (HTML-escape edilmiş, eşleşmeler <mark> içinde)"""
+        if not self.ranked or not ticket_ids:
+            return {}
+        config = cast(TICKET_SEARCH_CONFIG, REGCONFIG)
+        comment_text = select(
+            func.string_agg(func.coalesce(models.Comment.content, ""), " ")
+        ).where(models.Comment.ticket_id == models.Ticket.id).scalar_subquery()
+        body = func.left(func.regexp_replace(
+            func.concat_ws(" ", models.Ticket.description, comment_text), "<[^>]*>", " ", "g"
+        ), _COMMENT_TEXT_LIMIT)
+        options = f"StartSel={_MARK_START}, StopSel={_MARK_STOP}"
+        rows = db.query(
+            models.Ticket.id,
+            func.ts_headline(config, models.Ticket.title, self.tsquery, f"{options}, HighlightAll=true"),
+            func.ts_headline(config, body, self.tsquery, f"{options}, MaxWords=35, MinWords=15, MaxFragments=2"),
+        ).filter(models.Ticket.id.in_(ticket_ids)).all()
+        return {
+            ticket_id: {"title_highlight": _marked_html(title), "snippet": _marked_html(snippet)}
+            for ticket_id, title, snippet in rows
+        }
+
+
+def _marked_html(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    text_value = " ".join(html.unescape(value).split())
+    return html.escape(text_value).replace(_MARK_START, "<mark>").replace(_MARK_STOP, "</mark>")
@@ -0,0 +1,442 @@
+"""
+Webhook Teslimat Kuyruğu
+
+Olaylar istek içinde gönderilmez; webhook_deliveries tablosuna yazılır ve WebhookDispatcher gönderir.
+
+- Gövde kuyruğa alınırken bir kez JSON'a çevrilir; HMAC imzası gönderilen byte'lar üzerinden hesaplanır
+- Tek bir paylaşımlı httpx.AsyncClient (bağlantı havuzu, keep-alive) kullanılır
+- Başarısız teslimat bekleyerek (sleep) değil, run_after zamanı ileri alınarak tekrar denenir;
+  bekleme Webhook.retry_delay_seconds'tan başlayıp her denemede iki katına çıkar
+- Devre kesici: Webhook.failure_count (art arda başarısız teslimat) WEBHOOK_CIRCUIT_THRESHOLD'a
+  ulaşınca o uç nokta soğuma süresince denenmez; süre dolunca tek bir deneme (yarı açık) yapılır,
+  başarılıysa devre kapanır, değilse soğuma süresi uzar. Devre açıkken ertelenen teslimatlar
+  deneme hakkı harcamaz.
+- Aynı uç noktaya aynı anda en fazla WEBHOOK_ENDPOINT_CONCURRENCY istek gider
+- Sonuçlar (WebhookLog, teslimat durumu, Webhook sayaçları) toplu olarak yazılır
+- Birden fazla süreç kuyruğu FOR UPDATE SKIP LOCKED ile paylaşır (PostgreSQL)
+
+Outbox worker'ı varsa (NOTIFICATION_OUTBOX_ENABLED) teslimatı o yapar, yoksa API süreci.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+import httpx
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import models
+from database import SessionLocal
+
+logger = logging.getLogger("uvicorn")
+
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "32"))
+WEBHOOK_ENDPOINT_CONCURRENCY = int(os.getenv("WEBHOOK_ENDPOINT_CONCURRENCY", "4"))
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "1"))
+WEBHOOK_CIRCUIT_THRESHOLD = int(os.getenv("WEBHOOK_CIRCUIT_THRESHOLD", "5"))
+WEBHOOK_CIRCUIT_COOLDOWN_SECONDS = int(os.getenv("WEBHOOK_CIRCUIT_COOLDOWN_SECONDS", "60"))
+WEBHOOK_CIRCUIT_MAX_COOLDOWN_SECONDS = int(os.getenv("WEBHOOK_CIRCUIT_MAX_COOLDOWN_SECONDS", "3600"))
+WEBHOOK_RETRY_MAX_DELAY_SECONDS = int(os.getenv("WEBHOOK_RETRY_MAX_DELAY_SECONDS", "3600"))
+WEBHOOK_DELIVERY_RETENTION_DAYS = int(os.getenv("WEBHOOK_DELIVERY_RETENTION_DAYS", "7"))
+# Sonuçlar bu kadar birikince veya bu süre geçince yazılır
+WEBHOOK_RESULT_BATCH_SIZE = 100
+WEBHOOK_RESULT_FLUSH_SECONDS = 1.0
+# processing durumunda bu süreden uzun kalan teslimat (süreç çöktü) tekrar alınır
+WEBHOOK_LOCK_TIMEOUT_SECONDS = 300
+_PURGE_INTERVAL_SECONDS = 3600
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"
+
+
+def serialize_payload(payload: dict) -> str:
+    """Gövde ve imza bu metinden üretilir (alıcıların mevcut doğrulamasıyla aynı biçim)"""
+    return json.dumps(payload, default=str)
+
+
+def sign_body(secret: Optional[str], body: bytes) -> Optional[str]:
+    if not secret:
+        return None
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def webhook_headers(secret: Optional[str], body: bytes, event_type: str, delivery_id: Optional[int] = None) -> Dict[str, str]:
+    headers = {"Content-Type": "application/json", "X-Webhook-Event": event_type}
+    signature = sign_body(secret, body)
+    if signature:
+        headers["X-Webhook-Signature"] = signature
+    if delivery_id is not None:
+        # Tekrar denemelerde aynı kalır; alıcı tekilleştirme için kullanabilir
+        headers["X-Webhook-Delivery"] = str(delivery_id)
+    return headers
+
+
+def enqueue_event(db: Session, api_client_id: int, event_type: str, payload: dict) -> int:
+    """
+    Olayı, client'ın bu olaya abone aktif webhook'ları için kuyruğa alır.
+    Commit çağırana aittir. Kuyruğa alınan teslimat sayısını döndürür.
+    """
+    webhooks = db.query(models.Webhook.id, models.Webhook.events).filter(
+        models.Webhook.api_client_id == api_client_id,
+        models.Webhook.is_active == True
+    ).all()
+    webhook_ids = [webhook_id for webhook_id, events in webhooks if event_type in _parse_events(events)]
+    if not webhook_ids:
+        return 0
+
+    body = serialize_payload(payload)
+    now = datetime.utcnow()
+    db.execute(insert(models.WebhookDelivery), [
+        {"webhook_id": webhook_id, "event_type": event_type, "body": body, "status": STATUS_PENDING,
+         "attempts": 0, "run_after": now, "created_at": now}
+        for webhook_id in webhook_ids
+    ])
+    return len(webhook_ids)
+
+
+def _parse_events(events) -> List[str]:
+    if not isinstance(events, str):
+        return events or []
+    try:
+        return json.loads(events)
+    except ValueError:
+        return []
+
+
+def circuit_cooldown_seconds(failure_count: int) -> float:
+    """Eşikte WEBHOOK_CIRCUIT_COOLDOWN_SECONDS, sonraki her başarısız denemede iki katı"""
+    exponent = max(failure_count - WEBHOOK_CIRCUIT_THRESHOLD, 0)
+    return min(WEBHOOK_CIRCUIT_COOLDOWN_SECONDS * (2 ** min(exponent, 16)), WEBHOOK_CIRCUIT_MAX_COOLDOWN_SECONDS)
+
+
+def retry_delay_seconds(base_delay: int, attempts: int) -> float:
+    return min((base_delay or 60) * (2 ** min(max(attempts - 1, 0), 16)), WEBHOOK_RETRY_MAX_DELAY_SECONDS)
+
+
+class EndpointCircuit:
+    """Bir webhook'un devre durumu ve eşzamanlılık sınırı (süreç içi)"""
+    __slots__ = ("failure_count", "last_failure_at", "probing", "semaphore")
+
+    def __init__(self):
+        self.failure_count = 0
+        self.last_failure_at: Optional[datetime] = None
+        self.probing = False
+        self.semaphore = asyncio.Semaphore(WEBHOOK_ENDPOINT_CONCURRENCY)
+
+    def sync(self, failure_count: int, last_failure_at: Optional[datetime]):
+        """Veritabanındaki sayaç (diğer süreçler) ile birleştir"""
+        if last_failure_at and (self.last_failure_at is None or last_failure_at > self.last_failure_at):
+            self.failure_count = failure_count or 0
+            self.last_failure_at = last_failure_at
+
+    def reopen_at(self) -> Optional[datetime]:
+        """Devre açıksa tekrar denenebileceği zaman, kapalıysa None"""
+        if self.failure_count < WEBHOOK_CIRCUIT_THRESHOLD or self.last_failure_at is None:
+            return None
+        return self.last_failure_at + timedelta(seconds=circuit_cooldown_seconds(self.failure_count))
+
+    def try_acquire(self, now: datetime) -> Optional[datetime]:
+        """Gönderime izin varsa None; yoksa ertelenecek zaman"""
+        reopen_at = self.reopen_at()
+        if reopen_at is None:
+            return None
+        if now < reopen_at:
+            return reopen_at
+        # Yarı açık: aynı anda tek deneme
+        if self.probing:
+            return now + timedelta(seconds=WEBHOOK_CIRCUIT_COOLDOWN_SECONDS)
+        self.probing = True
+        return None
+
+    def record(self, success: bool, now: datetime):
+        self.probing = False
+        if success:
+            self.failure_count = 0
+        else:
+            self.failure_count += 1
+            self.last_failure_at = now
+
+
+def claim_deliveries(limit: int, open_webhook_ids: Set[int]) -> List[dict]:
+    """Zamanı gelmiş teslimatları bu süreç adına kilitler (kendi session'ı ile, thread'de çalışır)"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=WEBHOOK_LOCK_TIMEOUT_SECONDS)
+        delivery = models.WebhookDelivery
+        query = db.query(delivery.id).filter(
+            ((delivery.status == STATUS_PENDING) & (delivery.run_after <= now)) |
+            ((delivery.status == STATUS_PROCESSING) & (delivery.locked_at < stale_before))
+        )
+        if open_webhook_ids:
+            # Devresi açık uç noktaların teslimatları kuyrukta bekler
+            query = query.filter(delivery.webhook_id.notin_(list(open_webhook_ids)))
+        ids = [row[0] for row in query.order_by(delivery.run_after, delivery.id).limit(limit).with_for_update(skip_locked=True).all()]
+        if not ids:
+            db.commit()
+            return []
+
+        db.query(delivery).filter(delivery.id.in_(ids)).update({
+            delivery.status: STATUS_PROCESSING,
+            delivery.locked_at: now,
+        }, synchronize_session=False)
+        rows = db.query(
+            delivery.id, delivery.webhook_id, delivery.event_type, delivery.body, delivery.attempts,
+            models.Webhook.url, models.Webhook.secret, models.Webhook.is_active, models.Webhook.max_retries,
+            models.Webhook.retry_delay_seconds, models.Webhook.failure_count, models.Webhook.last_failure_at
+        ).join(models.Webhook, models.Webhook.id == delivery.webhook_id).filter(delivery.id.in_(ids)).all()
+        db.commit()
+        return [row._asdict() for row in rows]
+    finally:
+        db.close()
+
+
+def open_circuit_candidates() -> Dict[int, tuple]:
+    """failure_count eşiği aşmış webhook'lar: {id: (failure_count, last_failure_at)}"""
+    db = SessionLocal()
+    try:
+        rows = db.query(models.Webhook.id, models.Webhook.failure_count, models.Webhook.last_failure_at).filter(
+            models.Webhook.failure_count >= WEBHOOK_CIRCUIT_THRESHOLD
+        ).all()
+        return {webhook_id: (failure_count, last_failure_at) for webhook_id, failure_count, last_failure_at in rows}
+    finally:
+        db.close()
+
+
+def record_results(results: List[dict]):
+    """Teslimat sonuçlarını tek transaction'da toplu yazar"""
+    if not results:
+        return
+    db = SessionLocal()
+    try:
+        webhook_ids = {result["webhook_id"] for result in results}
+        existing = {row[0] for row in db.query(models.Webhook.id).filter(models.Webhook.id.in_(webhook_ids)).all()}
+        results = [result for result in results if result["webhook_id"] in existing]
+        if not results:
+            return
+
+        deliveries = models.WebhookDelivery.__table__
+        db.execute(
+            update(deliveries).where(deliveries.c.id == bindparam("_id")).values(
+                status=bindparam("status"), attempts=bindparam("attempts"), run_after=bindparam("run_after"),
+                last_error=bindparam("last_error"), finished_at=bindparam("finished_at"), locked_at=None
+            ),
+            [{"_id": r["delivery_id"], "status": r["status"], "attempts": r["attempts"], "run_after": r["run_after"],
+              "last_error": r["error"], "finished_at": r["finished_at"]} for r in results]
+        )
+
+        logs = [r["log"] for r in results if r.get("log")]
+        if logs:
+            db.execute(insert(models.WebhookLog), logs)
+
+        # Webhook başına son durum (art arda hata sayacı süreç içi devre durumundan gelir)
+        webhook_state: Dict[int, dict] = {}
+        for r in results:
+            if r.get("log") is None:
+                continue
+            state = webhook_state.setdefault(r["webhook_id"], {
+                "_id": r["webhook_id"], "last_triggered_at": None, "last_success_at": None,
+                "last_failure_at": None, "failure_count": 0,
+            })
+            state["last_triggered_at"] = r["attempted_at"]
+            state["failure_count"] = r["failure_count"]
+            state["last_success_at" if r["log"]["success"] else "last_failure_at"] = r["attempted_at"]
+        if webhook_state:
+            webhooks = models.Webhook.__table__
+            db.execute(
+                update(webhooks).where(webhooks.c.id == bindparam("_id")).values(
+                    last_triggered_at=bindparam("last_triggered_at"),
+                    failure_count=bindparam("failure_count"),
+                    last_success_at=func.coalesce(bindparam("last_success_at"), webhooks.c.last_success_at),
+                    last_failure_at=func.coalesce(bindparam("last_failure_at"), webhooks.c.last_failure_at),
+                ),
+                list(webhook_state.values())
+            )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Webhook sonuçları kaydedilemedi: {e}")
+    finally:
+        db.close()
+
+
+def purge_finished_deliveries(older_than_days: int = WEBHOOK_DELIVERY_RETENTION_DAYS) -> int:
+    """Tamamlanmış eski teslimatları siler (dead olanlar incelenmek üzere tutulur; log WebhookLog'da)"""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        count = db.query(models.WebhookDelivery).filter(
+            models.WebhookDelivery.status == STATUS_DONE,
+            models.WebhookDelivery.finished_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+class WebhookDispatcher:
+    """Kuyruktan teslimatları alır, paylaşımlı HTTP istemcisiyle gönderir, sonuçları toplu yazar"""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._circuits: Dict[int, EndpointCircuit] = {}
+        self._results: List[dict] = []
+        self._in_flight: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=WEBHOOK_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=WEBHOOK_MAX_IN_FLIGHT, max_keepalive_connections=WEBHOOK_MAX_IN_FLIGHT),
+            )
+        return self._client
+
+    async def post(self, url: str, body: bytes, headers: Dict[str, str]) -> httpx.Response:
+        return await self.client.post(url, content=body, headers=headers)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._drain()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def run(self, should_stop: Callable[[], bool] = lambda: False):
+        last_flush = time.monotonic()
+        last_purge = 0.0
+        while not should_stop():
+            free_slots = WEBHOOK_MAX_IN_FLIGHT - len(self._in_flight)
+            claimed = []
+            try:
+                if free_slots > 0:
+                    open_ids = self._open_circuits(await run_in_threadpool(open_circuit_candidates))
+                    claimed = await run_in_threadpool(claim_deliveries, free_slots, open_ids)
+                for delivery in claimed:
+                    task = asyncio.create_task(self._deliver(delivery))
+                    self._in_flight.add(task)
+                    task.add_done_callback(self._in_flight.discard)
+
+                if self._results and (len(self._results) >= WEBHOOK_RESULT_BATCH_SIZE or
+                                      time.monotonic() - last_flush >= WEBHOOK_RESULT_FLUSH_SECONDS):
+                    await self._flush()
+                    last_flush = time.monotonic()
+
+                if time.monotonic() - last_purge > _PURGE_INTERVAL_SECONDS:
+                    await run_in_threadpool(purge_finished_deliveries)
+                    last_purge = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook dağıtıcı hatası: {e}")
+
+            # Kuyruk doluysa hemen tekrar bak, değilse bekle
+            if len(claimed) < free_slots or free_slots <= 0:
+                await asyncio.sleep(WEBHOOK_POLL_SECONDS)
+        await self._drain()
+
+    async def _drain(self):
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        await self._flush()
+
+    async def _flush(self):
+        results, self._results = self._results, []
+        await run_in_threadpool(record_results, results)
+
+    def _open_circuits(self, candidates: Dict[int, tuple]) -> Set[int]:
+        now = datetime.utcnow()
+        open_ids = set()
+        for webhook_id, (failure_count, last_failure_at) in candidates.items():
+            circuit = self._circuits.setdefault(webhook_id, EndpointCircuit())
+            circuit.sync(failure_count, last_failure_at)
+            reopen_at = circuit.reopen_at()
+            if reopen_at is not None and now < reopen_at:
+                open_ids.add(webhook_id)
+        return open_ids
+
+    def _circuit(self, delivery: dict) -> EndpointCircuit:
+        circuit = self._circuits.get(delivery["webhook_id"])
+        if circuit is None:
+            circuit = self._circuits[delivery["webhook_id"]] = EndpointCircuit()
+        circuit.sync(delivery["failure_count"], delivery["last_failure_at"])
+        return circuit
+
+    async def _deliver(self, delivery: dict):
+        now = datetime.utcnow()
+        result = {
+            "delivery_id": delivery["id"], "webhook_id": delivery["webhook_id"], "attempts": delivery["attempts"],
+            "status": STATUS_PENDING, "run_after": now, "error": None, "finished_at": None, "log": None,
+        }
+        if not delivery["is_active"]:
+            result.update(status=STATUS_DEAD, finished_at=now, error="Webhook devre dışı")
+            self._results.append(result)
+            return
+
+        circuit = self._circuit(delivery)
+        async with circuit.semaphore:
+            # Semafor beklenirken devre açılmış olabilir
+            postpone_until = circuit.try_acquire(datetime.utcnow())
+            if postpone_until is not None:
+                result.update(run_after=postpone_until, error="Devre açık, ertelendi")
+                self._results.append(result)
+                return
+
+            body = delivery["body"].encode()
+            headers = webhook_headers(delivery["secret"], body, delivery["event_type"], delivery["id"])
+            response_status, response_body, error = None, None, None
+            try:
+                response = await self.post(delivery["url"], body, headers)
+                response_status = response.status_code
+                response_body = response.text[:1000]
+                if not 200 <= response.status_code < 300:
+                    error = f"HTTP {response.status_code}: {response_body}"
+            except Exception as e:
+                error = str(e) or type(e).__name__
+
+        attempted_at = datetime.utcnow()
+        success = error is None
+        circuit.record(success, attempted_at)
+        attempts = delivery["attempts"] + 1
+        result.update(attempts=attempts, error=error, attempted_at=attempted_at, failure_count=circuit.failure_count)
+        result["log"] = {
+            "webhook_id": delivery["webhook_id"], "event_type": delivery["event_type"], "payload": delivery["body"],
+            "response_status": response_status, "response_body": response_body, "success": success,
+            "error_message": error, "retry_count": attempts - 1, "created_at": attempted_at,
+        }
+        if success:
+            result.update(status=STATUS_DONE, finished_at=attempted_at)
+        elif attempts > (delivery["max_retries"] or 0):
+            result.update(status=STATUS_DEAD, finished_at=attempted_at)
+            logger.error(f"Webhook teslim edilemedi: {delivery['url']} ({delivery['event_type']}) - {error}")
+        else:
+            delay = retry_delay_seconds(delivery["retry_delay_seconds"], attempts)
+            result["run_after"] = attempted_at + timedelta(seconds=delay)
+            logger.warning(f"Webhook başarısız, {delay:.0f} sn sonra tekrar denenecek: {delivery['url']} - {error}")
+        self._results.append(result)
+
+
+webhook_dispatcher = WebhookDispatcher()
@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from database import SessionLocal
 import models
+from utils.config_cache import get_config_snapshot
+from utils.realtime import EVENT_TICKET_UPDATED, publish_event, ticket_event_data
 
 logger = logging.getLogger("uvicorn")
 
@@ -29,7 +31,7 @@ async def run_auto_escalation():
             db = SessionLocal()
             try:
                 # 1. Konfigürasyonu al
-                config = db.query(models.GeneralConfig).first()
+                config = get_config_snapshot(db)
                 if not config or not config.workflow_enabled or not config.escalation_enabled:
                     await asyncio.sleep(300)
                     continue
@@ -114,6 +116,9 @@ async def run_auto_escalation():
                         ticket.last_escalation_at = datetime.utcnow()
                         ticket.escalation_count += 1
                         
+                        # Açık sayfalar atama değişikliğini /ws üzerinden alır
+                        db.flush()
+                        publish_event(db, EVENT_TICKET_UPDATED, ticket_event_data(ticket), ticket_id=ticket.id)
                         db.commit()
                         
                         # Bildirim gönder - escalation için 'update' context kullan
@@ -18,6 +18,15 @@ const Icons = {
 // ChartJS'yi kaydet
 ChartJS.register(ArcElement, CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend);
 
+// Panoda son talepler gösterilir; tam liste Talepler sayfasında sayfa sayfa yüklenir
+const DASHBOARD_LIST_SIZE = 20;
+
+// Sayılar sunucuda hesaplanır (X-Total-Count); talepler indirilmez
+const countTickets = async (params) => {
+  const response = await axiosInstance.get('tickets/', { params: { ...params, limit: 1, include_total: true } });
+  return parseInt(response.headers['x-total-count'], 10) || 0;
+};
+
 const DashboardPage = () => {
   const { user } = useAuth();
   
@@ -35,6 +44,7 @@ const DashboardPage = () => {
   const [sortDesc, setSortDesc] = useState(true); // true: yeni > eski
   const [allDepartmentTickets, setAllDepartmentTickets] = useState([]);
   const [allPersonalTickets, setAllPersonalTickets] = useState([]);
+  const [hasMoreTickets, setHasMoreTickets] = useState(false);
 
   // Function to strip HTML tags and convert HTML entities
   const stripHtml = (html) => {
@@ -51,37 +61,45 @@ const DashboardPage = () => {
   };
 
   useEffect(() => {
-    const fetchDashboardData = async () => {
+    const fetchStats = async () => {
       try {
-        const response = await axiosInstance.get('tickets/');
-        // Artık backend tek bir liste döndürüyor, is_personal ile ayrım yapacağız
-        const allTickets = response.data || [];
-        const departmentTickets = allTickets.filter(t => !t.is_personal);
-        const personalTickets = allTickets.filter(t => t.is_personal);
-
-        // Sıralama
-        const sortedDepartment = departmentTickets.sort((a, b) => sortDesc
-          ? new Date(b.created_at) - new Date(a.created_at)
-          : new Date(a.created_at) - new Date(b.created_at)
-        );
-        const sortedPersonal = personalTickets.sort((a, b) => sortDesc
-          ? new Date(b.created_at) - new Date(a.created_at)
-          : new Date(a.created_at) - new Date(b.created_at)
-        );
-
-        // İstatistikleri hesapla
-        const open = sortedDepartment.filter(t => t.status === 'open').length;
-        const inProgress = sortedDepartment.filter(t => t.status === 'in_progress').length;
-        const closed = sortedDepartment.filter(t => t.status === 'closed').length;
-
+        const [open, inProgress, closed, personal] = await Promise.all([
+          countTickets({ is_personal: false, status: 'open' }),
+          countTickets({ is_personal: false, status: 'in_progress' }),
+          countTickets({ is_personal: false, status: 'closed' }),
+          countTickets({ is_personal: true })
+        ]);
         setStats({
           openTickets: open,
           inProgressTickets: inProgress,
           closedTickets: closed,
-          myTickets: sortedPersonal.length
+          myTickets: personal
         });
-        setAllDepartmentTickets(sortedDepartment);
-        setAllPersonalTickets(sortedPersonal);
+      } catch (error) {
+        console.error('Error fetching dashboard stats:', error);
+      }
+    };
+    fetchStats();
+  }, [user.id]);
+
+  useEffect(() => {
+    const fetchDashboardData = async () => {
+      try {
+        // Birim (atanmamış) ve kişisel talepler ayrı ayrı, sunucuda sıralanmış ilk sayfa olarak gelir
+        const params = {
+          limit: DASHBOARD_LIST_SIZE,
+          sort_by: 'created_at',
+          sort_order: sortDesc ? 'desc' : 'asc'
+        };
+        const [departmentResponse, personalResponse] = await Promise.all([
+          axiosInstance.get('tickets/', {
+            params: { ...params, is_personal: false, status: ticketFilter === 'all' ? undefined : ticketFilter }
+          }),
+          axiosInstance.get('tickets/', { params: { ...params, is_personal: true } })
+        ]);
+        setAllDepartmentTickets(departmentResponse.data || []);
+        setAllPersonalTickets(personalResponse.data || []);
+        setHasMoreTickets(Boolean(departmentResponse.headers['x-next-cursor'] || personalResponse.headers['x-next-cursor']));
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
       } finally {
@@ -89,7 +107,7 @@ const DashboardPage = () => {
       }
     };
     fetchDashboardData();
-  }, [user.id, sortDesc]);
+  }, [user.id, sortDesc, ticketFilter]);
 
   // Filtrelenmiş biletler (sadece departman için)
   const filteredDepartmentTickets = allDepartmentTickets.filter(ticket => {
@@ -354,6 +372,13 @@ const DashboardPage = () => {
             </div>
           )}
         </div>
+        {hasMoreTickets && (
+          <div className="px-4 py-3 sm:px-6 border-t border-gray-200 text-center">
+            <Link to="/tickets" className="text-sm font-medium text-primary-600 hover:text-primary-500">
+              Tüm talepleri görüntüle
+            </Link>
+          </div>
+        )}
       </div>
       {/* Kişisel Talepler - Sadece viewMode department iken göster */}
       {viewMode === 'department' && (
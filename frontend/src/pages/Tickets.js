@@ -3,6 +3,20 @@ import { Link } from 'react-router-dom';
 import axiosInstance from '../utils/axios';
 import { useAuth } from '../contexts/AuthContext';
 
+// Talepler sayfa sayfa yüklenir; sonraki sayfanın imleci X-Next-Cursor header'ında gelir
+const PAGE_SIZE = 50;
+
+const fetchTicketPage = (filter, cursor) => axiosInstance.get('tickets/', {
+  params: {
+    limit: PAGE_SIZE,
+    sort_by: 'created_at',
+    cursor: cursor || undefined,
+    // Durum ve öncelik filtreleri sunucuda uygulanır (arama yüklenen talepler üzerinde)
+    status: filter.status || undefined,
+    priority: filter.priority || undefined
+  }
+});
+
 const Tickets = () => {
   const [tickets, setTickets] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -13,6 +27,8 @@ const Tickets = () => {
     search: ''
   });
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [sortConfig, setSortConfig] = useState({ key: 'id', direction: 'desc' });
   const { user, token, isAuthenticated } = useAuth(); // AuthContext'ten kullanıcı bilgisini al
 
@@ -24,8 +40,9 @@ const Tickets = () => {
 
       setLoading(true);
       try {
-        const response = await axiosInstance.get('tickets/');
+        const response = await fetchTicketPage(filter, null);
         setTickets(response.data);
+        setNextCursor(response.headers['x-next-cursor'] || null);
 
         // Atanan talepleri özel olarak vurgulayabilirsiniz
         const assignedTickets = response.data.filter(ticket => ticket.assignee_id === user.id);
@@ -38,7 +55,22 @@ const Tickets = () => {
     };
 
     fetchTickets();
-  }, [user, isAuthenticated, token]);
+  }, [user, isAuthenticated, token, filter.status, filter.priority]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await fetchTicketPage(filter, nextCursor);
+      setTickets(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error fetching tickets:', error);
+      setError('Talepler yüklenirken bir hata oluştu');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const handleFilterChange = (e) => {
     const { name, value } = e.target;
@@ -284,6 +316,19 @@ const Tickets = () => {
             </div>
           )}
         </div>
+
+        {nextCursor && (
+          <div className="px-4 py-4 border-t border-gray-200 text-center">
+            <button
+              type="button"
+              className="btn btn-white"
+              onClick={loadMore}
+              disabled={loadingMore}
+            >
+              {loadingMore ? 'Yükleniyor...' : 'Daha fazla yükle'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );